@@ -0,0 +1,426 @@
+# ============================================================================
+# AGENDA DE PROFESIONALES: RESERVA DE FRANJAS SIN CONFLICTOS
+# ============================================================================
+"""
+Reserva de horarios de citas sin conflictos.
+
+Cada día de un profesional se divide en 48 franjas de 30 minutos; una cita
+ocupa la franja que contiene su hora (10:00 y 10:15 caen en la misma). La
+tabla agenda_diaria guarda por (profesional, día) un mapa de bits de las
+franjas ocupadas por citas activas (no canceladas).
+
+Reserva (dentro de la transacción que crea la cita):
+
+    reservar_franja(profesional_id, fecha, hora)   # FranjaOcupada si no está libre
+    db.session.add(cita)
+    db.session.commit()
+
+1. Si el día aún no tiene fila, se inserta vacía (INSERT ... ON CONFLICT
+   DO NOTHING, sin error si otra transacción la crea a la vez).
+2. UPDATE agenda_diaria SET franjas_ocupadas = franjas_ocupadas | bit
+   WHERE profesional_id = ? AND dia = ? AND franjas_ocupadas & bit = 0
+   Es una búsqueda por clave primaria que bloquea la fila: las reservas
+   concurrentes del mismo profesional y día esperan su turno y vuelven a
+   evaluar la condición. Si no se actualiza ninguna fila, la franja está
+   ocupada y se lanza FranjaOcupada de inmediato, sin leer la tabla citas.
+
+Búsqueda de franjas libres: buscar_franjas_libres lee solo las filas de
+agenda_diaria del rango (búsqueda por clave primaria por profesional) y
+obtiene las franjas libres del horario de atención con operaciones de bits,
+sin cargar citas. Los días sin fila están completamente libres.
+
+Respaldo: el índice único parcial uq_citas_profesional_fecha_hora
+(profesional_id, fecha, hora) WHERE estado <> 'CANCELADA' impide citas
+duplicadas aunque algún proceso escriba en citas sin pasar por aquí.
+
+Uso:
+    flask --app main agenda --reconstruir   # Recalcula la agenda desde las citas
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import select, update, delete, insert, func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db  # Instancia de la base de datos
+from modelos import Cita, AgendaDiaria  # Modelos de datos
+
+# Duración de una franja de la agenda y franjas por día (caben en un BigInteger)
+MINUTOS_POR_FRANJA = 30
+FRANJAS_POR_DIA = 24 * 60 // MINUTOS_POR_FRANJA
+
+# Estado de las citas que no ocupan franja
+ESTADO_CANCELADA = 'CANCELADA'
+
+# Horario de atención que ofrece la búsqueda de franjas libres (lunes a viernes)
+HORA_INICIO_ATENCION = time(8, 0)
+HORA_FIN_ATENCION = time(18, 0)
+DIAS_ATENCION = frozenset(range(5))
+
+# Días máximos de una búsqueda de franjas libres
+MAXIMO_DIAS_BUSQUEDA = 62
+
+# Filas de agenda insertadas por sentencia al reconstruir
+TAMANO_LOTE_RECONSTRUCCION = 5000
+
+# Índice único de respaldo (migración 4) y el mensaje con que SQLite lo
+# informa: SQLite nombra las columnas, no el índice
+INDICE_UNICO_FRANJAS = 'uq_citas_profesional_fecha_hora'
+_MENSAJE_SQLITE_FRANJA = 'UNIQUE constraint failed: citas.profesional_id, citas.fecha, citas.hora'
+
+
+class FranjaOcupada(Exception):
+    """
+    El profesional ya tiene una cita activa en la franja solicitada.
+
+    Atributos:
+        profesional_id (int): ID del profesional
+        fecha (date): Día de la cita
+        hora (time): Hora solicitada
+    """
+
+    def __init__(self, profesional_id, fecha, hora):
+        super().__init__(
+            f'El profesional ya tiene una cita el {fecha.strftime("%d/%m/%Y")} '
+            f'en la franja de las {hora_de_franja(franja_de_hora(hora)).strftime("%H:%M")}'
+        )
+        self.profesional_id = profesional_id
+        self.fecha = fecha
+        self.hora = hora
+
+
+def es_franja_duplicada(error):
+    """
+    Indica si un IntegrityError proviene del índice único de horarios.
+
+    Las demás violaciones (claves foráneas, NOT NULL) no son franjas ocupadas
+    y deben propagarse tal cual.
+
+    Args:
+        error (IntegrityError): Error lanzado por SQLAlchemy
+
+    Returns:
+        bool: True si la fila repetía una franja activa del profesional
+    """
+    original = getattr(error, 'orig', error)
+    # psycopg2 expone el nombre de la restricción violada
+    restriccion = getattr(getattr(original, 'diag', None), 'constraint_name', None)
+    if restriccion:
+        return restriccion == INDICE_UNICO_FRANJAS
+    mensaje = str(original)
+    return INDICE_UNICO_FRANJAS in mensaje or _MENSAJE_SQLITE_FRANJA in mensaje
+
+
+def franja_de_hora(hora):
+    """
+    Índice de la franja que contiene una hora.
+
+    Args:
+        hora (time): Hora de la cita
+
+    Returns:
+        int: Índice entre 0 y FRANJAS_POR_DIA - 1
+    """
+    return (hora.hour * 60 + hora.minute) // MINUTOS_POR_FRANJA
+
+
+def hora_de_franja(franja):
+    """
+    Hora de inicio de una franja.
+
+    Args:
+        franja (int): Índice de la franja
+
+    Returns:
+        time: Hora en que empieza la franja
+    """
+    minutos = franja * MINUTOS_POR_FRANJA
+    return time(minutos // 60, minutos % 60)
+
+
+def mapa_de_horas(horas):
+    """
+    Mapa de bits de las franjas que ocupan unas horas.
+
+    Args:
+        horas (iterable[time]): Horas de citas activas
+
+    Returns:
+        int: Entero con un bit por franja ocupada
+    """
+    mapa = 0
+    for hora in horas:
+        mapa |= 1 << franja_de_hora(hora)
+    return mapa
+
+
+def _mascara_franjas(desde, hasta):
+    """Mapa con las franjas [desde, hasta) en uno."""
+    return ((1 << hasta) - 1) & ~((1 << desde) - 1)
+
+
+# Franjas del horario de atención
+MASCARA_ATENCION = _mascara_franjas(franja_de_hora(HORA_INICIO_ATENCION), franja_de_hora(HORA_FIN_ATENCION))
+
+
+# Etiquetas 'HH:MM' de las franjas en uno de cada byte posible, para los
+# bytes del mapa que tocan el horario de atención: (desplazamiento, tabla)
+_BYTES_ATENCION = [
+    (8 * posicion, [
+        tuple(hora_de_franja(8 * posicion + bit).strftime('%H:%M') for bit in range(8) if valor >> bit & 1)
+        for valor in range(256)
+    ])
+    for posicion in range(FRANJAS_POR_DIA // 8)
+    if MASCARA_ATENCION >> (8 * posicion) & 0xFF
+]
+
+
+def _horas_libres(mapa_libres):
+    """Horas de inicio ('HH:MM') de las franjas en uno de un mapa del horario de atención."""
+    horas = ()
+    for desplazamiento, tabla in _BYTES_ATENCION:
+        horas += tabla[mapa_libres >> desplazamiento & 0xFF]
+    return horas
+
+
+def buscar_franjas_libres(profesionales, fecha_inicio, fecha_fin, ahora=None):
+    """
+    Franjas libres del horario de atención de varios profesionales.
+
+    Emite una sola consulta sobre agenda_diaria; las franjas ya pasadas de
+    hoy y los días anteriores a hoy no se ofrecen.
+
+    Args:
+        profesionales (list[tuple]): Pares (ID, nombre) en el orden de salida
+        fecha_inicio (date): Primer día del rango
+        fecha_fin (date): Último día del rango (incluido)
+        ahora (datetime, opcional): Momento de referencia (por defecto ahora)
+
+    Returns:
+        list[dict]: Por profesional: profesional_id, nombre y dias, una lista
+            de {'fecha': 'AAAA-MM-DD', 'horas': ['HH:MM', ...]} con los días
+            que tienen alguna franja libre
+    """
+    ahora = ahora or datetime.now()
+    hoy = ahora.date()
+    ids = [profesional_id for profesional_id, _ in profesionales]
+
+    ocupacion = {}
+    if ids:
+        ocupacion = {
+            (profesional_id, dia): mapa
+            for profesional_id, dia, mapa in db.session.execute(
+                select(AgendaDiaria.profesional_id, AgendaDiaria.dia, AgendaDiaria.franjas_ocupadas).where(
+                    AgendaDiaria.profesional_id.in_(ids),
+                    AgendaDiaria.dia.between(fecha_inicio, fecha_fin),
+                )
+            )
+        }
+
+    # Días de atención del rango con su máscara (hoy solo las franjas futuras)
+    dias = []
+    dia = max(fecha_inicio, hoy)
+    while dia <= fecha_fin:
+        if dia.weekday() in DIAS_ATENCION:
+            mascara = MASCARA_ATENCION
+            if dia == hoy:
+                mascara &= ~_mascara_franjas(0, franja_de_hora(ahora.time()) + 1)
+            dias.append((dia, dia.isoformat(), mascara))
+        dia += timedelta(days=1)
+
+    resultado = []
+    for profesional_id, nombre in profesionales:
+        dias_libres = []
+        for dia, dia_iso, mascara in dias:
+            horas = _horas_libres(mascara & ~ocupacion.get((profesional_id, dia), 0))
+            if horas:
+                dias_libres.append({'fecha': dia_iso, 'horas': list(horas)})
+        resultado.append({'profesional_id': profesional_id, 'nombre': nombre, 'dias': dias_libres})
+    return resultado
+
+
+def _insertar_dias_si_faltan(claves):
+    """
+    Crea las filas vacías de los días (profesional_id, dia) que no existan,
+    sin fallar ante una inserción concurrente.
+    """
+    claves = list(claves)
+    filas = [{'profesional_id': profesional_id, 'dia': dia, 'franjas_ocupadas': 0} for profesional_id, dia in claves]
+    if not filas:
+        return
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'postgresql':
+        db.session.execute(postgresql.insert(AgendaDiaria).on_conflict_do_nothing(), filas)
+    elif dialecto == 'sqlite':
+        db.session.execute(sqlite.insert(AgendaDiaria).on_conflict_do_nothing(), filas)
+    else:
+        existentes = set(bloquear_dias(claves, crear=False))
+        faltantes = [fila for fila in filas if (fila['profesional_id'], fila['dia']) not in existentes]
+        if faltantes:
+            db.session.execute(insert(AgendaDiaria), faltantes)
+
+
+def _insertar_dia_si_falta(profesional_id, fecha):
+    """Crea la fila vacía del día si no existe, sin fallar ante una inserción concurrente."""
+    _insertar_dias_si_faltan([(profesional_id, fecha)])
+
+
+def bloquear_dias(claves, crear=True):
+    """
+    Lee y bloquea hasta el commit la agenda de varios días.
+
+    Las filas se bloquean en orden de clave primaria, de modo que dos cargas
+    masivas concurrentes no pueden interbloquearse. En SQLite el bloqueo es
+    el de escritura de la base de datos, tomado al insertar los días.
+
+    Args:
+        claves (iterable[tuple]): Pares (profesional_id, dia)
+        crear (bool): Crear antes las filas de los días que no existan
+
+    Returns:
+        dict: (profesional_id, dia) -> mapa de franjas ocupadas
+    """
+    claves = sorted(set(claves))
+    if not claves:
+        return {}
+    if crear:
+        _insertar_dias_si_faltan(claves)
+    filas = db.session.execute(
+        select(AgendaDiaria.profesional_id, AgendaDiaria.dia, AgendaDiaria.franjas_ocupadas)
+        .where(tuple_(AgendaDiaria.profesional_id, AgendaDiaria.dia).in_(claves))
+        .order_by(AgendaDiaria.profesional_id, AgendaDiaria.dia)
+        .with_for_update()
+    )
+    return {(profesional_id, dia): mapa for profesional_id, dia, mapa in filas}
+
+
+def guardar_mapas(mapas):
+    """
+    Escribe los mapas de varios días (UPDATE por clave primaria en bloque).
+
+    Solo debe usarse con mapas leídos con bloquear_dias en la misma transacción.
+
+    Args:
+        mapas (dict): (profesional_id, dia) -> mapa de franjas ocupadas
+    """
+    if mapas:
+        db.session.execute(update(AgendaDiaria), [
+            {'profesional_id': profesional_id, 'dia': dia, 'franjas_ocupadas': mapa}
+            for (profesional_id, dia), mapa in mapas.items()
+        ])
+
+
+def reservar_franja(profesional_id, fecha, hora):
+    """
+    Marca como ocupada la franja de una cita nueva o reactivada.
+
+    Debe llamarse dentro de la transacción que guarda la cita y antes del
+    flush de la cita; el commit queda a cargo del servicio. Si la reserva
+    falla, el servicio debe hacer rollback.
+
+    Args:
+        profesional_id (int): ID del profesional
+        fecha (date): Día de la cita
+        hora (time): Hora de la cita
+
+    Raises:
+        FranjaOcupada: Si la franja ya tiene una cita activa
+    """
+    _insertar_dia_si_falta(profesional_id, fecha)
+    bit = 1 << franja_de_hora(hora)
+    resultado = db.session.execute(
+        update(AgendaDiaria)
+        .where(
+            AgendaDiaria.profesional_id == profesional_id,
+            AgendaDiaria.dia == fecha,
+            AgendaDiaria.franjas_ocupadas.op('&')(bit) == 0,
+        )
+        .values(franjas_ocupadas=AgendaDiaria.franjas_ocupadas.op('|')(bit))
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        raise FranjaOcupada(profesional_id, fecha, hora)
+
+
+def recalcular_dia(profesional_id, fecha):
+    """
+    Recalcula el mapa de un día desde sus citas activas (p. ej. tras cancelar).
+
+    Lee solo las citas de ese profesional y día mediante el índice
+    ix_citas_profesional_fecha. Debe llamarse antes del commit.
+
+    Args:
+        profesional_id (int): ID del profesional
+        fecha (date): Día a recalcular
+    """
+    db.session.flush()
+    horas = db.session.scalars(
+        select(Cita.hora).where(
+            Cita.profesional_id == profesional_id,
+            Cita.fecha == fecha,
+            Cita.estado != ESTADO_CANCELADA,
+        )
+    ).all()
+    _insertar_dia_si_falta(profesional_id, fecha)
+    db.session.execute(
+        update(AgendaDiaria)
+        .where(AgendaDiaria.profesional_id == profesional_id, AgendaDiaria.dia == fecha)
+        .values(franjas_ocupadas=mapa_de_horas(horas))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconstruir_agenda(conexion=None):
+    """
+    Recalcula por completo la agenda a partir de las citas activas.
+
+    Se usa al crear la tabla (migración 4) y después de cargas masivas que
+    no pasan por los servicios.
+
+    Args:
+        conexion (Connection, opcional): Conexión en transacción; por defecto
+            se usa la sesión actual y se confirma al terminar
+
+    Returns:
+        int: Número de días de agenda generados
+    """
+    ejecutar = conexion.execute if conexion is not None else db.session.execute
+
+    mapas = defaultdict(int)
+    filas = ejecutar(
+        select(Cita.profesional_id, Cita.fecha, Cita.hora)
+        .where(Cita.estado != ESTADO_CANCELADA)
+        .execution_options(yield_per=TAMANO_LOTE_RECONSTRUCCION)
+    )
+    for profesional_id, fecha, hora in filas:
+        mapas[(profesional_id, fecha)] |= 1 << franja_de_hora(hora)
+
+    ejecutar(delete(AgendaDiaria.__table__))
+    filas_agenda = [
+        {'profesional_id': profesional_id, 'dia': dia, 'franjas_ocupadas': mapa}
+        for (profesional_id, dia), mapa in mapas.items()
+    ]
+    for inicio in range(0, len(filas_agenda), TAMANO_LOTE_RECONSTRUCCION):
+        ejecutar(insert(AgendaDiaria.__table__), filas_agenda[inicio:inicio + TAMANO_LOTE_RECONSTRUCCION])
+
+    if conexion is None:
+        db.session.commit()
+    return len(filas_agenda)
+
+
+def registrar_comandos(app):
+    """Registra el comando `flask agenda` en la aplicación."""
+    import click
+
+    @app.cli.command('agenda')
+    @click.option('--reconstruir', is_flag=True, help='Recalcular la agenda desde las citas.')
+    def comando_agenda(reconstruir):
+        """Muestra o reconstruye la agenda diaria de los profesionales."""
+        if reconstruir:
+            dias = reconstruir_agenda()
+            click.echo(f'Agenda reconstruida: {dias} días de agenda.')
+            return
+
+        dias, profesionales = db.session.execute(select(
+            func.count(), func.count(func.distinct(AgendaDiaria.profesional_id)),
+        ).select_from(AgendaDiaria)).one()
+        click.echo(f'{dias} días de agenda de {profesionales} profesionales.')
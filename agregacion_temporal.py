@@ -0,0 +1,93 @@
+# ============================================================================
+# AGREGACIÓN POR INTERVALOS DE TIEMPO
+# ============================================================================
+"""
+Agregaciones por mes calendario y por día de la semana en una sola consulta.
+
+Las funciones agrupan con EXTRACT (year, month, dow), que SQLAlchemy
+traduce tanto para SQLite (strftime) como para PostgreSQL (EXTRACT), y
+completan en Python los intervalos sin registros con cero. Los meses se
+calculan con aritmética de calendario, nunca con múltiplos de 30 días.
+"""
+
+from datetime import date
+from sqlalchemy import func, extract  # Funciones SQL de agregación y extracción
+from app import db  # Instancia de la base de datos
+
+# Nombres de los días en orden ISO (lunes primero)
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def restar_meses(fecha, meses):
+    """
+    Retorna el primer día del mes calendario situado `meses` meses antes.
+
+    Args:
+        fecha (date): Fecha de referencia
+        meses (int): Número de meses a retroceder (0 = mes de la fecha)
+
+    Returns:
+        date: Primer día del mes resultante
+    """
+    indice = fecha.year * 12 + (fecha.month - 1) - meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def serie_mensual(columna, meses, hasta=None, valor=None, condiciones=()):
+    """
+    Agrega una columna de fecha por mes calendario para los últimos N meses.
+
+    Args:
+        columna: Columna Date/DateTime por la que se agrupa
+        meses (int): Número de meses de la serie, incluido el mes de `hasta`
+        hasta (date, opcional): Fecha del último mes de la serie (por defecto hoy)
+        valor (opcional): Expresión agregada (por defecto COUNT(*))
+        condiciones (iterable): Filtros adicionales
+
+    Returns:
+        list[tuple]: [('YYYY-MM', total), ...] en orden cronológico, con cero
+            en los meses sin registros
+    """
+    hasta = hasta or date.today()
+    inicio = restar_meses(hasta, meses - 1)
+    fin = restar_meses(hasta, -1)  # Primer día del mes siguiente (exclusivo)
+
+    anio = extract('year', columna)
+    mes = extract('month', columna)
+    filas = db.session.query(
+        anio, mes, valor if valor is not None else func.count()
+    ).filter(
+        columna >= inicio, columna < fin, *condiciones
+    ).group_by(anio, mes).all()
+
+    totales = {(int(a), int(m)): total or 0 for a, m, total in filas}
+    serie = []
+    for i in range(meses - 1, -1, -1):
+        primer_dia = restar_meses(hasta, i)
+        serie.append((primer_dia.strftime('%Y-%m'), totales.get((primer_dia.year, primer_dia.month), 0)))
+    return serie
+
+
+def histograma_dia_semana(columna, valor=None, condiciones=()):
+    """
+    Agrega una columna de fecha por día de la semana.
+
+    EXTRACT(dow) retorna 0 para domingo en SQLite y en PostgreSQL; el
+    resultado se reordena con el lunes primero.
+
+    Args:
+        columna: Columna Date/DateTime por la que se agrupa
+        valor (opcional): Expresión agregada (por defecto COUNT(*))
+        condiciones (iterable): Filtros adicionales
+
+    Returns:
+        dict: Nombre del día (DIAS_SEMANA) -> total, de lunes a domingo
+    """
+    dia = extract('dow', columna)
+    filas = db.session.query(
+        dia, valor if valor is not None else func.count()
+    ).filter(*condiciones).group_by(dia).all()
+
+    totales = {int(d): total or 0 for d, total in filas}
+    # Índice ISO i (0 = lunes) corresponde a dow (i + 1) % 7
+    return {nombre: totales.get((i + 1) % 7, 0) for i, nombre in enumerate(DIAS_SEMANA)}
@@ -6,6 +6,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from replica_lectura import SesionEnrutada, configurar_replica, enrutar_vistas_a_replica
+from pool_conexiones import leer_configuracion_pool, opciones_engine, instrumentar_engines
 
 # Configuración del sistema de logging
 logging.basicConfig(level=logging.DEBUG)
@@ -14,7 +16,7 @@ class Base(DeclarativeBase):
     pass
 
 # Inicialización de extensiones
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': SesionEnrutada})  # Lecturas de reportes a la réplica
 login_manager = LoginManager()
 
 def crear_app():
@@ -31,17 +33,47 @@ def crear_app():
 
     # Configuración de base de datos
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///mediconsult.db")
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-    # Middleware para entornos con proxy reverso
-    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    # Pool de conexiones (DB_POOL_*): se valida aquí para fallar al arrancar, no bajo carga
+    pool = leer_configuracion_pool()
+    app.config["DB_POOL_SIZE"] = pool['tamano']
+    app.config["DB_MAX_OVERFLOW"] = pool['max_overflow']
+    app.config["DB_POOL_TIMEOUT"] = pool['timeout']
+    app.config["DB_POOL_RECYCLE"] = pool['recycle']
+    app.config["DB_POOL_PRE_PING"] = pool['pre_ping']
+    app.config["DB_POOL_PING_OCIOSA"] = pool['ping_ociosa']
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opciones_engine(pool, app.config["SQLALCHEMY_DATABASE_URI"])
+
+    # Réplica de solo lectura para los reportes (opcional, mismo pool por worker)
+    url_replica = os.environ.get("DATABASE_URL_REPLICA")
+    configurar_replica(app, url_replica, opciones_engine(pool, url_replica) if url_replica else None)
+
+    # Caché de resultados de reportes (Redis compartido si se define CACHE_REPORTES_URL)
+    app.config["CACHE_REPORTES_URL"] = os.environ.get("CACHE_REPORTES_URL")
+    app.config["CACHE_REPORTES_MAX_ENTRADAS"] = int(os.environ.get("CACHE_REPORTES_MAX_ENTRADAS", 512))
+
+    # Vigencia en segundos de las instantáneas de usuario de sesión (0 = sin caché)
+    app.config["SESION_USUARIOS_TTL"] = int(os.environ.get("SESION_USUARIOS_TTL", 60))
+
+    # Verificación de contraseñas en procesos y límite de intentos de login
+    app.config["AUTH_PROCESOS"] = int(os.environ.get("AUTH_PROCESOS", min(4, os.cpu_count() or 1)))
+    app.config["AUTH_MAX_PENDIENTES"] = int(os.environ.get("AUTH_MAX_PENDIENTES", 64))
+    app.config["AUTH_TIMEOUT_SEGUNDOS"] = float(os.environ.get("AUTH_TIMEOUT_SEGUNDOS", 10))
+    app.config["AUTH_FALLOS_POR_IDENTIFICADOR"] = int(os.environ.get("AUTH_FALLOS_POR_IDENTIFICADOR", 5))
+    app.config["AUTH_FALLOS_POR_IP"] = int(os.environ.get("AUTH_FALLOS_POR_IP", 50))
+    app.config["AUTH_VENTANA_SEGUNDOS"] = int(os.environ.get("AUTH_VENTANA_SEGUNDOS", 300))
+
+    # Consultas de reportes independientes en paralelo (0 hilos = secuenciales) y plazo por reporte
+    app.config["REPORTES_HILOS"] = int(os.environ.get("REPORTES_HILOS", 4))
+    app.config["REPORTES_PLAZO_SEGUNDOS"] = float(os.environ.get("REPORTES_PLAZO_SEGUNDOS", 10))
+
+    # Middleware para entornos con proxy reverso (x_for: IP real del cliente para el límite por IP)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
     # Inicialización de extensiones
     db.init_app(app)
+    instrumentar_engines(app)
     login_manager.init_app(app)
 
     # Configuración de Flask-Login
@@ -49,38 +81,42 @@ def crear_app():
     login_manager.login_message = 'Debe iniciar sesión para acceder a esta página.'
     login_manager.login_message_category = 'warning'
 
+    # El user_loader devuelve una instantánea cacheada del usuario (ver sesion_usuarios)
+    from sesion_usuarios import cache_sesiones
+    cache_sesiones.configurar(app)
+
     @login_manager.user_loader
     def cargar_usuario(usuario_id):
-        from modelos import Usuario
-        return Usuario.query.get(int(usuario_id))
+        return cache_sesiones.cargar(int(usuario_id))
 
     # Registro de rutas
     from rutas import registrar_rutas
     registrar_rutas(app)
-
-    # Inicialización de base de datos
-    with app.app_context():
-        import modelos
-        db.create_all()
-
-        from modelos import Usuario, RolUsuario
-        admin_existente = Usuario.query.filter_by(dni='12345678').first()
-        if not admin_existente:
-            from werkzeug.security import generate_password_hash
-            admin = Usuario()
-            admin.nombre = 'DENIS ADMIN'
-            admin.dni = '12345678'
-            admin.rol = RolUsuario.ADMINISTRADOR
-            admin.password_hash = generate_password_hash('admin123')
-            db.session.add(admin)
-            db.session.commit()
-
-            try:
-                from respaldo_usuarios import ServicioRespaldoCSV
-                ServicioRespaldoCSV.guardar_usuario_en_csv(admin)
-                logging.info('Usuario administrador creado y guardado en CSV: DNI=12345678, Contraseña=admin123')
-            except Exception as e:
-                logging.error(f'Usuario administrador creado: DNI=12345678, Contraseña=admin123 (Error CSV: {e})')
+    enrutar_vistas_a_replica(app, '/reportes/api/')
+
+    # Comandos de línea de comandos (flask inicializar-bd, flask migrar, flask verificar-indices, ...)
+    # El esquema no se toca al importar: ver `flask inicializar-bd` en migraciones.py
+    from migraciones import registrar_comandos
+    from verificacion_indices import registrar_comandos as registrar_comandos_indices
+    from resumen_diario import registrar_comandos as registrar_comandos_resumen
+    from cache_reportes import configurar_cache_reportes
+    from pool_conexiones import registrar_comandos as registrar_comandos_pool
+    from agenda_profesionales import registrar_comandos as registrar_comandos_agenda
+    registrar_comandos(app)
+    registrar_comandos_indices(app)
+    registrar_comandos_resumen(app)
+    registrar_comandos_pool(app)
+    registrar_comandos_agenda(app)
+    configurar_cache_reportes(app)
+
+    from graficos import cache_graficos
+    cache_graficos.configurar(app)
+
+    from autenticacion_concurrente import configurar_autenticacion
+    configurar_autenticacion(app)
+
+    from ejecutor_reportes import configurar_ejecutor_reportes
+    configurar_ejecutor_reportes(app)
 
     return app
 
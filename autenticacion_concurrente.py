@@ -0,0 +1,251 @@
+# ============================================================================
+# VERIFICACIÓN DE CONTRASEÑAS EN PROCESOS Y LÍMITE DE INTENTOS DE LOGIN
+# ============================================================================
+"""
+Canal de autenticación para picos de inicio de sesión.
+
+La verificación de un hash scrypt/pbkdf2 es deliberadamente lenta (~100 ms
+de CPU). Ejecutada en el hilo de la solicitud, una avalancha de logins al
+inicio del semestre ocupa todos los workers de gunicorn. Este módulo separa
+el trabajo en dos etapas:
+
+1. LimitadorIntentos: cuenta los fallos por identificador y por IP en una
+   ventana de tiempo. Superado el límite, el intento se rechaza ANTES de
+   calcular el hash (LoginBloqueado), así que la fuerza bruta no consume CPU.
+2. PoolVerificacionPasswords: ejecuta check_password_hash en un
+   ProcessPoolExecutor acotado. Como máximo `procesos` hashes se calculan a
+   la vez por worker y como máximo `max_pendientes` esperan; el resto se
+   rechaza de inmediato (VerificacionSaturada) en lugar de encolarse sin fin.
+
+Los contadores viven en memoria de cada worker: con N workers de gunicorn
+el límite efectivo es N veces el configurado, sigue estando acotado.
+
+Configuración (app.config, ver app.py):
+    AUTH_PROCESOS (int): Procesos de verificación (0 = en el hilo de la solicitud)
+    AUTH_MAX_PENDIENTES (int): Verificaciones en curso o en espera por worker
+    AUTH_TIMEOUT_SEGUNDOS (float): Espera máxima por una verificación
+    AUTH_FALLOS_POR_IDENTIFICADOR (int): Fallos permitidos por identificador en la ventana
+    AUTH_FALLOS_POR_IP (int): Fallos permitidos por IP en la ventana
+    AUTH_VENTANA_SEGUNDOS (int): Duración de la ventana de fallos
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TimeoutFuturo
+from werkzeug.security import check_password_hash
+
+# Valores por defecto de la configuración
+PROCESOS_POR_DEFECTO = min(4, os.cpu_count() or 1)
+MAX_PENDIENTES_POR_DEFECTO = 64
+TIMEOUT_POR_DEFECTO = 10.0
+FALLOS_POR_IDENTIFICADOR = 5
+FALLOS_POR_IP = 50
+VENTANA_SEGUNDOS = 300
+
+# Claves distintas (identificadores + IPs) retenidas por el limitador
+MAX_CLAVES_LIMITADOR = 100000
+
+
+class LoginBloqueado(Exception):
+    """
+    Demasiados intentos fallidos para el identificador o la IP.
+
+    Atributos:
+        reintentar_en (int): Segundos hasta que se libera la ventana
+    """
+
+    def __init__(self, reintentar_en):
+        super().__init__(f'Demasiados intentos fallidos; reintente en {reintentar_en} segundos')
+        self.reintentar_en = reintentar_en
+
+
+class VerificacionSaturada(Exception):
+    """El pool de verificación tiene la cola llena o no respondió a tiempo."""
+
+
+def _verificar_hash(password_hash, password):
+    """Función ejecutada en los procesos del pool (debe ser de nivel de módulo)."""
+    return check_password_hash(password_hash, password)
+
+
+class PoolVerificacionPasswords:
+    """
+    Verificación de contraseñas en un pool de procesos acotado.
+
+    El pool se crea en el primer uso dentro de cada proceso, de modo que los
+    workers de gunicorn (creados por fork) no heredan procesos del maestro.
+    """
+
+    def __init__(self, procesos=PROCESOS_POR_DEFECTO, max_pendientes=MAX_PENDIENTES_POR_DEFECTO,
+                 timeout=TIMEOUT_POR_DEFECTO):
+        """
+        Args:
+            procesos (int): Procesos de verificación (0 = verificar en el hilo actual)
+            max_pendientes (int): Verificaciones simultáneas admitidas (en curso + en cola)
+            timeout (float): Segundos máximos de espera por verificación
+        """
+        self.procesos = procesos
+        self.max_pendientes = max_pendientes
+        self.timeout = timeout
+        self._ejecutor = None
+        self._pid = None
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._lock = threading.Lock()
+
+    def configurar(self, app):
+        """
+        Aplica AUTH_PROCESOS, AUTH_MAX_PENDIENTES y AUTH_TIMEOUT_SEGUNDOS.
+
+        Args:
+            app (Flask): Aplicación configurada
+        """
+        self.cerrar()
+        self.procesos = app.config.get('AUTH_PROCESOS', PROCESOS_POR_DEFECTO)
+        self.max_pendientes = app.config.get('AUTH_MAX_PENDIENTES', MAX_PENDIENTES_POR_DEFECTO)
+        self.timeout = app.config.get('AUTH_TIMEOUT_SEGUNDOS', TIMEOUT_POR_DEFECTO)
+        self._cupos = threading.BoundedSemaphore(self.max_pendientes)
+
+    def _obtener_ejecutor(self):
+        """Retorna el pool del proceso actual, creándolo si hace falta."""
+        with self._lock:
+            if self._ejecutor is None or self._pid != os.getpid():
+                self._ejecutor = ProcessPoolExecutor(max_workers=self.procesos)
+                self._pid = os.getpid()
+                logging.info(f'Pool de verificación de contraseñas: {self.procesos} procesos')
+            return self._ejecutor
+
+    def verificar(self, password_hash, password):
+        """
+        Verifica una contraseña contra su hash.
+
+        Args:
+            password_hash (str): Hash almacenado (formato werkzeug)
+            password (str): Contraseña en texto plano
+
+        Returns:
+            bool: True si la contraseña es correcta
+
+        Raises:
+            VerificacionSaturada: Si hay max_pendientes verificaciones en curso
+                o la verificación supera el timeout
+        """
+        if not self._cupos.acquire(blocking=False):
+            raise VerificacionSaturada('Demasiadas verificaciones de contraseña en curso')
+        try:
+            if self.procesos <= 0:
+                return _verificar_hash(password_hash, password)
+            futuro = self._obtener_ejecutor().submit(_verificar_hash, password_hash, password)
+            try:
+                return futuro.result(timeout=self.timeout)
+            except TimeoutFuturo as e:
+                futuro.cancel()
+                raise VerificacionSaturada('La verificación de contraseña no respondió a tiempo') from e
+        finally:
+            self._cupos.release()
+
+    def cerrar(self):
+        """Detiene el pool del proceso actual (si existe)."""
+        with self._lock:
+            if self._ejecutor is not None and self._pid == os.getpid():
+                self._ejecutor.shutdown(wait=False, cancel_futures=True)
+            self._ejecutor = None
+            self._pid = None
+
+
+class LimitadorIntentos:
+    """
+    Cuenta intentos fallidos por clave en ventanas fijas de tiempo.
+
+    Las claves son 'id:<identificador>' e 'ip:<dirección>'. Un login exitoso
+    reinicia el contador de su identificador (no el de la IP, que puede ser
+    compartida por toda una red universitaria).
+    """
+
+    def __init__(self, fallos_por_identificador=FALLOS_POR_IDENTIFICADOR, fallos_por_ip=FALLOS_POR_IP,
+                 ventana=VENTANA_SEGUNDOS, max_claves=MAX_CLAVES_LIMITADOR):
+        """
+        Args:
+            fallos_por_identificador (int): Fallos permitidos por identificador en la ventana
+            fallos_por_ip (int): Fallos permitidos por IP en la ventana
+            ventana (int): Duración de la ventana en segundos
+            max_claves (int): Claves retenidas (se descartan las más antiguas)
+        """
+        self.fallos_por_identificador = fallos_por_identificador
+        self.fallos_por_ip = fallos_por_ip
+        self.ventana = ventana
+        self.max_claves = max_claves
+        self._contadores = OrderedDict()  # clave -> (inicio de la ventana, fallos)
+        self._lock = threading.Lock()
+
+    def configurar(self, app):
+        """
+        Aplica AUTH_FALLOS_POR_IDENTIFICADOR, AUTH_FALLOS_POR_IP y AUTH_VENTANA_SEGUNDOS.
+
+        Args:
+            app (Flask): Aplicación configurada
+        """
+        self.fallos_por_identificador = app.config.get('AUTH_FALLOS_POR_IDENTIFICADOR', FALLOS_POR_IDENTIFICADOR)
+        self.fallos_por_ip = app.config.get('AUTH_FALLOS_POR_IP', FALLOS_POR_IP)
+        self.ventana = app.config.get('AUTH_VENTANA_SEGUNDOS', VENTANA_SEGUNDOS)
+        self.limpiar()
+
+    def _claves(self, identificador, ip):
+        """Pares (clave, límite) que aplican a un intento."""
+        claves = [(f'id:{identificador}', self.fallos_por_identificador)]
+        if ip:
+            claves.append((f'ip:{ip}', self.fallos_por_ip))
+        return claves
+
+    def comprobar(self, identificador, ip=None):
+        """
+        Verifica que el intento esté permitido, antes de calcular el hash.
+
+        Args:
+            identificador (str): DNI o código de matrícula
+            ip (str, opcional): Dirección del cliente
+
+        Raises:
+            LoginBloqueado: Si el identificador o la IP agotaron sus fallos
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            for clave, limite in self._claves(identificador, ip):
+                inicio, fallos = self._contadores.get(clave, (ahora, 0))
+                if fallos >= limite and ahora - inicio < self.ventana:
+                    raise LoginBloqueado(int(self.ventana - (ahora - inicio)) + 1)
+
+    def registrar_fallo(self, identificador, ip=None):
+        """Suma un fallo al identificador y a la IP."""
+        ahora = time.monotonic()
+        with self._lock:
+            for clave, _ in self._claves(identificador, ip):
+                inicio, fallos = self._contadores.pop(clave, (ahora, 0))
+                if ahora - inicio >= self.ventana:
+                    inicio, fallos = ahora, 0  # Ventana vencida: empezar de nuevo
+                self._contadores[clave] = (inicio, fallos + 1)  # Al final = más reciente
+            while len(self._contadores) > self.max_claves:
+                self._contadores.popitem(last=False)
+
+    def registrar_exito(self, identificador):
+        """Reinicia los fallos del identificador."""
+        with self._lock:
+            self._contadores.pop(f'id:{identificador}', None)
+
+    def limpiar(self):
+        """Elimina todos los contadores."""
+        with self._lock:
+            self._contadores.clear()
+
+
+# Instancias únicas usadas por ambas pilas de autenticación
+pool_verificacion = PoolVerificacionPasswords()
+limitador_intentos = LimitadorIntentos()
+
+
+def configurar_autenticacion(app):
+    """Configura el pool de verificación y el limitador desde app.config."""
+    pool_verificacion.configurar(app)
+    limitador_intentos.configurar(app)
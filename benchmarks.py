@@ -0,0 +1,1056 @@
+# ============================================================================
+# BENCHMARKS DE RENDIMIENTO DE LOS SERVICIOS
+# ============================================================================
+"""
+Benchmarks reproducibles de los servicios de negocio.
+
+Cada benchmark crea una base de datos SQLite temporal, la puebla con datos
+sintéticos y mide tiempos y número de consultas SQL emitidas.
+
+Uso:
+    python benchmarks.py                 # Ejecuta todos los benchmarks
+    python benchmarks.py rendimiento     # Ejecuta solo el benchmark indicado
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date, time as hora, timedelta
+
+# La base de datos temporal debe configurarse antes de importar la aplicación
+_DIRECTORIO_TEMPORAL = tempfile.mkdtemp(prefix='osiris_bench_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DIRECTORIO_TEMPORAL, 'bench.db')}"
+
+from app import app, db  # noqa: E402
+from modelos import Usuario, Paciente, Cita, Consulta, ResumenDiarioCitas, ResumenMensualCitas, RolUsuario, TipoCita, NivelRiesgo  # noqa: E402
+from monitor_consultas import ContadorConsultas, activar_presupuesto_plantillas  # noqa: E402
+from resumen_diario import reconstruir_resumen_diario  # noqa: E402
+from agenda_profesionales import reconstruir_agenda  # noqa: E402
+from cache_reportes import cache_reportes  # noqa: E402
+
+# Los benchmarks miden el cálculo real; benchmark_cache_reportes la activa
+cache_reportes.habilitada = False
+
+# Consultas permitidas mientras se renderizan las listas: los perfiles de carga
+# traen todo antes de renderizar, así que cualquier consulta es una carga perezosa.
+# Se activa al importar porque Flask no admite registrar hooks tras la primera solicitud.
+app.config['PRESUPUESTO_CONSULTAS_PLANTILLAS'] = {'citas/lista.html': 0, 'consultas/lista.html': 0}
+activar_presupuesto_plantillas(app)
+
+
+def _reiniciar_base_datos():
+    """Elimina y vuelve a crear todas las tablas."""
+    db.session.remove()  # Descartar objetos en memoria de la iteración anterior
+    db.drop_all()
+    db.create_all()
+
+
+def poblar_datos(num_profesionales, citas_por_profesional=10, num_pacientes=50):
+    """
+    Inserta datos sintéticos en bloque.
+
+    Args:
+        num_profesionales (int): Número de profesionales a crear
+        citas_por_profesional (int): Citas asignadas a cada profesional
+        num_pacientes (int): Número de pacientes entre los que se reparten las citas
+    """
+    _reiniciar_base_datos()
+
+    usuarios_pacientes = [
+        {'nombre': f'Estudiante {i}', 'codigo_matricula': f'{i:06d}',
+         'rol': RolUsuario.PACIENTE, 'password_hash': 'x', 'activo': True}
+        for i in range(num_pacientes)
+    ]
+    usuarios_profesionales = [
+        {'nombre': f'Profesional {i}', 'dni': f'{i:08d}',
+         'rol': RolUsuario.PROFESIONAL, 'password_hash': 'x', 'activo': True}
+        for i in range(num_profesionales)
+    ]
+    db.session.execute(db.insert(Usuario), usuarios_pacientes + usuarios_profesionales)
+
+    ids_usuarios_pacientes = db.session.scalars(
+        db.select(Usuario.id).filter_by(rol=RolUsuario.PACIENTE).order_by(Usuario.id)
+    ).all()
+    ids_profesionales = db.session.scalars(
+        db.select(Usuario.id).filter_by(rol=RolUsuario.PROFESIONAL).order_by(Usuario.id)
+    ).all()
+
+    carreras = ['Medicina', 'Ingeniería', 'Derecho', 'Enfermería']
+    db.session.execute(db.insert(Paciente), [
+        {'usuario_id': usuario_id, 'carrera': carreras[i % len(carreras)],
+         'fecha_nacimiento': date(2000, 1, 1) + timedelta(days=i)}
+        for i, usuario_id in enumerate(ids_usuarios_pacientes)
+    ])
+    ids_pacientes = db.session.scalars(db.select(Paciente.id).order_by(Paciente.id)).all()
+
+    tipos = list(TipoCita)
+    fecha_base = date.today() - timedelta(days=365)
+    citas = []
+    for p, profesional_id in enumerate(ids_profesionales):
+        for c in range(citas_por_profesional):
+            citas.append({
+                'paciente_id': ids_pacientes[(p + c) % len(ids_pacientes)],
+                'profesional_id': profesional_id,
+                'fecha': fecha_base + timedelta(days=(p * 7 + c * 3) % 365),
+                # (día, hora) distintos por profesional: 365 días x 9 horas x 12 minutos
+                'hora': hora(8 + c % 9, 5 * (c // 3285 % 12)),
+                'tipo_cita': tipos[c % len(tipos)],
+                'estado': 'COMPLETADA' if c % 2 == 0 else 'PROGRAMADA',
+            })
+    db.session.execute(db.insert(Cita), citas)
+
+    niveles = list(NivelRiesgo)
+    citas_completadas = db.session.scalars(
+        db.select(Cita.id).filter_by(estado='COMPLETADA').order_by(Cita.id)
+    ).all()
+    db.session.execute(db.insert(Consulta), [
+        {'cita_id': cita_id, 'diagnostico': 'Control', 'nivel_riesgo': niveles[i % len(niveles)]}
+        for i, cita_id in enumerate(citas_completadas)
+    ])
+    db.session.commit()
+
+    # La carga en bloque no pasa por los servicios: recalcular el resumen diario y la agenda
+    reconstruir_resumen_diario()
+    reconstruir_agenda()
+
+
+def medir(funcion, repeticiones=5):
+    """
+    Ejecuta una función varias veces y mide tiempo y consultas SQL.
+
+    Returns:
+        tuple: (milisegundos promedio por ejecución, consultas por ejecución)
+    """
+    db.session.expire_all()
+    with ContadorConsultas() as contador:
+        funcion()
+    consultas = contador.total
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        db.session.expire_all()
+        funcion()
+    milisegundos = (time.perf_counter() - inicio) * 1000 / repeticiones
+    return milisegundos, consultas
+
+
+def benchmark_rendimiento_profesionales():
+    """
+    Verifica que obtener_rendimiento_profesionales emite un número constante
+    de consultas SQL sin importar cuántos profesionales existan.
+    """
+    from servicios import ServicioReporte
+
+    print('\n== ServicioReporte.obtener_rendimiento_profesionales ==')
+    print(f"{'profesionales':>14} {'consultas SQL':>14} {'ms/llamada':>12}")
+    for num_profesionales in (10, 100, 300, 1000):
+        poblar_datos(num_profesionales)
+        ms, consultas = medir(ServicioReporte.obtener_rendimiento_profesionales)
+        print(f'{num_profesionales:>14} {consultas:>14} {ms:>12.2f}')
+
+
+def _cliente_administrador():
+    """Crea un administrador y retorna un cliente de pruebas con su sesión iniciada."""
+    admin = Usuario(nombre='Admin Bench', dni='99999999', rol=RolUsuario.ADMINISTRADOR, password_hash='x')
+    db.session.add(admin)
+    db.session.commit()
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(admin.id)
+        sesion['_fresh'] = True
+    return cliente
+
+
+def benchmark_perfiles_carga():
+    """
+    Cuenta las consultas SQL emitidas al renderizar las listas de citas y
+    consultas con sus perfiles de carga anticipada. Falla con
+    PresupuestoConsultasExcedido si una de las plantillas supera su
+    presupuesto (PRESUPUESTO_CONSULTAS_PLANTILLAS).
+    """
+    print('\n== Renderizado de listas con perfiles de carga ==')
+    print(f"{'citas':>8} {'/citas/ SQL':>12} {'/consultas/ SQL':>16} {'ms /citas/':>12} {'presupuesto':>12}")
+    # Sin propagación Flask convertiría el fallo del presupuesto en una respuesta 500
+    propagar = app.config['PROPAGATE_EXCEPTIONS']
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    try:
+        for num_profesionales in (10, 50, 200):
+            poblar_datos(num_profesionales)
+            cliente = _cliente_administrador()
+            total_citas = Cita.query.count()
+            with ContadorConsultas() as contador_citas:
+                inicio = time.perf_counter()
+                respuesta_citas = cliente.get('/citas/')
+                ms = (time.perf_counter() - inicio) * 1000
+            with ContadorConsultas() as contador_consultas:
+                respuesta_consultas = cliente.get('/consultas/')
+            assert respuesta_citas.status_code == respuesta_consultas.status_code == 200
+            print(f'{total_citas:>8} {contador_citas.total:>12} {contador_consultas.total:>16} {ms:>12.2f} '
+                  f"{'cumplido':>12}")
+    finally:
+        app.config['PROPAGATE_EXCEPTIONS'] = propagar
+
+
+def benchmark_paginacion():
+    """
+    Compara el costo de la primera página de citas con el de una página
+    profunda: con paginación por cursor ambos deben ser equivalentes.
+    """
+    from paginacion import codificar_cursor
+    from servicios import ServicioCita
+
+    print('\n== ServicioCita.obtener_citas_paginadas ==')
+    print(f"{'citas':>8} {'ms página 1':>12} {'ms página final':>16} {'consultas SQL':>14}")
+    for num_profesionales in (200, 1000, 4000):
+        poblar_datos(num_profesionales, citas_por_profesional=25, num_pacientes=500)
+        total_citas = Cita.query.count()
+        # Cursor que apunta a las últimas filas del orden (fecha, hora, id) descendente
+        penultima = Cita.query.order_by(Cita.fecha.asc(), Cita.hora.asc(), Cita.id.asc()).offset(50).first()
+        cursor_profundo = codificar_cursor([penultima.fecha, penultima.hora, penultima.id])
+
+        ms_inicio, consultas = medir(lambda: ServicioCita.obtener_citas_paginadas(perfil='lista_citas'))
+        ms_final, _ = medir(lambda: ServicioCita.obtener_citas_paginadas(cursor=cursor_profundo, perfil='lista_citas'))
+        print(f'{total_citas:>8} {ms_inicio:>12.2f} {ms_final:>16.2f} {consultas:>14}')
+
+
+def benchmark_dashboard():
+    """
+    Mide las estadísticas del dashboard administrativo al crecer el número de
+    citas en el mismo año: el resumen diario crece casi como las citas, el
+    mensual depende de los meses y combinaciones de tipo, carrera, nivel y
+    estado, y el tiempo de la vista sigue al mensual.
+    """
+    from servicios import ServicioReporte
+
+    def estadisticas_dashboard():
+        ServicioReporte.obtener_resumen_dashboard()
+        ServicioReporte.obtener_estadisticas_citas()
+        ServicioReporte.obtener_tendencia_mensual_citas()
+        ServicioReporte.obtener_niveles_riesgo()
+
+    print('\n== Estadísticas del dashboard (resumen mensual) ==')
+    print(f"{'citas':>8} {'filas diario':>13} {'filas mensual':>14} {'consultas SQL':>14} {'ms/vista':>10}")
+    # Mismo número de profesionales con un historial de citas cada vez mayor
+    for citas_por_profesional in (100, 1000, 10000):
+        poblar_datos(20, citas_por_profesional=citas_por_profesional, num_pacientes=200)
+        total_citas = Cita.query.count()
+        filas_diario = ResumenDiarioCitas.query.count()
+        filas_mensual = ResumenMensualCitas.query.count()
+        ms, consultas = medir(estadisticas_dashboard)
+        print(f'{total_citas:>8} {filas_diario:>13} {filas_mensual:>14} {consultas:>14} {ms:>10.2f}')
+
+
+def benchmark_prediccion():
+    """
+    Verifica que obtener_datos_prediccion emite un número constante de
+    consultas SQL (serie mensual, histograma semanal y demanda por tipo).
+    """
+    from servicios import ServicioReporte
+
+    print('\n== ServicioReporte.obtener_datos_prediccion ==')
+    print(f"{'citas':>8} {'consultas SQL':>14} {'ms/llamada':>12}")
+    for num_profesionales in (10, 100, 1000):
+        poblar_datos(num_profesionales, citas_por_profesional=25, num_pacientes=200)
+        total_citas = Cita.query.count()
+        ms, consultas = medir(ServicioReporte.obtener_datos_prediccion)
+        print(f'{total_citas:>8} {consultas:>14} {ms:>12.2f}')
+
+
+def benchmark_pronostico():
+    """
+    Mide el ajuste de los tres modelos de pronostico.py: primero sobre
+    matrices sintéticas de varios años (solo NumPy) y luego de extremo a
+    extremo, incluida la consulta al resumen diario.
+    """
+    import numpy as np
+    from pronostico import ajustar_modelos, pronosticar_demanda
+
+    print('\n== pronostico.ajustar_modelos (matriz sintética) ==')
+    print(f"{'series':>8} {'días':>6} {'ms ajuste':>10}")
+    generador = np.random.default_rng(0)
+    for series, dias in ((100, 365), (1000, 3 * 365), (5000, 3 * 365)):
+        semana = np.tile([6, 7, 7, 6, 5, 1, 0], dias // 7 + 1)[:dias]
+        Y = generador.poisson(semana * generador.uniform(0.2, 1.5, (series, 1))).astype(float)
+        inicio = time.perf_counter()
+        ajustar_modelos(Y, horizonte=30)
+        print(f'{series:>8} {dias:>6} {(time.perf_counter() - inicio) * 1000:>10.1f}')
+
+    print('\n== pronostico.pronosticar_demanda (consulta + ajuste + formato) ==')
+    print(f"{'citas':>8} {'profesionales':>14} {'consultas SQL':>14} {'ms/llamada':>12}")
+    for num_profesionales in (100, 1000):
+        poblar_datos(num_profesionales, citas_por_profesional=50, num_pacientes=200)
+        total_citas = Cita.query.count()
+        ms, consultas = medir(lambda: pronosticar_demanda(horizonte=30), repeticiones=3)
+        print(f'{total_citas:>8} {num_profesionales:>14} {consultas:>14} {ms:>12.1f}')
+
+
+def benchmark_cache_reportes():
+    """
+    Simula varios administradores consultando el dashboard entre escrituras
+    y muestra aciertos, fallos y tiempo con y sin caché de reportes.
+    """
+    from servicios import ServicioReporte, ServicioCita
+
+    def vista_dashboard():
+        ServicioReporte.obtener_resumen_dashboard()
+        ServicioReporte.obtener_estadisticas_citas()
+        ServicioReporte.obtener_tendencia_mensual_citas()
+        ServicioReporte.obtener_niveles_riesgo()
+        ServicioReporte.obtener_rendimiento_profesionales()
+
+    poblar_datos(200, citas_por_profesional=25, num_pacientes=500)
+    cita = Cita.query.first()
+
+    print('\n== Caché de reportes: 10 escrituras, 20 vistas de dashboard por escritura ==')
+    print(f"{'caché':>8} {'ms total':>10} {'aciertos':>10} {'fallos':>8}")
+    for habilitada in (False, True):
+        cache_reportes.habilitada = habilitada
+        cache_reportes.limpiar()
+        inicio = time.perf_counter()
+        for _ in range(10):
+            ServicioCita.actualizar_estado_cita(cita.id, 'PROGRAMADA')  # Invalida 'citas'
+            for _ in range(20):
+                vista_dashboard()
+        ms = (time.perf_counter() - inicio) * 1000
+        estadisticas = cache_reportes.estadisticas()
+        print(f"{'sí' if habilitada else 'no':>8} {ms:>10.1f} {estadisticas['aciertos']:>10} {estadisticas['fallos']:>8}")
+    cache_reportes.habilitada = False
+
+
+def benchmark_exportacion_csv():
+    """
+    Exporta citas y consultas en streaming y muestra que el pico de memoria
+    (tracemalloc) no crece con el número de filas; luego mide la ruta HTTP
+    con y sin gzip.
+    """
+    import tracemalloc
+    from exportacion_csv import generar_csv
+
+    print('\n== Exportación CSV en streaming ==')
+    print(f"{'conjunto':>10} {'filas':>8} {'MB csv':>8} {'pico KB':>9} {'ms':>9}")
+    for num_profesionales in (100, 1000):
+        poblar_datos(num_profesionales, citas_por_profesional=50, num_pacientes=500)
+        for conjunto in ('citas', 'consultas'):
+            inicio = time.perf_counter()
+            caracteres = filas = 0
+            for bloque in generar_csv(conjunto):
+                caracteres += len(bloque)
+                filas += bloque.count('\n')
+            ms = (time.perf_counter() - inicio) * 1000
+
+            # Segunda pasada solo para el pico de memoria (tracemalloc ralentiza)
+            tracemalloc.start()
+            for _ in generar_csv(conjunto):
+                pass
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{conjunto:>10} {filas - 1:>8} {caracteres / 1e6:>8.2f} {pico / 1024:>9.0f} {ms:>9.1f}')
+
+    cliente = _cliente_administrador()
+    print(f"\n{'gzip':>6} {'bytes enviados':>15} {'ms':>9}")
+    for gzip in ('0', '1'):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(f'/reportes/exportar/citas.csv?gzip={gzip}')
+        enviados = len(respuesta.get_data())
+        ms = (time.perf_counter() - inicio) * 1000
+        print(f"{'sí' if gzip == '1' else 'no':>6} {enviados:>15} {ms:>9.1f}")
+
+
+def benchmark_importacion_procedencia():
+    """
+    Importa un CSV de procedencias de 50 000 filas (mitad por código de
+    matrícula, mitad por nombre) y cuenta consultas SQL y commits.
+    """
+    import csv
+    import io
+    from sqlalchemy import event
+    from servicios import ServicioReporte
+
+    num_pacientes = 50000
+    poblar_datos(10, citas_por_profesional=1, num_pacientes=num_pacientes)
+
+    archivo = io.StringIO()
+    escritor = csv.writer(archivo)
+    escritor.writerow(['nombre', 'codigo_matricula', 'procedencia'])
+    localidades = ['Puno', 'Juliaca', 'Ilave', 'Yunguyo', 'Azángaro']
+    for i in range(num_pacientes):
+        codigo = f'{i:06d}' if i % 2 == 0 else ''
+        escritor.writerow([f'Estudiante {i}', codigo, localidades[i % len(localidades)]])
+
+    commits = []
+
+    def contar_commit(conexion):
+        commits.append(1)
+
+    event.listen(db.engine, 'commit', contar_commit)
+    try:
+        with ContadorConsultas() as contador:
+            inicio = time.perf_counter()
+            resultado = ServicioReporte.importar_datos_procedencia_csv(io.StringIO(archivo.getvalue()))
+            ms = (time.perf_counter() - inicio) * 1000
+    finally:
+        event.remove(db.engine, 'commit', contar_commit)
+
+    print('\n== Importación CSV de procedencias ==')
+    print(f"{'filas':>8} {'actualizados':>13} {'errores':>8} {'consultas SQL':>14} {'commits':>8} {'ms':>9}")
+    print(f"{resultado['filas_leidas']:>8} {resultado['registros_procesados']:>13} "
+          f"{resultado['total_errores']:>8} {contador.total:>14} {len(commits):>8} {ms:>9.1f}")
+
+
+def benchmark_login():
+    """
+    Mide inicios de sesión por segundo (y por núcleo) verificando el hash en
+    el hilo de la solicitud y en el pool de procesos, y cuenta cuántos hashes
+    calcula un ataque de fuerza bruta con el limitador de intentos activo.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.security import generate_password_hash
+    from servicios import ServicioAutenticacion
+    from autenticacion_concurrente import pool_verificacion, limitador_intentos, LoginBloqueado
+    import autenticacion_concurrente
+
+    num_usuarios = 24
+    poblar_datos(1, num_pacientes=num_usuarios)
+    password_hash = generate_password_hash('secreto123')  # Un hash real compartido: misma carga por login
+    db.session.execute(db.update(Usuario).values(password_hash=password_hash))
+    db.session.commit()
+    codigos = [f'{i:06d}' for i in range(num_usuarios)]
+
+    def iniciar_sesion(codigo):
+        with app.app_context():
+            return ServicioAutenticacion.autenticar_usuario(codigo, 'secreto123', ip='10.0.0.1') is not None
+
+    nucleos = os.cpu_count() or 1
+    print(f'\n== Inicio de sesión: {num_usuarios} logins concurrentes (16 hilos), {nucleos} núcleo(s) ==')
+    print(f"{'verificación':>14} {'logins/s':>10} {'logins/s/núcleo':>16} {'exitosos':>9}")
+    for procesos in sorted({0, 1, nucleos}):
+        pool_verificacion.cerrar()
+        pool_verificacion.procesos = procesos
+        if procesos:
+            pool_verificacion.verificar(password_hash, 'calentar')  # Arrancar los procesos fuera de la medición
+        limitador_intentos.limpiar()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as hilos:
+            exitosos = sum(hilos.map(iniciar_sesion, codigos))
+        segundos = time.perf_counter() - inicio
+        etiqueta = 'en el hilo' if procesos == 0 else f'{procesos} procesos'
+        print(f'{etiqueta:>14} {num_usuarios / segundos:>10.1f} '
+              f'{num_usuarios / segundos / min(nucleos, max(procesos, 1)):>16.1f} {exitosos:>9}')
+
+    # Fuerza bruta sobre un identificador: solo los primeros intentos llegan al hash
+    hashes = []
+    verificar_original = autenticacion_concurrente._verificar_hash
+
+    def verificar_contando(password_hash, password):
+        hashes.append(1)
+        return verificar_original(password_hash, password)
+
+    pool_verificacion.cerrar()
+    pool_verificacion.procesos = 0  # En el hilo para poder contar las llamadas
+    limitador_intentos.limpiar()
+    autenticacion_concurrente._verificar_hash = verificar_contando
+    bloqueados = 0
+    try:
+        for intento in range(200):
+            try:
+                ServicioAutenticacion.autenticar_usuario(codigos[0], f'clave{intento}', ip='10.0.0.2')
+            except LoginBloqueado:
+                bloqueados += 1
+    finally:
+        autenticacion_concurrente._verificar_hash = verificar_original
+        limitador_intentos.limpiar()
+    print(f'\nFuerza bruta: 200 intentos, {len(hashes)} hashes calculados, {bloqueados} rechazados por el limitador')
+
+
+def benchmark_graficos(repeticiones=20):
+    """
+    Mide por gráfico la respuesta de /reportes/graficos/<id>.json al
+    construir la figura, al servir el payload cacheado y al responder 304
+    con el ETag, y la compara con las series compactas de
+    /reportes/api/graficos/<id>, con la caché de reportes activa (como en
+    producción). Al final pide todas las series en una sola solicitud.
+    """
+    from graficos import GRAFICOS, cache_graficos
+
+    poblar_datos(100, citas_por_profesional=20, num_pacientes=500)
+    reconstruir_resumen_diario()
+    cliente = _cliente_administrador()
+    cache_reportes.habilitada = True
+    cache_reportes.limpiar()
+
+    def ms_por_solicitud(url, **kwargs):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            respuesta = cliente.get(url, **kwargs)
+        return (time.perf_counter() - inicio) * 1000 / repeticiones, respuesta
+
+    print(f'\n== Payloads de gráficos ({repeticiones} solicitudes por caso) ==')
+    print(f"{'gráfico':>30} {'ms construir':>13} {'ms caché':>9} {'ms 304':>7} {'KB':>6} "
+          f"{'ms series':>10} {'KB series':>10}")
+    for grafico_id in GRAFICOS:
+        url = f'/reportes/graficos/{grafico_id}.json'
+        cliente.get(url)  # Calentar la caché de reportes: se mide solo el gráfico
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            cache_graficos.limpiar()
+            respuesta = cliente.get(url)
+        ms_construir = (time.perf_counter() - inicio) * 1000 / repeticiones
+        if respuesta.status_code != 200:
+            print(f'{grafico_id:>30} {"sin datos":>13}')
+            continue
+
+        ms_cache, respuesta = ms_por_solicitud(url)
+        ms_304, condicional = ms_por_solicitud(url, headers={'If-None-Match': respuesta.headers['ETag']})
+        assert condicional.status_code == 304
+        ms_series, series = ms_por_solicitud(f'/reportes/api/graficos/{grafico_id}')
+        print(f'{grafico_id:>30} {ms_construir:>13.2f} {ms_cache:>9.2f} {ms_304:>7.2f} '
+              f'{len(respuesta.data) / 1024:>6.1f} {ms_series:>10.2f} {len(series.data) / 1024:>10.2f}')
+
+    ms_lote, lote = ms_por_solicitud('/reportes/api/graficos?ids=' + ','.join(GRAFICOS))
+    print(f'\n{len(GRAFICOS)} gráficos en una solicitud: {ms_lote:.2f} ms, {len(lote.data) / 1024:.1f} KB')
+    cache_reportes.habilitada = False
+
+
+
+def benchmark_widgets_dashboard(repeticiones=10):
+    """
+    Compara la página de estadísticas cargando sus widgets con las siete APIs
+    individuales frente a una sola solicitud a /reportes/api/dashboard:
+    solicitudes HTTP, sentencias SQL y milisegundos por carga, sin caché.
+    """
+    poblar_datos(50, citas_por_profesional=200, num_pacientes=500)
+    reconstruir_resumen_diario()
+    cliente = _cliente_administrador()
+    individuales = [
+        '/reportes/api/estadisticas-citas', '/reportes/api/estadisticas-carreras',
+        '/reportes/api/tendencia-mensual', '/reportes/api/niveles-riesgo',
+        '/reportes/api/horarios-populares', '/reportes/api/alertas-sistema',
+        '/reportes/api/profesionales-rendimiento',
+    ]
+    lote = ['/reportes/api/dashboard?widgets=citas-por-tipo,carreras,tendencia,riesgo,horarios,alertas,rendimiento']
+
+    def cargar(urls):
+        for url in urls:
+            assert cliente.get(url).status_code == 200
+
+    print(f'\n== Widgets del dashboard ({Cita.query.count()} citas, {repeticiones} cargas por caso) ==')
+    print(f"{'modo':>13} {'solicitudes':>12} {'consultas SQL':>14} {'ms/carga':>10}")
+    for modo, urls in (('individuales', individuales), ('lote', lote)):
+        with ContadorConsultas() as contador:
+            cargar(urls)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            cargar(urls)
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        print(f'{modo:>13} {len(urls):>12} {contador.total:>14} {ms:>10.2f}')
+
+
+
+def benchmark_ejecutor_reportes(repeticiones=5):
+    """
+    Compara las seis consultas de estadisticas_detalladas ejecutadas en
+    serie (REPORTES_HILOS=0) y en el ejecutor concurrente, sin caché, sobre
+    SQLite (consultas en el propio proceso) y con 30 ms de espera simulada
+    por consulta, como el viaje de ida y vuelta a un servidor. Luego agrega
+    una tarea que simula una consulta lenta para comprobar el plazo:
+    la llamada termina al vencer el plazo con los resultados parciales.
+    """
+    from servicios import ServicioReporte
+    from ejecutor_reportes import EjecutorReportes, PlazoReporteExcedido
+
+    poblar_datos(100, citas_por_profesional=200, num_pacientes=1000)
+    reconstruir_resumen_diario()
+    tareas = {
+        'citas_por_mes': ServicioReporte.obtener_tendencia_mensual_citas,
+        'consultas_por_carrera': ServicioReporte.obtener_estadisticas_consultas_por_carrera,
+        'niveles_riesgo': ServicioReporte.obtener_niveles_riesgo,
+        'profesionales_activos': ServicioReporte.obtener_estadisticas_profesionales,
+        'citas_por_tipo': ServicioReporte.obtener_estadisticas_citas_por_tipo,
+        'horarios_populares': ServicioReporte.obtener_horarios_populares,
+    }
+
+    print(f'\n== Ejecutor de reportes ({Cita.query.count()} citas, {len(tareas)} consultas, '
+          f'{os.cpu_count()} CPU) ==')
+    def con_espera(funcion):
+        def tarea():
+            time.sleep(0.03)
+            return funcion()
+        return tarea
+
+    tareas_servidor = {nombre: con_espera(funcion) for nombre, funcion in tareas.items()}
+    print(f"{'hilos':>6} {'ms SQLite':>10} {'ms +30 ms/consulta':>19}")
+    for hilos in (0, 2, 4, 6):
+        ejecutor = EjecutorReportes(hilos=hilos)
+        ejecutor.ejecutar(tareas)  # Calentar hilos y conexiones
+        tiempos = []
+        for conjunto in (tareas, tareas_servidor):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                ejecutor.ejecutar(conjunto)
+            tiempos.append((time.perf_counter() - inicio) * 1000 / repeticiones)
+        print(f'{hilos:>6} {tiempos[0]:>10.1f} {tiempos[1]:>19.1f}')
+        ejecutor.cerrar()
+
+    ejecutor = EjecutorReportes(hilos=4, plazo=0.5)
+    inicio = time.perf_counter()
+    try:
+        ejecutor.ejecutar(dict(tareas, consulta_lenta=lambda: time.sleep(3)))
+    except PlazoReporteExcedido as e:
+        print(f'Plazo 0.5 s con una consulta de 3 s: {(time.perf_counter() - inicio) * 1000:.0f} ms, '
+              f'{len(e.parciales)} resultados, pendientes: {", ".join(e.pendientes)}')
+    ejecutor.cerrar()
+
+
+def benchmark_reservas_concurrentes(hilos=32, intentos=400, franjas=16):
+    """
+    Lanza reservas concurrentes contra un mismo profesional y día: muchos
+    hilos piden al azar una de pocas franjas. Verifica que cada franja se
+    reserve exactamente una vez, que el resto falle con FranjaOcupada y que
+    no queden citas duplicadas; mide reservas por segundo y la latencia de
+    los rechazos.
+    """
+    import random
+    import statistics
+    from concurrent.futures import ThreadPoolExecutor
+    from servicios import ServicioCita
+    from agenda_profesionales import FranjaOcupada
+
+    poblar_datos(5, citas_por_profesional=200, num_pacientes=100)
+    profesional_id = db.session.scalar(db.select(Usuario.id).filter_by(rol=RolUsuario.PROFESIONAL))
+    ids_pacientes = db.session.scalars(db.select(Paciente.id)).all()
+    dia = date.today() + timedelta(days=400)  # Día sin citas previas
+    generador = random.Random(0)
+    solicitudes = [
+        (ids_pacientes[i % len(ids_pacientes)], hora(8 + generador.randrange(franjas) // 2, 30 * generador.randrange(2)))
+        for i in range(intentos)
+    ]
+
+    def reservar(solicitud):
+        paciente_id, hora_cita = solicitud
+        inicio = time.perf_counter()
+        with app.app_context():
+            try:
+                ServicioCita.crear_cita({'paciente_id': paciente_id, 'profesional_id': profesional_id,
+                                         'fecha': dia, 'hora': hora_cita, 'tipo_cita': 'MEDICINA'})
+                resultado = 'reservada'
+            except FranjaOcupada:
+                resultado = 'ocupada'
+            except Exception as e:  # Cualquier otro error es un fallo del benchmark
+                resultado = type(e).__name__
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        resultados = list(ejecutor.map(reservar, solicitudes))
+    segundos = time.perf_counter() - inicio
+
+    conteo = {}
+    for resultado, _ in resultados:
+        conteo[resultado] = conteo.get(resultado, 0) + 1
+    rechazos = sorted(ms for resultado, ms in resultados if resultado == 'ocupada')
+    citas_dia = db.session.scalars(db.select(Cita.hora).filter_by(profesional_id=profesional_id, fecha=dia)).all()
+
+    print(f'\n== Reservas concurrentes: {intentos} intentos, {hilos} hilos, {franjas} franjas de un profesional ==')
+    print(f"{'reservadas':>11} {'ocupadas':>9} {'otros errores':>14} {'citas del día':>14} {'duplicadas':>11} "
+          f"{'intentos/s':>11} {'p50 rechazo ms':>15} {'p95 rechazo ms':>15}")
+    print(f"{conteo.get('reservada', 0):>11} {conteo.get('ocupada', 0):>9} "
+          f"{intentos - conteo.get('reservada', 0) - conteo.get('ocupada', 0):>14} {len(citas_dia):>14} "
+          f"{len(citas_dia) - len(set(citas_dia)):>11} {intentos / segundos:>11.1f} "
+          f"{statistics.median(rechazos):>15.2f} {rechazos[int(len(rechazos) * 0.95)]:>15.2f}")
+
+
+def benchmark_disponibilidad(repeticiones=5):
+    """
+    Mide la búsqueda de franjas libres de un mes para todos los
+    profesionales y para uno, con la agenda ocupada al azar en un 60 %, y
+    compara el resultado con el cálculo directo sobre las citas del rango.
+    """
+    import random
+    from servicios import ServicioCita
+    from agenda_profesionales import (HORA_INICIO_ATENCION, HORA_FIN_ATENCION, DIAS_ATENCION,
+                                      franja_de_hora, hora_de_franja)
+
+    inicio_rango = date.today() + timedelta(days=1)
+    fin_rango = inicio_rango + timedelta(days=30)
+    franjas_atencion = range(franja_de_hora(HORA_INICIO_ATENCION), franja_de_hora(HORA_FIN_ATENCION))
+
+    print(f'\n== Búsqueda de franjas libres ({inicio_rango} a {fin_rango}) ==')
+    print(f"{'profesionales':>14} {'citas del mes':>14} {'ms todos':>9} {'ms uno':>7} {'consultas SQL':>14} "
+          f"{'franjas libres':>15} {'coincide':>9}")
+    for num_profesionales in (50, 200, 500):
+        poblar_datos(num_profesionales, citas_por_profesional=50, num_pacientes=200)
+        generador = random.Random(num_profesionales)
+        ids_profesionales = db.session.scalars(db.select(Usuario.id).filter_by(rol=RolUsuario.PROFESIONAL)).all()
+        ids_pacientes = db.session.scalars(db.select(Paciente.id)).all()
+        citas = [
+            {'paciente_id': generador.choice(ids_pacientes), 'profesional_id': profesional_id,
+             'fecha': inicio_rango + timedelta(days=d), 'hora': hora_de_franja(franja),
+             'tipo_cita': TipoCita.MEDICINA, 'estado': 'PROGRAMADA'}
+            for profesional_id in ids_profesionales
+            for d in range(31)
+            for franja in franjas_atencion
+            if generador.random() < 0.6
+        ]
+        db.session.execute(db.insert(Cita), citas)
+        db.session.commit()
+        reconstruir_agenda()
+
+        ms_todos, consultas = medir(lambda: ServicioCita.buscar_disponibilidad(inicio_rango, fin_rango), repeticiones)
+        ms_uno, _ = medir(lambda: ServicioCita.buscar_disponibilidad(
+            inicio_rango, fin_rango, profesional_id=ids_profesionales[0]), repeticiones)
+        resultado = ServicioCita.buscar_disponibilidad(inicio_rango, fin_rango)
+        libres = {(p['profesional_id'], d['fecha'], h) for p in resultado for d in p['dias'] for h in d['horas']}
+
+        # Cálculo directo: todas las franjas de atención menos las ocupadas por citas
+        ocupadas = {(c['profesional_id'], c['fecha'].isoformat(), c['hora'].strftime('%H:%M')) for c in citas}
+        esperadas = {
+            (profesional_id, dia.isoformat(), hora_de_franja(franja).strftime('%H:%M'))
+            for profesional_id in ids_profesionales
+            for dia in (inicio_rango + timedelta(days=d) for d in range(31))
+            if dia.weekday() in DIAS_ATENCION
+            for franja in franjas_atencion
+        } - ocupadas
+        print(f'{num_profesionales:>14} {len(citas):>14} {ms_todos:>9.1f} {ms_uno:>7.2f} {consultas:>14} '
+              f"{len(libres):>15} {'sí' if libres == esperadas else 'NO':>9}")
+
+
+def benchmark_programacion_masiva(filas=5000, filas_una_a_una=500, proporcion_conflictos=0.05):
+    """
+    Programa un lote de citas (con un porcentaje de filas que repiten una
+    franja ya pedida) con programacion_masiva y lo compara con crear_cita
+    fila por fila. Verifica que creadas + rechazadas cubran el lote, que no
+    queden franjas duplicadas y que la agenda y los resúmenes diario y mensual coincidan
+    con su reconstrucción completa. También simula un fallo al bloquear la
+    agenda y verifica que todas las filas reciban su resultado.
+    """
+    import random
+    from sqlalchemy.exc import OperationalError
+    import programacion_masiva
+    from servicios import ServicioCita
+    from programacion_masiva import programar_citas
+    from agenda_profesionales import FranjaOcupada, reconstruir_agenda, hora_de_franja
+    from modelos import AgendaDiaria
+
+    def generar_filas(cantidad, semilla):
+        generador = random.Random(semilla)
+        ids_profesionales = db.session.scalars(db.select(Usuario.id).filter_by(rol=RolUsuario.PROFESIONAL)).all()
+        ids_pacientes = db.session.scalars(db.select(Paciente.id)).all()
+        pedidas = []
+        resultado = []
+        for _ in range(cantidad):
+            if pedidas and generador.random() < proporcion_conflictos:
+                profesional_id, dia, franja = generador.choice(pedidas)
+            else:
+                profesional_id = generador.choice(ids_profesionales)
+                dia = date.today() + timedelta(days=500 + generador.randrange(60))
+                franja = generador.randrange(16, 36)
+                pedidas.append((profesional_id, dia, franja))
+            resultado.append({'paciente_id': generador.choice(ids_pacientes), 'profesional_id': profesional_id,
+                              'fecha': dia.isoformat(), 'hora': hora_de_franja(franja).strftime('%H:%M'),
+                              'tipo_cita': 'MEDICINA'})
+        return resultado
+
+    def estado_derivado():
+        agenda = {(a.profesional_id, a.dia): a.franjas_ocupadas for a in AgendaDiaria.query if a.franjas_ocupadas}
+        resumen = sorted(
+            (r.dia, r.tipo_cita.name, r.profesional_id, r.carrera, r.estado or '', r.total_citas)
+            for r in ResumenDiarioCitas.query if r.total_citas
+        )
+        mensual = sorted(
+            (r.mes, r.tipo_cita.name, r.carrera, r.nivel_riesgo.name if r.nivel_riesgo else '', r.estado or '',
+             r.total_citas, r.total_consultas)
+            for r in ResumenMensualCitas.query if r.total_citas
+        )
+        return agenda, resumen, mensual
+
+    def verificar():
+        duplicadas = db.session.scalar(db.select(db.func.count()).select_from(
+            db.select(Cita.profesional_id, Cita.fecha, Cita.hora)
+            .group_by(Cita.profesional_id, Cita.fecha, Cita.hora).having(db.func.count() > 1).subquery()
+        ))
+        incremental = estado_derivado()
+        reconstruir_agenda()
+        reconstruir_resumen_diario()
+        return duplicadas, incremental == estado_derivado()
+
+    print(f'\n== Programación masiva: {filas} filas, {proporcion_conflictos:.0%} repiten una franja ==')
+    print(f"{'modo':>12} {'filas':>6} {'creadas':>8} {'rechazadas':>11} {'consultas SQL':>14} {'ms':>9} "
+          f"{'filas/s':>9} {'duplicadas':>11} {'consistente':>12} {'cubiertas':>10}")
+
+    def cubiertas(resultado, cantidad):
+        # Cada fila leída tiene exactamente un resultado (cita_id o error)
+        return ('sí' if resultado['filas_leidas'] == cantidad
+                and [r['fila'] for r in resultado['resultados']] == list(range(1, cantidad + 1))
+                and resultado['citas_creadas'] + resultado['total_errores'] == cantidad else 'NO')
+
+    poblar_datos(50, citas_por_profesional=100, num_pacientes=2000)
+    lote = generar_filas(filas, 1)
+    db.session.expire_all()
+    inicio = time.perf_counter()
+    with ContadorConsultas() as contador:
+        resultado = programar_citas(lote)
+    ms = (time.perf_counter() - inicio) * 1000
+    duplicadas, consistente = verificar()
+    print(f"{'masiva':>12} {filas:>6} {resultado['citas_creadas']:>8} {resultado['total_errores']:>11} "
+          f"{contador.total:>14} {ms:>9.1f} {filas / ms * 1000:>9.0f} {duplicadas:>11} "
+          f"{'sí' if consistente else 'NO':>12} {cubiertas(resultado, filas):>10}")
+
+    # Fallo al bloquear la agenda (p. ej. "database is locked"): se revierte cada lote
+    def bloqueo_fallido(*args, **kwargs):
+        raise OperationalError('SELECT ... FOR UPDATE', {}, Exception('database is locked'))
+
+    lote = generar_filas(filas_una_a_una, 2)
+    bloquear_original = programacion_masiva.bloquear_dias
+    programacion_masiva.bloquear_dias = bloqueo_fallido
+    try:
+        inicio = time.perf_counter()
+        with ContadorConsultas() as contador:
+            resultado = programar_citas(lote, tamano_lote=100)
+        ms = (time.perf_counter() - inicio) * 1000
+    finally:
+        programacion_masiva.bloquear_dias = bloquear_original
+    duplicadas, consistente = verificar()
+    print(f"{'bloqueo':>12} {filas_una_a_una:>6} {resultado['citas_creadas']:>8} {resultado['total_errores']:>11} "
+          f"{contador.total:>14} {ms:>9.1f} {filas_una_a_una / ms * 1000:>9.0f} {duplicadas:>11} "
+          f"{'sí' if consistente else 'NO':>12} {cubiertas(resultado, filas_una_a_una):>10}")
+
+    poblar_datos(50, citas_por_profesional=100, num_pacientes=2000)
+    lote = generar_filas(filas_una_a_una, 1)
+    creadas = rechazadas = 0
+    db.session.expire_all()
+    inicio = time.perf_counter()
+    with ContadorConsultas() as contador:
+        for fila in lote:
+            datos = dict(fila, fecha=date.fromisoformat(fila['fecha']),
+                         hora=hora.fromisoformat(fila['hora']))
+            try:
+                ServicioCita.crear_cita(datos)
+                creadas += 1
+            except FranjaOcupada:
+                rechazadas += 1
+    ms = (time.perf_counter() - inicio) * 1000
+    duplicadas, consistente = verificar()
+    print(f"{'una a una':>12} {filas_una_a_una:>6} {creadas:>8} {rechazadas:>11} {contador.total:>14} {ms:>9.1f} "
+          f"{filas_una_a_una / ms * 1000:>9.0f} {duplicadas:>11} {'sí' if consistente else 'NO':>12} "
+          f"{'sí' if creadas + rechazadas == filas_una_a_una else 'NO':>10}")
+
+
+def benchmark_busqueda_pacientes(tamanos=(10000, 100000), repeticiones=20):
+    """
+    Mide la búsqueda de pacientes por relevancia (código exacto y por prefijo,
+    prefijo de nombre, nombre y apellido, error de tipeo y carrera) con el
+    índice de n-gramas en memoria. Compara la primera página con un cálculo
+    directo fila por fila del mismo puntaje y verifica que recorrer todas las
+    páginas con el cursor no repita ni omita pacientes. También mide la
+    primera búsqueda después de una escritura (usa el índice anterior) y la
+    reconstrucción en segundo plano, sin el intervalo mínimo.
+    """
+    import random
+    import statistics
+    import busqueda_pacientes
+    from busqueda_pacientes import (buscar_pacientes, indice_pacientes, normalizar, trigramas, _similitud,
+                                    UMBRAL_SIMILITUD, PUNTAJE_CODIGO_EXACTO, PUNTAJE_CODIGO_PREFIJO,
+                                    PUNTAJE_NOMBRE_PREFIJO, PUNTAJE_NOMBRE_PALABRAS, PUNTAJE_NOMBRE_SIMILAR,
+                                    PUNTAJE_ATRIBUTO_PREFIJO, PUNTAJE_ATRIBUTO_SIMILAR)
+
+    nombres = ['María', 'José', 'Luis', 'Ana', 'Jesús', 'Rocío', 'Raúl', 'Inés', 'Carlos', 'Lucía',
+               'Héctor', 'Sofía', 'Iván', 'Nélida', 'Óscar', 'Ramón', 'Elena', 'Julián', 'Verónica', 'Hugo']
+    apellidos = ['López', 'Quispe', 'Mamani', 'Condori', 'Pérez', 'Gutiérrez', 'Huamán', 'Flores', 'Ramírez',
+                 'Chávez', 'Núñez', 'Apaza', 'Ticona', 'Cáceres', 'Zúñiga', 'Vilca', 'Coaquira', 'Yupanqui']
+    carreras = ['Medicina Humana', 'Ingeniería de Sistemas', 'Derecho', 'Enfermería', 'Educación Inicial',
+                'Ingeniería Civil', 'Contabilidad', 'Psicología', 'Arquitectura', 'Biología']
+    localidades = ['Puno', 'Juliaca', 'Ilave', 'Yunguyo', 'Azángaro', 'Ayaviri', 'Lampa', 'Huancané']
+
+    def puntaje_directo(termino, compacto, fila):
+        """Puntaje de un paciente calculado regla por regla (referencia)."""
+        trigramas_termino = trigramas(termino)
+        palabras = termino.split()
+
+        def por_prefijo(texto):
+            return texto.startswith(termino) or all(any(p.startswith(t) for p in texto.split()) for t in palabras)
+
+        puntajes = [0.0]
+        codigos = [c for c in (fila['codigo_matricula'], fila['dni']) if c]
+        if compacto in codigos:
+            puntajes.append(PUNTAJE_CODIGO_EXACTO)
+        if compacto.isdigit() and any(c.startswith(compacto) for c in codigos):
+            puntajes.append(PUNTAJE_CODIGO_PREFIJO)
+        nombre = normalizar(fila['nombre'])
+        if nombre.startswith(termino):
+            puntajes.append(PUNTAJE_NOMBRE_PREFIJO)
+        elif por_prefijo(nombre):
+            puntajes.append(PUNTAJE_NOMBRE_PALABRAS)
+        for texto, (base, peso) in ((nombre, PUNTAJE_NOMBRE_SIMILAR),
+                                    (normalizar(fila['carrera']), PUNTAJE_ATRIBUTO_SIMILAR),
+                                    (normalizar(fila['procedencia']), PUNTAJE_ATRIBUTO_SIMILAR)):
+            similitud = _similitud(trigramas_termino, texto)
+            if similitud >= UMBRAL_SIMILITUD:
+                puntajes.append(base + peso * similitud)
+        for texto in (fila['carrera'], fila['procedencia']):
+            if texto and por_prefijo(normalizar(texto)):
+                puntajes.append(PUNTAJE_ATRIBUTO_PREFIJO)
+        return round(max(puntajes), 4)
+
+    print('\n== Búsqueda de pacientes por relevancia (índice en memoria) ==')
+    print(f"{'pacientes':>10} {'consulta':<24} {'resultados':>11} {'p50 ms':>8} {'p95 ms':>8} {'SQL':>4} {'coincide':>9}")
+    for num_pacientes in tamanos:
+        _reiniciar_base_datos()
+        generador = random.Random(num_pacientes)
+        filas = [{
+            'nombre': f'{generador.choice(nombres)} {generador.choice(apellidos)} {generador.choice(apellidos)}',
+            'codigo_matricula': f'{2015 + i % 10}{i:06d}', 'dni': f'{40000000 + i * 7:08d}',
+            'carrera': generador.choice(carreras), 'procedencia': generador.choice(localidades),
+        } for i in range(num_pacientes)]
+        db.session.execute(db.insert(Usuario), [
+            {'nombre': f['nombre'], 'codigo_matricula': f['codigo_matricula'], 'dni': f['dni'],
+             'rol': RolUsuario.PACIENTE, 'password_hash': 'x', 'activo': True} for f in filas
+        ])
+        ids_usuarios = db.session.scalars(db.select(Usuario.id).order_by(Usuario.id)).all()
+        db.session.execute(db.insert(Paciente), [
+            {'usuario_id': usuario_id, 'carrera': f['carrera'], 'procedencia': f['procedencia'],
+             'fecha_nacimiento': date(2000, 1, 1)} for usuario_id, f in zip(ids_usuarios, filas)
+        ])
+        db.session.commit()
+        ids_pacientes = db.session.scalars(db.select(Paciente.id).order_by(Paciente.id)).all()
+
+        indice_pacientes.invalidar()
+        inicio = time.perf_counter()
+        indice_pacientes.obtener()
+        print(f"{num_pacientes:>10} {'(construcción índice)':<24} {'':>11} "
+              f"{(time.perf_counter() - inicio) * 1000:>8.0f}")
+
+        intervalo = busqueda_pacientes.INTERVALO_MINIMO_RECONSTRUCCION
+        busqueda_pacientes.INTERVALO_MINIMO_RECONSTRUCCION = 0
+        try:
+            cache_reportes.invalidar('pacientes')
+            inicio = time.perf_counter()
+            buscar_pacientes('mar')
+            print(f"{'':>10} {'(búsqueda tras escribir)':<24} {'':>11} {(time.perf_counter() - inicio) * 1000:>8.2f}")
+            indice_pacientes.esperar_reconstruccion()
+            print(f"{'':>10} {'(reconstrucción en hilo)':<24} {'':>11} {(time.perf_counter() - inicio) * 1000:>8.0f}")
+        finally:
+            busqueda_pacientes.INTERVALO_MINIMO_RECONSTRUCCION = intervalo
+
+        muestra = filas[num_pacientes // 3]
+        consultas = [
+            ('código exacto', muestra['codigo_matricula']),
+            ('prefijo de código', muestra['codigo_matricula'][:6]),
+            ('prefijo de nombre', 'mar'),
+            ('nombre y apellido', 'jose quis'),
+            ('error de tipeo', 'rocio gutierez'),
+            ('carrera', 'ingenieria'),
+        ]
+        for descripcion, termino in consultas:
+            tiempos = []
+            for _ in range(repeticiones):
+                db.session.expire_all()
+                inicio = time.perf_counter()
+                pagina = buscar_pacientes(termino)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            with ContadorConsultas() as contador:
+                pagina = buscar_pacientes(termino)
+            obtenidos = [(r.paciente.id, r.puntaje) for r in pagina.items]
+
+            normalizado, compacto = normalizar(termino), ''.join(termino.split())
+            directos = [(paciente_id, puntaje_directo(normalizado, compacto, f))
+                        for paciente_id, f in zip(ids_pacientes, filas)]
+            esperados = sorted((r for r in directos if r[1] > 0), key=lambda r: (-r[1], r[0]))
+            coincide = obtenidos == esperados[:pagina.limite]
+
+            # Recorrer todas las páginas: sin repetidos ni faltantes respecto del cálculo directo
+            if coincide and descripcion in ('prefijo de nombre', 'error de tipeo'):
+                vistos, cursor = [], None
+                while True:
+                    siguiente = buscar_pacientes(termino, cursor=cursor, limite=200)
+                    vistos += [r.paciente.id for r in siguiente.items]
+                    if not siguiente.hay_siguiente:
+                        break
+                    cursor = siguiente.cursor_siguiente
+                coincide = vistos == [paciente_id for paciente_id, _ in esperados]
+
+            tiempos.sort()
+            print(f"{'':>10} {descripcion:<24} {len(esperados):>11} {statistics.median(tiempos):>8.2f} "
+                  f"{tiempos[int(len(tiempos) * 0.95) - 1]:>8.2f} {contador.total:>4} {'sí' if coincide else 'NO':>9}")
+
+
+# Programa ejecutado en un intérprete nuevo por benchmark_arranque
+_PROGRAMA_ARRANQUE = """
+import json, sys, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+sentencias = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: sentencias.append(1))
+inicio = time.perf_counter()
+from main import app
+importacion = time.perf_counter() - inicio
+plotly_al_importar = 'plotly' in sys.modules
+inicio = time.perf_counter()
+import plotly.graph_objects as go
+from graficos import figura_json
+figura_json(go.Figure(data=[go.Bar(x=['a'], y=[1])]))
+primer_grafico = time.perf_counter() - inicio
+print(json.dumps({'importacion': importacion, 'primer_grafico': primer_grafico, 'sentencias': len(sentencias),
+                  'plotly_al_importar': plotly_al_importar}))
+"""
+
+
+def benchmark_arranque(repeticiones=5):
+    """
+    Mide el tiempo de importación en frío de `main:app` (lo que paga cada
+    worker de gunicorn al arrancar) en intérpretes nuevos, las sentencias SQL
+    emitidas durante la importación y el costo diferido de cargar Plotly en
+    el primer gráfico (importar y serializar una figura).
+    """
+    import json
+    import statistics
+    import subprocess
+
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    entorno = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(_DIRECTORIO_TEMPORAL, 'arranque.db')}")
+    entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [directorio, entorno.get('PYTHONPATH')]))
+
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', _PROGRAMA_ARRANQUE], cwd=directorio, env=entorno,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        mediciones.append(json.loads(salida.strip().splitlines()[-1]))
+
+    importacion = [m['importacion'] * 1000 for m in mediciones]
+    print(f'\n== Arranque en frío de main:app ({repeticiones} intérpretes nuevos) ==')
+    print(f"{'mediana ms':>11} {'mínimo ms':>10} {'SQL':>5} {'plotly cargado':>15} {'1er gráfico ms':>15}")
+    print(f"{statistics.median(importacion):>11.1f} {min(importacion):>10.1f} "
+          f"{mediciones[0]['sentencias']:>5} {'sí' if mediciones[0]['plotly_al_importar'] else 'no':>15} "
+          f"{statistics.median(m['primer_grafico'] * 1000 for m in mediciones):>15.1f}")
+
+
+BENCHMARKS = {
+    'rendimiento': benchmark_rendimiento_profesionales,
+    'perfiles': benchmark_perfiles_carga,
+    'paginacion': benchmark_paginacion,
+    'dashboard': benchmark_dashboard,
+    'widgets': benchmark_widgets_dashboard,
+    'ejecutor': benchmark_ejecutor_reportes,
+    'reservas': benchmark_reservas_concurrentes,
+    'disponibilidad': benchmark_disponibilidad,
+    'programacion': benchmark_programacion_masiva,
+    'busqueda': benchmark_busqueda_pacientes,
+    'cache': benchmark_cache_reportes,
+    'prediccion': benchmark_prediccion,
+    'pronostico': benchmark_pronostico,
+    'exportacion': benchmark_exportacion_csv,
+    'importacion': benchmark_importacion_procedencia,
+    'login': benchmark_login,
+    'arranque': benchmark_arranque,
+    'graficos': benchmark_graficos,
+}
+
+
+if __name__ == '__main__':
+    seleccion = sys.argv[1:] or list(BENCHMARKS)
+    with app.app_context():
+        for nombre in seleccion:
+            BENCHMARKS[nombre]()
@@ -0,0 +1,542 @@
+# ============================================================================
+# BÚSQUEDA DE PACIENTES POR PREFIJO Y SIMILITUD
+# ============================================================================
+"""
+Búsqueda de pacientes activos por nombre, código de matrícula, DNI, carrera
+y procedencia, con coincidencia por prefijo y por similitud de trigramas
+(tolera errores de tipeo: "mria lopes" encuentra a "María López").
+
+Cada paciente recibe el mayor puntaje de las reglas que cumple:
+
+    100      código de matrícula o DNI igual al término
+     80      código o DNI que empieza por el término (solo dígitos)
+     70      nombre que empieza por el término
+     60      cada palabra del término es prefijo de una palabra del nombre
+    30-60    nombre similar (similitud de trigramas >= UMBRAL_SIMILITUD)
+     25      carrera o procedencia que empieza por el término (o sus palabras)
+    10-25    carrera o procedencia similar
+
+Los resultados se ordenan por puntaje (y por ID) y se paginan por cursor
+sobre (puntaje, id), igual que las demás listas (ver paginacion.py).
+
+Las comparaciones no distinguen mayúsculas ni acentos. La similitud es la
+de pg_trgm: trigramas de cada palabra rellenada con dos espacios delante y
+uno detrás; similitud = comunes / (trigramas del término + del texto - comunes).
+
+Implementaciones:
+- PostgreSQL: la consulta calcula el puntaje con pg_trgm; los candidatos
+  salen de índices GIN de trigramas (migración 6) y de los índices únicos
+  de código y DNI.
+- SQLite y otros: índice de n-gramas en memoria del proceso (IndiceNgramas)
+  con listas de publicación en arreglos NumPy y claves ordenadas para los
+  prefijos. Se construye en la primera búsqueda (que espera) y se vence
+  cuando cambian las versiones 'usuarios' o 'pacientes' de cache_reportes
+  (con Redis, también por escrituras de otros workers) o cada
+  EDAD_MAXIMA_INDICE segundos. Un índice vencido se sigue usando mientras un
+  hilo en segundo plano construye el nuevo, a lo sumo una vez cada
+  INTERVALO_MINIMO_RECONSTRUCCION segundos: una ráfaga de escrituras cuesta
+  una reconstrucción y las búsquedas no esperan por ella, a cambio de que un
+  paciente nuevo tarde hasta ese intervalo (más la construcción) en aparecer.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, union, case, and_, or_, func, literal, literal_column, cast, Numeric, String
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, Paciente  # Modelos de datos
+from perfiles_carga import aplicar_perfil  # Carga anticipada de la lista de pacientes
+from paginacion import PaginaKeyset, codificar_cursor, decodificar_cursor, LIMITE_POR_DEFECTO, LIMITE_MAXIMO  # Paginación por cursor
+from cache_reportes import cache_reportes  # Versiones de las tablas (invalidación del índice)
+
+# Similitud mínima para una coincidencia aproximada (umbral por defecto de pg_trgm)
+UMBRAL_SIMILITUD = 0.3
+
+# Longitud mínima del término normalizado
+LONGITUD_MINIMA = 2
+
+# Puntajes de cada regla (ver docstring del módulo)
+PUNTAJE_CODIGO_EXACTO = 100
+PUNTAJE_CODIGO_PREFIJO = 80
+PUNTAJE_NOMBRE_PREFIJO = 70
+PUNTAJE_NOMBRE_PALABRAS = 60
+PUNTAJE_NOMBRE_SIMILAR = (30, 30)  # base + peso * similitud
+PUNTAJE_ATRIBUTO_PREFIJO = 25
+PUNTAJE_ATRIBUTO_SIMILAR = (10, 15)
+
+# Segundos máximos de vida del índice en memoria (escrituras sin invalidación)
+EDAD_MAXIMA_INDICE = 300
+
+# Segundos mínimos entre el final de una construcción y el inicio de la siguiente
+INTERVALO_MINIMO_RECONSTRUCCION = 30
+
+# Dependencias de cache_reportes cuyas versiones invalidan el índice
+DEPENDENCIAS_INDICE = ('usuarios', 'pacientes')
+
+# Letras acentuadas que PostgreSQL pliega con translate() (mismo efecto que normalizar)
+_ACENTOS = 'áàäâéèëêíìïîóòöôúùüûñç'
+_SIN_ACENTOS = 'aaaaeeeeiiiioooouuuunc'
+_PLIEGUE = str.maketrans(_ACENTOS, _SIN_ACENTOS)
+
+_NO_ALFANUMERICO = re.compile(r'[\W_]+')
+
+# Fila de una página de resultados
+ResultadoBusqueda = namedtuple('ResultadoBusqueda', ['paciente', 'puntaje'])
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los signos reemplazados por espacios."""
+    if not texto:
+        return ''
+    texto = texto.lower().translate(_PLIEGUE)
+    if not texto.isascii():
+        # Otros diacríticos (ã, å, ...): descomponer y quitar las marcas
+        texto = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def _trigramas_palabra(palabra):
+    relleno = f'  {palabra} '
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def trigramas(texto):
+    """Conjunto de trigramas de un texto normalizado (como pg_trgm)."""
+    resultado = set()
+    for palabra in texto.split():
+        resultado |= _trigramas_palabra(palabra)
+    return resultado
+
+
+def _similitud(trigramas_termino, texto):
+    """Similitud de trigramas entre el término y un texto normalizado."""
+    otros = trigramas(texto)
+    comunes = len(trigramas_termino & otros)
+    total = len(trigramas_termino) + len(otros) - comunes
+    return comunes / total if total else 0.0
+
+
+def _siguiente_prefijo(prefijo):
+    """Menor cadena mayor que todas las que empiezan por prefijo (para rangos de índice)."""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+# ----------------------------------------------------------------------------
+# Índice en memoria (SQLite y otros motores sin pg_trgm)
+# ----------------------------------------------------------------------------
+
+class _ClavesOrdenadas:
+    """Claves de texto ordenadas con la posición del paciente de cada una."""
+
+    def __init__(self, claves, posiciones):
+        orden = sorted(range(len(claves)), key=claves.__getitem__)
+        self.claves = [claves[i] for i in orden]
+        self.posiciones = np.array(posiciones, dtype=np.int32)[orden] if orden else np.zeros(0, dtype=np.int32)
+
+    def con_prefijo(self, prefijo):
+        """Posiciones cuyas claves empiezan por prefijo."""
+        inicio = bisect_left(self.claves, prefijo)
+        fin = bisect_left(self.claves, _siguiente_prefijo(prefijo), inicio)
+        return self.posiciones[inicio:fin]
+
+    def iguales(self, clave):
+        """Posiciones cuya clave es exactamente la dada."""
+        inicio = bisect_left(self.claves, clave)
+        return self.posiciones[inicio:bisect_right(self.claves, clave, inicio)]
+
+
+class _Atributo:
+    """Atributo de pocos valores distintos (carrera, procedencia) por paciente."""
+
+    def __init__(self, valores_por_paciente):
+        # Se normaliza cada valor distinto una sola vez
+        normalizados = {v: normalizar(v) for v in set(valores_por_paciente)}
+        self.valores = sorted({v for v in normalizados.values() if v})
+        indice = {valor: i for i, valor in enumerate(self.valores)}
+        # Los pacientes sin valor apuntan a una posición extra con puntaje 0
+        self.indices = np.array([indice.get(normalizados[v], len(self.valores)) for v in valores_por_paciente],
+                                dtype=np.int32)
+
+    def puntajes(self, termino, palabras, trigramas_termino):
+        """Puntaje de cada paciente según su valor del atributo."""
+        por_valor = np.zeros(len(self.valores) + 1)
+        base, peso = PUNTAJE_ATRIBUTO_SIMILAR
+        for i, valor in enumerate(self.valores):
+            puntaje = 0.0
+            if valor.startswith(termino) or all(
+                any(p.startswith(t) for p in valor.split()) for t in palabras
+            ):
+                puntaje = PUNTAJE_ATRIBUTO_PREFIJO
+            similitud = _similitud(trigramas_termino, valor)
+            if similitud >= UMBRAL_SIMILITUD:
+                puntaje = max(puntaje, base + peso * similitud)
+            por_valor[i] = puntaje
+        return por_valor[self.indices]
+
+
+class _DatosIndice:
+    """Estructuras del índice construidas a partir de los pacientes activos."""
+
+    def __init__(self, filas):
+        self.ids = np.array([fila.id for fila in filas], dtype=np.int64)
+        nombres = [normalizar(fila.nombre) for fila in filas]
+
+        # Listas de publicación: trigrama -> posiciones de los nombres que lo contienen.
+        # Se arma una lista plana de pares (trigrama, posición) y NumPy la agrupa.
+        codigos_trigrama = {}
+        por_palabra = {}  # Los nombres repiten mucho las mismas palabras
+        pares_trigrama, pares_posicion, cantidades = [], [], []
+        for posicion, nombre in enumerate(nombres):
+            propios = set()
+            for palabra in nombre.split():
+                if palabra not in por_palabra:
+                    por_palabra[palabra] = {
+                        codigos_trigrama.setdefault(t, len(codigos_trigrama)) for t in _trigramas_palabra(palabra)
+                    }
+                propios |= por_palabra[palabra]
+            pares_trigrama.extend(propios)
+            pares_posicion.extend([posicion] * len(propios))
+            cantidades.append(len(propios))
+        self.trigramas_por_nombre = np.array(cantidades, dtype=np.int32)
+        pares_trigrama = np.array(pares_trigrama, dtype=np.int32)
+        orden = np.argsort(pares_trigrama, kind='stable')
+        grupos = np.split(np.array(pares_posicion, dtype=np.int32)[orden],
+                          np.flatnonzero(np.diff(pares_trigrama[orden])) + 1)
+        trigramas_ordenados = sorted(codigos_trigrama, key=codigos_trigrama.get)
+        self.publicaciones = dict(zip(trigramas_ordenados, grupos)) if len(pares_trigrama) else {}
+
+        self.nombres = _ClavesOrdenadas(nombres, range(len(nombres)))
+        palabras = [(palabra, i) for i, nombre in enumerate(nombres) for palabra in set(nombre.split())]
+        self.palabras = _ClavesOrdenadas([p for p, _ in palabras], [i for _, i in palabras])
+        codigos = [(codigo, i) for i, fila in enumerate(filas) for codigo in (fila.codigo_matricula, fila.dni) if codigo]
+        self.codigos = _ClavesOrdenadas([c for c, _ in codigos], [i for _, i in codigos])
+        self.carreras = _Atributo([fila.carrera for fila in filas])
+        self.procedencias = _Atributo([fila.procedencia for fila in filas])
+
+    def puntajes(self, termino, compacto):
+        """
+        Puntaje de todos los pacientes para un término (0 = sin coincidencia).
+
+        Args:
+            termino (str): Término normalizado
+            compacto (str): Término original sin espacios (código o DNI)
+
+        Returns:
+            ndarray: Puntaje por posición, redondeado a 4 decimales
+        """
+        puntajes = np.zeros(len(self.ids))
+
+        def aplicar(posiciones, valor):
+            puntajes[posiciones] = np.maximum(puntajes[posiciones], valor)
+
+        if compacto.isdigit():
+            aplicar(self.codigos.con_prefijo(compacto), PUNTAJE_CODIGO_PREFIJO)
+        aplicar(self.codigos.iguales(compacto), PUNTAJE_CODIGO_EXACTO)
+
+        aplicar(self.nombres.con_prefijo(termino), PUNTAJE_NOMBRE_PREFIJO)
+        palabras = termino.split()
+        coinciden = None
+        for palabra in palabras:
+            posiciones = np.unique(self.palabras.con_prefijo(palabra))
+            coinciden = posiciones if coinciden is None else np.intersect1d(coinciden, posiciones, assume_unique=True)
+        aplicar(coinciden, PUNTAJE_NOMBRE_PALABRAS)
+
+        # Trigramas comunes de todos los nombres a la vez: una pasada de bincount
+        trigramas_termino = trigramas(termino)
+        listas = [self.publicaciones[t] for t in trigramas_termino if t in self.publicaciones]
+        if listas:
+            comunes = np.bincount(np.concatenate(listas), minlength=len(self.ids))
+            similitud = comunes / (len(trigramas_termino) + self.trigramas_por_nombre - comunes)
+            base, peso = PUNTAJE_NOMBRE_SIMILAR
+            similares = np.flatnonzero(similitud >= UMBRAL_SIMILITUD)
+            aplicar(similares, base + peso * similitud[similares])
+
+        for atributo in (self.carreras, self.procedencias):
+            np.maximum(puntajes, atributo.puntajes(termino, palabras, trigramas_termino), out=puntajes)
+        return np.round(puntajes, 4)
+
+
+class IndiceNgramas:
+    """
+    Índice de n-gramas de los pacientes activos en memoria del proceso.
+
+    Seguro para hilos: la primera construcción toma un lock y las búsquedas
+    concurrentes la esperan; después, un índice vencido se reconstruye en un
+    solo hilo en segundo plano y las búsquedas siguen usando el anterior.
+    """
+
+    def __init__(self):
+        self._datos = None
+        self._versiones = None
+        self._construido_en = 0.0
+        self._lock = threading.Lock()  # Construcción síncrona (sin índice)
+        self._lock_estado = threading.Lock()  # Reemplazo del índice y hilo en curso
+        self._hilo = None
+
+    def _vigente(self, versiones):
+        return (self._datos is not None and self._versiones == versiones
+                and time.monotonic() - self._construido_en < EDAD_MAXIMA_INDICE)
+
+    def _instalar(self, datos, versiones):
+        with self._lock_estado:
+            self._datos = datos
+            self._versiones = versiones  # Leídas antes de construir: una escritura concurrente vence el índice otra vez
+            self._construido_en = time.monotonic()
+
+    def obtener(self):
+        """Retorna las estructuras del índice, construyéndolas si no hay ninguno."""
+        versiones = cache_reportes.backend.obtener_versiones(DEPENDENCIAS_INDICE)
+        datos = self._datos
+        if datos is not None:
+            if not self._vigente(versiones):
+                self._programar_reconstruccion()
+            return datos
+
+        with self._lock:
+            if self._datos is None:
+                self._instalar(self._construir(), versiones)
+            return self._datos
+
+    def _programar_reconstruccion(self):
+        """Lanza el hilo de reconstrucción si no hay uno en curso."""
+        with self._lock_estado:
+            if self._hilo is not None:
+                return
+            espera = max(0.0, self._construido_en + INTERVALO_MINIMO_RECONSTRUCCION - time.monotonic())
+            self._hilo = threading.Thread(
+                target=self._reconstruir, args=(current_app._get_current_object(), espera),
+                name='indice-pacientes', daemon=True,
+            )
+            self._hilo.start()
+
+    def _reconstruir(self, app, espera):
+        """Cuerpo del hilo: espera el intervalo mínimo y reemplaza el índice."""
+        try:
+            time.sleep(espera)
+            versiones = cache_reportes.backend.obtener_versiones(DEPENDENCIAS_INDICE)
+            with app.app_context():
+                datos = self._construir()
+            if self._datos is not None:  # Tras invalidar() la próxima búsqueda construye de cero
+                self._instalar(datos, versiones)
+        except Exception:
+            logging.exception('Error al reconstruir el índice de búsqueda de pacientes')
+        finally:
+            with self._lock_estado:
+                self._hilo = None
+
+    def esperar_reconstruccion(self, plazo=None):
+        """
+        Espera a que termine la reconstrucción en segundo plano, si hay una.
+
+        Args:
+            plazo (float, opcional): Segundos máximos de espera
+
+        Returns:
+            bool: True si no queda ninguna reconstrucción en curso
+        """
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(plazo)
+            return not hilo.is_alive()
+        return True
+
+    @staticmethod
+    def _construir():
+        filas = db.session.execute(
+            select(Paciente.id, Usuario.nombre, Usuario.codigo_matricula, Usuario.dni,
+                   Paciente.carrera, Paciente.procedencia)
+            .join(Usuario, Paciente.usuario_id == Usuario.id)
+            .where(Usuario.activo == True)
+            .order_by(Paciente.id)
+        ).all()
+        return _DatosIndice(filas)
+
+    def invalidar(self):
+        """Descarta el índice (la próxima búsqueda lo construye y espera)."""
+        with self._lock_estado:
+            self._datos = None
+            self._versiones = None
+
+    def buscar(self, termino, compacto, referencia, limite):
+        """
+        Página de (id, puntaje) ordenada por puntaje descendente e ID.
+
+        Args:
+            termino (str): Término normalizado
+            compacto (str): Término original sin espacios
+            referencia (tuple): (puntaje, id) de la última fila vista, o None
+            limite (int): Filas a retornar
+        """
+        datos = self.obtener()
+        puntajes = datos.puntajes(termino, compacto)
+        candidatos = np.flatnonzero(puntajes > 0)
+        if referencia is not None:
+            puntaje_ref, id_ref = referencia
+            p = puntajes[candidatos]
+            candidatos = candidatos[(p < puntaje_ref) | ((p == puntaje_ref) & (datos.ids[candidatos] > id_ref))]
+        # Reducir a los mejores antes de ordenar (los empates en el umbral se conservan)
+        if len(candidatos) > limite:
+            p = puntajes[candidatos]
+            umbral = np.partition(p, len(p) - limite)[len(p) - limite]
+            candidatos = candidatos[p >= umbral]
+        orden = np.lexsort((datos.ids[candidatos], -puntajes[candidatos]))[:limite]
+        return [(int(datos.ids[i]), float(puntajes[i])) for i in candidatos[orden]]
+
+
+# Índice único del proceso
+indice_pacientes = IndiceNgramas()
+
+
+# ----------------------------------------------------------------------------
+# PostgreSQL con pg_trgm
+# ----------------------------------------------------------------------------
+
+def _plegado(columna):
+    """lower() sin acentos, idéntico a la expresión de los índices de la migración 6."""
+    return func.translate(
+        func.lower(columna), literal_column(f"'{_ACENTOS}'"), literal_column(f"'{_SIN_ACENTOS}'"),
+        type_=String,
+    )
+
+
+def _palabras_con_prefijo(expresion, palabras):
+    """Cada palabra es prefijo de alguna palabra de la expresión."""
+    return and_(*[(literal(' ', String) + expresion).like(f'% {p}%') for p in palabras])
+
+
+def _contiene_palabras(expresion, palabras):
+    """Cada palabra aparece en la expresión (condición indexable por GIN de trigramas)."""
+    return and_(*[expresion.like(f'%{p}%') for p in palabras])
+
+
+def _buscar_postgresql(termino, compacto, referencia, limite):
+    """Igual que IndiceNgramas.buscar, calculado en PostgreSQL."""
+    palabras = termino.split()
+    nombre = _plegado(Usuario.nombre)
+    carrera = _plegado(Paciente.carrera)
+    procedencia = _plegado(Paciente.procedencia)
+
+    # Candidatos: cada rama usa los índices de su tabla (GIN de trigramas, únicos de código y DNI)
+    condiciones_usuario = [
+        nombre.op('%')(termino),
+        _contiene_palabras(nombre, palabras),
+        Usuario.codigo_matricula == compacto,
+        Usuario.dni == compacto,
+    ]
+    if compacto.isdigit():
+        siguiente = _siguiente_prefijo(compacto)
+        condiciones_usuario += [
+            and_(Usuario.codigo_matricula >= compacto, Usuario.codigo_matricula < siguiente),
+            and_(Usuario.dni >= compacto, Usuario.dni < siguiente),
+        ]
+    candidatos = union(
+        select(Paciente.id).join(Usuario, Paciente.usuario_id == Usuario.id).where(or_(*condiciones_usuario)),
+        select(Paciente.id).where(or_(
+            carrera.op('%')(termino), _contiene_palabras(carrera, palabras),
+            procedencia.op('%')(termino), _contiene_palabras(procedencia, palabras),
+        )),
+    ).subquery()
+
+    codigo_prefijo = literal(False)
+    if compacto.isdigit():
+        codigo_prefijo = or_(Usuario.codigo_matricula.like(f'{compacto}%'), Usuario.dni.like(f'{compacto}%'))
+
+    def similar(expresion, base_y_peso):
+        base, peso = base_y_peso
+        return case((expresion.op('%')(termino), base + peso * func.similarity(expresion, termino)), else_=0)
+
+    def atributo(expresion):
+        return func.greatest(
+            case((or_(expresion.like(f'{termino}%'), _palabras_con_prefijo(expresion, palabras)),
+                  PUNTAJE_ATRIBUTO_PREFIJO), else_=0),
+            similar(expresion, PUNTAJE_ATRIBUTO_SIMILAR),
+        )
+
+    puntaje = func.round(cast(func.greatest(
+        case((or_(Usuario.codigo_matricula == compacto, Usuario.dni == compacto), PUNTAJE_CODIGO_EXACTO),
+             (codigo_prefijo, PUNTAJE_CODIGO_PREFIJO), else_=0),
+        case((nombre.like(f'{termino}%'), PUNTAJE_NOMBRE_PREFIJO),
+             (_palabras_con_prefijo(nombre, palabras), PUNTAJE_NOMBRE_PALABRAS), else_=0),
+        similar(nombre, PUNTAJE_NOMBRE_SIMILAR),
+        atributo(carrera),
+        atributo(procedencia),
+    ), Numeric), 4).label('puntaje')
+
+    puntuados = select(Paciente.id, puntaje).join(Usuario, Paciente.usuario_id == Usuario.id).where(
+        Paciente.id.in_(select(candidatos.c.id)), Usuario.activo == True
+    ).subquery()
+    consulta = select(puntuados.c.id, puntuados.c.puntaje).where(puntuados.c.puntaje > 0)
+    if referencia is not None:
+        puntaje_ref, id_ref = referencia
+        consulta = consulta.where(or_(
+            puntuados.c.puntaje < puntaje_ref,
+            and_(puntuados.c.puntaje == puntaje_ref, puntuados.c.id > id_ref),
+        ))
+    filas = db.session.execute(
+        consulta.order_by(puntuados.c.puntaje.desc(), puntuados.c.id).limit(limite)
+    ).all()
+    return [(paciente_id, float(valor)) for paciente_id, valor in filas]
+
+
+# ----------------------------------------------------------------------------
+# Punto de entrada
+# ----------------------------------------------------------------------------
+
+def _decodificar_referencia(cursor):
+    """(puntaje, id) de un cursor de búsqueda; None si falta o es inválido."""
+    if not cursor:
+        return None
+    try:
+        return tuple(decodificar_cursor(cursor, [literal(0.0), Paciente.id]))
+    except ValueError:
+        # Un cursor manipulado o caducado reinicia la búsqueda desde el principio
+        return None
+
+
+def buscar_pacientes(termino, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """
+    Busca pacientes activos y retorna una página ordenada por relevancia.
+
+    Args:
+        termino (str): Texto buscado (nombre, código, DNI, carrera o procedencia)
+        cursor (str, opcional): Cursor de la página anterior; None para la primera
+        limite (int): Resultados por página (se acota a LIMITE_MAXIMO)
+
+    Returns:
+        PaginaKeyset: Página de ResultadoBusqueda (paciente, puntaje)
+    """
+    limite = max(1, min(int(limite or LIMITE_POR_DEFECTO), LIMITE_MAXIMO))
+    normalizado = normalizar(termino)
+    compacto = ''.join((termino or '').split())
+    referencia = _decodificar_referencia(cursor)
+    if referencia is None:
+        cursor = None
+    if len(normalizado) < LONGITUD_MINIMA:
+        return PaginaKeyset([], cursor, None, limite)
+
+    # Una fila extra indica si hay página siguiente
+    if db.session.get_bind().dialect.name == 'postgresql':
+        filas = _buscar_postgresql(normalizado, compacto, referencia, limite + 1)
+    else:
+        filas = indice_pacientes.buscar(normalizado, compacto, referencia, limite + 1)
+
+    pagina = filas[:limite]
+    pacientes = {
+        paciente.id: paciente
+        for paciente in aplicar_perfil(
+            Paciente.query.filter(Paciente.id.in_([paciente_id for paciente_id, _ in pagina])), 'lista_pacientes'
+        )
+    }
+    items = [ResultadoBusqueda(pacientes[paciente_id], puntaje) for paciente_id, puntaje in pagina
+             if paciente_id in pacientes]
+    cursor_siguiente = None
+    if len(filas) > limite:
+        paciente_id, puntaje = pagina[-1]
+        cursor_siguiente = codificar_cursor([puntaje, paciente_id])
+    return PaginaKeyset(items, cursor, cursor_siguiente, limite)
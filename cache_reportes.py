@@ -0,0 +1,346 @@
+# ============================================================================
+# CACHÉ DE RESULTADOS DE REPORTES
+# ============================================================================
+"""
+Caché de resultados para los métodos estáticos de ServicioReporte.
+
+Cada función de reporte declara su TTL y las tablas de las que depende:
+
+    @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('citas',))
+    def obtener_estadisticas_citas():
+        ...
+
+Invalidación por versiones: cada dependencia ('citas', 'consultas',
+'pacientes', 'usuarios') tiene un número de versión que forma parte de la
+clave de caché. Los servicios de escritura llaman a
+cache_reportes.invalidar('citas') después del commit; eso incrementa la
+versión y deja inalcanzables todas las entradas calculadas con la versión
+anterior, que luego se descartan por LRU o por TTL. Como la versión se lee
+antes de calcular, un resultado calculado durante una escritura nunca queda
+asociado a la versión nueva.
+
+Backends:
+- BackendMemoriaLRU: diccionario acotado en el proceso (por defecto)
+- BackendRedis: compartido entre workers de gunicorn; se activa con la
+  variable de entorno CACHE_REPORTES_URL=redis://... y requiere el paquete redis
+
+Configuración (app.config):
+    CACHE_REPORTES_HABILITADA (bool): Activa la caché (por defecto True)
+    CACHE_REPORTES_URL (str): URL de Redis; si falta se usa memoria local
+    CACHE_REPORTES_MAX_ENTRADAS (int): Tamaño del LRU en memoria
+    CACHE_REPORTES_TTL (dict): Función -> TTL en segundos (sobrescribe el declarado); la
+        función se indica como 'modulo.Clase.funcion' o solo por su nombre
+"""
+
+import functools
+import hashlib
+import inspect
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Dependencias conocidas que pueden invalidarse
+DEPENDENCIAS = ('usuarios', 'pacientes', 'citas', 'consultas')
+
+# Tamaño por defecto del LRU en memoria
+MAX_ENTRADAS_POR_DEFECTO = 512
+
+
+class BackendMemoriaLRU:
+    """
+    Almacenamiento en memoria del proceso con expulsión LRU y expiración por TTL.
+
+    Seguro para hilos: todas las operaciones toman un lock interno.
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_POR_DEFECTO):
+        """
+        Args:
+            max_entradas (int): Número máximo de resultados almacenados
+        """
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # clave -> (expira_en, valor serializado)
+        self._versiones = {}  # dependencia -> versión
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Retorna el valor serializado o None si no existe o expiró."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            expira_en, valor = entrada
+            if expira_en < time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)  # Marcar como usada recientemente
+            return valor
+
+    def guardar(self, clave, valor, ttl):
+        """Guarda un valor serializado durante ttl segundos."""
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)  # Expulsar la menos usada
+
+    def eliminar(self, clave):
+        """Elimina una entrada si existe."""
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def obtener_versiones(self, dependencias):
+        """Retorna la versión actual de cada dependencia."""
+        with self._lock:
+            return [self._versiones.get(d, 0) for d in dependencias]
+
+    def incrementar_versiones(self, dependencias):
+        """Incrementa la versión de cada dependencia (invalidación)."""
+        with self._lock:
+            for dependencia in dependencias:
+                self._versiones[dependencia] = self._versiones.get(dependencia, 0) + 1
+
+    def limpiar(self):
+        """Elimina todas las entradas."""
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class BackendRedis:
+    """
+    Almacenamiento compartido en Redis para despliegues con varios workers.
+
+    Las entradas expiran con el TTL nativo de Redis y las versiones de las
+    dependencias se guardan como contadores (INCR), de modo que una
+    invalidación en un worker es visible para todos.
+    """
+
+    def __init__(self, url, prefijo='osiris:reportes:'):
+        """
+        Args:
+            url (str): URL de conexión, p. ej. redis://localhost:6379/0
+            prefijo (str): Prefijo de todas las claves
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                'CACHE_REPORTES_URL requiere el paquete redis (pip install redis)'
+            ) from e
+        self._cliente = redis.Redis.from_url(url)
+        self._prefijo = prefijo
+
+    def obtener(self, clave):
+        """Retorna el valor serializado o None si no existe o expiró."""
+        return self._cliente.get(self._prefijo + clave)
+
+    def guardar(self, clave, valor, ttl):
+        """Guarda un valor serializado durante ttl segundos."""
+        self._cliente.set(self._prefijo + clave, valor, ex=max(1, int(ttl)))
+
+    def eliminar(self, clave):
+        """Elimina una entrada si existe."""
+        self._cliente.delete(self._prefijo + clave)
+
+    def obtener_versiones(self, dependencias):
+        """Retorna la versión actual de cada dependencia."""
+        valores = self._cliente.mget([f'{self._prefijo}version:{d}' for d in dependencias])
+        return [int(v) if v is not None else 0 for v in valores]
+
+    def incrementar_versiones(self, dependencias):
+        """Incrementa la versión de cada dependencia (invalidación)."""
+        tuberia = self._cliente.pipeline()
+        for dependencia in dependencias:
+            tuberia.incr(f'{self._prefijo}version:{dependencia}')
+        tuberia.execute()
+
+    def limpiar(self):
+        """Elimina todas las entradas con el prefijo de la caché."""
+        claves = list(self._cliente.scan_iter(match=self._prefijo + '*'))
+        if claves:
+            self._cliente.delete(*claves)
+
+    def __len__(self):
+        return sum(1 for _ in self._cliente.scan_iter(match=self._prefijo + '*'))
+
+
+class CacheReportes:
+    """
+    Caché de resultados de funciones de reporte con TTL e invalidación.
+
+    Lleva contadores de aciertos y fallos por función para observar su
+    efectividad (ver estadisticas()).
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: BackendMemoriaLRU o BackendRedis (por defecto LRU en memoria)
+        """
+        self.backend = backend or BackendMemoriaLRU()
+        self.habilitada = True
+        self.ttl_configurados = {}  # Sobrescrituras de TTL por nombre de función
+        self._funciones = {}  # nombre -> (ttl declarado, dependencias)
+        self._aciertos = {}
+        self._fallos = {}
+        self._lock = threading.Lock()
+
+    def configurar(self, app):
+        """
+        Configura el backend y los TTL a partir de app.config.
+
+        Args:
+            app (Flask): Aplicación con las claves CACHE_REPORTES_*
+        """
+        self.habilitada = app.config.get('CACHE_REPORTES_HABILITADA', True)
+        self.ttl_configurados = dict(app.config.get('CACHE_REPORTES_TTL', {}))
+
+        url = app.config.get('CACHE_REPORTES_URL')
+        if url:
+            self.backend = BackendRedis(url)
+            logging.info('Caché de reportes compartida en Redis')
+        else:
+            self.backend = BackendMemoriaLRU(
+                app.config.get('CACHE_REPORTES_MAX_ENTRADAS', MAX_ENTRADAS_POR_DEFECTO)
+            )
+
+    def _registrar(self, contadores, nombre):
+        with self._lock:
+            contadores[nombre] = contadores.get(nombre, 0) + 1
+
+    def cachear(self, ttl, dependencias):
+        """
+        Decorador que almacena el resultado de una función de reporte.
+
+        La clave incluye el nombre calificado de la función (módulo y clase,
+        para que funciones homónimas no compartan entradas), sus argumentos y las
+        versiones de las dependencias. Los resultados se serializan con
+        pickle, así que cada llamada recibe una copia independiente.
+
+        Args:
+            ttl (int): Segundos que un resultado permanece válido
+            dependencias (tuple): Tablas cuyas escrituras invalidan el resultado
+
+        Returns:
+            callable: Decorador
+        """
+        desconocidas = set(dependencias) - set(DEPENDENCIAS)
+        if desconocidas:
+            raise ValueError(f"Dependencias de caché desconocidas: {', '.join(sorted(desconocidas))}")
+
+        def decorador(funcion):
+            nombre = f'{funcion.__module__}.{funcion.__qualname__}'
+            firma = inspect.signature(funcion)
+            self._funciones[nombre] = (ttl, tuple(dependencias))
+
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self.habilitada:
+                    return funcion(*args, **kwargs)
+
+                # Normalizar argumentos posicionales y por defecto para que
+                # f(1) y f(x=1) compartan entrada
+                argumentos = firma.bind(*args, **kwargs)
+                argumentos.apply_defaults()
+                versiones = self.backend.obtener_versiones(dependencias)
+                huella = repr((sorted(argumentos.arguments.items()), versiones))
+                clave = f'{nombre}:{hashlib.sha1(huella.encode("utf-8")).hexdigest()}'
+
+                valor = self.backend.obtener(clave)
+                if valor is not None:
+                    self._registrar(self._aciertos, nombre)
+                    return pickle.loads(valor)
+
+                self._registrar(self._fallos, nombre)
+                resultado = funcion(*args, **kwargs)
+                ttl_efectivo = self.ttl_configurados.get(nombre, self.ttl_configurados.get(funcion.__name__, ttl))
+                if ttl_efectivo > 0:
+                    self.backend.guardar(clave, pickle.dumps(resultado), ttl_efectivo)
+                return resultado
+
+            envoltura.sin_cache = funcion  # Acceso directo al cálculo original
+            return envoltura
+
+        return decorador
+
+    def invalidar(self, *dependencias):
+        """
+        Invalida los resultados que dependen de las tablas indicadas.
+
+        Debe llamarse después del commit de la escritura.
+
+        Args:
+            *dependencias (str): Nombres de tablas de DEPENDENCIAS
+        """
+        if dependencias:
+            self.backend.incrementar_versiones(dependencias)
+
+    def limpiar(self):
+        """Elimina todos los resultados y reinicia los contadores."""
+        self.backend.limpiar()
+        with self._lock:
+            self._aciertos.clear()
+            self._fallos.clear()
+
+    def estadisticas(self):
+        """
+        Retorna los contadores de aciertos y fallos.
+
+        Returns:
+            dict: backend, entradas, totales y detalle por función con su TTL
+        """
+        with self._lock:
+            aciertos = dict(self._aciertos)
+            fallos = dict(self._fallos)
+
+        funciones = {}
+        for nombre, (ttl, dependencias) in sorted(self._funciones.items()):
+            funciones[nombre] = {
+                'ttl': self.ttl_configurados.get(nombre, self.ttl_configurados.get(nombre.rsplit('.', 1)[-1], ttl)),
+                'dependencias': list(dependencias),
+                'aciertos': aciertos.get(nombre, 0),
+                'fallos': fallos.get(nombre, 0),
+            }
+
+        total_aciertos = sum(aciertos.values())
+        total_fallos = sum(fallos.values())
+        consultas = total_aciertos + total_fallos
+        return {
+            'backend': type(self.backend).__name__,
+            'habilitada': self.habilitada,
+            'entradas': len(self.backend),
+            'aciertos': total_aciertos,
+            'fallos': total_fallos,
+            'tasa_aciertos': round(total_aciertos / consultas, 3) if consultas else 0.0,
+            'funciones': funciones,
+        }
+
+
+# Instancia única usada por ServicioReporte y los servicios de escritura
+cache_reportes = CacheReportes()
+
+
+def configurar_cache_reportes(app):
+    """Configura la caché global y registra el comando `flask cache-reportes`."""
+    import click
+
+    cache_reportes.configurar(app)
+
+    @app.cli.command('cache-reportes')
+    @click.option('--limpiar', is_flag=True, help='Eliminar todos los resultados almacenados.')
+    def comando_cache_reportes(limpiar):
+        """Muestra las estadísticas de la caché de reportes."""
+        if limpiar:
+            cache_reportes.limpiar()
+            click.echo('Caché de reportes vaciada.')
+            return
+        estadisticas = cache_reportes.estadisticas()
+        click.echo(f"{estadisticas['backend']}: {estadisticas['entradas']} entradas")
+        for nombre, datos in estadisticas['funciones'].items():
+            click.echo(f"  {nombre}: ttl={datos['ttl']}s dependencias={','.join(datos['dependencias'])}")
@@ -0,0 +1,184 @@
+# ============================================================================
+# EJECUCIÓN CONCURRENTE DE AGREGADOS DE REPORTES
+# ============================================================================
+"""
+Ejecución concurrente de consultas de reportes independientes.
+
+Las páginas de reportes llaman varias funciones de ServicioReporte que no
+dependen entre sí (dashboard_admin: cuatro; estadisticas_detalladas: seis).
+Ejecutadas una tras otra, la latencia de la página es la SUMA de sus
+consultas. EjecutorReportes las lanza a la vez en un ThreadPoolExecutor:
+cada tarea abre su propio contexto de aplicación, y por tanto su propia
+sesión de Flask-SQLAlchemy y su propia conexión del pool, de modo que la
+latencia queda acotada por la consulta más lenta.
+
+    resultados = ejecutor_reportes.ejecutar({
+        'resumen': ServicioReporte.obtener_resumen_dashboard,
+        'niveles_riesgo': ServicioReporte.obtener_niveles_riesgo,
+    })
+
+Plazo por reporte: si alguna tarea no termina dentro de REPORTES_PLAZO_SEGUNDOS
+se lanza PlazoReporteExcedido con los resultados que sí llegaron (las vistas
+renderizan la página parcial con un aviso). Las tareas aún en cola se
+cancelan; las que ya están en curso terminan en segundo plano y su
+resultado se descarta (la consulta no se puede interrumpir desde Python).
+
+Los hilos son compartidos por todas las solicitudes del worker, así que
+como máximo REPORTES_HILOS conexiones se usan a la vez para reportes;
+conviene que no supere DB_POOL_SIZE + DB_MAX_OVERFLOW (ver pool_conexiones).
+Con SQLite y con REPORTES_HILOS=0 las tareas se ejecutan en el hilo de la
+solicitud: SQLite resuelve las consultas dentro del propio proceso (CPU y
+GIL compartidos), así que los hilos solo agregan sobrecarga; la ganancia
+aparece cuando las consultas esperan a un servidor (PostgreSQL).
+
+Configuración (app.config, ver app.py):
+    REPORTES_HILOS (int): Hilos del ejecutor por worker (0 = secuencial)
+    REPORTES_PLAZO_SEGUNDOS (float): Plazo máximo de un reporte completo
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+# Valores por defecto de la configuración
+HILOS_POR_DEFECTO = 4
+PLAZO_POR_DEFECTO = 10.0
+
+
+class PlazoReporteExcedido(Exception):
+    """
+    Alguna tarea del reporte no terminó dentro del plazo.
+
+    Atributos:
+        parciales (dict): Resultados de las tareas que sí terminaron
+        pendientes (list): Nombres de las tareas que no terminaron
+    """
+
+    def __init__(self, parciales, pendientes):
+        super().__init__(f'Tareas de reporte fuera de plazo: {", ".join(pendientes)}')
+        self.parciales = parciales
+        self.pendientes = pendientes
+
+
+class EjecutorReportes:
+    """
+    Ejecuta funciones de reporte independientes en un pool de hilos.
+
+    El pool se crea en el primer uso dentro de cada proceso, de modo que los
+    workers de gunicorn (creados por fork) no heredan hilos del maestro.
+    """
+
+    def __init__(self, hilos=HILOS_POR_DEFECTO, plazo=PLAZO_POR_DEFECTO):
+        """
+        Args:
+            hilos (int): Hilos del pool (0 = ejecutar en el hilo actual)
+            plazo (float): Segundos máximos por reporte
+        """
+        self.hilos = hilos
+        self.plazo = plazo
+        self._ejecutor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configurar(self, app):
+        """
+        Aplica REPORTES_HILOS y REPORTES_PLAZO_SEGUNDOS.
+
+        Con SQLite las tareas se ejecutan en el hilo de la solicitud (en
+        memoria compartirían además la misma conexión).
+
+        Args:
+            app (Flask): Aplicación configurada
+        """
+        self.cerrar()
+        self.hilos = app.config.get('REPORTES_HILOS', HILOS_POR_DEFECTO)
+        self.plazo = app.config.get('REPORTES_PLAZO_SEGUNDOS', PLAZO_POR_DEFECTO)
+        if app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith('sqlite'):
+            self.hilos = 0
+
+    def _obtener_ejecutor(self):
+        """Retorna el pool del proceso actual, creándolo si hace falta."""
+        with self._lock:
+            if self._ejecutor is None or self._pid != os.getpid():
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='reportes')
+                self._pid = os.getpid()
+                logging.info(f'Ejecutor de reportes: {self.hilos} hilos')
+            return self._ejecutor
+
+    @staticmethod
+    def _ejecutar_en_contexto(app, funcion):
+        """
+        Ejecuta una tarea en un contexto de aplicación propio.
+
+        Al cerrarse el contexto, Flask-SQLAlchemy cierra la sesión de la
+        tarea y devuelve su conexión al pool.
+        """
+        with app.app_context():
+            return funcion()
+
+    def ejecutar(self, tareas, plazo=None):
+        """
+        Ejecuta las tareas a la vez y espera sus resultados.
+
+        Args:
+            tareas (dict): Nombre -> función sin argumentos (de solo lectura)
+            plazo (float, opcional): Segundos máximos (por defecto el configurado)
+
+        Returns:
+            dict: Nombre -> resultado de cada tarea
+
+        Raises:
+            PlazoReporteExcedido: Si alguna tarea no terminó dentro del plazo
+            Exception: La primera excepción lanzada por una tarea
+        """
+        if self.hilos <= 0 or len(tareas) <= 1:
+            return {nombre: funcion() for nombre, funcion in tareas.items()}
+
+        from flask import current_app
+        app = current_app._get_current_object()
+        plazo = self.plazo if plazo is None else plazo
+
+        inicio = time.monotonic()
+        ejecutor = self._obtener_ejecutor()
+        futuros = {
+            nombre: ejecutor.submit(self._ejecutar_en_contexto, app, funcion)
+            for nombre, funcion in tareas.items()
+        }
+        terminados, pendientes = wait(futuros.values(), timeout=plazo, return_when=FIRST_EXCEPTION)
+
+        # Una tarea fallida invalida el reporte, igual que en la ejecución secuencial
+        for futuro in terminados:
+            if futuro.exception() is not None:
+                for otro in pendientes:
+                    otro.cancel()
+                raise futuro.exception()
+
+        resultados = {nombre: futuro.result() for nombre, futuro in futuros.items() if futuro in terminados}
+        if pendientes:
+            for futuro in pendientes:
+                futuro.cancel()
+            nombres = [nombre for nombre, futuro in futuros.items() if futuro in pendientes]
+            logging.warning(f'Reporte fuera de plazo ({plazo}s): {", ".join(nombres)}')
+            raise PlazoReporteExcedido(resultados, nombres)
+
+        logging.debug(f'Reporte de {len(tareas)} tareas en {(time.monotonic() - inicio) * 1000:.1f} ms')
+        return resultados
+
+    def cerrar(self):
+        """Detiene el pool del proceso actual (si existe)."""
+        with self._lock:
+            if self._ejecutor is not None and self._pid == os.getpid():
+                self._ejecutor.shutdown(wait=False, cancel_futures=True)
+            self._ejecutor = None
+            self._pid = None
+
+
+# Instancia única usada por las vistas de reportes
+ejecutor_reportes = EjecutorReportes()
+
+
+def configurar_ejecutor_reportes(app):
+    """Configura el ejecutor de reportes desde app.config."""
+    ejecutor_reportes.configurar(app)
@@ -0,0 +1,278 @@
+# ============================================================================
+# EXPORTACIÓN CSV EN STREAMING
+# ============================================================================
+"""
+Exportación de conjuntos de datos a CSV sin archivos intermedios.
+
+Cada conjunto ('procedencia', 'citas', 'consultas', 'usuarios') es un
+SELECT de columnas (no de entidades ORM, para no llenar el identity map)
+que se ejecuta con yield_per: el driver entrega las filas por lotes desde
+un cursor del lado del servidor (stream_results en PostgreSQL) y cada lote
+se escribe como texto CSV y se envía al cliente antes de leer el siguiente.
+La memoria usada depende del tamaño del lote, no del tamaño de la tabla, y
+nunca se escribe nada en disco.
+
+La respuesta HTTP se envía en bloques (Transfer-Encoding: chunked) y se
+comprime con gzip en el propio generador cuando el cliente lo acepta.
+
+Uso desde una ruta:
+
+    return respuesta_csv('citas')
+"""
+
+import csv
+import io
+import zlib
+from datetime import date, datetime, time
+from enum import Enum
+from itertools import groupby
+from flask import Response, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, Paciente, Cita, Consulta  # Modelos de datos
+
+# Filas que el driver entrega por lote desde el cursor del servidor
+FILAS_POR_LOTE = 1000
+
+# Tamaño aproximado (caracteres) de cada bloque enviado al cliente
+TAMANO_BLOQUE = 64 * 1024
+
+# Nivel de compresión gzip (1 = más rápido, 9 = más compacto)
+NIVEL_GZIP = 6
+
+
+def _valor_csv(valor):
+    """Convierte un valor de la base de datos a texto para el CSV."""
+    if valor is None:
+        return ''
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _consulta_usuarios():
+    """Usuarios sin el hash de contraseña, ordenados por ID."""
+    return select(
+        Usuario.id, Usuario.nombre, Usuario.dni, Usuario.codigo_matricula,
+        Usuario.rol, Usuario.activo, Usuario.fecha_creacion,
+    ).order_by(Usuario.id)
+
+
+def _consulta_citas():
+    """Citas con los datos del paciente y del profesional, ordenadas por ID."""
+    usuario_paciente = aliased(Usuario)
+    profesional = aliased(Usuario)
+    return select(
+        Cita.id, Cita.fecha, Cita.hora, Cita.tipo_cita, Cita.estado,
+        Cita.paciente_id, usuario_paciente.nombre, usuario_paciente.codigo_matricula, Paciente.carrera,
+        Cita.profesional_id, profesional.nombre,
+        Cita.motivo, Cita.fecha_creacion,
+    ).join(
+        Paciente, Paciente.id == Cita.paciente_id
+    ).join(
+        usuario_paciente, usuario_paciente.id == Paciente.usuario_id
+    ).join(
+        profesional, profesional.id == Cita.profesional_id
+    ).order_by(Cita.id)
+
+
+def _consulta_consultas():
+    """Consultas con la fecha de la cita, el paciente y el profesional, ordenadas por ID."""
+    usuario_paciente = aliased(Usuario)
+    profesional = aliased(Usuario)
+    return select(
+        Consulta.id, Consulta.cita_id, Consulta.fecha_consulta, Cita.fecha,
+        usuario_paciente.nombre, usuario_paciente.codigo_matricula, Paciente.carrera,
+        profesional.nombre, Consulta.nivel_riesgo,
+        Consulta.diagnostico, Consulta.tratamiento, Consulta.observaciones,
+    ).join(
+        Cita, Cita.id == Consulta.cita_id
+    ).join(
+        Paciente, Paciente.id == Cita.paciente_id
+    ).join(
+        usuario_paciente, usuario_paciente.id == Paciente.usuario_id
+    ).join(
+        profesional, profesional.id == Cita.profesional_id
+    ).order_by(Consulta.id)
+
+
+def _consulta_procedencia():
+    """Pacientes con procedencia ordenados por procedencia y nombre."""
+    return select(
+        Paciente.procedencia, Usuario.nombre,
+    ).join(
+        Usuario, Usuario.id == Paciente.usuario_id
+    ).where(
+        Paciente.procedencia.isnot(None),
+        Paciente.procedencia != '',
+    ).order_by(Paciente.procedencia, Usuario.nombre)
+
+
+def _agrupar_procedencia(filas):
+    """
+    Agrupa las filas (procedencia, nombre) ya ordenadas por procedencia.
+
+    Reemplaza a string_agg (no disponible en SQLite): como la consulta
+    llega ordenada, cada procedencia es un tramo contiguo del stream y solo
+    se retiene en memoria el tramo actual.
+    """
+    for procedencia, grupo in groupby(filas, key=lambda fila: fila[0]):
+        nombres = [nombre for _, nombre in grupo]
+        yield procedencia, len(nombres), ', '.join(nombres)
+
+
+# Conjuntos exportables: nombre -> (encabezado, consulta, transformación de filas)
+CONJUNTOS = {
+    'procedencia': (
+        ['Procedencia', 'Cantidad_Pacientes', 'Pacientes'],
+        _consulta_procedencia,
+        _agrupar_procedencia,
+    ),
+    'citas': (
+        ['ID', 'Fecha', 'Hora', 'Tipo', 'Estado', 'Paciente_ID', 'Paciente', 'Codigo_Matricula',
+         'Carrera', 'Profesional_ID', 'Profesional', 'Motivo', 'Fecha_Creacion'],
+        _consulta_citas,
+        None,
+    ),
+    'consultas': (
+        ['ID', 'Cita_ID', 'Fecha_Consulta', 'Fecha_Cita', 'Paciente', 'Codigo_Matricula',
+         'Carrera', 'Profesional', 'Nivel_Riesgo', 'Diagnostico', 'Tratamiento', 'Observaciones'],
+        _consulta_consultas,
+        None,
+    ),
+    'usuarios': (
+        ['ID', 'Nombre', 'DNI', 'Codigo_Matricula', 'Rol', 'Activo', 'Fecha_Creacion'],
+        _consulta_usuarios,
+        None,
+    ),
+}
+
+
+def _filas_en_streaming(consulta, filas_por_lote):
+    """
+    Ejecuta la consulta con un cursor del lado del servidor y produce sus filas.
+
+    Args:
+        consulta (Select): Consulta de columnas
+        filas_por_lote (int): Filas leídas del cursor en cada viaje
+
+    Yields:
+        Row: Filas del resultado, leídas lote a lote
+    """
+    resultado = db.session.execute(consulta.execution_options(yield_per=filas_por_lote))
+    try:
+        for lote in resultado.partitions():
+            yield from lote
+    finally:
+        resultado.close()  # Liberar el cursor si el cliente cancela la descarga
+
+
+def generar_csv(conjunto, filas_por_lote=FILAS_POR_LOTE, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera el CSV de un conjunto de datos en bloques de texto.
+
+    Args:
+        conjunto (str): Clave de CONJUNTOS
+        filas_por_lote (int): Filas leídas del cursor en cada viaje
+        tamano_bloque (int): Caracteres acumulados antes de entregar un bloque
+
+    Yields:
+        str: Fragmentos consecutivos del CSV (el primero incluye el encabezado)
+
+    Raises:
+        KeyError: Si el conjunto no existe
+    """
+    encabezado, construir_consulta, transformar = CONJUNTOS[conjunto]
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(encabezado)
+
+    filas = _filas_en_streaming(construir_consulta(), filas_por_lote)
+    if transformar is not None:
+        filas = transformar(filas)
+
+    for fila in filas:
+        escritor.writerow([_valor_csv(valor) for valor in fila])
+        if buffer.tell() >= tamano_bloque:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def comprimir_gzip(bloques, nivel=NIVEL_GZIP):
+    """
+    Comprime un stream de bloques de texto en formato gzip, bloque a bloque.
+
+    Args:
+        bloques (iterable[str]): Fragmentos de texto
+        nivel (int): Nivel de compresión zlib
+
+    Yields:
+        bytes: Fragmentos del stream gzip (se omiten los vacíos)
+    """
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16 + = cabecera gzip
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque.encode('utf-8'))
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def _cliente_acepta_gzip():
+    """Decide si comprimir: ?gzip=1/0 tiene prioridad sobre Accept-Encoding."""
+    parametro = request.args.get('gzip')
+    if parametro is not None:
+        return parametro.lower() in ('1', 'true', 'si')
+    return request.accept_encodings['gzip'] > 0
+
+
+def respuesta_csv(conjunto, nombre_archivo=None):
+    """
+    Construye la respuesta HTTP en streaming con el CSV de un conjunto.
+
+    La consulta se ejecuta mientras se envía la respuesta, dentro del
+    contexto de la solicitud (stream_with_context), de modo que la sesión
+    de base de datos sigue disponible hasta el último bloque.
+
+    Args:
+        conjunto (str): Clave de CONJUNTOS
+        nombre_archivo (str, opcional): Nombre de descarga (por defecto
+            <conjunto>_<fecha>.csv)
+
+    Returns:
+        Response: Respuesta text/csv en bloques, comprimida con gzip si el
+            cliente lo acepta
+
+    Raises:
+        KeyError: Si el conjunto no existe
+    """
+    if conjunto not in CONJUNTOS:
+        raise KeyError(conjunto)
+
+    nombre_archivo = nombre_archivo or f'{conjunto}_{datetime.now().strftime("%Y%m%d")}.csv'
+    bloques = generar_csv(conjunto)
+    encabezados = {
+        'Content-Disposition': f'attachment; filename="{nombre_archivo}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',  # Evitar que un proxy nginx acumule la respuesta
+        'Vary': 'Accept-Encoding',
+    }
+
+    if _cliente_acepta_gzip():
+        bloques = comprimir_gzip(bloques)
+        encabezados['Content-Encoding'] = 'gzip'
+    else:
+        bloques = (bloque.encode('utf-8') for bloque in bloques)
+
+    return Response(
+        stream_with_context(bloques),
+        mimetype='text/csv',
+        headers=encabezados,
+    )
@@ -32,13 +32,18 @@ class FormularioLogin(FlaskForm):
         Length(min=6, message='La contraseña debe tener al menos 6 caracteres')  # Longitud mínima de seguridad
     ])
     
+    # Usuario encontrado por validate_identificador (None hasta validar)
+    usuario = None
+    
     def validate_identificador(self, field):
         """
         Validación personalizada del campo identificador.
         
         Este método verifica que el identificador ingresado corresponda a un usuario
-        válido y activo en el sistema. Busca primero por DNI (si es numérico) y luego
-        por código de matrícula.
+        válido y activo en el sistema. La búsqueda por DNI o código de matrícula
+        es una sola consulta (RepositorioUsuarioSQLAlchemy.obtener_por_identificador)
+        y el usuario encontrado queda en self.usuario para que la vista no
+        repita la búsqueda al autenticar.
         
         Args:
             field: Campo del formulario que contiene el identificador a validar
@@ -46,27 +51,17 @@ class FormularioLogin(FlaskForm):
         Raises:
             ValidationError: Si el identificador no existe o el usuario está inactivo
         """
-        usuario = None  # Inicializar variable para el usuario encontrado
-        
-        # Estrategia 1: Si el identificador es completamente numérico
-        if field.data.isdigit():
-            # Si son 8 dígitos, buscar por DNI
-            if len(field.data) == 8:
-                usuario = Usuario.query.filter_by(dni=field.data).first()
-            # Si son 6 dígitos, buscar por código de matrícula  
-            elif len(field.data) == 6:
-                usuario = Usuario.query.filter_by(codigo_matricula=field.data).first()
+        from servicios_solid import RepositorioUsuarioSQLAlchemy
         
-        # Estrategia 2: Si no se encontró aún, buscar por código de matrícula (por compatibilidad)
-        if not usuario:
-            usuario = Usuario.query.filter_by(codigo_matricula=field.data).first()
+        # Buscar por DNI o código de matrícula en una sola consulta
+        self.usuario = RepositorioUsuarioSQLAlchemy().obtener_por_identificador(field.data)
         
         # Verificar que se encontró un usuario con ese identificador
-        if not usuario:
+        if not self.usuario:
             raise ValidationError('Identificador no válido')
         
         # Verificar que el usuario esté activo en el sistema
-        if not usuario.activo:
+        if not self.usuario.activo:
             raise ValidationError('Usuario inactivo')
 
 class FormularioRegistro(FlaskForm):
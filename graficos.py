@@ -0,0 +1,490 @@
+# ============================================================================
+# GRÁFICOS DE PLOTLY Y CACHÉ DE SUS PAYLOADS
+# ============================================================================
+"""
+Construcción de los gráficos de reportes y caché de su JSON serializado.
+
+Cada gráfico tiene un ID estable registrado en GRAFICOS junto con tres
+funciones: la que obtiene sus datos agregados (métodos de ServicioReporte,
+ya cacheados por cache_reportes), la que construye la figura de Plotly y la
+que reduce los datos a series compactas (etiquetas y valores).
+
+Dos formas de servir un gráfico:
+- Series compactas (/reportes/api/graficos?ids=...): solo los datos; el
+  diseño y el tema se arman en el navegador con static/js/graficos.js. Es
+  la forma que usan las páginas de análisis: no se construye ninguna figura
+  en el servidor y varios gráficos llegan en una sola solicitud.
+- Figura completa (/reportes/graficos/<id>.json): JSON de Plotly listo
+  para Plotly.newPlot, construido en el servidor y cacheado.
+
+Construir la figura y serializarla con PlotlyJSONEncoder cuesta más que la
+consulta que la alimenta, así que el JSON resultante se guarda en
+cache_graficos con la clave (ID del gráfico, huella de los datos). La
+huella es un SHA-1 de los datos agregados: mientras no cambien, la figura
+no se vuelve a construir, y cuando cambian la clave es otra y la entrada
+anterior se descarta por LRU. No hace falta invalidación explícita.
+
+La huella también es el ETag de /reportes/graficos/<id>.json: un navegador
+que ya tiene el gráfico recibe 304 sin que se construya ni se lea el payload.
+
+Si cambia el diseño de alguna figura, incrementar VERSION_GRAFICOS para que
+no se sirvan payloads con el diseño anterior desde Redis.
+
+Uso desde una vista:
+
+    graficos = {'citas_tipo': cache_graficos.json_grafico('dashboard-citas-tipo')}
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+from functools import partial
+from flask import Response, jsonify, request
+from cache_reportes import BackendMemoriaLRU, BackendRedis  # Almacenamiento con TTL
+from servicios import ServicioReporte  # Datos agregados de los reportes
+
+# Forma parte de la huella: cambiarla descarta todos los payloads guardados
+VERSION_GRAFICOS = 1
+
+# Payloads retenidos en el LRU en memoria y su vigencia máxima
+MAX_GRAFICOS_POR_DEFECTO = 256
+TTL_GRAFICOS = 24 * 3600
+
+
+def figura_json(fig):
+    """Serializa una figura de Plotly a JSON (PlotlyJSONEncoder)."""
+    from plotly.utils import PlotlyJSONEncoder
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+
+def huella_datos(grafico_id, datos):
+    """
+    Calcula la huella de los datos agregados de un gráfico.
+
+    Args:
+        grafico_id (str): ID del gráfico
+        datos: Datos agregados (dict o list serializables a JSON)
+
+    Returns:
+        str: SHA-1 hexadecimal de (versión, ID, datos)
+    """
+    contenido = json.dumps([VERSION_GRAFICOS, grafico_id, datos], sort_keys=True, default=str)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+# === CONSTRUCCIÓN DE FIGURAS ===
+
+def _barras(datos, colores, mostrar_texto=False, **diseno):
+    """Barras de un diccionario categoría -> valor."""
+    import plotly.graph_objects as go  # Importación diferida al primer gráfico
+    barra = dict(x=list(datos.keys()), y=list(datos.values()), marker_color=colores)
+    if mostrar_texto:
+        barra.update(text=list(datos.values()), textposition='auto')
+    fig = go.Figure(data=[go.Bar(**barra)])
+    fig.update_layout(template='plotly_white', **diseno)
+    return fig
+
+
+def _torta(datos, hueco, colores=None, textinfo=None, **diseno):
+    """Torta (o dona) de un diccionario categoría -> valor."""
+    import plotly.graph_objects as go
+    torta = dict(labels=list(datos.keys()), values=list(datos.values()), hole=hueco)
+    if colores:
+        torta['marker'] = dict(colors=colores)
+    if textinfo:
+        torta.update(textinfo=textinfo, textposition='outside')
+    fig = go.Figure(data=[go.Pie(**torta)])
+    fig.update_layout(template='plotly_white', **diseno)
+    return fig
+
+
+def _linea_mensual(datos, tamano_marcador, nombre=None, **diseno):
+    """Línea de la tendencia mensual {'meses': [...], 'totales': [...]}."""
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[
+        go.Scatter(
+            x=datos.get('meses', []),
+            y=datos.get('totales', []),
+            mode='lines+markers',
+            line=dict(color='#007bff', width=3),
+            marker=dict(size=tamano_marcador),
+            name=nombre,
+        )
+    ])
+    fig.update_layout(template='plotly_white', **diseno)
+    return fig
+
+
+def _tendencia_con_prediccion(tendencia):
+    """Serie histórica de citas más el punto predicho con su intervalo del 95%."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+
+    # Línea de datos históricos
+    fig.add_trace(go.Scatter(
+        x=tendencia['meses'],
+        y=tendencia['valores'],
+        mode='lines+markers',
+        name='Datos Históricos',
+        line=dict(color='#007bff', width=3),
+        marker=dict(size=8)
+    ))
+
+    # Punto de predicción con su intervalo de confianza del 95%
+    fig.add_trace(go.Scatter(
+        x=['Próximo mes'],
+        y=[tendencia['prediccion_proximo']],
+        mode='markers',
+        name='Predicción',
+        marker=dict(size=12, color='#dc3545', symbol='star'),
+        error_y=dict(
+            type='data',
+            symmetric=False,
+            array=[tendencia['prediccion_superior'] - tendencia['prediccion_proximo']],
+            arrayminus=[tendencia['prediccion_proximo'] - tendencia['prediccion_inferior']]
+        )
+    ))
+
+    fig.update_layout(
+        title='Tendencia de Citas con Predicción',
+        xaxis_title='Mes',
+        yaxis_title='Número de Citas',
+        template='plotly_white',
+        height=400
+    )
+    return fig
+
+
+def _demanda_por_tipo(demanda):
+    """Barras agrupadas de demanda actual y predicha por tipo, con intervalo."""
+    import plotly.graph_objects as go
+    tipos = list(demanda.keys())
+    valores_actuales = [demanda[t]['actual'] for t in tipos]
+    valores_prediccion = [demanda[t]['prediccion'] for t in tipos]
+    margen_superior = [demanda[t]['superior'] - demanda[t]['prediccion'] for t in tipos]
+    margen_inferior = [demanda[t]['prediccion'] - demanda[t]['inferior'] for t in tipos]
+
+    fig = go.Figure(data=[
+        go.Bar(name='Últimos 30 días', x=tipos, y=valores_actuales, marker_color='#17a2b8'),
+        go.Bar(name='Próximos 30 días', x=tipos, y=valores_prediccion, marker_color='#28a745',
+               error_y=dict(type='data', symmetric=False, array=margen_superior, arrayminus=margen_inferior))
+    ])
+    fig.update_layout(
+        title='Demanda por Tipo de Consulta: Actual vs Predicción',
+        xaxis_title='Tipo de Consulta',
+        yaxis_title='Número de Consultas',
+        template='plotly_white',
+        height=400,
+        barmode='group'
+    )
+    return fig
+
+
+def _segmentacion(clave):
+    """Obtiene una sección de los datos de segmentación."""
+    return ServicioReporte.obtener_datos_segmentacion().get(clave)
+
+
+def _prediccion(clave):
+    """Obtiene una sección de los datos de predicción."""
+    return ServicioReporte.obtener_datos_prediccion().get(clave)
+
+
+# === SERIES COMPACTAS ===
+
+def _series_categorias(datos):
+    """Una serie a partir de un diccionario categoría -> valor."""
+    return [{'etiquetas': list(datos.keys()), 'valores': list(datos.values())}]
+
+
+def _series_tendencia_mensual(datos):
+    """Una serie a partir de {'meses': [...], 'totales': [...]}."""
+    return [{'etiquetas': datos.get('meses', []), 'valores': datos.get('totales', [])}]
+
+
+def _series_tendencia_prediccion(tendencia):
+    """Serie histórica y punto predicho con los límites de su intervalo."""
+    return [
+        {'nombre': 'Datos Históricos', 'etiquetas': tendencia['meses'], 'valores': tendencia['valores']},
+        {'nombre': 'Predicción', 'etiquetas': ['Próximo mes'], 'valores': [tendencia['prediccion_proximo']],
+         'superior': [tendencia['prediccion_superior']], 'inferior': [tendencia['prediccion_inferior']]},
+    ]
+
+
+def _series_demanda_por_tipo(demanda):
+    """Demanda actual y predicha por tipo, con los límites de la predicción."""
+    tipos = list(demanda.keys())
+    return [
+        {'nombre': 'Últimos 30 días', 'etiquetas': tipos, 'valores': [demanda[t]['actual'] for t in tipos]},
+        {'nombre': 'Próximos 30 días', 'etiquetas': tipos,
+         'valores': [demanda[t]['prediccion'] for t in tipos],
+         'superior': [demanda[t]['superior'] for t in tipos],
+         'inferior': [demanda[t]['inferior'] for t in tipos]},
+    ]
+
+
+COLORES_TIPO_CITA = ['#28a745', '#17a2b8', '#dc3545']
+
+# Funciones de un gráfico: datos agregados, figura de Plotly y series compactas
+Grafico = namedtuple('Grafico', ['obtener_datos', 'construir_figura', 'series'])
+
+# ID del gráfico -> Grafico (los diseños del navegador están en static/js/graficos.js)
+GRAFICOS = {
+    'citas-por-tipo': Grafico(
+        ServicioReporte.obtener_estadisticas_citas,
+        partial(_barras, colores=COLORES_TIPO_CITA, mostrar_texto=True,
+                title='Distribución de Citas por Tipo de Consulta',
+                xaxis_title='Tipo de Consulta', yaxis_title='Número de Citas', height=400),
+        _series_categorias,
+    ),
+    'consultas-por-carrera': Grafico(
+        ServicioReporte.obtener_estadisticas_consultas_por_carrera,
+        partial(_torta, hueco=0.3, textinfo='label+percent',
+                title='Consultas Médicas por Carrera Universitaria', height=500),
+        _series_categorias,
+    ),
+    'tendencia-mensual': Grafico(
+        ServicioReporte.obtener_tendencia_mensual_citas,
+        partial(_linea_mensual, tamano_marcador=8, nombre='Citas por Mes',
+                title='Tendencia Mensual de Citas Médicas',
+                xaxis_title='Mes', yaxis_title='Número de Citas', height=400),
+        _series_tendencia_mensual,
+    ),
+    'dashboard-citas-tipo': Grafico(
+        ServicioReporte.obtener_estadisticas_citas,
+        partial(_barras, colores=COLORES_TIPO_CITA, mostrar_texto=True,
+                title='Citas por Tipo de Consulta', xaxis_title='Tipo', yaxis_title='Cantidad', height=300),
+        _series_categorias,
+    ),
+    'dashboard-consultas-carrera': Grafico(
+        ServicioReporte.obtener_estadisticas_consultas_por_carrera,
+        partial(_torta, hueco=0.3, title='Consultas por Carrera', height=300),
+        _series_categorias,
+    ),
+    'dashboard-tendencia-mensual': Grafico(
+        ServicioReporte.obtener_tendencia_mensual_citas,
+        partial(_linea_mensual, tamano_marcador=6,
+                title='Tendencia Mensual', xaxis_title='Mes', yaxis_title='Citas', height=300),
+        _series_tendencia_mensual,
+    ),
+    'segmentacion-edad': Grafico(
+        partial(_segmentacion, 'por_edad'),
+        partial(_torta, hueco=0.4, colores=['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A'],
+                title='Segmentación por Edad', height=400),
+        _series_categorias,
+    ),
+    'segmentacion-tipo-consulta': Grafico(
+        partial(_segmentacion, 'por_tipo_consulta'),
+        partial(_barras, colores=['#28a745', '#17a2b8', '#dc3545', '#ffc107'],
+                title='Segmentación por Tipo de Consulta',
+                xaxis_title='Tipo de Consulta', yaxis_title='Número de Pacientes', height=400),
+        _series_categorias,
+    ),
+    'segmentacion-riesgo': Grafico(
+        partial(_segmentacion, 'por_riesgo'),
+        partial(_torta, hueco=0.3, colores=['#28a745', '#ffc107', '#fd7e14', '#dc3545'],
+                title='Segmentación por Nivel de Riesgo', height=400),
+        _series_categorias,
+    ),
+    'segmentacion-actividad': Grafico(
+        partial(_segmentacion, 'por_actividad'),
+        partial(_barras, colores=['#28a745', '#6c757d'],
+                title='Segmentación por Actividad',
+                xaxis_title='Tipo de Actividad', yaxis_title='Número de Pacientes', height=400),
+        _series_categorias,
+    ),
+    'prediccion-tendencia': Grafico(
+        partial(_prediccion, 'tendencia_citas'),
+        _tendencia_con_prediccion,
+        _series_tendencia_prediccion,
+    ),
+    'prediccion-patrones-semanales': Grafico(
+        partial(_prediccion, 'patrones_semanales'),
+        partial(_barras, colores=['#4ECDC4', '#45B7D1', '#FFA07A', '#FF6B6B', '#98D8C8', '#F7DC6F', '#BB8FCE'],
+                title='Patrones de Consulta por Día de la Semana',
+                xaxis_title='Día de la Semana', yaxis_title='Número de Consultas', height=400),
+        _series_categorias,
+    ),
+    'prediccion-demanda-tipo': Grafico(
+        partial(_prediccion, 'demanda_por_tipo'),
+        _demanda_por_tipo,
+        _series_demanda_por_tipo,
+    ),
+}
+
+
+# === CACHÉ DE PAYLOADS ===
+
+class PayloadGrafico:
+    """
+    JSON de un gráfico para unos datos concretos.
+
+    El ETag se conoce sin construir la figura; el cuerpo se lee de la caché
+    o se construye solo cuando se accede a él.
+
+    Atributos:
+        grafico_id (str): ID del gráfico
+        etag (str): Huella de los datos
+    """
+
+    def __init__(self, cache, grafico_id, datos, etag):
+        self._cache = cache
+        self._datos = datos
+        self.grafico_id = grafico_id
+        self.etag = etag
+
+    @property
+    def cuerpo(self):
+        """bytes: JSON de la figura (UTF-8)."""
+        return self._cache._cuerpo(self.grafico_id, self._datos, self.etag)
+
+    @property
+    def texto(self):
+        """str: JSON de la figura, para incrustarlo en una plantilla."""
+        return self.cuerpo.decode('utf-8')
+
+
+class CacheGraficos:
+    """
+    Caché del JSON serializado de los gráficos indexada por (ID, huella de datos).
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: BackendMemoriaLRU o BackendRedis (por defecto LRU en memoria)
+        """
+        self.backend = backend or BackendMemoriaLRU(MAX_GRAFICOS_POR_DEFECTO)
+        self.aciertos = 0
+        self.construcciones = 0
+
+    def configurar(self, app):
+        """
+        Comparte los payloads en Redis si la caché de reportes lo usa.
+
+        Args:
+            app (Flask): Aplicación con CACHE_REPORTES_URL
+        """
+        url = app.config.get('CACHE_REPORTES_URL')
+        if url:
+            self.backend = BackendRedis(url, prefijo='osiris:graficos:')
+        else:
+            self.backend = BackendMemoriaLRU(MAX_GRAFICOS_POR_DEFECTO)
+
+    def obtener(self, grafico_id):
+        """
+        Obtiene los datos del gráfico y su huella, sin construir la figura.
+
+        Args:
+            grafico_id (str): Clave de GRAFICOS
+
+        Returns:
+            PayloadGrafico: Payload del gráfico, o None si no hay datos
+
+        Raises:
+            KeyError: Si el gráfico no existe
+        """
+        datos = GRAFICOS[grafico_id].obtener_datos()
+        if not datos:
+            return None
+        return PayloadGrafico(self, grafico_id, datos, huella_datos(grafico_id, datos))
+
+    def json_grafico(self, grafico_id):
+        """
+        Retorna el JSON del gráfico como texto para una plantilla.
+
+        Returns:
+            str: JSON de la figura, o None si no hay datos
+        """
+        payload = self.obtener(grafico_id)
+        return payload.texto if payload else None
+
+    def _cuerpo(self, grafico_id, datos, huella):
+        """Lee el payload de la caché o construye y guarda la figura."""
+        clave = f'{grafico_id}:{huella}'
+        cuerpo = self.backend.obtener(clave)
+        if cuerpo is not None:
+            self.aciertos += 1
+            return cuerpo
+
+        cuerpo = figura_json(GRAFICOS[grafico_id].construir_figura(datos)).encode('utf-8')
+        self.backend.guardar(clave, cuerpo, TTL_GRAFICOS)
+        self.construcciones += 1
+        return cuerpo
+
+    def limpiar(self):
+        """Descarta todos los payloads."""
+        self.backend.limpiar()
+
+
+# Instancia única usada por las vistas de gráficos
+cache_graficos = CacheGraficos()
+
+
+def respuesta_grafico(grafico_id):
+    """
+    Respuesta JSON de un gráfico con ETag; 304 si el cliente ya lo tiene.
+
+    Args:
+        grafico_id (str): Clave de GRAFICOS
+
+    Returns:
+        Response: JSON de la figura, 304 sin cuerpo, o 404 si no hay datos
+
+    Raises:
+        KeyError: Si el gráfico no existe
+    """
+    payload = cache_graficos.obtener(grafico_id)
+    if payload is None:
+        return jsonify({'error': 'No hay datos para este gráfico'}), 404
+
+    if payload.etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        respuesta = Response(payload.cuerpo, mimetype='application/json')
+    respuesta.set_etag(payload.etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'  # Revalidar siempre: datos de administrador
+    return respuesta
+
+
+def respuesta_series(grafico_ids):
+    """
+    Respuesta JSON con las series compactas de uno o varios gráficos.
+
+    Solo se obtienen los datos agregados (cacheados por cache_reportes); no
+    se construye ninguna figura. El ETag combina las huellas de todos los
+    gráficos pedidos, así que una página entera se revalida con un 304.
+
+    Formato:
+        {"graficos": {"<id>": {"series": [{"etiquetas": [...], "valores": [...]}]}
+                      | null si no hay datos}}
+
+    Args:
+        grafico_ids (list[str]): Claves de GRAFICOS, sin repetir
+
+    Returns:
+        Response: JSON de las series, o 304 sin cuerpo
+
+    Raises:
+        KeyError: Si algún gráfico no existe
+    """
+    graficos = {}
+    huellas = []
+    for grafico_id in grafico_ids:
+        grafico = GRAFICOS[grafico_id]
+        datos = grafico.obtener_datos()
+        if datos:
+            graficos[grafico_id] = {'series': grafico.series(datos)}
+            huellas.append(huella_datos(grafico_id, datos))
+        else:
+            graficos[grafico_id] = None
+            huellas.append(f'{grafico_id}:vacio')
+    etag = hashlib.sha1('|'.join(huellas).encode('utf-8')).hexdigest()
+
+    if etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        respuesta = jsonify({'graficos': graficos})
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'  # Revalidar siempre: datos de administrador
+    return respuesta
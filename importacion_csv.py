@@ -0,0 +1,228 @@
+# ============================================================================
+# IMPORTACIÓN CSV EN BLOQUE
+# ============================================================================
+"""
+Importación de procedencias de pacientes desde CSV por lotes.
+
+El archivo se lee en lotes de TAMANO_LOTE filas. Para cada lote:
+
+1. Se validan las filas en memoria (clave presente, longitud de procedencia).
+2. Todas las claves del lote (codigo_matricula o nombre) se resuelven con
+   una sola consulta IN contra usuarios ⋈ pacientes.
+3. Las actualizaciones se aplican con un UPDATE por clave primaria en modo
+   executemany (bulk update del ORM) y se confirman en una transacción por
+   lote. Si el lote falla en la base de datos se revierte solo ese lote.
+
+Cada fila rechazada se informa con su número de línea. Así un archivo de
+50 000 filas cuesta ~100 consultas y ~100 commits, en lugar de dos o tres
+consultas y un commit por fila.
+
+Formato esperado (ver ejemplo_importacion_procedencia.csv):
+
+    nombre,codigo_matricula,procedencia
+"""
+
+import csv
+import io
+from itertools import islice
+from sqlalchemy import select, update, or_
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, Paciente  # Modelos de datos
+from cache_reportes import cache_reportes  # Invalidación de reportes por paciente
+
+# Filas procesadas por transacción (dos listas IN de este tamaño por consulta)
+TAMANO_LOTE = 500
+
+# Máximo de mensajes de error devueltos; el total se informa siempre
+MAX_ERRORES_REPORTADOS = 100
+
+# Longitud máxima de Paciente.procedencia
+LONGITUD_PROCEDENCIA = Paciente.__table__.c.procedencia.type.length
+
+
+def _abrir_origen(origen):
+    """
+    Retorna un flujo de texto a partir de una ruta o de un archivo abierto.
+
+    Los flujos binarios (p. ej. request.files[...].stream) se decodifican
+    como UTF-8; utf-8-sig descarta el BOM que agregan hojas de cálculo.
+    """
+    if isinstance(origen, str):
+        return open(origen, 'r', encoding='utf-8-sig', newline='')
+    if isinstance(origen, io.TextIOBase):
+        return origen
+    return io.TextIOWrapper(origen, encoding='utf-8-sig', newline='')
+
+
+def _validar_fila(fila):
+    """
+    Extrae (tipo de clave, clave, procedencia) de una fila del CSV.
+
+    Se usa codigo_matricula si la fila lo trae; si no, el nombre.
+
+    Returns:
+        tuple: (('codigo_matricula' | 'nombre', clave, procedencia), None) o
+            (None, mensaje de error)
+    """
+    codigo = (fila.get('codigo_matricula') or '').strip()
+    nombre = (fila.get('nombre') or '').strip()
+    procedencia = (fila.get('procedencia') or '').strip() or None  # Vacía = sin procedencia
+
+    if procedencia and len(procedencia) > LONGITUD_PROCEDENCIA:
+        return None, f'procedencia supera {LONGITUD_PROCEDENCIA} caracteres'
+    if codigo:
+        return ('codigo_matricula', codigo, procedencia), None
+    if nombre:
+        return ('nombre', nombre, procedencia), None
+    return None, 'falta codigo_matricula o nombre'
+
+
+def _resolver_claves(codigos, nombres):
+    """
+    Resuelve las claves de un lote a IDs de paciente con una sola consulta.
+
+    Args:
+        codigos (set[str]): Códigos de matrícula del lote
+        nombres (set[str]): Nombres del lote (para filas sin código)
+
+    Returns:
+        tuple: (codigo -> paciente_id, nombre -> [paciente_id, ...])
+    """
+    condiciones = []
+    if codigos:
+        condiciones.append(Usuario.codigo_matricula.in_(codigos))
+    if nombres:
+        condiciones.append(Usuario.nombre.in_(nombres))
+    if not condiciones:
+        return {}, {}
+
+    filas = db.session.execute(
+        select(Usuario.codigo_matricula, Usuario.nombre, Paciente.id)
+        .join(Paciente, Paciente.usuario_id == Usuario.id)
+        .where(or_(*condiciones))
+    ).all()
+
+    por_codigo = {}
+    por_nombre = {}
+    for codigo, nombre, paciente_id in filas:
+        if codigo in codigos:
+            por_codigo[codigo] = paciente_id
+        if nombre in nombres:
+            por_nombre.setdefault(nombre, []).append(paciente_id)
+    return por_codigo, por_nombre
+
+
+def _procesar_lote(lote, resultado):
+    """
+    Valida, resuelve y aplica un lote de filas en una transacción.
+
+    Args:
+        lote (list[tuple]): Pares (número de línea, fila del CSV)
+        resultado (dict): Acumulador de la importación (se modifica)
+    """
+    validas = []
+    for linea, fila in lote:
+        datos, error = _validar_fila(fila)
+        if error:
+            _registrar_error(resultado, linea, error)
+        else:
+            validas.append((linea, datos))
+
+    por_codigo, por_nombre = _resolver_claves(
+        {clave for _, (tipo, clave, _) in validas if tipo == 'codigo_matricula'},
+        {clave for _, (tipo, clave, _) in validas if tipo == 'nombre'},
+    )
+
+    # paciente_id -> procedencia (si un paciente se repite en el lote gana la última fila)
+    cambios = {}
+    for linea, (tipo, clave, procedencia) in validas:
+        if tipo == 'codigo_matricula':
+            paciente_id = por_codigo.get(clave)
+        else:
+            candidatos = por_nombre.get(clave, [])
+            if len(candidatos) > 1:
+                _registrar_error(resultado, linea, f"nombre '{clave}' ambiguo ({len(candidatos)} pacientes)")
+                continue
+            paciente_id = candidatos[0] if candidatos else None
+
+        if paciente_id is None:
+            _registrar_error(resultado, linea, f"no existe paciente con {tipo} '{clave}'")
+            continue
+        cambios[paciente_id] = procedencia
+
+    if not cambios:
+        return
+
+    try:
+        db.session.execute(
+            update(Paciente),
+            [{'id': paciente_id, 'procedencia': procedencia} for paciente_id, procedencia in cambios.items()],
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _registrar_error(resultado, lote[0][0], f'lote hasta la línea {lote[-1][0]} revertido: {str(e)}')
+        return
+
+    resultado['registros_procesados'] += len(cambios)
+
+
+def _registrar_error(resultado, linea, mensaje):
+    """Cuenta un error y guarda su mensaje si no se superó el máximo."""
+    resultado['total_errores'] += 1
+    if len(resultado['errores']) < MAX_ERRORES_REPORTADOS:
+        resultado['errores'].append(f'Error en fila {linea}: {mensaje}')
+
+
+def importar_procedencias(origen, tamano_lote=TAMANO_LOTE):
+    """
+    Importa procedencias de pacientes desde un CSV por lotes.
+
+    Args:
+        origen: Ruta del archivo, flujo de texto o flujo binario (upload)
+        tamano_lote (int): Filas por consulta y por transacción
+
+    Returns:
+        dict: exitoso, filas_leidas, registros_procesados (pacientes
+            actualizados), total_errores y errores (primeros mensajes)
+    """
+    resultado = {
+        'exitoso': False,
+        'filas_leidas': 0,
+        'registros_procesados': 0,
+        'total_errores': 0,
+        'errores': [],
+    }
+
+    try:
+        archivo = _abrir_origen(origen)
+        try:
+            lector = csv.DictReader(archivo)
+            columnas = set(lector.fieldnames or [])
+            if 'procedencia' not in columnas or not columnas & {'codigo_matricula', 'nombre'}:
+                resultado['errores'].append(
+                    'El CSV debe tener la columna procedencia y codigo_matricula o nombre'
+                )
+                resultado['total_errores'] = 1
+                return resultado
+
+            # Cada fila se acompaña de la línea en la que termina en el archivo
+            filas = ((lector.line_num, fila) for fila in lector)
+            while True:
+                lote = list(islice(filas, tamano_lote))
+                if not lote:
+                    break
+                resultado['filas_leidas'] += len(lote)
+                _procesar_lote(lote, resultado)
+        finally:
+            if archivo is not origen:
+                archivo.close()
+        resultado['exitoso'] = True
+
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        resultado['errores'].append(f'Error al leer archivo: {str(e)}')
+        resultado['total_errores'] += 1
+
+    if resultado['registros_procesados']:
+        cache_reportes.invalidar('pacientes')  # Los reportes de procedencia quedan obsoletos
+    return resultado
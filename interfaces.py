@@ -45,6 +45,11 @@ class IRepositorioUsuario(ABC):
         """Obtiene un usuario por su código de matrícula"""
         pass
     
+    @abstractmethod
+    def obtener_por_identificador(self, identificador: str) -> Optional[Any]:
+        """Obtiene un usuario por DNI o código de matrícula en una sola búsqueda"""
+        pass
+    
     @abstractmethod
     def guardar(self, usuario: Any) -> Any:
         """Guarda un usuario en el repositorio"""
@@ -132,8 +137,8 @@ class IServicioAutenticacion(ABC):
     """
     
     @abstractmethod
-    def autenticar(self, identificador: str, password: str) -> Optional[Any]:
-        """Autentica un usuario con sus credenciales"""
+    def autenticar(self, identificador: str, password: str, ip: Optional[str] = None) -> Optional[Any]:
+        """Autentica un usuario con sus credenciales (ip para el límite de intentos)"""
         pass
     
     @abstractmethod
@@ -1,5 +1,10 @@
 from app import app
 
 if __name__ == '__main__':
+    # En desarrollo el esquema se prepara al arrancar; en producción: flask --app main inicializar-bd
+    from migraciones import inicializar_base_datos
+    with app.app_context():
+        inicializar_base_datos()
+
     # La aplicación se ejecuta en modo debug en puerto 5000
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,294 @@
+# ============================================================================
+# MIGRACIONES VERSIONADAS DEL ESQUEMA
+# ============================================================================
+"""
+Migraciones versionadas del esquema de base de datos.
+
+Cada migración es una función que recibe una conexión abierta dentro de una
+transacción. Las versiones aplicadas se registran en la tabla
+`version_esquema`, de modo que cada migración se ejecuta una sola vez por
+base de datos y en orden.
+
+Convención: la migración 1 crea las tablas a partir de los modelos actuales,
+por lo que en una base de datos nueva las migraciones posteriores encuentran
+sus cambios ya aplicados. Toda migración debe ser idempotente (usar
+IF NOT EXISTS / comprobaciones previas) para funcionar en ambos casos.
+
+La aplicación no toca el esquema al importarse: `main:app` arranca sin
+consultas y el despliegue ejecuta una vez `flask inicializar-bd` antes de
+levantar los workers (`python main.py` lo hace solo en desarrollo).
+
+Uso:
+    flask --app main inicializar-bd      # Migraciones + administrador inicial
+    flask --app main migrar              # Aplica las migraciones pendientes
+    flask --app main migrar --estado     # Muestra la versión actual
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import text  # Sentencias DDL explícitas
+from app import db  # Instancia de la base de datos
+
+
+def _migracion_esquema_inicial(conexion):
+    """Crea las tablas de los modelos que aún no existan."""
+    import modelos  # noqa: F401  (registra los modelos en los metadatos)
+    db.metadata.create_all(conexion, checkfirst=True)
+
+
+def _migracion_indices_secundarios(conexion):
+    """Crea los índices compuestos y de cobertura declarados en modelos.py."""
+    indices = [
+        'CREATE INDEX IF NOT EXISTS ix_usuarios_rol_activo ON usuarios (rol, activo)',
+        'CREATE INDEX IF NOT EXISTS ix_usuarios_activo ON usuarios (activo)',
+        'CREATE INDEX IF NOT EXISTS ix_pacientes_usuario_id ON pacientes (usuario_id)',
+        'CREATE INDEX IF NOT EXISTS ix_pacientes_carrera ON pacientes (carrera)',
+        'CREATE INDEX IF NOT EXISTS ix_pacientes_procedencia ON pacientes (procedencia)',
+        'CREATE INDEX IF NOT EXISTS ix_pacientes_fecha_nacimiento ON pacientes (fecha_nacimiento)',
+        'CREATE INDEX IF NOT EXISTS ix_citas_profesional_fecha ON citas (profesional_id, fecha, hora)',
+        'CREATE INDEX IF NOT EXISTS ix_citas_paciente_fecha ON citas (paciente_id, fecha)',
+        'CREATE INDEX IF NOT EXISTS ix_citas_fecha_hora ON citas (fecha, hora, id)',
+        'CREATE INDEX IF NOT EXISTS ix_citas_tipo_fecha ON citas (tipo_cita, fecha)',
+        'CREATE INDEX IF NOT EXISTS ix_citas_fecha_creacion ON citas (fecha_creacion)',
+        'CREATE INDEX IF NOT EXISTS ix_consultas_cita_riesgo ON consultas (cita_id, nivel_riesgo)',
+        'CREATE INDEX IF NOT EXISTS ix_consultas_nivel_riesgo ON consultas (nivel_riesgo)',
+        'CREATE INDEX IF NOT EXISTS ix_consultas_fecha ON consultas (fecha_consulta, id)',
+    ]
+    for sentencia in indices:
+        conexion.execute(text(sentencia))
+
+
+def _migracion_resumen_diario(conexion):
+    """Crea la tabla resumen_diario_citas y la llena desde las tablas base."""
+    from modelos import ResumenDiarioCitas
+    from resumen_diario import reconstruir_resumen_diario
+    ResumenDiarioCitas.__table__.create(conexion, checkfirst=True)
+    conexion.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_resumen_diario_clave ON resumen_diario_citas '
+        '(dia, tipo_cita, profesional_id, carrera, nivel_riesgo, estado)'
+    ))
+    reconstruir_resumen_diario(conexion)
+
+
+def _migracion_reserva_franjas(conexion):
+    """
+    Crea el índice único de horarios por profesional y la agenda diaria.
+
+    Falla sin cambios si ya hay citas activas duplicadas: deben cancelarse
+    las sobrantes antes de volver a ejecutar la migración.
+    """
+    from modelos import AgendaDiaria
+    from agenda_profesionales import reconstruir_agenda
+    duplicados = conexion.execute(text(
+        "SELECT profesional_id, fecha, hora, COUNT(*) FROM citas WHERE estado <> 'CANCELADA' "
+        'GROUP BY profesional_id, fecha, hora HAVING COUNT(*) > 1 ORDER BY fecha, hora LIMIT 20'
+    )).all()
+    if duplicados:
+        detalle = '; '.join(f'profesional {p} el {f} a las {h} ({n} citas)' for p, f, h, n in duplicados)
+        raise RuntimeError(f'Hay citas activas duplicadas, cancele las sobrantes y reintente: {detalle}')
+
+    conexion.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_citas_profesional_fecha_hora ON citas '
+        "(profesional_id, fecha, hora) WHERE estado <> 'CANCELADA'"
+    ))
+    AgendaDiaria.__table__.create(conexion, checkfirst=True)
+    reconstruir_agenda(conexion)
+
+
+def _migracion_prefijo_nombre(conexion):
+    """
+    Crea el índice de búsqueda por prefijo del nombre de usuario.
+
+    SQLite solo usa un índice para LIKE 'abc%' (que no distingue mayúsculas)
+    si el índice tiene intercalación NOCASE; en PostgreSQL se indexa
+    lower(nombre) con text_pattern_ops para LIKE con cualquier intercalación.
+    """
+    if conexion.dialect.name == 'postgresql':
+        sentencia = ('CREATE INDEX IF NOT EXISTS ix_usuarios_nombre_prefijo ON usuarios '
+                     '(lower(nombre) text_pattern_ops)')
+    else:
+        sentencia = 'CREATE INDEX IF NOT EXISTS ix_usuarios_nombre_prefijo ON usuarios (nombre COLLATE NOCASE)'
+    conexion.execute(text(sentencia))
+
+
+def _migracion_busqueda_trigramas(conexion):
+    """
+    Crea los índices de trigramas de la búsqueda de pacientes (solo PostgreSQL).
+
+    Requiere la extensión pg_trgm (confiable desde PostgreSQL 13: la puede
+    crear el dueño de la base). Las expresiones deben coincidir con las de
+    busqueda_pacientes._plegado para que el planificador use los índices.
+    En SQLite la búsqueda usa un índice en memoria y no hay nada que crear.
+    """
+    if conexion.dialect.name != 'postgresql':
+        return
+    from busqueda_pacientes import _ACENTOS, _SIN_ACENTOS
+    conexion.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    for nombre, tabla, columna in (
+        ('ix_usuarios_nombre_trgm', 'usuarios', 'nombre'),
+        ('ix_pacientes_carrera_trgm', 'pacientes', 'carrera'),
+        ('ix_pacientes_procedencia_trgm', 'pacientes', 'procedencia'),
+    ):
+        conexion.execute(text(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin '
+            f"(translate(lower({columna}), '{_ACENTOS}', '{_SIN_ACENTOS}') gin_trgm_ops)"
+        ))
+
+
+def _migracion_resumen_mensual(conexion):
+    """Crea la tabla resumen_mensual_citas y la llena desde el resumen diario."""
+    from modelos import ResumenMensualCitas
+    from resumen_diario import reconstruir_resumen_mensual
+    ResumenMensualCitas.__table__.create(conexion, checkfirst=True)
+    conexion.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_resumen_mensual_clave ON resumen_mensual_citas '
+        '(mes, tipo_cita, carrera, nivel_riesgo, estado)'
+    ))
+    reconstruir_resumen_mensual(conexion)
+
+
+def _migracion_quitar_prefijo_nombre(conexion):
+    """
+    Elimina el índice de prefijo del nombre de la migración 5.
+
+    La búsqueda al teclear del formulario de citas pasó a usar la búsqueda
+    por relevancia (busqueda_pacientes) y ninguna consulta filtra ya por
+    prefijo del nombre; el índice solo encarecía las escrituras en usuarios.
+    """
+    conexion.execute(text('DROP INDEX IF EXISTS ix_usuarios_nombre_prefijo'))
+
+
+# Lista ordenada de migraciones: (versión, descripción, función)
+# Las versiones nunca se reutilizan ni se reordenan una vez publicadas.
+MIGRACIONES = [
+    (1, 'Esquema inicial', _migracion_esquema_inicial),
+    (2, 'Índices secundarios en usuarios, pacientes, citas y consultas', _migracion_indices_secundarios),
+    (3, 'Resumen diario materializado de citas y consultas', _migracion_resumen_diario),
+    (4, 'Índice único de horarios por profesional y agenda diaria', _migracion_reserva_franjas),
+    (5, 'Índice de búsqueda por prefijo del nombre de usuario', _migracion_prefijo_nombre),
+    (6, 'Índices de trigramas para la búsqueda de pacientes', _migracion_busqueda_trigramas),
+    (7, 'Resumen mensual materializado de citas y consultas', _migracion_resumen_mensual),
+    (8, 'Elimina el índice de búsqueda por prefijo del nombre de usuario', _migracion_quitar_prefijo_nombre),
+]
+
+
+def _asegurar_tabla_versiones(conexion):
+    """Crea la tabla de control de versiones si no existe."""
+    conexion.execute(text(
+        'CREATE TABLE IF NOT EXISTS version_esquema ('
+        ' version INTEGER PRIMARY KEY,'
+        ' descripcion VARCHAR(200) NOT NULL,'
+        ' fecha_aplicacion TIMESTAMP NOT NULL)'
+    ))
+
+
+def obtener_versiones_aplicadas():
+    """
+    Obtiene las versiones de migración ya aplicadas.
+
+    Returns:
+        list[int]: Versiones registradas en version_esquema, en orden ascendente
+    """
+    with db.engine.begin() as conexion:
+        _asegurar_tabla_versiones(conexion)
+        filas = conexion.execute(text('SELECT version FROM version_esquema ORDER BY version'))
+        return [fila[0] for fila in filas]
+
+
+def aplicar_migraciones():
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción.
+
+    Returns:
+        list[int]: Versiones aplicadas en esta llamada
+    """
+    aplicadas = set(obtener_versiones_aplicadas())
+    nuevas = []
+
+    for version, descripcion, migracion in MIGRACIONES:
+        if version in aplicadas:
+            continue
+        with db.engine.begin() as conexion:
+            migracion(conexion)
+            conexion.execute(
+                text('INSERT INTO version_esquema (version, descripcion, fecha_aplicacion) '
+                     'VALUES (:version, :descripcion, :fecha)'),
+                {'version': version, 'descripcion': descripcion, 'fecha': datetime.utcnow()}
+            )
+        logging.info(f'Migración {version} aplicada: {descripcion}')
+        nuevas.append(version)
+
+    return nuevas
+
+
+def crear_administrador_inicial():
+    """
+    Crea el administrador por defecto (DNI 12345678) si aún no existe.
+
+    Returns:
+        bool: True si se creó el administrador
+    """
+    from werkzeug.security import generate_password_hash
+    from modelos import Usuario, RolUsuario
+
+    if Usuario.query.filter_by(dni='12345678').first():
+        return False
+
+    admin = Usuario()
+    admin.nombre = 'DENIS ADMIN'
+    admin.dni = '12345678'
+    admin.rol = RolUsuario.ADMINISTRADOR
+    admin.password_hash = generate_password_hash('admin123')
+    db.session.add(admin)
+    db.session.commit()
+
+    try:
+        from respaldo_usuarios import ServicioRespaldoCSV
+        ServicioRespaldoCSV.guardar_usuario_en_csv(admin)
+        logging.info('Usuario administrador creado y guardado en CSV: DNI=12345678, Contraseña=admin123')
+    except Exception as e:
+        logging.error(f'Usuario administrador creado: DNI=12345678, Contraseña=admin123 (Error CSV: {e})')
+    return True
+
+
+def inicializar_base_datos():
+    """
+    Deja la base de datos lista para servir: aplica las migraciones
+    pendientes y crea el administrador inicial. Es idempotente.
+
+    Returns:
+        tuple: (versiones aplicadas, si se creó el administrador)
+    """
+    nuevas = aplicar_migraciones()
+    return nuevas, crear_administrador_inicial()
+
+
+def registrar_comandos(app):
+    """Registra los comandos `flask migrar` y `flask inicializar-bd` en la aplicación."""
+    import click
+
+    @app.cli.command('inicializar-bd')
+    def comando_inicializar_bd():
+        """Aplica las migraciones y crea el administrador inicial."""
+        nuevas, admin_creado = inicializar_base_datos()
+        click.echo(f'Migraciones aplicadas: {", ".join(map(str, nuevas))}' if nuevas
+                   else 'El esquema ya está actualizado.')
+        if admin_creado:
+            click.echo('Administrador inicial creado (DNI 12345678).')
+
+    @app.cli.command('migrar')
+    @click.option('--estado', is_flag=True, help='Solo mostrar las versiones aplicadas y pendientes.')
+    def comando_migrar(estado):
+        """Aplica las migraciones pendientes del esquema."""
+        if estado:
+            aplicadas = obtener_versiones_aplicadas()
+            for version, descripcion, _ in MIGRACIONES:
+                marca = 'aplicada ' if version in aplicadas else 'pendiente'
+                click.echo(f'[{marca}] {version}: {descripcion}')
+            return
+
+        nuevas = aplicar_migraciones()
+        if nuevas:
+            click.echo(f'Migraciones aplicadas: {", ".join(map(str, nuevas))}')
+        else:
+            click.echo('El esquema ya está actualizado.')
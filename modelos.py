@@ -32,7 +32,7 @@ DIP: Los modelos dependen de abstracciones:
 from datetime import datetime, date  # Para manejo de fechas y tiempos
 from enum import Enum  # Para crear enumeraciones con valores fijos
 from flask_login import UserMixin  # Mixin que proporciona métodos necesarios para Flask-Login
-from sqlalchemy import Column, Integer, String, DateTime, Date, Text, ForeignKey, Enum as SQLEnum  # Tipos de datos de SQLAlchemy
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, Text, ForeignKey, Index, Enum as SQLEnum, text  # Tipos de datos de SQLAlchemy
 from sqlalchemy.orm import relationship  # Para definir relaciones entre modelos
 from app import db  # Instancia de la base de datos desde la aplicación principal
 
@@ -120,6 +120,17 @@ class Usuario(UserMixin, db.Model):
     # Nombre de la tabla en la base de datos
     __tablename__ = 'usuarios'
     
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante la migración 2 de migraciones.py
+    __table_args__ = (
+        # Filtros por rol y estado (profesionales activos, usuarios inactivos)
+        Index('ix_usuarios_rol_activo', 'rol', 'activo'),
+        Index('ix_usuarios_activo', 'activo'),
+        # Búsqueda de pacientes en PostgreSQL: ix_usuarios_nombre_trgm (migración 6,
+        # ver busqueda_pacientes.py); el índice de prefijo de la migración 5 se
+        # eliminó en la migración 8
+    )
+    
     # === CAMPOS DE LA TABLA ===
     
     # Campo ID: Clave primaria autoincremental única para cada usuario
@@ -232,6 +243,20 @@ class Paciente(db.Model):
     # Nombre de la tabla en la base de datos
     __tablename__ = 'pacientes'
     
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante la migración 2 de migraciones.py
+    __table_args__ = (
+        # JOIN Paciente -> Usuario usado por todas las listas de pacientes
+        Index('ix_pacientes_usuario_id', 'usuario_id'),
+        # Agrupaciones de reportes por carrera y procedencia
+        Index('ix_pacientes_carrera', 'carrera'),
+        Index('ix_pacientes_procedencia', 'procedencia'),
+        # Búsqueda por similitud en PostgreSQL: ix_pacientes_carrera_trgm e
+        # ix_pacientes_procedencia_trgm (migración 6, ver busqueda_pacientes.py)
+        # Segmentación por rangos de edad
+        Index('ix_pacientes_fecha_nacimiento', 'fecha_nacimiento'),
+    )
+    
     # === CAMPOS DE LA TABLA ===
     
     # Campo ID: Clave primaria autoincremental única para cada paciente
@@ -330,6 +355,25 @@ class Cita(db.Model):
     # Nombre de la tabla en la base de datos
     __tablename__ = 'citas'
     
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante las migraciones 2 y 4 de migraciones.py
+    __table_args__ = (
+        # Agenda del profesional ordenada por fecha (listas, rendimiento, disponibilidad)
+        Index('ix_citas_profesional_fecha', 'profesional_id', 'fecha', 'hora'),
+        # Un profesional no puede tener dos citas activas a la misma fecha y hora
+        # (las canceladas liberan el horario)
+        Index('uq_citas_profesional_fecha_hora', 'profesional_id', 'fecha', 'hora', unique=True,
+              sqlite_where=text("estado <> 'CANCELADA'"), postgresql_where=text("estado <> 'CANCELADA'")),
+        # Historial del paciente ordenado por fecha
+        Index('ix_citas_paciente_fecha', 'paciente_id', 'fecha'),
+        # Rangos de fechas y paginación por (fecha, hora, id)
+        Index('ix_citas_fecha_hora', 'fecha', 'hora', 'id'),
+        # Conteos por tipo de cita (cubre GROUP BY tipo_cita con filtro de fecha)
+        Index('ix_citas_tipo_fecha', 'tipo_cita', 'fecha'),
+        # Última cita registrada (configuración del sistema)
+        Index('ix_citas_fecha_creacion', 'fecha_creacion'),
+    )
+    
     # === CAMPOS DE LA TABLA ===
     
     # Campo ID: Clave primaria autoincremental única para cada cita
@@ -424,6 +468,17 @@ class Consulta(db.Model):
     # Nombre de la tabla en la base de datos
     __tablename__ = 'consultas'
     
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante la migración 2 de migraciones.py
+    __table_args__ = (
+        # JOIN Consulta -> Cita; incluye nivel_riesgo para cubrir los promedios de riesgo
+        Index('ix_consultas_cita_riesgo', 'cita_id', 'nivel_riesgo'),
+        # Conteos y filtros por nivel de riesgo
+        Index('ix_consultas_nivel_riesgo', 'nivel_riesgo'),
+        # Paginación por (fecha_consulta, id)
+        Index('ix_consultas_fecha', 'fecha_consulta', 'id'),
+    )
+    
     # === CAMPOS DE LA TABLA ===
     
     # Campo ID: Clave primaria autoincremental única para cada consulta
@@ -481,3 +536,154 @@ class Consulta(db.Model):
             bool: True si el nivel de riesgo es ALTO o CRITICO, False en caso contrario
         """
         return self.nivel_riesgo in [NivelRiesgo.ALTO, NivelRiesgo.CRITICO]
+
+class ResumenDiarioCitas(db.Model):
+    """
+    Resumen diario materializado de citas y consultas para el dashboard.
+    
+    Cada fila acumula cuántas citas (y cuántas de ellas tienen consulta
+    registrada) comparten la misma combinación de día, tipo de cita,
+    profesional, carrera del paciente, nivel de riesgo y estado. Los
+    reportes del dashboard suman estas filas en lugar de recorrer las
+    tablas de citas y consultas completas.
+    
+    Características:
+    - Se mantiene de forma incremental desde los servicios de escritura
+      (ver resumen_diario.py)
+    - Puede reconstruirse por completo con `flask resumen-diario --reconstruir`
+    - Una misma clave puede repetirse en varias filas; los lectores siempre
+      agregan con SUM, por lo que el resultado no cambia
+    """
+    
+    # Nombre de la tabla en la base de datos
+    __tablename__ = 'resumen_diario_citas'
+    
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante la migración 3 de migraciones.py
+    __table_args__ = (
+        # Búsqueda de la fila a incrementar y rangos de días
+        Index('ix_resumen_diario_clave', 'dia', 'tipo_cita', 'profesional_id', 'carrera', 'nivel_riesgo', 'estado'),
+    )
+    
+    # === CAMPOS DE LA TABLA ===
+    
+    # Campo ID: Clave primaria autoincremental
+    id = Column(Integer, primary_key=True)
+    
+    # === CLAVE DEL RESUMEN ===
+    
+    # Campo dia: Fecha programada de las citas agregadas
+    dia = Column(Date, nullable=False)
+    
+    # Campo tipo_cita: Tipo de las citas agregadas
+    tipo_cita = Column(SQLEnum(TipoCita), nullable=False)
+    
+    # Campo profesional_id: Profesional que atiende las citas agregadas
+    profesional_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    
+    # Campo carrera: Carrera del paciente de las citas agregadas
+    carrera = Column(String(100), nullable=False)
+    
+    # Campo nivel_riesgo: Nivel de riesgo de la consulta (nulo si no hay consulta)
+    nivel_riesgo = Column(SQLEnum(NivelRiesgo), nullable=True)
+    
+    # Campo estado: Estado de las citas agregadas
+    estado = Column(String(20), nullable=True)
+    
+    # === CONTADORES ===
+    
+    # Campo total_citas: Número de citas con esta clave
+    total_citas = Column(Integer, nullable=False, default=0)
+    
+    # Campo total_consultas: Número de esas citas con consulta registrada
+    total_consultas = Column(Integer, nullable=False, default=0)
+
+class ResumenMensualCitas(db.Model):
+    """
+    Resumen mensual materializado de citas y consultas para el dashboard.
+    
+    Misma información que ResumenDiarioCitas plegada por mes y sin el
+    profesional: cada fila acumula las citas de un mes con la misma
+    combinación de tipo de cita, carrera del paciente, nivel de riesgo y
+    estado. Los widgets que agregan todo el historial la recorren en lugar
+    del resumen diario, de modo que su costo crece con el número de meses y
+    no con el de días por profesional.
+    
+    Características:
+    - Se mantiene junto con el resumen diario (ver resumen_diario.py)
+    - Puede reconstruirse con `flask resumen-diario --reconstruir`
+    - Como en el resumen diario, los lectores siempre agregan con SUM
+    """
+    
+    # Nombre de la tabla en la base de datos
+    __tablename__ = 'resumen_mensual_citas'
+    
+    # === ÍNDICES SECUNDARIOS ===
+    # Se crean mediante la migración 7 de migraciones.py
+    __table_args__ = (
+        # Búsqueda de la fila a incrementar y rangos de meses
+        Index('ix_resumen_mensual_clave', 'mes', 'tipo_cita', 'carrera', 'nivel_riesgo', 'estado'),
+    )
+    
+    # === CAMPOS DE LA TABLA ===
+    
+    # Campo ID: Clave primaria autoincremental
+    id = Column(Integer, primary_key=True)
+    
+    # === CLAVE DEL RESUMEN ===
+    
+    # Campo mes: Primer día del mes de las citas agregadas
+    mes = Column(Date, nullable=False)
+    
+    # Campo tipo_cita: Tipo de las citas agregadas
+    tipo_cita = Column(SQLEnum(TipoCita), nullable=False)
+    
+    # Campo carrera: Carrera del paciente de las citas agregadas
+    carrera = Column(String(100), nullable=False)
+    
+    # Campo nivel_riesgo: Nivel de riesgo de la consulta (nulo si no hay consulta)
+    nivel_riesgo = Column(SQLEnum(NivelRiesgo), nullable=True)
+    
+    # Campo estado: Estado de las citas agregadas
+    estado = Column(String(20), nullable=True)
+    
+    # === CONTADORES ===
+    
+    # Campo total_citas: Número de citas con esta clave
+    total_citas = Column(Integer, nullable=False, default=0)
+    
+    # Campo total_consultas: Número de esas citas con consulta registrada
+    total_consultas = Column(Integer, nullable=False, default=0)
+    
+class AgendaDiaria(db.Model):
+    """
+    Índice de disponibilidad de cada profesional por día.
+    
+    Cada fila guarda en un entero de 64 bits qué franjas de 30 minutos del
+    día tienen una cita activa (bit i = franja que empieza en i * 30
+    minutos). La reserva de una franja es un UPDATE condicional sobre esta
+    fila, que además sirve de bloqueo: dos reservas del mismo profesional y
+    día se serializan sin recorrer la tabla de citas.
+    
+    Características:
+    - Se mantiene desde ServicioCita al crear, cancelar o reactivar citas
+      (ver agenda_profesionales.py)
+    - Puede reconstruirse por completo con `flask agenda --reconstruir`
+    - Las citas canceladas no ocupan franjas
+    """
+    
+    # Nombre de la tabla en la base de datos
+    __tablename__ = 'agenda_diaria'
+    
+    # === CLAVE ===
+    
+    # Campo profesional_id: Profesional dueño de la agenda
+    profesional_id = Column(Integer, ForeignKey('usuarios.id'), primary_key=True)
+    
+    # Campo dia: Día de la agenda
+    dia = Column(Date, primary_key=True)
+    
+    # === OCUPACIÓN ===
+    
+    # Campo franjas_ocupadas: Mapa de bits de las franjas con cita activa
+    franjas_ocupadas = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,128 @@
+# ============================================================================
+# MONITOR DE CONSULTAS SQL
+# ============================================================================
+"""
+Utilidades para contar las sentencias SQL que emite SQLAlchemy.
+
+Se usan en los benchmarks para verificar que el número de consultas de los
+servicios se mantiene constante al crecer el volumen de datos, y en pruebas
+para imponer un presupuesto máximo de consultas por plantilla renderizada
+(detecta cargas perezosas N+1 introducidas en las vistas).
+"""
+
+from flask import g, before_render_template, template_rendered  # Señales de renderizado de Flask
+from sqlalchemy import event  # Sistema de eventos de SQLAlchemy
+from app import db  # Instancia de la base de datos
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Se lanza cuando un bloque o una plantilla emite más consultas de las permitidas."""
+
+
+class ContadorConsultas:
+    """
+    Context manager que cuenta las sentencias ejecutadas sobre el engine.
+
+    Ejemplo:
+        with ContadorConsultas() as contador:
+            ServicioReporte.obtener_rendimiento_profesionales()
+        print(contador.total)
+    """
+
+    def __init__(self, engine=None):
+        """
+        Args:
+            engine: Engine a monitorear (por defecto db.engine de la aplicación)
+        """
+        self._engine = engine
+        self.total = 0  # Número de sentencias ejecutadas
+        self.sentencias = []  # Texto SQL de cada sentencia
+        self.parametros = []  # Parámetros de cada sentencia (mismo orden)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        """Callback de SQLAlchemy invocado antes de cada ejecución."""
+        self.total += 1
+        self.sentencias.append(statement)
+        self.parametros.append(parameters)
+
+    def __enter__(self):
+        if self._engine is None:
+            self._engine = db.engine
+        event.listen(self._engine, 'before_cursor_execute', self._registrar)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self._engine, 'before_cursor_execute', self._registrar)
+        return False
+
+
+class PresupuestoConsultas(ContadorConsultas):
+    """
+    Context manager que falla si el bloque emite más consultas que el máximo.
+
+    Ejemplo:
+        with PresupuestoConsultas(2):
+            ServicioCita.obtener_citas(perfil='lista_citas')
+    """
+
+    def __init__(self, maximo, engine=None, descripcion='bloque'):
+        """
+        Args:
+            maximo (int): Número máximo de sentencias permitidas
+            engine: Engine a monitorear (por defecto db.engine de la aplicación)
+            descripcion (str): Texto usado en el mensaje de error
+        """
+        super().__init__(engine)
+        self.maximo = maximo
+        self.descripcion = descripcion
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if exc_type is None and self.total > self.maximo:
+            raise PresupuestoConsultasExcedido(
+                f"{self.descripcion} emitió {self.total} consultas SQL "
+                f"(presupuesto: {self.maximo})"
+            )
+        return False
+
+
+def activar_presupuesto_plantillas(app, presupuestos=None, por_defecto=None):
+    """
+    Impone un presupuesto de consultas SQL a cada render_template de la aplicación.
+
+    Pensado para pruebas: cuenta las consultas emitidas mientras se renderiza
+    una plantilla (incluidas las cargas perezosas de relaciones) y lanza
+    PresupuestoConsultasExcedido si supera el límite configurado. El contador
+    escucha el engine completo, por lo que debe usarse con un solo hilo.
+
+    Args:
+        app (Flask): Aplicación a instrumentar
+        presupuestos (dict, opcional): Nombre de plantilla -> máximo de consultas.
+            Por defecto se toma de app.config['PRESUPUESTO_CONSULTAS_PLANTILLAS']
+        por_defecto (int, opcional): Máximo para plantillas sin entrada propia;
+            None deja sin límite esas plantillas
+    """
+    if presupuestos is None:
+        presupuestos = app.config.get('PRESUPUESTO_CONSULTAS_PLANTILLAS', {})
+
+    def iniciar(sender, template, context, **extra):
+        maximo = presupuestos.get(template.name, por_defecto)
+        if maximo is None:
+            return
+        presupuesto = PresupuestoConsultas(maximo, descripcion=f"La plantilla '{template.name}'")
+        g._presupuesto_plantilla = presupuesto.__enter__()
+
+    def verificar(sender, template, context, **extra):
+        presupuesto = g.pop('_presupuesto_plantilla', None)
+        if presupuesto is not None:
+            presupuesto.__exit__(None, None, None)
+
+    def limpiar(exc):
+        # Si el renderizado falló, retirar el listener pendiente
+        presupuesto = g.pop('_presupuesto_plantilla', None)
+        if presupuesto is not None:
+            ContadorConsultas.__exit__(presupuesto, None, None, None)
+
+    before_render_template.connect(iniciar, app, weak=False)
+    template_rendered.connect(verificar, app, weak=False)
+    app.teardown_request(limpiar)
@@ -0,0 +1,184 @@
+# ============================================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ============================================================================
+"""
+Paginación por cursor sobre las claves de ordenamiento de cada lista.
+
+A diferencia de LIMIT/OFFSET, la página siguiente se obtiene filtrando por
+la última clave vista ((fecha, hora, id) < (...)), de modo que la página N
+cuesta lo mismo que la primera y solo se materializan `limite` filas por
+solicitud, sin importar el tamaño de la tabla.
+
+El cursor es un token opaco (base64 de JSON) con los valores de las claves
+de ordenamiento de la última fila de la página.
+"""
+
+import base64
+import json
+import logging
+from datetime import date, datetime, time  # Tipos de las claves de ordenamiento
+from sqlalchemy import tuple_, literal  # Comparación de filas (row values)
+from sqlalchemy import Date, DateTime, Time, Integer, Float, Numeric  # Tipos de columna para decodificar el cursor
+
+# Tamaño de página por defecto y máximo permitido desde la URL
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+class PaginaKeyset:
+    """
+    Resultado de una consulta paginada por cursor.
+
+    Atributos:
+        items (list): Filas de la página actual
+        cursor_actual (str): Cursor con el que se obtuvo la página (None = primera)
+        cursor_siguiente (str): Cursor para la página siguiente (None si es la última)
+        limite (int): Tamaño de página aplicado
+    """
+
+    def __init__(self, items, cursor_actual, cursor_siguiente, limite):
+        self.items = items
+        self.cursor_actual = cursor_actual
+        self.cursor_siguiente = cursor_siguiente
+        self.limite = limite
+
+    @property
+    def hay_siguiente(self):
+        """True si existen más filas después de esta página."""
+        return self.cursor_siguiente is not None
+
+    @property
+    def es_primera(self):
+        """True si la página se obtuvo sin cursor."""
+        return self.cursor_actual is None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _serializar_valor(valor):
+    """Convierte fechas y horas a texto ISO para incluirlas en el cursor."""
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _deserializar_valor(valor, columna):
+    """
+    Convierte un valor del cursor al tipo Python de la columna.
+
+    Raises:
+        TypeError, ValueError: Si el valor no corresponde al tipo de la columna
+    """
+    if valor is None:
+        return None
+    tipo = columna.type
+    if isinstance(tipo, (DateTime, Date, Time)):
+        if not isinstance(valor, str):
+            raise TypeError(f"se esperaba texto ISO para {tipo}, no {type(valor).__name__}")
+        if isinstance(tipo, DateTime):
+            return datetime.fromisoformat(valor)
+        if isinstance(tipo, Date):
+            return date.fromisoformat(valor)
+        return time.fromisoformat(valor)
+    # JSON solo produce números, texto, listas, objetos y booleanos: se rechaza todo lo que no sea número
+    if isinstance(tipo, Integer):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or int(valor) != valor:
+            raise TypeError(f"se esperaba un entero, no {valor!r}")
+        return int(valor)
+    if isinstance(tipo, (Float, Numeric)):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise TypeError(f"se esperaba un número, no {valor!r}")
+        return float(valor)
+    if not isinstance(valor, str):
+        raise TypeError(f"se esperaba texto, no {type(valor).__name__}")
+    return valor
+
+
+def codificar_cursor(valores):
+    """
+    Codifica los valores de las claves de ordenamiento como cursor opaco.
+
+    Args:
+        valores (list): Valores de las columnas de ordenamiento de la última fila
+
+    Returns:
+        str: Cursor seguro para URL
+    """
+    datos = json.dumps([_serializar_valor(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, columnas):
+    """
+    Decodifica un cursor generado por codificar_cursor.
+
+    Args:
+        cursor (str): Cursor recibido en la URL
+        columnas (list): Columnas de ordenamiento para restaurar los tipos
+
+    Returns:
+        list: Valores tipados de las claves de ordenamiento
+
+    Raises:
+        ValueError: Si el cursor está corrupto o no corresponde a las columnas
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {e}") from e
+    if not isinstance(valores, list) or len(valores) != len(columnas):
+        raise ValueError("Cursor de paginación inválido: número de claves incorrecto")
+    try:
+        return [_deserializar_valor(v, c) for v, c in zip(valores, columnas)]
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {e}") from e
+
+
+def paginar_keyset(query, columnas, cursor=None, limite=LIMITE_POR_DEFECTO, descendente=False):
+    """
+    Pagina una consulta por cursor sobre las columnas de ordenamiento dadas.
+
+    Las columnas deben identificar cada fila de forma única (incluir el id
+    como desempate) y compartir la misma dirección de ordenamiento, para que
+    la condición se exprese como comparación de filas y use el índice.
+
+    Args:
+        query: Consulta SQLAlchemy (sin ORDER BY ni LIMIT propios)
+        columnas (list): Atributos del modelo por los que se ordena
+        cursor (str, opcional): Cursor de la página anterior; None para la primera
+        limite (int): Número de filas por página (se acota a LIMITE_MAXIMO)
+        descendente (bool): Ordenar de mayor a menor
+
+    Returns:
+        PaginaKeyset: Página con sus filas y el cursor siguiente
+    """
+    limite = max(1, min(int(limite or LIMITE_POR_DEFECTO), LIMITE_MAXIMO))
+
+    if cursor:
+        try:
+            valores = decodificar_cursor(cursor, columnas)
+        except ValueError as e:
+            # Un cursor manipulado o caducado reinicia la lista desde el principio
+            logging.warning(str(e))
+            cursor = None
+        else:
+            clave = tuple_(*columnas)
+            referencia = tuple_(*[literal(v, c.type) for v, c in zip(valores, columnas)])
+            query = query.filter(clave < referencia if descendente else clave > referencia)
+
+    orden = [c.desc() if descendente else c.asc() for c in columnas]
+    # Pedir una fila extra para saber si existe una página siguiente sin COUNT(*)
+    filas = query.order_by(None).order_by(*orden).limit(limite + 1).all()
+
+    items = filas[:limite]
+    cursor_siguiente = None
+    if len(filas) > limite:
+        ultima = items[-1]
+        cursor_siguiente = codificar_cursor([getattr(ultima, c.key) for c in columnas])
+
+    return PaginaKeyset(items, cursor, cursor_siguiente, limite)
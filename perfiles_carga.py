@@ -0,0 +1,85 @@
+# ============================================================================
+# PERFILES DE CARGA ANTICIPADA (EAGER LOADING)
+# ============================================================================
+"""
+Perfiles con nombre de opciones de carga de SQLAlchemy para cada vista.
+
+Las plantillas de listas recorren relaciones como cita.paciente.usuario o
+consulta.cita.profesional por cada fila. Sin carga anticipada cada acceso
+dispara un SELECT perezoso adicional (problema N+1). Cada perfil declara las
+relaciones que una vista necesita para que los servicios las carguen en la
+misma consulta (joinedload) o en una consulta adicional por relación
+(selectinload), sin importar cuántas filas se muestren.
+
+Uso:
+    query = aplicar_perfil(Cita.query, 'lista_citas')
+"""
+
+from sqlalchemy.orm import joinedload  # Carga anticipada mediante JOIN
+from modelos import Paciente, Cita, Consulta  # Modelos de datos
+
+
+def _opciones_lista_citas():
+    """Relaciones usadas por citas/lista*.html: paciente, usuario, profesional y consulta."""
+    return (
+        joinedload(Cita.paciente).joinedload(Paciente.usuario),
+        joinedload(Cita.profesional),
+        joinedload(Cita.consulta),
+    )
+
+
+def _opciones_lista_consultas():
+    """Relaciones usadas por consultas/lista.html a través de consulta.cita."""
+    return (
+        joinedload(Consulta.cita).joinedload(Cita.paciente).joinedload(Paciente.usuario),
+        joinedload(Consulta.cita).joinedload(Cita.profesional),
+    )
+
+
+def _opciones_lista_pacientes():
+    """Relaciones usadas por pacientes/lista*.html: el usuario de cada paciente."""
+    return (
+        joinedload(Paciente.usuario),
+    )
+
+
+def _opciones_detalle_cita():
+    """Relaciones usadas por citas/detalle.html."""
+    return (
+        joinedload(Cita.paciente).joinedload(Paciente.usuario),
+        joinedload(Cita.profesional),
+        joinedload(Cita.consulta),
+    )
+
+
+# Registro de perfiles disponibles: nombre -> función que construye las opciones.
+# Las opciones se construyen en cada llamada porque los objetos Load no deben
+# compartirse entre consultas concurrentes.
+PERFILES_CARGA = {
+    'lista_citas': _opciones_lista_citas,
+    'lista_consultas': _opciones_lista_consultas,
+    'lista_pacientes': _opciones_lista_pacientes,
+    'detalle_cita': _opciones_detalle_cita,
+}
+
+
+def aplicar_perfil(query, perfil=None):
+    """
+    Aplica a una consulta las opciones de carga de un perfil con nombre.
+
+    Args:
+        query: Consulta SQLAlchemy a la que aplicar las opciones
+        perfil (str, opcional): Nombre del perfil en PERFILES_CARGA; si es None
+            la consulta se retorna sin cambios (carga perezosa por defecto)
+
+    Returns:
+        Query: Consulta con las opciones de carga aplicadas
+
+    Raises:
+        ValueError: Si el perfil no está registrado
+    """
+    if perfil is None:
+        return query
+    if perfil not in PERFILES_CARGA:
+        raise ValueError(f"Perfil de carga desconocido: {perfil}")
+    return query.options(*PERFILES_CARGA[perfil]())
@@ -0,0 +1,368 @@
+# ============================================================================
+# CONFIGURACIÓN Y MÉTRICAS DEL POOL DE CONEXIONES
+# ============================================================================
+"""
+Pool de conexiones configurable por entorno e instrumentado.
+
+Cada worker de gunicorn tiene su propio pool por engine (primario y, si
+existe, réplica). Con W workers el servidor de base de datos puede recibir
+hasta W * (DB_POOL_SIZE + DB_MAX_OVERFLOW) conexiones por engine, así que
+el tamaño debe elegirse contra el número de workers y el max_connections del
+servidor. Las variables se validan al crear la aplicación: un valor inválido
+detiene el arranque con un ValueError en lugar de fallar bajo carga.
+
+Variables de entorno:
+    DB_POOL_SIZE (int >= 1): Conexiones persistentes por worker (por defecto 5)
+    DB_MAX_OVERFLOW (int >= -1): Conexiones extra temporales (por defecto 10; -1 = sin límite)
+    DB_POOL_TIMEOUT (float > 0): Segundos de espera por una conexión libre (por defecto 30)
+    DB_POOL_RECYCLE (int >= -1): Segundos antes de reabrir una conexión (por defecto 300; -1 = nunca)
+    DB_POOL_PRE_PING (str): Estrategia de comprobación al entregar una conexión:
+        'siempre'  SELECT 1 en cada checkout (una ida y vuelta extra por solicitud)
+        'ociosas'  SELECT 1 solo si la conexión estuvo libre más de
+                   DB_POOL_PING_OCIOSA segundos (por defecto)
+        'nunca'    sin comprobación; pool_recycle sigue descartando las viejas
+    DB_POOL_PING_OCIOSA (float >= 0): Umbral de inactividad para 'ociosas' (por defecto 30)
+
+Con SQLite en memoria SQLAlchemy usa un pool de una conexión por hilo y las
+opciones de tamaño se ignoran.
+
+Métricas (por engine y por proceso): checkouts, latencia de checkout
+(promedio, p50, p95, máximo), checkouts que esperaron por falta de conexión
+libre, timeouts, uso del overflow (actual, máximo observado, checkouts
+servidos con conexiones de overflow) y pings de 'ociosas'. Se consultan en
+/reportes/api/pool-conexiones (del worker que atiende la solicitud) o con
+`flask pool-conexiones`.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Valores por defecto (los mismos que usa SQLAlchemy, salvo recycle)
+TAMANO_POR_DEFECTO = 5
+MAX_OVERFLOW_POR_DEFECTO = 10
+TIMEOUT_POR_DEFECTO = 30.0
+RECYCLE_POR_DEFECTO = 300
+PRE_PING_POR_DEFECTO = 'ociosas'
+PING_OCIOSA_POR_DEFECTO = 30.0
+
+ESTRATEGIAS_PRE_PING = ('siempre', 'ociosas', 'nunca')
+
+# Latencias de checkout retenidas para calcular percentiles
+MUESTRAS_LATENCIA = 2048
+
+
+def _leer_numero(entorno, variable, tipo, por_defecto, minimo, errores):
+    """Lee una variable numérica; los problemas se acumulan en errores."""
+    texto = entorno.get(variable)
+    if texto is None or texto.strip() == '':
+        return por_defecto
+    try:
+        valor = tipo(texto)
+    except ValueError:
+        errores.append(f'{variable}={texto!r} no es un número válido')
+        return por_defecto
+    if valor < minimo:
+        errores.append(f'{variable}={valor} debe ser mayor o igual que {minimo}')
+    return valor
+
+
+def leer_configuracion_pool(entorno=None):
+    """
+    Lee y valida la configuración del pool desde variables de entorno.
+
+    Args:
+        entorno (dict, opcional): Variables a leer (por defecto os.environ)
+
+    Returns:
+        dict: tamano, max_overflow, timeout, recycle, pre_ping y ping_ociosa
+
+    Raises:
+        ValueError: Con todos los valores inválidos encontrados
+    """
+    entorno = os.environ if entorno is None else entorno
+    errores = []
+    configuracion = {
+        'tamano': _leer_numero(entorno, 'DB_POOL_SIZE', int, TAMANO_POR_DEFECTO, 1, errores),
+        'max_overflow': _leer_numero(entorno, 'DB_MAX_OVERFLOW', int, MAX_OVERFLOW_POR_DEFECTO, -1, errores),
+        'timeout': _leer_numero(entorno, 'DB_POOL_TIMEOUT', float, TIMEOUT_POR_DEFECTO, 0.001, errores),
+        'recycle': _leer_numero(entorno, 'DB_POOL_RECYCLE', int, RECYCLE_POR_DEFECTO, -1, errores),
+        'pre_ping': (entorno.get('DB_POOL_PRE_PING') or PRE_PING_POR_DEFECTO).strip().lower(),
+        'ping_ociosa': _leer_numero(entorno, 'DB_POOL_PING_OCIOSA', float, PING_OCIOSA_POR_DEFECTO, 0, errores),
+    }
+    if configuracion['pre_ping'] not in ESTRATEGIAS_PRE_PING:
+        errores.append(
+            f"DB_POOL_PRE_PING={configuracion['pre_ping']!r} debe ser uno de: {', '.join(ESTRATEGIAS_PRE_PING)}"
+        )
+    if errores:
+        raise ValueError('Configuración del pool de conexiones inválida: ' + '; '.join(errores))
+    return configuracion
+
+
+def _es_sqlite_en_memoria(url):
+    """Indica si la URL es una base SQLite en memoria (pool de una conexión por hilo)."""
+    return url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url)
+
+
+def opciones_engine(configuracion, url):
+    """
+    Traduce la configuración del pool a opciones de create_engine.
+
+    Args:
+        configuracion (dict): Resultado de leer_configuracion_pool
+        url (str): URL de la base de datos del engine
+
+    Returns:
+        dict: Opciones para SQLALCHEMY_ENGINE_OPTIONS o para un bind
+    """
+    opciones = {
+        'pool_recycle': configuracion['recycle'],
+        'pool_pre_ping': configuracion['pre_ping'] == 'siempre',
+    }
+    if not _es_sqlite_en_memoria(url):
+        opciones.update({
+            'poolclass': PoolInstrumentado,
+            'pool_size': configuracion['tamano'],
+            'max_overflow': configuracion['max_overflow'],
+            'pool_timeout': configuracion['timeout'],
+        })
+    return opciones
+
+
+class MetricasPool:
+    """
+    Contadores de checkout de un pool, propios del proceso que los registra.
+    """
+
+    def __init__(self, nombre):
+        """
+        Args:
+            nombre (str): Nombre del engine ('primario' o el del bind)
+        """
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Pone todos los contadores a cero."""
+        with self._lock:
+            self.checkouts = 0
+            self.esperas = 0
+            self.timeouts = 0
+            self.checkouts_en_overflow = 0
+            self.maximo_overflow = 0
+            self.pings = 0
+            self.pings_fallidos = 0
+            self.latencia_total = 0.0
+            self.latencia_maxima = 0.0
+            self._latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    def registrar_checkout(self, segundos, espero, overflow):
+        """
+        Registra un checkout completado.
+
+        Args:
+            segundos (float): Tiempo hasta obtener la conexión
+            espero (bool): Si no había conexión libre ni cupo para abrir otra
+            overflow (int): Conexiones de overflow abiertas tras el checkout
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.esperas += espero
+            self.checkouts_en_overflow += overflow > 0
+            self.maximo_overflow = max(self.maximo_overflow, overflow)
+            self.latencia_total += segundos
+            self.latencia_maxima = max(self.latencia_maxima, segundos)
+            self._latencias.append(segundos)
+
+    def registrar_timeout(self):
+        """Registra un checkout que agotó pool_timeout."""
+        with self._lock:
+            self.esperas += 1
+            self.timeouts += 1
+
+    def registrar_ping(self, exitoso):
+        """Registra una comprobación de la estrategia 'ociosas'."""
+        with self._lock:
+            self.pings += 1
+            self.pings_fallidos += not exitoso
+
+    def resumen(self, pool):
+        """
+        Retorna las métricas junto con el estado actual del pool.
+
+        Args:
+            pool (Pool): Pool del engine
+
+        Returns:
+            dict: Contadores, latencias en milisegundos y estado del pool
+        """
+        with self._lock:
+            muestras = sorted(self._latencias)
+            datos = {
+                'checkouts': self.checkouts,
+                'esperas': self.esperas,
+                'timeouts': self.timeouts,
+                'checkouts_en_overflow': self.checkouts_en_overflow,
+                'maximo_overflow': self.maximo_overflow,
+                'pings': self.pings,
+                'pings_fallidos': self.pings_fallidos,
+                'latencia_ms': {
+                    'promedio': round(1000 * self.latencia_total / self.checkouts, 3) if self.checkouts else 0.0,
+                    'p50': round(1000 * _percentil(muestras, 0.50), 3),
+                    'p95': round(1000 * _percentil(muestras, 0.95), 3),
+                    'maxima': round(1000 * self.latencia_maxima, 3),
+                },
+            }
+        if isinstance(pool, QueuePool):
+            datos.update({
+                'tamano': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'en_uso': pool.checkedout(),
+                'libres': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        return datos
+
+
+def _percentil(muestras, fraccion):
+    """Percentil por el método del rango más cercano sobre muestras ordenadas."""
+    if not muestras:
+        return 0.0
+    return muestras[min(len(muestras) - 1, int(fraccion * len(muestras)))]
+
+
+class PoolInstrumentado(QueuePool):
+    """
+    QueuePool que mide cada checkout en su MetricasPool.
+
+    Las métricas se asignan tras crear el engine (instrumentar_engines) y se
+    conservan cuando SQLAlchemy recrea el pool (engine.dispose()).
+    """
+
+    metricas = None
+
+    # Registrar con el logger de QueuePool: con el nombre por defecto
+    # (pool_conexiones.PoolInstrumentado) heredaría el nivel DEBUG de la
+    # aplicación en lugar del WARN que SQLAlchemy fija para sus loggers
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.QueuePool'
+
+    def connect(self):
+        metricas = self.metricas
+        if metricas is None:
+            return super().connect()
+
+        # Sin conexión libre y sin cupo de overflow: el checkout va a esperar
+        espero = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.checkedout() >= self.size() + self._max_overflow
+        )
+        inicio = time.perf_counter()
+        try:
+            conexion = super().connect()
+        except exc.TimeoutError:
+            metricas.registrar_timeout()
+            raise
+        metricas.registrar_checkout(time.perf_counter() - inicio, espero, max(self.overflow(), 0))
+        return conexion
+
+    def recreate(self):
+        nuevo = super().recreate()
+        nuevo.metricas = self.metricas
+        return nuevo
+
+
+def _instalar_ping_ociosas(engine, umbral, metricas):
+    """
+    Comprueba con SELECT 1 las conexiones que estuvieron libres más de umbral
+    segundos. Si falla, DisconnectionError hace que el pool descarte la
+    conexión y entregue otra.
+    """
+    @event.listens_for(engine, 'checkin')
+    def marcar_devolucion(conexion_dbapi, registro):
+        registro.info['devuelta_en'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def comprobar_ociosa(conexion_dbapi, registro, proxy):
+        devuelta_en = registro.info.pop('devuelta_en', None)
+        if devuelta_en is None or time.monotonic() - devuelta_en < umbral:
+            return  # Conexión recién abierta o usada hace poco
+        cursor = conexion_dbapi.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        except Exception as e:
+            metricas.registrar_ping(False)
+            raise exc.DisconnectionError(f'Conexión ociosa inválida: {e}') from e
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        metricas.registrar_ping(True)
+
+
+def instrumentar_engines(app):
+    """
+    Asigna métricas a los pools de todos los engines de la aplicación e
+    instala la comprobación de conexiones ociosas si corresponde.
+
+    Debe llamarse después de db.init_app(app).
+
+    Args:
+        app (Flask): Aplicación con DB_POOL_* en app.config
+    """
+    from app import db
+    with app.app_context():
+        engines = db.engines
+    for nombre, engine in engines.items():
+        metricas = MetricasPool(nombre or 'primario')
+        engine.pool.metricas = metricas
+        if app.config['DB_POOL_PRE_PING'] == 'ociosas':
+            _instalar_ping_ociosas(engine, app.config['DB_POOL_PING_OCIOSA'], metricas)
+
+    logging.info(
+        f"Pool de conexiones: size={app.config['DB_POOL_SIZE']} "
+        f"max_overflow={app.config['DB_MAX_OVERFLOW']} timeout={app.config['DB_POOL_TIMEOUT']}s "
+        f"pre_ping={app.config['DB_POOL_PRE_PING']}"
+    )
+
+
+def metricas_pool():
+    """
+    Retorna las métricas de los pools de este proceso.
+
+    Returns:
+        dict: pid y, por engine, el resumen de MetricasPool (los engines sin
+            pool instrumentado solo informan su clase de pool)
+    """
+    from app import db
+    pools = {}
+    for nombre, engine in db.engines.items():
+        metricas = getattr(engine.pool, 'metricas', None)
+        nombre = nombre or 'primario'
+        if metricas is None:
+            pools[nombre] = {'pool': type(engine.pool).__name__}
+        else:
+            pools[nombre] = {'pool': type(engine.pool).__name__, **metricas.resumen(engine.pool)}
+    return {'pid': os.getpid(), 'pools': pools}
+
+
+def registrar_comandos(app):
+    """Registra el comando `flask pool-conexiones` en la aplicación."""
+    import click
+
+    @app.cli.command('pool-conexiones')
+    def comando_pool_conexiones():
+        """Muestra la configuración y las métricas del pool de este proceso."""
+        click.echo(
+            f"size={app.config['DB_POOL_SIZE']} max_overflow={app.config['DB_MAX_OVERFLOW']} "
+            f"timeout={app.config['DB_POOL_TIMEOUT']}s recycle={app.config['DB_POOL_RECYCLE']}s "
+            f"pre_ping={app.config['DB_POOL_PRE_PING']}"
+        )
+        for nombre, datos in metricas_pool()['pools'].items():
+            click.echo(f"  {nombre}: {datos}")
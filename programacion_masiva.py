@@ -0,0 +1,341 @@
+# ============================================================================
+# PROGRAMACIÓN MASIVA DE CITAS
+# ============================================================================
+"""
+Programación de miles de citas en bloque (campañas de vacunación,
+chequeos de admisión) desde una lista JSON o un CSV.
+
+Las filas se procesan en lotes de TAMANO_LOTE. Para cada lote:
+
+1. Se validan las filas en memoria (fecha, hora, tipo, motivo).
+2. Pacientes y profesionales se resuelven con una consulta IN cada uno.
+3. Dentro de la transacción del lote se lee y bloquea de una vez la agenda
+   de todos los (profesional, día) del lote (agenda_profesionales.bloquear_dias)
+   y los conflictos se validan en memoria contra esos mapas de bits: una
+   fila choca con las citas existentes y con las filas anteriores del
+   mismo archivo que caen en la misma franja de 30 minutos.
+4. Los mapas modificados se escriben con un UPDATE en bloque, las citas se
+   insertan en modo executemany (con RETURNING de sus IDs) y se suman al
+   resumen diario; el lote se confirma en un solo commit. Si falla en la
+   base de datos se revierte solo ese lote.
+
+El resultado informa cada fila: el ID de la cita creada o el motivo del
+rechazo. Un lote de 500 citas cuesta unas diez consultas y un commit, en
+lugar de ~5 consultas y un commit por cita.
+
+Columnas (CSV) o claves (JSON) de cada fila:
+
+    codigo_matricula | paciente_id      Paciente
+    dni_profesional | profesional_id    Profesional activo
+    fecha (AAAA-MM-DD), hora (HH:MM), tipo_cita (MEDICINA, PSICOLOGIA, EMERGENCIA)
+    motivo                              Opcional (máximo 500 caracteres)
+"""
+
+import csv
+from datetime import date, datetime
+from itertools import islice
+from sqlalchemy import select, insert, or_
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, Paciente, Cita, RolUsuario, TipoCita  # Modelos de datos
+from agenda_profesionales import bloquear_dias, guardar_mapas, franja_de_hora, hora_de_franja, es_franja_duplicada  # Agenda en bits
+from resumen_diario import sumar_al_resumen  # Resumen diario del dashboard
+from cache_reportes import cache_reportes  # Invalidación de reportes de citas
+from importacion_csv import _abrir_origen  # Mismo manejo de rutas y uploads que la importación de procedencias
+
+# Filas procesadas por transacción
+TAMANO_LOTE = 500
+
+# Longitud máxima del motivo (igual que FormularioCita)
+LONGITUD_MOTIVO = 500
+
+
+def _texto(fila, clave):
+    """Valor de texto de una columna, sin espacios (cadena vacía si falta)."""
+    valor = fila.get(clave)
+    return '' if valor is None else str(valor).strip()
+
+
+def _clave(fila, columna_codigo, columna_id, descripcion):
+    """
+    Extrae la clave de una persona: (columna, valor) por código o por ID.
+
+    Returns:
+        tuple: ((columna, valor), None) o (None, mensaje de error)
+    """
+    codigo = _texto(fila, columna_codigo)
+    if codigo:
+        return (columna_codigo, codigo), None
+    identificador = _texto(fila, columna_id)
+    if identificador:
+        if not identificador.isdigit():
+            return None, f'{columna_id} no es un número: {identificador}'
+        return (columna_id, int(identificador)), None
+    return None, f'falta {columna_codigo} o {columna_id} del {descripcion}'
+
+
+def _validar_fila(fila, hoy):
+    """
+    Valida una fila en memoria.
+
+    Returns:
+        tuple: (datos, None) o (None, mensaje de error); datos contiene
+            paciente y profesional (claves por resolver), fecha, hora,
+            tipo_cita y motivo
+    """
+    if not isinstance(fila, dict):
+        return None, 'la fila debe ser un objeto con los datos de la cita'
+
+    paciente, error = _clave(fila, 'codigo_matricula', 'paciente_id', 'paciente')
+    if error:
+        return None, error
+    profesional, error = _clave(fila, 'dni_profesional', 'profesional_id', 'profesional')
+    if error:
+        return None, error
+
+    try:
+        fecha = date.fromisoformat(_texto(fila, 'fecha'))
+    except ValueError:
+        return None, f"fecha no válida (AAAA-MM-DD): '{_texto(fila, 'fecha')}'"
+    if fecha < hoy:
+        return None, 'la fecha no puede ser anterior a hoy'
+    try:
+        hora = datetime.strptime(_texto(fila, 'hora'), '%H:%M').time()
+    except ValueError:
+        return None, f"hora no válida (HH:MM): '{_texto(fila, 'hora')}'"
+
+    tipo = _texto(fila, 'tipo_cita').upper()
+    if tipo not in TipoCita.__members__:
+        return None, f"tipo_cita no válido: '{_texto(fila, 'tipo_cita')}'"
+    motivo = _texto(fila, 'motivo') or None
+    if motivo and len(motivo) > LONGITUD_MOTIVO:
+        return None, f'motivo supera {LONGITUD_MOTIVO} caracteres'
+
+    return {'paciente': paciente, 'profesional': profesional, 'fecha': fecha, 'hora': hora,
+            'tipo_cita': TipoCita[tipo], 'motivo': motivo}, None
+
+
+def _resolver(claves, columna_codigo, columna_id, condiciones_base=()):
+    """
+    Resuelve claves (columna, valor) de personas a IDs con una sola consulta.
+
+    Returns:
+        dict: (columna, valor) -> ID
+    """
+    codigos = {valor for columna, valor in claves if columna == 'codigo'}
+    ids = {valor for columna, valor in claves if columna == 'id'}
+    condiciones = []
+    if codigos:
+        condiciones.append(columna_codigo.in_(codigos))
+    if ids:
+        condiciones.append(columna_id.in_(ids))
+    if not condiciones:
+        return {}
+
+    resueltos = {}
+    consulta = select(columna_codigo, columna_id).select_from(Usuario)
+    if columna_id is Paciente.id:
+        consulta = consulta.join(Paciente, Paciente.usuario_id == Usuario.id)
+    for codigo, identificador in db.session.execute(consulta.where(*condiciones_base, or_(*condiciones))):
+        if codigo in codigos:
+            resueltos[('codigo', codigo)] = identificador
+        if identificador in ids:
+            resueltos[('id', identificador)] = identificador
+    return resueltos
+
+
+def _procesar_lote(lote, resultado, hoy):
+    """
+    Valida, resuelve y programa un lote de filas en una transacción.
+
+    Args:
+        lote (list[tuple]): Pares (número de fila, fila)
+        resultado (dict): Acumulador de la programación (se modifica)
+        hoy (date): Primer día admitido
+    """
+    validas = []
+    for numero, fila in lote:
+        datos, error = _validar_fila(fila, hoy)
+        if error:
+            _registrar_error(resultado, numero, error)
+        else:
+            validas.append((numero, datos))
+
+    # Claves normalizadas: ('codigo', valor) o ('id', valor)
+    def normalizar(clave):
+        columna, valor = clave
+        return ('id' if columna.endswith('_id') else 'codigo', valor)
+
+    pacientes = _resolver(
+        {normalizar(d['paciente']) for _, d in validas}, Usuario.codigo_matricula, Paciente.id,
+    )
+    profesionales = _resolver(
+        {normalizar(d['profesional']) for _, d in validas}, Usuario.dni, Usuario.id,
+        (Usuario.rol == RolUsuario.PROFESIONAL, Usuario.activo == True),
+    )
+
+    candidatas = []
+    for numero, datos in validas:
+        paciente_id = pacientes.get(normalizar(datos['paciente']))
+        if paciente_id is None:
+            _registrar_error(resultado, numero, f"no existe paciente con {datos['paciente'][0]} '{datos['paciente'][1]}'")
+            continue
+        profesional_id = profesionales.get(normalizar(datos['profesional']))
+        if profesional_id is None:
+            _registrar_error(resultado, numero,
+                             f"no existe profesional activo con {datos['profesional'][0]} '{datos['profesional'][1]}'")
+            continue
+        candidatas.append((numero, {
+            'paciente_id': paciente_id, 'profesional_id': profesional_id,
+            'fecha': datos['fecha'], 'hora': datos['hora'], 'tipo_cita': datos['tipo_cita'],
+            'motivo': datos['motivo'], 'estado': 'PROGRAMADA',
+        }))
+
+    if not candidatas:
+        return
+
+    aceptadas = []
+    en_conflicto = set()
+    try:
+        # Agenda del lote leída y bloqueada una vez; los conflictos se validan en memoria
+        mapas = bloquear_dias((cita['profesional_id'], cita['fecha']) for _, cita in candidatas)
+        originales = dict(mapas)
+        for numero, cita in candidatas:
+            clave = (cita['profesional_id'], cita['fecha'])
+            franja = franja_de_hora(cita['hora'])
+            if mapas[clave] >> franja & 1:
+                _registrar_error(resultado, numero, f"el profesional ya tiene una cita el {cita['fecha'].isoformat()} "
+                                                    f"en la franja de las {hora_de_franja(franja).strftime('%H:%M')}")
+                en_conflicto.add(numero)
+                continue
+            mapas[clave] |= 1 << franja
+            aceptadas.append((numero, cita))
+
+        ids = {}
+        if aceptadas:
+            guardar_mapas({clave: mapa for clave, mapa in mapas.items() if mapa != originales[clave]})
+            # Cada cita aceptada ocupa una franja distinta: su (profesional, fecha, hora)
+            # identifica el ID devuelto sin pedir RETURNING ordenado (en SQLite
+            # eso insertaría fila por fila)
+            ids = {
+                (profesional_id, fecha, hora): cita_id
+                for cita_id, profesional_id, fecha, hora in db.session.execute(
+                    insert(Cita).returning(Cita.id, Cita.profesional_id, Cita.fecha, Cita.hora),
+                    [cita for _, cita in aceptadas],
+                )
+            }
+            sumar_al_resumen(Cita.id.in_(ids.values()))
+        db.session.commit()
+    except Exception as e:
+        # Incluye fallos al bloquear la agenda (p. ej. "database is locked"), antes de aceptar filas
+        db.session.rollback()
+        if es_franja_duplicada(e):
+            # Otra carga ocupó una franja sin pasar por la agenda (índice único de citas)
+            mensaje = ('lote revertido: una de sus franjas ya tenía una cita activa; '
+                       'ejecute `flask agenda --reconstruir` y reintente')
+        else:
+            mensaje = f'lote revertido: {str(getattr(e, "orig", None) or e)}'
+        _registrar_lote_revertido(resultado, candidatas, en_conflicto, mensaje)
+        return
+
+    for numero, cita in aceptadas:
+        cita_id = ids[(cita['profesional_id'], cita['fecha'], cita['hora'])]
+        resultado['resultados'].append({'fila': numero, 'cita_id': cita_id})
+    resultado['citas_creadas'] += len(aceptadas)
+
+
+def _registrar_error(resultado, numero, mensaje):
+    """Registra el rechazo de una fila."""
+    resultado['total_errores'] += 1
+    resultado['resultados'].append({'fila': numero, 'error': mensaje})
+
+
+def _registrar_lote_revertido(resultado, candidatas, en_conflicto, mensaje):
+    """Registra el rechazo de las filas candidatas de un lote revertido que no tenían ya su error."""
+    for numero, _ in candidatas:
+        if numero not in en_conflicto:
+            _registrar_error(resultado, numero, mensaje)
+
+
+def _nuevo_resultado():
+    """Acumulador vacío de una programación masiva."""
+    return {
+        'exitoso': False,
+        'filas_leidas': 0,
+        'citas_creadas': 0,
+        'total_errores': 0,
+        'resultados': [],
+        'errores': [],
+    }
+
+
+def _programar(filas, resultado, tamano_lote):
+    """Procesa (número, fila) por lotes y ordena los resultados por fila."""
+    hoy = date.today()
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        resultado['filas_leidas'] += len(lote)
+        _procesar_lote(lote, resultado, hoy)
+    resultado['resultados'].sort(key=lambda r: r['fila'])
+    resultado['exitoso'] = True
+    if resultado['citas_creadas']:
+        cache_reportes.invalidar('citas')  # Los reportes de citas quedan obsoletos
+
+
+def programar_citas(filas, tamano_lote=TAMANO_LOTE):
+    """
+    Programa una lista de citas (p. ej. el cuerpo JSON de la API).
+
+    Args:
+        filas (list[dict]): Citas a programar (ver columnas en el módulo)
+        tamano_lote (int): Filas por consulta y por transacción
+
+    Returns:
+        dict: exitoso, filas_leidas, citas_creadas, total_errores y
+            resultados (por fila, numerada desde 1: cita_id o error)
+    """
+    resultado = _nuevo_resultado()
+    _programar(enumerate(filas, start=1), resultado, tamano_lote)
+    return resultado
+
+
+def programar_desde_csv(origen, tamano_lote=TAMANO_LOTE):
+    """
+    Programa las citas de un CSV.
+
+    Args:
+        origen: Ruta del archivo, flujo de texto o flujo binario (upload)
+        tamano_lote (int): Filas por consulta y por transacción
+
+    Returns:
+        dict: Igual que programar_citas; las filas se numeran con la línea
+            del archivo y los errores de lectura van en errores
+    """
+    resultado = _nuevo_resultado()
+    try:
+        archivo = _abrir_origen(origen)
+        try:
+            lector = csv.DictReader(archivo)
+            columnas = set(lector.fieldnames or [])
+            faltantes = [
+                grupo for grupo in (('codigo_matricula', 'paciente_id'), ('dni_profesional', 'profesional_id'),
+                                    ('fecha',), ('hora',), ('tipo_cita',))
+                if not columnas & set(grupo)
+            ]
+            if faltantes:
+                resultado['errores'].append(
+                    'Faltan columnas en el CSV: ' + ', '.join(' o '.join(grupo) for grupo in faltantes)
+                )
+                resultado['total_errores'] = 1
+                return resultado
+            _programar(((lector.line_num, fila) for fila in lector), resultado, tamano_lote)
+        finally:
+            if archivo is not origen:
+                archivo.close()
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        resultado['exitoso'] = False
+        resultado['errores'].append(f'Error al leer archivo: {str(e)}')
+        resultado['total_errores'] += 1
+    return resultado
@@ -0,0 +1,314 @@
+# ============================================================================
+# PRONÓSTICO VECTORIZADO DE DEMANDA DE CITAS
+# ============================================================================
+"""
+Pronóstico de la demanda diaria de citas con NumPy.
+
+La serie diaria completa se obtiene en una sola consulta agrupada sobre el
+resumen diario (ResumenDiarioCitas) y se convierte en una matriz
+(series x días) con una fila por tipo de cita, una por profesional y una
+para el total. Los tres modelos se ajustan sobre la matriz entera a la vez:
+
+- Media móvil: promedio de los últimos `ventana` días
+- Holt-Winters aditivo con estacionalidad semanal (periodo 7): el recorrido
+  temporal es secuencial, pero cada paso opera sobre todas las series
+- Tendencia por mínimos cuadrados: pendiente e intercepto en forma cerrada
+
+Cada modelo retorna el pronóstico y una banda de confianza calculada a
+partir de la desviación estándar de sus errores dentro de la muestra.
+"""
+
+from datetime import date, timedelta
+from statistics import NormalDist
+import numpy as np
+from sqlalchemy import func, select, cast, String
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, ResumenDiarioCitas, TipoCita  # Modelos de datos
+
+# Parámetros por defecto de los modelos
+VENTANA_MEDIA_MOVIL = 28  # Días promediados por la media móvil
+PERIODO_SEMANAL = 7  # Longitud de la estacionalidad de Holt-Winters
+ALFA, BETA, GAMMA = 0.3, 0.05, 0.2  # Suavizado de nivel, tendencia y estacionalidad
+HISTORIA_MAXIMA_DIAS = 3 * 365  # Días de historia usados para ajustar
+
+MODELOS = ('media_movil', 'holt_winters', 'tendencia')
+
+
+def _cuantil_normal(nivel_confianza):
+    """Valor z de la normal estándar para un intervalo bilateral."""
+    return NormalDist().inv_cdf(0.5 + nivel_confianza / 2)
+
+
+def media_movil(Y, horizonte, ventana=VENTANA_MEDIA_MOVIL):
+    """
+    Pronóstico constante igual al promedio de los últimos `ventana` días.
+
+    Args:
+        Y (ndarray): Matriz (series, días) de conteos diarios
+        horizonte (int): Días a pronosticar
+        ventana (int): Días promediados
+
+    Returns:
+        tuple: (pronóstico (series, horizonte), sigma (series, horizonte))
+    """
+    series, dias = Y.shape
+    ventana = max(1, min(ventana, dias))
+    acumulado = np.concatenate([np.zeros((series, 1)), np.cumsum(Y, axis=1)], axis=1)
+
+    # Pronóstico a un paso en cada día t >= ventana para estimar el error
+    medias = (acumulado[:, ventana:-1] - acumulado[:, :-ventana - 1]) / ventana
+    errores = Y[:, ventana:] - medias
+    sigma = np.sqrt((errores ** 2).mean(axis=1)) if errores.size else np.zeros(series)
+
+    nivel = (acumulado[:, -1] - acumulado[:, -ventana - 1]) / ventana
+    pronostico = np.repeat(nivel[:, None], horizonte, axis=1)
+    # El error de la media estimada se suma al ruido de cada día futuro
+    desviacion = np.repeat((sigma * np.sqrt(1 + 1 / ventana))[:, None], horizonte, axis=1)
+    return pronostico, desviacion
+
+
+def tendencia_lineal(Y, horizonte):
+    """
+    Recta de mínimos cuadrados ajustada a cada serie y extrapolada.
+
+    Args:
+        Y (ndarray): Matriz (series, días) de conteos diarios
+        horizonte (int): Días a pronosticar
+
+    Returns:
+        tuple: (pronóstico (series, horizonte), sigma (series, horizonte))
+    """
+    series, dias = Y.shape
+    t = np.arange(dias, dtype=float)
+    t_medio = t.mean()
+    centrado = t - t_medio
+    sxx = (centrado ** 2).sum() or 1.0
+
+    pendiente = (Y @ centrado) / sxx
+    intercepto = Y.mean(axis=1) - pendiente * t_medio
+
+    ajustado = intercepto[:, None] + pendiente[:, None] * t
+    grados_libertad = max(dias - 2, 1)
+    sigma = np.sqrt(((Y - ajustado) ** 2).sum(axis=1) / grados_libertad)
+
+    t_futuro = np.arange(dias, dias + horizonte, dtype=float)
+    pronostico = intercepto[:, None] + pendiente[:, None] * t_futuro
+    # Intervalo de predicción clásico de la regresión lineal simple
+    factor = np.sqrt(1 + 1 / dias + (t_futuro - t_medio) ** 2 / sxx)
+    return pronostico, sigma[:, None] * factor
+
+
+def holt_winters(Y, horizonte, periodo=PERIODO_SEMANAL, alfa=ALFA, beta=BETA, gamma=GAMMA):
+    """
+    Holt-Winters aditivo (nivel, tendencia y estacionalidad) para todas las series.
+
+    Con menos de dos periodos completos de historia se usa la media móvil.
+
+    Args:
+        Y (ndarray): Matriz (series, días) de conteos diarios
+        horizonte (int): Días a pronosticar
+        periodo (int): Longitud de la estacionalidad
+        alfa, beta, gamma (float): Constantes de suavizado
+
+    Returns:
+        tuple: (pronóstico (series, horizonte), sigma (series, horizonte))
+    """
+    series, dias = Y.shape
+    if dias < 2 * periodo:
+        return media_movil(Y, horizonte)
+
+    # Inicialización con las dos primeras temporadas
+    primera = Y[:, :periodo]
+    nivel = primera.mean(axis=1)
+    tendencia = (Y[:, periodo:2 * periodo].mean(axis=1) - nivel) / periodo
+    estacional = primera - nivel[:, None]
+
+    suma_cuadrados = np.zeros(series)
+    for t in range(periodo, dias):
+        indice = t % periodo
+        observado = Y[:, t]
+        factor_estacional = estacional[:, indice]
+
+        suma_cuadrados += (observado - (nivel + tendencia + factor_estacional)) ** 2
+
+        nivel_anterior = nivel
+        nivel = alfa * (observado - factor_estacional) + (1 - alfa) * (nivel + tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * tendencia
+        estacional[:, indice] = gamma * (observado - nivel) + (1 - gamma) * factor_estacional
+
+    sigma = np.sqrt(suma_cuadrados / (dias - periodo))
+
+    pasos = np.arange(1, horizonte + 1)
+    indices = (dias + pasos - 1) % periodo
+    pronostico = nivel[:, None] + tendencia[:, None] * pasos + estacional[:, indices]
+    # Aproximación de la varianza del suavizado exponencial a h pasos
+    factor = np.sqrt(1 + (pasos - 1) * alfa ** 2)
+    return pronostico, sigma[:, None] * factor
+
+
+def ajustar_modelos(Y, horizonte, nivel_confianza=0.95):
+    """
+    Ajusta los tres modelos sobre la matriz completa.
+
+    Args:
+        Y (ndarray): Matriz (series, días) de conteos diarios
+        horizonte (int): Días a pronosticar
+        nivel_confianza (float): Cobertura de las bandas (p. ej. 0.95)
+
+    Returns:
+        dict: Modelo -> (pronóstico, inferior, superior), cada uno (series, horizonte);
+            los valores se acotan en cero porque no hay demanda negativa
+    """
+    z = _cuantil_normal(nivel_confianza)
+    funciones = {
+        'media_movil': media_movil,
+        'holt_winters': holt_winters,
+        'tendencia': tendencia_lineal,
+    }
+    resultados = {}
+    for nombre, funcion in funciones.items():
+        pronostico, sigma = funcion(Y, horizonte)
+        resultados[nombre] = (
+            np.clip(pronostico, 0, None),
+            np.clip(pronostico - z * sigma, 0, None),
+            np.clip(pronostico + z * sigma, 0, None),
+        )
+    return resultados
+
+
+def obtener_matriz_diaria(hasta=None, historia_dias=HISTORIA_MAXIMA_DIAS):
+    """
+    Obtiene los conteos diarios por tipo de cita y profesional en una consulta.
+
+    Args:
+        hasta (date, opcional): Último día de la historia (por defecto hoy)
+        historia_dias (int): Máximo de días de historia
+
+    Returns:
+        tuple: (fechas, tipos, ids_profesionales, por_tipo, por_profesional)
+            donde por_tipo es (tipos, días) y por_profesional es
+            (profesionales, días); (None, ...) si no hay citas
+    """
+    hasta = hasta or date.today()
+    limite = hasta - timedelta(days=historia_dias - 1)
+
+    # Día y tipo se leen como texto ('YYYY-MM-DD' y nombre del enum) para
+    # convertirlos en bloque con NumPy en lugar de fila por fila
+    filas = db.session.connection().execute(
+        select(
+            cast(ResumenDiarioCitas.dia, String),
+            cast(ResumenDiarioCitas.tipo_cita, String),
+            ResumenDiarioCitas.profesional_id,
+            func.sum(ResumenDiarioCitas.total_citas),
+        ).where(
+            ResumenDiarioCitas.dia >= limite,
+            ResumenDiarioCitas.dia <= hasta,
+        ).group_by(
+            ResumenDiarioCitas.dia, ResumenDiarioCitas.tipo_cita, ResumenDiarioCitas.profesional_id
+        )
+    ).all()
+
+    tipos = list(TipoCita)
+    if not filas:
+        return None, tipos, [], None, None
+
+    columna_dia, columna_tipo, columna_profesional, columna_total = zip(*filas)
+    dias_fila = np.array(columna_dia, dtype='datetime64[D]')
+    desde_np = dias_fila.min()
+    desde = desde_np.astype(date)
+    dias = (hasta - desde).days + 1
+
+    # Índices de cada fila en la matriz, calculados en bloque
+    indice_dia = (dias_fila - desde_np).astype(np.int64)
+    nombres_tipo = np.array([tipo.name for tipo in tipos])
+    orden_tipos = np.argsort(nombres_tipo)
+    indice_tipo = orden_tipos[np.searchsorted(nombres_tipo[orden_tipos], np.array(columna_tipo))]
+    ids_profesionales, indice_profesional = np.unique(np.array(columna_profesional, dtype=np.int64), return_inverse=True)
+    totales = np.array(columna_total, dtype=float)
+
+    por_tipo = np.zeros((len(tipos), dias))
+    np.add.at(por_tipo, (indice_tipo, indice_dia), totales)
+    por_profesional = np.zeros((len(ids_profesionales), dias))
+    np.add.at(por_profesional, (indice_profesional, indice_dia), totales)
+    ids_profesionales = ids_profesionales.tolist()
+
+    fechas = [desde + timedelta(days=i) for i in range(dias)]
+    return fechas, tipos, ids_profesionales, por_tipo, por_profesional
+
+
+def _a_listas(resultados, recientes):
+    """Redondea y convierte a listas de Python todas las matrices de una vez."""
+    listas = {
+        modelo: [np.round(matriz, 2).tolist() for matriz in matrices]
+        for modelo, matrices in resultados.items()
+    }
+    return listas, recientes.astype(np.int64).tolist()
+
+
+def _formatear(listas, fila):
+    """Arma el pronóstico de la serie `fila` a partir de la salida de _a_listas."""
+    modelos, recientes = listas
+    serie = {
+        modelo: {
+            'pronostico': pronostico[fila],
+            'inferior': inferior[fila],
+            'superior': superior[fila],
+        }
+        for modelo, (pronostico, inferior, superior) in modelos.items()
+    }
+    serie['ultimos_30_dias'] = recientes[fila]
+    return serie
+
+
+def pronosticar_demanda(horizonte=30, hasta=None, historia_dias=HISTORIA_MAXIMA_DIAS, nivel_confianza=0.95):
+    """
+    Pronostica la demanda diaria total, por tipo de cita y por profesional.
+
+    Args:
+        horizonte (int): Días a pronosticar a partir del día siguiente a `hasta`
+        hasta (date, opcional): Último día de la historia (por defecto hoy)
+        historia_dias (int): Máximo de días de historia
+        nivel_confianza (float): Cobertura de las bandas
+
+    Returns:
+        dict: fechas (ISO), total, por_tipo y por_profesional; cada serie
+            contiene los modelos con sus listas pronostico/inferior/superior
+            y 'ultimos_30_dias' con las citas observadas en ese periodo.
+            por_profesional va indexado por ID de profesional (los nombres
+            pueden repetirse) y cada serie incluye además su 'nombre'
+    """
+    hasta = hasta or date.today()
+    fechas_futuras = [(hasta + timedelta(days=h)).isoformat() for h in range(1, horizonte + 1)]
+    fechas, tipos, ids_profesionales, por_tipo, por_profesional = obtener_matriz_diaria(hasta, historia_dias)
+
+    if fechas is None:
+        vacio = np.zeros((1, horizonte))
+        ceros = _formatear(_a_listas({m: (vacio, vacio, vacio) for m in MODELOS}, np.zeros(1)), 0)
+        return {
+            'fechas': fechas_futuras,
+            'historia_dias': 0,
+            'total': ceros,
+            'por_tipo': {tipo.value: ceros for tipo in tipos},
+            'por_profesional': {},
+        }
+
+    # Un solo lote: total, tipos y profesionales comparten el eje temporal
+    Y = np.vstack([por_tipo.sum(axis=0, keepdims=True), por_tipo, por_profesional])
+    resultados = ajustar_modelos(Y, horizonte, nivel_confianza)
+    listas = _a_listas(resultados, Y[:, -30:].sum(axis=1))
+
+    nombres = dict(db.session.query(Usuario.id, Usuario.nombre).filter(
+        Usuario.id.in_(ids_profesionales)
+    ).all())
+    desplazamiento = 1 + len(tipos)
+
+    return {
+        'fechas': fechas_futuras,
+        'historia_dias': len(fechas),
+        'total': _formatear(listas, 0),
+        'por_tipo': {tipo.value: _formatear(listas, 1 + i) for i, tipo in enumerate(tipos)},
+        'por_profesional': {
+            id_: dict(_formatear(listas, desplazamiento + i), nombre=nombres.get(id_, f'Profesional {id_}'))
+            for i, id_ in enumerate(ids_profesionales)
+        },
+    }
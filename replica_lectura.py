@@ -0,0 +1,187 @@
+# ============================================================================
+# ENRUTAMIENTO DE LECTURAS DE REPORTES A UNA RÉPLICA
+# ============================================================================
+"""
+Lecturas de reportes sobre una réplica de solo lectura.
+
+Si se define DATABASE_URL_REPLICA, la aplicación registra un segundo engine
+(bind 'replica' de Flask-SQLAlchemy) y la sesión usa SesionEnrutada: mientras
+una función marcada con @en_replica se ejecuta, todas las consultas de
+lectura de db.session (Model.query, db.session.execute, connection()) van a
+la réplica. Las escrituras (flush, INSERT/UPDATE/DELETE) siempre van al
+primario, igual que todo lo que se ejecuta fuera de @en_replica.
+
+    @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('citas',))
+    @en_replica
+    def obtener_estadisticas_citas():
+        ...
+
+Respaldo al primario:
+- Sin DATABASE_URL_REPLICA, @en_replica no tiene efecto.
+- Si una lectura en la réplica falla por conexión o esquema
+  (OperationalError), la réplica se marca como no disponible durante
+  REPLICA_ESPERA_REINTENTO segundos y la función se repite en el primario.
+
+La réplica puede ir algunos segundos por detrás del primario; los reportes
+lo toleran (ya se sirven desde caché con TTL). Las vistas que leen lo que
+acaban de escribir no deben usar @en_replica.
+
+Prueba local con dos archivos SQLite:
+    DATABASE_URL=sqlite:////tmp/primario.db DATABASE_URL_REPLICA=sqlite:////tmp/replica.db
+"""
+
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+
+# Nombre del bind de Flask-SQLAlchemy para la réplica
+BIND_REPLICA = 'replica'
+
+# Segundos que la réplica queda descartada tras un fallo
+REPLICA_ESPERA_REINTENTO = 30
+
+# Destino de las lecturas en el contexto actual (None = primario)
+_destino_lecturas = ContextVar('destino_lecturas', default=None)
+
+_estado_lock = threading.Lock()
+_replica_caida_hasta = 0.0
+
+
+def _es_escritura(clause):
+    """Indica si la sentencia modifica datos (INSERT, UPDATE, DELETE)."""
+    return clause is not None and getattr(clause, 'is_dml', False)
+
+
+class SesionEnrutada(Session):
+    """
+    Sesión de Flask-SQLAlchemy que envía las lecturas a la réplica cuando el
+    contexto actual lo indica (ver en_replica).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and _destino_lecturas.get() == BIND_REPLICA
+            and not self._flushing
+            and not _es_escritura(clause)
+        ):
+            motor = self._db.engines.get(BIND_REPLICA)
+            if motor is not None:
+                return motor
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configurar_replica(app, url_replica, opciones_pool=None):
+    """
+    Registra el bind de la réplica en app.config (antes de db.init_app).
+
+    En PostgreSQL las conexiones a la réplica se abren con
+    default_transaction_read_only, de modo que una escritura enviada por
+    error falla en lugar de divergir del primario.
+
+    Args:
+        app (Flask): Aplicación en construcción
+        url_replica (str): URL de la réplica (None o vacía = sin réplica)
+        opciones_pool (dict, opcional): Opciones de pool de create_engine
+            (ver pool_conexiones.opciones_engine)
+    """
+    if not url_replica:
+        return
+    opciones = {'url': url_replica, **(opciones_pool or {'pool_recycle': 300, 'pool_pre_ping': True})}
+    if url_replica.startswith('postgresql'):
+        opciones['connect_args'] = {'options': '-c default_transaction_read_only=on'}
+    app.config.setdefault('SQLALCHEMY_BINDS', {})[BIND_REPLICA] = opciones
+    logging.info('Lecturas de reportes enrutadas a la réplica')
+
+
+def replica_disponible():
+    """
+    Indica si hay réplica configurada y no está en espera tras un fallo.
+
+    Returns:
+        bool: True si las lecturas deben ir a la réplica
+    """
+    from app import db
+    if BIND_REPLICA not in db.engines:
+        return False
+    with _estado_lock:
+        return time.monotonic() >= _replica_caida_hasta
+
+
+def marcar_replica_caida(error):
+    """Descarta la réplica durante REPLICA_ESPERA_REINTENTO segundos."""
+    global _replica_caida_hasta
+    with _estado_lock:
+        _replica_caida_hasta = time.monotonic() + REPLICA_ESPERA_REINTENTO
+    logging.warning(f'Réplica no disponible, lecturas en el primario por {REPLICA_ESPERA_REINTENTO}s: {error}')
+
+
+@contextmanager
+def lecturas_en_replica():
+    """Context manager que envía a la réplica las lecturas del bloque."""
+    token = _destino_lecturas.set(BIND_REPLICA)
+    try:
+        yield
+    finally:
+        _destino_lecturas.reset(token)
+
+
+@contextmanager
+def lecturas_en_primario():
+    """Context manager que fuerza el primario aunque el contexto exterior use la réplica."""
+    token = _destino_lecturas.set(None)
+    try:
+        yield
+    finally:
+        _destino_lecturas.reset(token)
+
+
+def en_replica(funcion):
+    """
+    Decorador que ejecuta las lecturas de la función en la réplica.
+
+    Si la réplica falla, la marca como caída, revierte la sesión y repite la
+    función en el primario. Las llamadas anidadas heredan el destino de la
+    exterior, que es la que gestiona el respaldo.
+
+    Args:
+        funcion (callable): Función de solo lectura
+
+    Returns:
+        callable: Función enrutada (la original queda en .en_primario)
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if _destino_lecturas.get() == BIND_REPLICA or not replica_disponible():
+            return funcion(*args, **kwargs)
+
+        try:
+            with lecturas_en_replica():
+                return funcion(*args, **kwargs)
+        except OperationalError as e:
+            from app import db
+            marcar_replica_caida(e)
+            db.session.rollback()  # Liberar la conexión a la réplica de la transacción
+        return funcion(*args, **kwargs)
+
+    envoltura.en_primario = funcion
+    return envoltura
+
+
+def enrutar_vistas_a_replica(app, prefijo):
+    """
+    Aplica en_replica a todas las vistas cuya URL empieza por el prefijo.
+
+    Args:
+        app (Flask): Aplicación con las rutas ya registradas
+        prefijo (str): Prefijo de URL, p. ej. '/reportes/api/'
+    """
+    for regla in app.url_map.iter_rules():
+        if regla.rule.startswith(prefijo):
+            app.view_functions[regla.endpoint] = en_replica(app.view_functions[regla.endpoint])
@@ -0,0 +1,362 @@
+# ============================================================================
+# RESUMEN DIARIO MATERIALIZADO DE CITAS Y CONSULTAS
+# ============================================================================
+"""
+Mantenimiento de las tablas resumen_diario_citas y resumen_mensual_citas.
+
+El resumen agrupa las citas por (día, tipo de cita, profesional, carrera,
+nivel de riesgo, estado) y guarda cuántas citas y consultas hay en cada
+grupo. Su tamaño depende del número de combinaciones por día, que con
+muchos profesionales se acerca al de citas; por eso el resumen mensual
+pliega las mismas filas por mes y sin el profesional. Los widgets que
+agregan todo el historial leen el mensual, cuyo tamaño crece con el
+número de meses y de combinaciones de tipo, carrera, nivel y estado, pero
+no con el de citas ni de profesionales. El diario queda para lo que
+necesita el día o el profesional (pronóstico y catálogo de tipos por
+profesional).
+
+Actualización incremental: cada servicio que modifica una cita resta la
+contribución de las citas afectadas antes del cambio y la vuelve a sumar
+después, dentro de la misma transacción (ambos resúmenes a la vez):
+
+    with recalcular_resumen(Cita.id == cita.id):
+        cita.estado = nuevo_estado
+    db.session.commit()
+
+Uso:
+    flask --app main resumen-diario --reconstruir   # Recalcula desde cero
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import func, select, update, delete, insert, bindparam, extract, inspect
+from app import db  # Instancia de la base de datos
+from modelos import Cita, Paciente, Consulta, ResumenDiarioCitas, ResumenMensualCitas  # Modelos de datos
+
+# Columnas de la clave del resumen y su origen en las tablas base (mismo orden)
+_CLAVE_RESUMEN = [
+    ResumenDiarioCitas.dia,
+    ResumenDiarioCitas.tipo_cita,
+    ResumenDiarioCitas.profesional_id,
+    ResumenDiarioCitas.carrera,
+    ResumenDiarioCitas.nivel_riesgo,
+    ResumenDiarioCitas.estado,
+]
+# Clave del resumen mensual: la diaria con el mes en lugar del día y sin profesional
+_CLAVE_MENSUAL = [
+    ResumenMensualCitas.mes,
+    ResumenMensualCitas.tipo_cita,
+    ResumenMensualCitas.carrera,
+    ResumenMensualCitas.nivel_riesgo,
+    ResumenMensualCitas.estado,
+]
+_CLAVE_ORIGEN = [
+    Cita.fecha,
+    Cita.tipo_cita,
+    Cita.profesional_id,
+    Paciente.carrera,
+    Consulta.nivel_riesgo,
+    Cita.estado,
+]
+
+
+def _consulta_contribuciones(*condiciones):
+    """
+    Construye el SELECT agrupado que calcula el resumen de un conjunto de citas.
+
+    Args:
+        *condiciones: Filtros sobre las tablas base (sin filtros = todas las citas)
+
+    Returns:
+        Select: Columnas de la clave seguidas de total_citas y total_consultas
+    """
+    return select(
+        *_CLAVE_ORIGEN,
+        func.count(func.distinct(Cita.id)).label('total_citas'),
+        func.count(Consulta.id).label('total_consultas'),
+    ).select_from(Cita).join(
+        Paciente, Paciente.id == Cita.paciente_id
+    ).outerjoin(
+        Consulta, Consulta.cita_id == Cita.id
+    ).where(*condiciones).group_by(*_CLAVE_ORIGEN)
+
+
+def _condicion_clave(clave_columnas, valores):
+    """Condición que localiza las filas del resumen con la clave dada (NULL incluido)."""
+    return [
+        columna.is_(None) if valor is None else columna == valor
+        for columna, valor in zip(clave_columnas, valores)
+    ]
+
+
+def _plegar_por_mes(contribuciones):
+    """
+    Pliega contribuciones del resumen diario en claves del resumen mensual.
+
+    Args:
+        contribuciones (list[tuple]): (clave diaria, citas, consultas)
+
+    Returns:
+        list[tuple]: (clave mensual, citas, consultas)
+    """
+    totales = defaultdict(lambda: [0, 0])
+    for (dia, tipo, _profesional, carrera, nivel, estado), citas, consultas in contribuciones:
+        acumulado = totales[(dia.replace(day=1), tipo, carrera, nivel, estado)]
+        acumulado[0] += citas
+        acumulado[1] += consultas
+    return [(clave, citas, consultas) for clave, (citas, consultas) in totales.items()]
+
+
+def _aplicar_contribuciones(condicion, signo):
+    """
+    Suma (signo=1) o resta (signo=-1) de los resúmenes diario y mensual la
+    contribución de las citas que cumplen la condición, según su estado
+    actual en la base de datos.
+
+    Args:
+        condicion: Filtro sobre las tablas base que selecciona las citas
+        signo (int): 1 para sumar, -1 para restar
+    """
+    contribuciones = [
+        (tuple(fila[:len(_CLAVE_RESUMEN)]), fila.total_citas, fila.total_consultas)
+        for fila in db.session.execute(_consulta_contribuciones(condicion))
+    ]
+    for modelo, clave_columnas, filtros, filas in (
+        (ResumenDiarioCitas, _CLAVE_RESUMEN, (0, 2), contribuciones),
+        (ResumenMensualCitas, _CLAVE_MENSUAL, (0,), _plegar_por_mes(contribuciones)),
+    ):
+        if len(filas) > 1:
+            _aplicar_en_bloque(modelo, clave_columnas, filtros, filas, signo)
+        else:
+            _aplicar_fila(modelo, clave_columnas, filas, signo)
+
+
+def _aplicar_fila(modelo, clave_columnas, filas, signo):
+    """
+    Aplica la contribución de una sola clave (el caso de una cita suelta).
+
+    Args:
+        modelo: ResumenDiarioCitas o ResumenMensualCitas
+        clave_columnas (list): Columnas de la clave del resumen
+        filas (list[tuple]): (clave, citas, consultas); cero o una entrada
+        signo (int): 1 para sumar, -1 para restar
+    """
+    for clave, citas, consultas in filas:
+        total_citas = signo * citas
+        total_consultas = signo * consultas
+
+        # Incrementar una sola fila existente con la clave (puede haber
+        # duplicadas si dos transacciones la insertaron a la vez); si no
+        # existe ninguna, crearla
+        fila_existente = select(modelo.id).where(
+            *_condicion_clave(clave_columnas, clave)
+        ).limit(1).scalar_subquery()
+        resultado = db.session.execute(
+            update(modelo)
+            .where(modelo.id == fila_existente)
+            .values(
+                total_citas=modelo.total_citas + total_citas,
+                total_consultas=modelo.total_consultas + total_consultas,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 0:
+            db.session.execute(insert(modelo).values(
+                **{columna.key: valor for columna, valor in zip(clave_columnas, clave)},
+                total_citas=total_citas,
+                total_consultas=total_consultas,
+            ))
+
+
+def _aplicar_en_bloque(modelo, clave_columnas, filtros, filas, signo):
+    """
+    Aplica las contribuciones de muchas claves a la vez (p. ej. una carga
+    masiva de citas): una consulta localiza las filas existentes, un UPDATE
+    en modo executemany las incrementa y un INSERT crea las que faltan.
+
+    Args:
+        modelo: ResumenDiarioCitas o ResumenMensualCitas
+        clave_columnas (list): Columnas de la clave del resumen
+        filtros (tuple[int]): Posiciones de la clave que acotan la búsqueda
+            de filas existentes (día y profesional, o mes)
+        filas (list[tuple]): (clave, citas, consultas)
+        signo (int): 1 para sumar, -1 para restar
+    """
+    tabla = modelo.__table__
+    existentes = {}
+    for fila in db.session.execute(
+        select(tabla.c.id, *clave_columnas).where(*(
+            clave_columnas[posicion].in_({clave[posicion] for clave, _, _ in filas})
+            for posicion in filtros
+        )).order_by(tabla.c.id)
+    ):
+        existentes.setdefault(tuple(fila[1:]), fila.id)  # Una sola fila por clave, como en el caso simple
+
+    incrementos = []
+    nuevas = []
+    for clave, citas, consultas in filas:
+        if clave in existentes:
+            incrementos.append({'id_resumen': existentes[clave], 'citas': signo * citas,
+                                'consultas': signo * consultas})
+        else:
+            nuevas.append(dict(
+                {columna.key: valor for columna, valor in zip(clave_columnas, clave)},
+                total_citas=signo * citas,
+                total_consultas=signo * consultas,
+            ))
+
+    if incrementos:
+        db.session.execute(
+            update(tabla).where(tabla.c.id == bindparam('id_resumen')).values(
+                total_citas=tabla.c.total_citas + bindparam('citas'),
+                total_consultas=tabla.c.total_consultas + bindparam('consultas'),
+            ),
+            incrementos,
+        )
+    if nuevas:
+        db.session.execute(insert(tabla), nuevas)
+
+
+def sumar_al_resumen(condicion):
+    """
+    Agrega al resumen las citas que cumplen la condición (p. ej. una cita nueva).
+
+    Debe llamarse antes del commit; si la condición usa el ID de un objeto
+    nuevo, hacer flush antes de construirla para que el ID esté asignado.
+
+    Args:
+        condicion: Filtro sobre las tablas base, p. ej. Cita.id == cita.id
+    """
+    db.session.flush()
+    _aplicar_contribuciones(condicion, 1)
+
+
+@contextmanager
+def recalcular_resumen(condicion):
+    """
+    Context manager que mueve en el resumen las citas modificadas en el bloque.
+
+    Al entrar resta la contribución actual de las citas que cumplen la
+    condición; al salir hace flush de los cambios del bloque y suma la nueva
+    contribución. El commit queda a cargo del servicio que lo invoca, de modo
+    que el resumen y las tablas base se confirman en la misma transacción.
+
+    Args:
+        condicion: Filtro sobre las tablas base, p. ej. Cita.paciente_id == 5
+    """
+    db.session.flush()
+    _aplicar_contribuciones(condicion, -1)
+    yield
+    db.session.flush()
+    _aplicar_contribuciones(condicion, 1)
+
+
+def _reconstruir_mensual(ejecutar):
+    """
+    Recalcula el resumen mensual plegando el resumen diario por mes.
+
+    Args:
+        ejecutar: Función que ejecuta una sentencia (Connection.execute o
+            db.session.execute)
+    """
+    año = extract('year', ResumenDiarioCitas.dia)
+    mes = extract('month', ResumenDiarioCitas.dia)
+    dimensiones = [ResumenDiarioCitas.tipo_cita, ResumenDiarioCitas.carrera,
+                   ResumenDiarioCitas.nivel_riesgo, ResumenDiarioCitas.estado]
+    filas = ejecutar(select(
+        año, mes, *dimensiones,
+        func.sum(ResumenDiarioCitas.total_citas),
+        func.sum(ResumenDiarioCitas.total_consultas),
+    ).group_by(año, mes, *dimensiones)).all()
+
+    ejecutar(delete(ResumenMensualCitas.__table__))
+    if filas:
+        ejecutar(insert(ResumenMensualCitas.__table__), [
+            {'mes': date(int(a), int(m), 1), 'tipo_cita': tipo, 'carrera': carrera,
+             'nivel_riesgo': nivel, 'estado': estado,
+             'total_citas': citas, 'total_consultas': consultas}
+            for a, m, tipo, carrera, nivel, estado, citas, consultas in filas
+        ])
+
+
+def reconstruir_resumen_mensual(conexion=None):
+    """
+    Recalcula por completo el resumen mensual a partir del resumen diario.
+
+    Se usa al crear la tabla (migración 7); reconstruir_resumen_diario ya
+    recalcula ambos.
+
+    Args:
+        conexion (Connection, opcional): Conexión en transacción; por defecto
+            se usa la sesión actual y se confirma al terminar
+
+    Returns:
+        int: Número de filas del resumen mensual generadas
+    """
+    conteo = select(func.count()).select_from(ResumenMensualCitas.__table__)
+    if conexion is not None:
+        _reconstruir_mensual(conexion.execute)
+        return conexion.execute(conteo).scalar()
+
+    _reconstruir_mensual(db.session.execute)
+    db.session.commit()
+    return db.session.execute(conteo).scalar()
+
+
+def reconstruir_resumen_diario(conexion=None):
+    """
+    Recalcula por completo los resúmenes diario y mensual a partir de las
+    tablas base.
+
+    Se usa al crear la tabla (migración 3), después de cargas masivas que no
+    pasan por los servicios y para compactar filas con contadores en cero.
+
+    Args:
+        conexion (Connection, opcional): Conexión en transacción; por defecto
+            se usa la sesión actual y se confirma al terminar
+
+    Returns:
+        int: Número de filas del resumen diario generadas
+    """
+    columnas = [c.key for c in _CLAVE_RESUMEN] + ['total_citas', 'total_consultas']
+    sentencias = [
+        delete(ResumenDiarioCitas.__table__),
+        insert(ResumenDiarioCitas.__table__).from_select(columnas, _consulta_contribuciones()),
+    ]
+    conteo = select(func.count()).select_from(ResumenDiarioCitas.__table__)
+
+    if conexion is not None:
+        for sentencia in sentencias:
+            conexion.execute(sentencia)
+        if inspect(conexion).has_table(ResumenMensualCitas.__tablename__):
+            _reconstruir_mensual(conexion.execute)  # Al migrar desde antes de la 7 aún no existe
+        return conexion.execute(conteo).scalar()
+
+    for sentencia in sentencias:
+        db.session.execute(sentencia)
+    _reconstruir_mensual(db.session.execute)
+    db.session.commit()
+    return db.session.execute(conteo).scalar()
+
+
+def registrar_comandos(app):
+    """Registra el comando `flask resumen-diario` en la aplicación."""
+    import click
+
+    @app.cli.command('resumen-diario')
+    @click.option('--reconstruir', is_flag=True, help='Recalcular el resumen desde las tablas base.')
+    def comando_resumen_diario(reconstruir):
+        """Muestra o reconstruye el resumen diario de citas."""
+        if reconstruir:
+            filas = reconstruir_resumen_diario()
+            mensuales = db.session.scalar(select(func.count(ResumenMensualCitas.id)))
+            click.echo(f'Resumen diario reconstruido: {filas} filas ({mensuales} mensuales).')
+            return
+
+        filas, citas, consultas = db.session.execute(select(
+            func.count(ResumenDiarioCitas.id),
+            func.coalesce(func.sum(ResumenDiarioCitas.total_citas), 0),
+            func.coalesce(func.sum(ResumenDiarioCitas.total_consultas), 0),
+        )).one()
+        click.echo(f'{filas} filas de resumen: {citas} citas, {consultas} consultas.')
@@ -1,15 +1,53 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-import plotly.graph_objects as go
-import plotly.express as px
-import json
-import plotly
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
 from app import db
-from modelos import Usuario, Paciente, Cita, Consulta, RolUsuario
+from modelos import Usuario, Paciente, Cita, Consulta, TipoCita
 from formularios import FormularioLogin, FormularioRegistro, FormularioPaciente, FormularioCita, FormularioConsulta
 from servicios import ServicioAutenticacion, ServicioPaciente, ServicioCita, ServicioConsulta, ServicioReporte
 from decoradores import requiere_login, requiere_administrador, requiere_profesional
+from perfiles_carga import aplicar_perfil
+from paginacion import LIMITE_POR_DEFECTO
+from cache_reportes import cache_reportes
+from sesion_usuarios import cache_sesiones
+from autenticacion_concurrente import LoginBloqueado, VerificacionSaturada
+from exportacion_csv import respuesta_csv, CONJUNTOS as CONJUNTOS_EXPORTABLES
+from graficos import GRAFICOS, cache_graficos, respuesta_grafico, respuesta_series
+from ejecutor_reportes import ejecutor_reportes, PlazoReporteExcedido
+from agenda_profesionales import FranjaOcupada, ESTADO_CANCELADA
+
+def _ejecutar_reporte(tareas):
+    """
+    Ejecuta en paralelo las consultas independientes de una página de reportes.
+
+    Si el plazo se agota, avisa al usuario y retorna solo los resultados
+    disponibles: la plantilla muestra vacías las secciones que faltan.
+    """
+    try:
+        return ejecutor_reportes.ejecutar(tareas)
+    except PlazoReporteExcedido as e:
+        flash('Algunas estadísticas tardaron demasiado y no se muestran. Intente nuevamente en unos segundos.', 'warning')
+        return e.parciales
+
+def _parametros_paginacion():
+    """Lee el cursor y el tamaño de página de la URL actual"""
+    return {
+        'cursor': request.args.get('cursor') or None,
+        'limite': request.args.get('limite', LIMITE_POR_DEFECTO, type=int)
+    }
+
+def _graficos_disponibles(ids_por_clave):
+    """JSON de cada gráfico con datos, por clave de plantilla (se omiten los vacíos)"""
+    graficos = {}
+    for clave, grafico_id in ids_por_clave.items():
+        grafico_json = cache_graficos.json_grafico(grafico_id)
+        if grafico_json:
+            graficos[clave] = grafico_json
+    return graficos
+
+def _ids_con_datos(datos, ids_por_clave):
+    """ID de gráfico por clave de plantilla, solo para las secciones con datos"""
+    return {clave: grafico_id for clave, grafico_id in ids_por_clave.items() if datos.get(clave)}
 
 def registrar_rutas(app):
     """Registra todas las rutas de la aplicación"""
@@ -25,10 +63,20 @@ def registrar_rutas(app):
         
         form = FormularioLogin()
         if form.validate_on_submit():
-            usuario = ServicioAutenticacion.autenticar_usuario(
-                form.identificador.data,
-                form.password.data
-            )
+            try:
+                usuario = ServicioAutenticacion.autenticar_usuario(
+                    form.identificador.data,
+                    form.password.data,
+                    ip=request.remote_addr,
+                    usuario=form.usuario  # Ya resuelto al validar el formulario
+                )
+            except LoginBloqueado as e:
+                minutos = max(1, -(-e.reintentar_en // 60))
+                flash(f'Demasiados intentos fallidos. Intente nuevamente en {minutos} minuto(s).', 'danger')
+                return render_template('login.html', form=form), 429
+            except VerificacionSaturada:
+                flash('El servicio de inicio de sesión está ocupado. Intente nuevamente en unos segundos.', 'warning')
+                return render_template('login.html', form=form), 503
             
             if usuario:
                 login_user(usuario)
@@ -114,8 +162,43 @@ def registrar_rutas(app):
             return redirect(url_for('pacientes.lista_profesional'))
         
         # Solo administradores llegan aquí
-        pacientes = ServicioPaciente.obtener_pacientes()
-        return render_template('pacientes/lista.html', pacientes=pacientes)
+        termino = request.args.get('q', '').strip()
+        if termino:
+            # Búsqueda por relevancia: la página trae (paciente, puntaje)
+            pagina = ServicioPaciente.buscar_pacientes(termino, **_parametros_paginacion())
+            pacientes = [resultado.paciente for resultado in pagina.items]
+        else:
+            pagina = ServicioPaciente.obtener_pacientes_paginados(perfil='lista_pacientes', **_parametros_paginacion())
+            pacientes = pagina.items
+        return render_template('pacientes/lista.html', pacientes=pacientes, pagina=pagina, termino=termino)
+    
+    @pacientes_bp.route('/api/buscar')
+    @requiere_login
+    def api_buscar():
+        """API de búsqueda de pacientes al teclear (q: prefijo del nombre o del código de matrícula)"""
+        if current_user.es_paciente():
+            return jsonify({'error': 'No tiene permisos para buscar pacientes'}), 403
+        limite = min(max(request.args.get('limite', 10, type=int), 1), 20)
+        resultados = ServicioPaciente.buscar_para_seleccion(request.args.get('q', ''), limite)
+        return jsonify({'resultados': [{'id': paciente_id, 'texto': texto} for paciente_id, texto in resultados]})
+    
+    @pacientes_bp.route('/api/busqueda')
+    @requiere_administrador
+    def api_busqueda():
+        """API de búsqueda de pacientes por relevancia, como la de la lista (solo administradores)"""
+        pagina = ServicioPaciente.buscar_pacientes(request.args.get('q', ''), **_parametros_paginacion())
+        return jsonify({
+            'resultados': [{
+                'id': resultado.paciente.id,
+                'nombre': resultado.paciente.usuario.nombre,
+                'codigo_matricula': resultado.paciente.usuario.codigo_matricula,
+                'dni': resultado.paciente.usuario.dni,
+                'carrera': resultado.paciente.carrera,
+                'procedencia': resultado.paciente.procedencia,
+                'puntaje': resultado.puntaje
+            } for resultado in pagina.items],
+            'cursor_siguiente': pagina.cursor_siguiente
+        })
     
     @pacientes_bp.route('/perfil')
     @requiere_login
@@ -163,17 +246,11 @@ def registrar_rutas(app):
     @pacientes_bp.route('/lista-profesional')
     @requiere_profesional
     def lista_profesional():
-        """Lista de pacientes asignados al profesional"""
-        # Obtener pacientes que tienen citas con este profesional
-        from sqlalchemy import distinct
-        pacientes_ids = db.session.query(distinct(Cita.paciente_id)).filter_by(profesional_id=current_user.id).all()
-        pacientes_ids = [p[0] for p in pacientes_ids]
-        
-        pacientes = []
-        if pacientes_ids:
-            pacientes = Paciente.query.filter(Paciente.id.in_(pacientes_ids)).all()
-        
-        return render_template('pacientes/lista_profesional.html', pacientes=pacientes)
+        """Lista de pacientes asignados al profesional (los que tienen citas con él)"""
+        pagina = ServicioPaciente.obtener_pacientes_paginados(
+            perfil='lista_pacientes', profesional_id=current_user.id, **_parametros_paginacion()
+        )
+        return render_template('pacientes/lista_profesional.html', pacientes=pagina.items, pagina=pagina)
     
     # Blueprint para citas
     citas_bp = Blueprint('citas', __name__, url_prefix='/citas')
@@ -190,15 +267,17 @@ def registrar_rutas(app):
             return redirect(url_for('citas.lista_profesional'))
         
         # Solo administradores llegan aquí
-        citas = ServicioCita.obtener_citas()
-        return render_template('citas/lista.html', citas=citas)
+        pagina = ServicioCita.obtener_citas_paginadas(perfil='lista_citas', **_parametros_paginacion())
+        return render_template('citas/lista.html', citas=pagina.items, pagina=pagina)
     
     @citas_bp.route('/lista-profesional')
     @requiere_profesional
     def lista_profesional():
         """Lista de citas para profesionales"""
-        citas = ServicioCita.obtener_citas_por_profesional(current_user.id)
-        return render_template('citas/lista_profesional.html', citas=citas)
+        pagina = ServicioCita.obtener_citas_paginadas(
+            perfil='lista_citas', profesional_id=current_user.id, **_parametros_paginacion()
+        )
+        return render_template('citas/lista_profesional.html', citas=pagina.items, pagina=pagina)
     
     @citas_bp.route('/lista-paciente')
     @requiere_login
@@ -208,12 +287,14 @@ def registrar_rutas(app):
             flash('Solo los pacientes pueden ver esta página', 'danger')
             return redirect(url_for('main.dashboard'))
         
-        if not current_user.paciente:
+        if not current_user.paciente_id:
             flash('Complete su perfil de paciente primero', 'warning')
             return redirect(url_for('pacientes.completar_perfil'))
         
-        citas = ServicioCita.obtener_citas_por_paciente(current_user.paciente.id)
-        return render_template('citas/lista_paciente.html', citas=citas)
+        pagina = ServicioCita.obtener_citas_paginadas(
+            perfil='lista_citas', paciente_id=current_user.paciente_id, **_parametros_paginacion()
+        )
+        return render_template('citas/lista_paciente.html', citas=pagina.items, pagina=pagina)
     
     @citas_bp.route('/crear', methods=['GET', 'POST'])
     @requiere_login
@@ -221,12 +302,14 @@ def registrar_rutas(app):
         """Crear nueva cita"""
         form = FormularioCita()
         
-        # Poblar choices para select fields
-        pacientes = ServicioPaciente.obtener_pacientes()
-        profesionales = Usuario.query.filter_by(rol=RolUsuario.PROFESIONAL, activo=True).all()
-        
-        form.paciente_id.choices = [(p.id, f"{p.usuario.nombre} - {p.carrera}") for p in pacientes]
-        form.profesional_id.choices = [(p.id, p.nombre) for p in profesionales]
+        # Poblar choices para select fields: profesionales desde la caché; de los
+        # pacientes solo el elegido (el resto se busca al teclear en api_buscar)
+        form.profesional_id.choices = ServicioCita.opciones_profesionales()
+        if current_user.es_paciente():
+            paciente_id = current_user.paciente_id
+        else:
+            paciente_id = request.form.get('paciente_id', type=int) or request.args.get('paciente_id', type=int)
+        form.paciente_id.choices = ServicioPaciente.opcion_paciente(paciente_id)
         
         if form.validate_on_submit():
             try:
@@ -241,16 +324,58 @@ def registrar_rutas(app):
                 
                 flash('Cita creada exitosamente', 'success')
                 return redirect(url_for('citas.lista'))
+            except FranjaOcupada as e:
+                flash(f'{e}. Elija otro horario.', 'warning')
             except Exception as e:
                 flash('Error al crear cita', 'danger')
         
         return render_template('citas/crear.html', form=form)
     
+    @citas_bp.route('/api/disponibilidad')
+    @requiere_login
+    def api_disponibilidad():
+        """API de franjas libres (fecha_inicio, fecha_fin, profesional_id y tipo_cita opcionales)"""
+        from datetime import date, timedelta
+        from agenda_profesionales import MAXIMO_DIAS_BUSQUEDA
+        fecha_inicio = request.args.get('fecha_inicio', type=date.fromisoformat) or date.today()
+        fecha_fin = request.args.get('fecha_fin', type=date.fromisoformat) or fecha_inicio + timedelta(days=30)
+        if fecha_fin < fecha_inicio or (fecha_fin - fecha_inicio).days >= MAXIMO_DIAS_BUSQUEDA:
+            return jsonify({'error': f'El rango debe tener entre 1 y {MAXIMO_DIAS_BUSQUEDA} días'}), 400
+        tipo_cita = request.args.get('tipo_cita') or None
+        if tipo_cita and tipo_cita not in TipoCita.__members__:
+            return jsonify({'error': f'Tipo de cita no válido: {tipo_cita}'}), 400
+
+        profesionales = ServicioCita.buscar_disponibilidad(
+            fecha_inicio, fecha_fin,
+            profesional_id=request.args.get('profesional_id', type=int),
+            tipo_cita=tipo_cita
+        )
+        return jsonify({'fecha_inicio': fecha_inicio.isoformat(), 'fecha_fin': fecha_fin.isoformat(),
+                        'profesionales': profesionales})
+
+    @citas_bp.route('/programacion-masiva', methods=['POST'])
+    @requiere_administrador
+    def programacion_masiva():
+        """API de programación en bloque: JSON {"citas": [...]} o CSV (campo archivo o cuerpo text/csv)"""
+        if request.is_json:
+            datos = request.get_json(silent=True)
+            citas = datos.get('citas') if isinstance(datos, dict) else datos
+            if not isinstance(citas, list):
+                return jsonify({'error': 'Se esperaba una lista de citas en "citas"'}), 400
+            resultado = ServicioCita.programar_citas_masivas(citas=citas)
+        elif 'archivo' in request.files:
+            resultado = ServicioCita.programar_citas_masivas(archivo_csv=request.files['archivo'].stream)
+        elif request.mimetype == 'text/csv':
+            resultado = ServicioCita.programar_citas_masivas(archivo_csv=request.stream)
+        else:
+            return jsonify({'error': 'Envíe JSON, un archivo CSV en "archivo" o un cuerpo text/csv'}), 400
+        return jsonify(resultado), 200 if resultado['exitoso'] else 400
+
     @citas_bp.route('/<int:cita_id>')
     @requiere_login
     def detalle(cita_id):
         """Detalle de una cita"""
-        cita = Cita.query.get_or_404(cita_id)
+        cita = aplicar_perfil(Cita.query.filter_by(id=cita_id), 'detalle_cita').first_or_404()
         
         # Verificar permisos
         if current_user.es_paciente() and cita.paciente.usuario_id != current_user.id:
@@ -269,18 +394,18 @@ def registrar_rutas(app):
     @requiere_login
     def lista():
         """Lista de consultas"""
-        if current_user.es_administrador():
-            consultas = ServicioConsulta.obtener_consultas()
-        elif current_user.es_profesional():
+        filtros = {}
+        if current_user.es_profesional():
             # Obtener consultas de citas del profesional
-            consultas = Consulta.query.join(Cita).filter(Cita.profesional_id == current_user.id).all()
-        else:  # Paciente
-            if not current_user.paciente:
+            filtros['profesional_id'] = current_user.id
+        elif not current_user.es_administrador():  # Paciente
+            if not current_user.paciente_id:
                 flash('Complete su perfil de paciente primero', 'warning')
                 return redirect(url_for('pacientes.completar_perfil'))
-            consultas = ServicioConsulta.obtener_consultas_por_paciente(current_user.paciente.id)
+            filtros['paciente_id'] = current_user.paciente_id
         
-        return render_template('consultas/lista.html', consultas=consultas)
+        pagina = ServicioConsulta.obtener_consultas_paginadas(perfil='lista_consultas', **filtros, **_parametros_paginacion())
+        return render_template('consultas/lista.html', consultas=pagina.items, pagina=pagina)
     
     @consultas_bp.route('/crear/<int:cita_id>', methods=['GET', 'POST'])
     @requiere_profesional
@@ -298,6 +423,11 @@ def registrar_rutas(app):
             flash('Esta cita ya tiene una consulta registrada', 'warning')
             return redirect(url_for('citas.detalle', cita_id=cita_id))
         
+        # Una cita cancelada ya liberó su franja: no se completa
+        if cita.estado == ESTADO_CANCELADA:
+            flash('No se puede registrar una consulta en una cita cancelada', 'warning')
+            return redirect(url_for('citas.detalle', cita_id=cita_id))
+        
         form = FormularioConsulta()
         if form.validate_on_submit():
             try:
@@ -310,6 +440,8 @@ def registrar_rutas(app):
                 
                 flash('Consulta registrada exitosamente', 'success')
                 return redirect(url_for('citas.detalle', cita_id=cita_id))
+            except ValueError as e:
+                flash(str(e), 'warning')
             except Exception as e:
                 flash('Error al registrar consulta', 'danger')
         
@@ -322,23 +454,26 @@ def registrar_rutas(app):
     @requiere_administrador
     def dashboard_admin():
         """Dashboard administrativo principal con resumen general"""
-        resumen = ServicioReporte.obtener_resumen_dashboard()
-        estadisticas_citas = ServicioReporte.obtener_estadisticas_citas()
-        tendencia_mensual = ServicioReporte.obtener_tendencia_mensual_citas()
-        niveles_riesgo = ServicioReporte.obtener_niveles_riesgo()
+        datos = _ejecutar_reporte({
+            'resumen': ServicioReporte.obtener_resumen_dashboard,
+            'estadisticas_citas': ServicioReporte.obtener_estadisticas_citas,
+            'tendencia_mensual': ServicioReporte.obtener_tendencia_mensual_citas,
+            'niveles_riesgo': ServicioReporte.obtener_niveles_riesgo,
+        })
         
         return render_template('reportes/dashboard.html', 
-                             resumen=resumen,
-                             estadisticas_citas=estadisticas_citas,
-                             tendencia_mensual=tendencia_mensual,
-                             niveles_riesgo=niveles_riesgo)
+                             resumen=datos.get('resumen', {}),
+                             estadisticas_citas=datos.get('estadisticas_citas', {}),
+                             tendencia_mensual=datos.get('tendencia_mensual', {'meses': [], 'totales': []}),
+                             niveles_riesgo=datos.get('niveles_riesgo', {}))
     
     @reportes_bp.route('/usuarios')
     @requiere_administrador
     def gestion_usuarios():
         """Gestión de usuarios del sistema"""
-        usuarios = Usuario.query.all()
-        return render_template('reportes/usuarios.html', usuarios=usuarios)
+        pagina = ServicioAutenticacion.obtener_usuarios_paginados(**_parametros_paginacion())
+        resumen = ServicioAutenticacion.obtener_resumen_usuarios()
+        return render_template('reportes/usuarios.html', usuarios=pagina.items, pagina=pagina, resumen=resumen)
     
     @reportes_bp.route('/usuarios/<int:usuario_id>/toggle-activo')
     @requiere_administrador
@@ -347,6 +482,8 @@ def registrar_rutas(app):
         usuario = Usuario.query.get_or_404(usuario_id)
         usuario.activo = not usuario.activo
         db.session.commit()
+        cache_reportes.invalidar('usuarios')  # Alertas y reportes de profesionales
+        cache_sesiones.invalidar(usuario.id)  # La sesión del usuario ve el nuevo estado
         
         estado = "activado" if usuario.activo else "desactivado"
         flash(f'Usuario {usuario.nombre} {estado} correctamente', 'success')
@@ -440,14 +577,14 @@ def registrar_rutas(app):
     @requiere_administrador
     def estadisticas_detalladas():
         """Página de estadísticas detalladas"""
-        estadisticas = {
-            'citas_por_mes': ServicioReporte.obtener_tendencia_mensual_citas(),
-            'consultas_por_carrera': ServicioReporte.obtener_estadisticas_consultas_por_carrera(),
-            'niveles_riesgo': ServicioReporte.obtener_niveles_riesgo(),
-            'profesionales_activos': ServicioReporte.obtener_estadisticas_profesionales(),
-            'citas_por_tipo': ServicioReporte.obtener_estadisticas_citas_por_tipo(),
-            'horarios_populares': ServicioReporte.obtener_horarios_populares()
-        }
+        estadisticas = _ejecutar_reporte({
+            'citas_por_mes': ServicioReporte.obtener_tendencia_mensual_citas,
+            'consultas_por_carrera': ServicioReporte.obtener_estadisticas_consultas_por_carrera,
+            'niveles_riesgo': ServicioReporte.obtener_niveles_riesgo,
+            'profesionales_activos': ServicioReporte.obtener_estadisticas_profesionales,
+            'citas_por_tipo': ServicioReporte.obtener_estadisticas_citas_por_tipo,
+            'horarios_populares': ServicioReporte.obtener_horarios_populares
+        })
         return render_template('reportes/estadisticas.html', estadisticas=estadisticas)
     
     @reportes_bp.route('/reportes-exportar')
@@ -495,8 +632,17 @@ def registrar_rutas(app):
     @reportes_bp.route('/api/profesionales-rendimiento')
     @requiere_administrador
     def api_profesionales_rendimiento():
-        """API para rendimiento de profesionales"""
-        rendimiento = ServicioReporte.obtener_rendimiento_profesionales()
+        """API para rendimiento de profesionales (filtros opcionales: fecha_inicio, fecha_fin, tipo_cita)"""
+        from datetime import date
+        tipo_cita = request.args.get('tipo_cita') or None
+        if tipo_cita and tipo_cita not in TipoCita.__members__:
+            return jsonify({'error': f'Tipo de cita no válido: {tipo_cita}'}), 400
+
+        rendimiento = ServicioReporte.obtener_rendimiento_profesionales(
+            fecha_inicio=request.args.get('fecha_inicio', type=date.fromisoformat),
+            fecha_fin=request.args.get('fecha_fin', type=date.fromisoformat),
+            tipo_cita=tipo_cita
+        )
         return jsonify(rendimiento)
     
     @reportes_bp.route('/api/horarios-populares')
@@ -512,6 +658,57 @@ def registrar_rutas(app):
         """API para alertas del sistema"""
         alertas = ServicioReporte.obtener_alertas_sistema()
         return jsonify(alertas)
+
+    @reportes_bp.route('/api/dashboard')
+    @requiere_administrador
+    def api_dashboard():
+        """API con varios widgets del dashboard en una sola respuesta (parámetro widgets=a,b,c; todos por defecto)"""
+        widgets = list(dict.fromkeys(
+            w.strip() for w in request.args.get('widgets', '').split(',') if w.strip()
+        )) or list(ServicioReporte.WIDGETS_DASHBOARD)
+        desconocidos = [w for w in widgets if w not in ServicioReporte.WIDGETS_DASHBOARD]
+        if desconocidos:
+            return jsonify({'error': 'Widgets desconocidos',
+                            'desconocidos': desconocidos,
+                            'disponibles': list(ServicioReporte.WIDGETS_DASHBOARD)}), 400
+        return jsonify({'widgets': ServicioReporte.obtener_widgets_dashboard(widgets)})
+
+    @reportes_bp.route('/api/pronostico')
+    @requiere_administrador
+    def api_pronostico():
+        """API con el pronóstico diario de citas (parámetro opcional: horizonte en días, 1-365)"""
+        horizonte = request.args.get('horizonte', 30, type=int)
+        if not 1 <= horizonte <= 365:
+            return jsonify({'error': 'El horizonte debe estar entre 1 y 365 días'}), 400
+        return jsonify(ServicioReporte.obtener_pronostico_demanda(horizonte=horizonte))
+    
+    @reportes_bp.route('/api/cache-reportes')
+    @requiere_administrador
+    def api_cache_reportes():
+        """API con los aciertos y fallos de la caché de reportes de este proceso"""
+        return jsonify(cache_reportes.estadisticas())
+    
+    @reportes_bp.route('/api/graficos')
+    @reportes_bp.route('/api/graficos/<grafico_id>')
+    @requiere_administrador
+    def api_series_graficos(grafico_id=None):
+        """API con las series compactas de uno o varios gráficos (parámetro ids=a,b,c)"""
+        ids = [grafico_id] if grafico_id else list(dict.fromkeys(
+            i.strip() for i in request.args.get('ids', '').split(',') if i.strip()
+        ))
+        desconocidos = [i for i in ids if i not in GRAFICOS]
+        if not ids or desconocidos:
+            return jsonify({'error': 'Gráficos desconocidos o no indicados',
+                            'desconocidos': desconocidos,
+                            'disponibles': list(GRAFICOS)}), 400 if not grafico_id else 404
+        return respuesta_series(ids)
+    
+    @reportes_bp.route('/api/pool-conexiones')
+    @requiere_administrador
+    def api_pool_conexiones():
+        """API con las métricas del pool de conexiones del worker que atiende la solicitud"""
+        from pool_conexiones import metricas_pool
+        return jsonify(metricas_pool())
     
     # === RUTAS PARA GESTIÓN DE RESPALDO CSV ===
     
@@ -566,33 +763,26 @@ def registrar_rutas(app):
         return redirect(url_for('reportes.gestion_respaldo_csv'))
     
     # === RUTAS PARA GRÁFICOS DE PLOTLY ===
+    # Las figuras se construyen en graficos.py y su JSON se reutiliza mientras los datos no cambien
+    
+    @reportes_bp.route('/graficos/<grafico_id>.json')
+    @requiere_administrador
+    def grafico_json(grafico_id):
+        """JSON de un gráfico con ETag (304 si los datos no cambiaron)"""
+        if grafico_id not in GRAFICOS:
+            abort(404)
+        return respuesta_grafico(grafico_id)
     
     @reportes_bp.route('/graficos/citas-por-tipo')
     @requiere_administrador
     def grafico_citas_por_tipo():
         """Gráfico de citas por tipo de consulta"""
-        datos = ServicioReporte.obtener_estadisticas_citas()
-        
-        # Crear gráfico de barras con Plotly
-        fig = go.Figure(data=[
-            go.Bar(
-                x=list(datos.keys()),
-                y=list(datos.values()),
-                marker_color=['#28a745', '#17a2b8', '#dc3545'],
-                text=list(datos.values()),
-                textposition='auto',
-            )
-        ])
-        
-        fig.update_layout(
-            title='Distribución de Citas por Tipo de Consulta',
-            xaxis_title='Tipo de Consulta',
-            yaxis_title='Número de Citas',
-            template='plotly_white',
-            height=400
-        )
+        grafico_json = cache_graficos.json_grafico('citas-por-tipo')
+        
+        if not grafico_json:
+            flash('No hay datos de citas por tipo disponibles', 'warning')
+            return redirect(url_for('reportes.dashboard_admin'))
         
-        grafico_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
         return render_template('reportes/grafico_plotly.html', 
                              grafico_json=grafico_json, 
                              titulo='Citas por Tipo')
@@ -601,30 +791,12 @@ def registrar_rutas(app):
     @requiere_administrador
     def grafico_consultas_por_carrera():
         """Gráfico de consultas por carrera universitaria"""
-        datos = ServicioReporte.obtener_estadisticas_consultas_por_carrera()
+        grafico_json = cache_graficos.json_grafico('consultas-por-carrera')
         
-        if not datos:
+        if not grafico_json:
             flash('No hay datos de consultas por carrera disponibles', 'warning')
             return redirect(url_for('reportes.dashboard_admin'))
         
-        # Crear gráfico de torta con Plotly
-        fig = go.Figure(data=[
-            go.Pie(
-                labels=list(datos.keys()),
-                values=list(datos.values()),
-                hole=0.3,
-                textinfo='label+percent',
-                textposition='outside'
-            )
-        ])
-        
-        fig.update_layout(
-            title='Consultas Médicas por Carrera Universitaria',
-            template='plotly_white',
-            height=500
-        )
-        
-        grafico_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
         return render_template('reportes/grafico_plotly.html', 
                              grafico_json=grafico_json, 
                              titulo='Consultas por Carrera')
@@ -633,33 +805,12 @@ def registrar_rutas(app):
     @requiere_administrador
     def grafico_tendencia_mensual():
         """Gráfico de tendencia mensual de citas"""
-        datos = ServicioReporte.obtener_tendencia_mensual_citas()
+        grafico_json = cache_graficos.json_grafico('tendencia-mensual')
         
-        if not datos:
+        if not grafico_json:
             flash('No hay datos de tendencia mensual disponibles', 'warning')
             return redirect(url_for('reportes.dashboard_admin'))
         
-        # Crear gráfico de líneas con Plotly
-        fig = go.Figure(data=[
-            go.Scatter(
-                x=datos.get('meses', []),
-                y=datos.get('totales', []),
-                mode='lines+markers',
-                line=dict(color='#007bff', width=3),
-                marker=dict(size=8),
-                name='Citas por Mes'
-            )
-        ])
-        
-        fig.update_layout(
-            title='Tendencia Mensual de Citas Médicas',
-            xaxis_title='Mes',
-            yaxis_title='Número de Citas',
-            template='plotly_white',
-            height=400
-        )
-        
-        grafico_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
         return render_template('reportes/grafico_plotly.html', 
                              grafico_json=grafico_json, 
                              titulo='Tendencia Mensual')
@@ -668,70 +819,11 @@ def registrar_rutas(app):
     @requiere_administrador
     def dashboard_graficos_completo():
         """Dashboard completo con múltiples gráficos"""
-        # Obtener todos los datos
-        citas_por_tipo = ServicioReporte.obtener_estadisticas_citas()
-        consultas_por_carrera = ServicioReporte.obtener_estadisticas_consultas_por_carrera()
-        tendencia_mensual = ServicioReporte.obtener_tendencia_mensual_citas()
-        
-        # Crear múltiples gráficos
-        graficos = {}
-        
-        # Gráfico 1: Citas por tipo
-        if citas_por_tipo:
-            fig1 = go.Figure(data=[
-                go.Bar(
-                    x=list(citas_por_tipo.keys()),
-                    y=list(citas_por_tipo.values()),
-                    marker_color=['#28a745', '#17a2b8', '#dc3545'],
-                    text=list(citas_por_tipo.values()),
-                    textposition='auto',
-                )
-            ])
-            fig1.update_layout(
-                title='Citas por Tipo de Consulta',
-                xaxis_title='Tipo',
-                yaxis_title='Cantidad',
-                template='plotly_white',
-                height=300
-            )
-            graficos['citas_tipo'] = json.dumps(fig1, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 2: Consultas por carrera
-        if consultas_por_carrera:
-            fig2 = go.Figure(data=[
-                go.Pie(
-                    labels=list(consultas_por_carrera.keys()),
-                    values=list(consultas_por_carrera.values()),
-                    hole=0.3
-                )
-            ])
-            fig2.update_layout(
-                title='Consultas por Carrera',
-                template='plotly_white',
-                height=300
-            )
-            graficos['consultas_carrera'] = json.dumps(fig2, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 3: Tendencia mensual
-        if tendencia_mensual:
-            fig3 = go.Figure(data=[
-                go.Scatter(
-                    x=tendencia_mensual.get('meses', []),
-                    y=tendencia_mensual.get('totales', []),
-                    mode='lines+markers',
-                    line=dict(color='#007bff', width=3),
-                    marker=dict(size=6)
-                )
-            ])
-            fig3.update_layout(
-                title='Tendencia Mensual',
-                xaxis_title='Mes',
-                yaxis_title='Citas',
-                template='plotly_white',
-                height=300
-            )
-            graficos['tendencia_mensual'] = json.dumps(fig3, cls=plotly.utils.PlotlyJSONEncoder)
-        
+        graficos = _graficos_disponibles({
+            'citas_tipo': 'dashboard-citas-tipo',
+            'consultas_carrera': 'dashboard-consultas-carrera',
+            'tendencia_mensual': 'dashboard-tendencia-mensual',
+        })
         return render_template('reportes/dashboard_graficos.html', graficos=graficos)
     
     # === RUTAS PARA ANÁLISIS AVANZADO ===
@@ -741,80 +833,13 @@ def registrar_rutas(app):
     def analisis_segmentacion():
         """Análisis de segmentación de pacientes"""
         datos = ServicioReporte.obtener_datos_segmentacion()
-        
-        # Crear gráficos de segmentación
-        graficos = {}
-        
-        # Gráfico 1: Segmentación por edad
-        if datos.get('por_edad'):
-            fig1 = go.Figure(data=[
-                go.Pie(
-                    labels=list(datos['por_edad'].keys()),
-                    values=list(datos['por_edad'].values()),
-                    hole=0.4,
-                    marker=dict(colors=['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A'])
-                )
-            ])
-            fig1.update_layout(
-                title='Segmentación por Edad',
-                template='plotly_white',
-                height=400
-            )
-            graficos['por_edad'] = json.dumps(fig1, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 2: Segmentación por tipo de consulta
-        if datos.get('por_tipo_consulta'):
-            fig2 = go.Figure(data=[
-                go.Bar(
-                    x=list(datos['por_tipo_consulta'].keys()),
-                    y=list(datos['por_tipo_consulta'].values()),
-                    marker_color=['#28a745', '#17a2b8', '#dc3545', '#ffc107']
-                )
-            ])
-            fig2.update_layout(
-                title='Segmentación por Tipo de Consulta',
-                xaxis_title='Tipo de Consulta',
-                yaxis_title='Número de Pacientes',
-                template='plotly_white',
-                height=400
-            )
-            graficos['por_tipo_consulta'] = json.dumps(fig2, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 3: Segmentación por nivel de riesgo
-        if datos.get('por_riesgo'):
-            fig3 = go.Figure(data=[
-                go.Pie(
-                    labels=list(datos['por_riesgo'].keys()),
-                    values=list(datos['por_riesgo'].values()),
-                    hole=0.3,
-                    marker=dict(colors=['#28a745', '#ffc107', '#fd7e14', '#dc3545'])
-                )
-            ])
-            fig3.update_layout(
-                title='Segmentación por Nivel de Riesgo',
-                template='plotly_white',
-                height=400
-            )
-            graficos['por_riesgo'] = json.dumps(fig3, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 4: Segmentación por actividad
-        if datos.get('por_actividad'):
-            fig4 = go.Figure(data=[
-                go.Bar(
-                    x=list(datos['por_actividad'].keys()),
-                    y=list(datos['por_actividad'].values()),
-                    marker_color=['#28a745', '#6c757d']
-                )
-            ])
-            fig4.update_layout(
-                title='Segmentación por Actividad',
-                xaxis_title='Tipo de Actividad',
-                yaxis_title='Número de Pacientes',
-                template='plotly_white',
-                height=400
-            )
-            graficos['por_actividad'] = json.dumps(fig4, cls=plotly.utils.PlotlyJSONEncoder)
-        
+        # La plantilla pide las series de estos gráficos a /reportes/api/graficos
+        graficos = _ids_con_datos(datos, {
+            'por_edad': 'segmentacion-edad',
+            'por_tipo_consulta': 'segmentacion-tipo-consulta',
+            'por_riesgo': 'segmentacion-riesgo',
+            'por_actividad': 'segmentacion-actividad',
+        })
         return render_template('reportes/analisis_segmentacion.html', 
                              graficos=graficos, 
                              datos=datos)
@@ -824,86 +849,12 @@ def registrar_rutas(app):
     def analisis_prediccion():
         """Análisis predictivo de citas y consultas"""
         datos = ServicioReporte.obtener_datos_prediccion()
-        
-        # Crear gráficos predictivos
-        graficos = {}
-        
-        # Gráfico 1: Tendencia de citas con predicción
-        if datos.get('tendencia_citas'):
-            tendencia = datos['tendencia_citas']
-            
-            # Agregar mes futuro para predicción
-            meses_completos = tendencia['meses'] + ['Próximo mes']
-            valores_completos = tendencia['valores'] + [tendencia['prediccion_proximo']]
-            
-            fig1 = go.Figure()
-            
-            # Línea de datos históricos
-            fig1.add_trace(go.Scatter(
-                x=tendencia['meses'],
-                y=tendencia['valores'],
-                mode='lines+markers',
-                name='Datos Históricos',
-                line=dict(color='#007bff', width=3),
-                marker=dict(size=8)
-            ))
-            
-            # Punto de predicción
-            fig1.add_trace(go.Scatter(
-                x=['Próximo mes'],
-                y=[tendencia['prediccion_proximo']],
-                mode='markers',
-                name='Predicción',
-                marker=dict(size=12, color='#dc3545', symbol='star')
-            ))
-            
-            fig1.update_layout(
-                title='Tendencia de Citas con Predicción',
-                xaxis_title='Mes',
-                yaxis_title='Número de Citas',
-                template='plotly_white',
-                height=400
-            )
-            graficos['tendencia_citas'] = json.dumps(fig1, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 2: Patrones semanales
-        if datos.get('patrones_semanales'):
-            fig2 = go.Figure(data=[
-                go.Bar(
-                    x=list(datos['patrones_semanales'].keys()),
-                    y=list(datos['patrones_semanales'].values()),
-                    marker_color=['#4ECDC4', '#45B7D1', '#FFA07A', '#FF6B6B', '#98D8C8', '#F7DC6F', '#BB8FCE']
-                )
-            ])
-            fig2.update_layout(
-                title='Patrones de Consulta por Día de la Semana',
-                xaxis_title='Día de la Semana',
-                yaxis_title='Número de Consultas',
-                template='plotly_white',
-                height=400
-            )
-            graficos['patrones_semanales'] = json.dumps(fig2, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        # Gráfico 3: Demanda por tipo de consulta (actual vs predicción)
-        if datos.get('demanda_por_tipo'):
-            tipos = list(datos['demanda_por_tipo'].keys())
-            valores_actuales = [datos['demanda_por_tipo'][t]['actual'] for t in tipos]
-            valores_prediccion = [datos['demanda_por_tipo'][t]['prediccion'] for t in tipos]
-            
-            fig3 = go.Figure(data=[
-                go.Bar(name='Actual', x=tipos, y=valores_actuales, marker_color='#17a2b8'),
-                go.Bar(name='Predicción', x=tipos, y=valores_prediccion, marker_color='#28a745')
-            ])
-            fig3.update_layout(
-                title='Demanda por Tipo de Consulta: Actual vs Predicción',
-                xaxis_title='Tipo de Consulta',
-                yaxis_title='Número de Consultas',
-                template='plotly_white',
-                height=400,
-                barmode='group'
-            )
-            graficos['demanda_por_tipo'] = json.dumps(fig3, cls=plotly.utils.PlotlyJSONEncoder)
-        
+        # La plantilla pide las series de estos gráficos a /reportes/api/graficos
+        graficos = _ids_con_datos(datos, {
+            'tendencia_citas': 'prediccion-tendencia',
+            'patrones_semanales': 'prediccion-patrones-semanales',
+            'demanda_por_tipo': 'prediccion-demanda-tipo',
+        })
         return render_template('reportes/analisis_prediccion.html', 
                              graficos=graficos, 
                              datos=datos)
@@ -920,23 +871,20 @@ def registrar_rutas(app):
     @reportes_bp.route('/mapa/exportar-csv')
     @requiere_administrador
     def exportar_procedencia_csv():
-        """Exportar datos de procedencia a CSV"""
-        try:
-            archivo = ServicioReporte.exportar_datos_procedencia_csv()
-            
-            # Enviar archivo como descarga
-            from flask import send_file
-            import os
-            
-            return send_file(
-                archivo,
-                as_attachment=True,
-                download_name=f'procedencia_pacientes_{datetime.now().strftime("%Y%m%d")}.csv',
-                mimetype='text/csv'
-            )
-        except Exception as e:
-            flash(f'Error al exportar CSV: {str(e)}', 'error')
-            return redirect(url_for('reportes.mapa_procedencia'))
+        """Exportar datos de procedencia a CSV (en streaming, sin archivo temporal)"""
+        from datetime import date
+        return respuesta_csv(
+            'procedencia',
+            f'procedencia_pacientes_{date.today().strftime("%Y%m%d")}.csv'
+        )
+    
+    @reportes_bp.route('/exportar/<conjunto>.csv')
+    @requiere_administrador
+    def exportar_conjunto_csv(conjunto):
+        """Exportar procedencia, citas, consultas o usuarios a CSV en streaming"""
+        if conjunto not in CONJUNTOS_EXPORTABLES:
+            abort(404)
+        return respuesta_csv(conjunto)
     
     @reportes_bp.route('/mapa/importar-csv', methods=['GET', 'POST'])
     @requiere_administrador
@@ -953,27 +901,19 @@ def registrar_rutas(app):
                 return redirect(url_for('reportes.mapa_procedencia'))
             
             if archivo and archivo.filename.endswith('.csv'):
-                # Guardar archivo temporalmente
-                import tempfile
-                import os
+                # Importar directamente desde el flujo subido, por lotes
+                resultado = ServicioReporte.importar_datos_procedencia_csv(archivo.stream)
                 
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp:
-                    archivo.save(tmp.name)
-                    
-                    # Importar datos
-                    resultado = ServicioReporte.importar_datos_procedencia_csv(tmp.name)
-                    
-                    # Eliminar archivo temporal
-                    os.unlink(tmp.name)
-                    
-                    if resultado['exitoso']:
-                        flash(f'Importación exitosa: {resultado["registros_procesados"]} registros procesados', 'success')
-                        if resultado['errores']:
-                            flash(f'Advertencias: {len(resultado["errores"])} errores encontrados', 'warning')
-                    else:
-                        flash('Error en la importación', 'error')
-                        for error in resultado['errores']:
-                            flash(error, 'error')
+                if resultado['exitoso']:
+                    flash(f'Importación exitosa: {resultado["registros_procesados"]} registros procesados', 'success')
+                    if resultado['total_errores']:
+                        flash(f'Advertencias: {resultado["total_errores"]} errores encontrados', 'warning')
+                        for error in resultado['errores'][:10]:
+                            flash(error, 'warning')
+                else:
+                    flash('Error en la importación', 'error')
+                    for error in resultado['errores']:
+                        flash(error, 'error')
             else:
                 flash('El archivo debe ser formato CSV', 'error')
         
@@ -9,10 +9,24 @@ ver servicios_solid.py.
 
 # Importaciones necesarias para los servicios de negocio
 from collections import defaultdict  # Para crear diccionarios con valores por defecto
-from datetime import datetime, timedelta  # Para manejo de fechas y cálculos temporales
-from sqlalchemy import func, extract, case  # Funciones SQL para agregaciones y extracciones
+from datetime import date, datetime, timedelta  # Para manejo de fechas y cálculos temporales
+from sqlalchemy import func, case, and_  # Funciones SQL para agregaciones y extracciones
+from sqlalchemy.exc import IntegrityError  # Violación del índice único de horarios
 from app import db  # Instancia de la base de datos
-from modelos import Usuario, Paciente, Cita, Consulta, TipoCita, NivelRiesgo, RolUsuario  # Modelos de datos
+from modelos import Usuario, Paciente, Cita, Consulta, TipoCita, NivelRiesgo, RolUsuario, ResumenDiarioCitas, ResumenMensualCitas  # Modelos de datos
+from perfiles_carga import aplicar_perfil  # Perfiles de carga anticipada por vista
+from paginacion import paginar_keyset, LIMITE_POR_DEFECTO  # Paginación por cursor
+from resumen_diario import sumar_al_resumen, recalcular_resumen  # Resumen diario del dashboard
+from cache_reportes import cache_reportes  # Caché de resultados de reportes
+from replica_lectura import en_replica  # Lecturas de reportes en la réplica
+from sesion_usuarios import cache_sesiones  # Instantáneas de usuario de sesión
+from autenticacion_concurrente import pool_verificacion, limitador_intentos  # Verificación acotada de contraseñas
+from agregacion_temporal import serie_mensual, histograma_dia_semana, restar_meses  # Agregación por mes y día de la semana
+from pronostico import pronosticar_demanda  # Pronóstico vectorizado con NumPy
+from agenda_profesionales import reservar_franja, recalcular_dia, buscar_franjas_libres, es_franja_duplicada, FranjaOcupada, ESTADO_CANCELADA  # Reserva y búsqueda de horarios
+
+# Resultados por defecto de la búsqueda de pacientes al teclear
+LIMITE_SELECCION = 10
 
 # ============================================================================
 # NOTA SOBRE REFACTORING SOLID:
@@ -51,7 +65,7 @@ class ServicioAutenticacion:
     """
     
     @staticmethod
-    def autenticar_usuario(identificador, password):
+    def autenticar_usuario(identificador, password, ip=None, usuario=None):
         """
         PRINCIPIOS SOLID:
         
@@ -69,33 +83,43 @@ class ServicioAutenticacion:
         
         Autentica un usuario en el sistema usando DNI o código de matrícula.
         
-        El método intenta autenticar primero por DNI (si el identificador es numérico)
-        y luego por código de matrícula. Verifica que el usuario esté activo y que
-        la contraseña sea correcta.
+        El identificador se resuelve con una sola consulta sobre DNI (si es
+        numérico) y código de matrícula, compartida con la pila SOLID
+        (RepositorioUsuarioSQLAlchemy.obtener_por_identificador). Verifica que
+        el usuario esté activo y que la contraseña sea correcta.
+        
+        Los intentos pasan primero por el limitador de fallos por identificador
+        e IP, y el hash se verifica en el pool de procesos acotado (ver
+        autenticacion_concurrente).
         
         Args:
             identificador (str): DNI o código de matrícula del usuario
             password (str): Contraseña en texto plano del usuario
+            ip (str, opcional): Dirección del cliente para el límite por IP
+            usuario (Usuario, opcional): Usuario ya resuelto para este identificador
+                (p. ej. por FormularioLogin), para no repetir la búsqueda
             
         Returns:
             Usuario: Instancia del usuario autenticado o None si falla la autenticación
+            
+        Raises:
+            LoginBloqueado: Si el identificador o la IP agotaron sus intentos
+            VerificacionSaturada: Si el pool de verificación está lleno
         """
-        from werkzeug.security import check_password_hash  # Importación local para verificar hash
-        
-        usuario = None  # Inicializar variable para el usuario encontrado
-        
-        # Estrategia 1: Intentar buscar por DNI si el identificador es completamente numérico
-        if identificador.isdigit():
-            usuario = Usuario.query.filter_by(dni=identificador).first()
+        # Rechazar antes de buscar y calcular el hash si hay demasiados fallos
+        limitador_intentos.comprobar(identificador, ip)
         
-        # Estrategia 2: Si no se encontró por DNI, intentar buscar por código de matrícula
-        if not usuario:
-            usuario = Usuario.query.filter_by(codigo_matricula=identificador).first()
+        # Buscar por DNI o código de matrícula en una sola consulta indexada
+        if usuario is None:
+            from servicios_solid import RepositorioUsuarioSQLAlchemy
+            usuario = RepositorioUsuarioSQLAlchemy().obtener_por_identificador(identificador)
         
         # Verificar que el usuario existe, está activo y la contraseña es correcta
-        if usuario and usuario.activo and check_password_hash(usuario.password_hash, password):
+        if usuario and usuario.activo and pool_verificacion.verificar(usuario.password_hash, password):
+            limitador_intentos.registrar_exito(identificador)
             return usuario  # Retornar usuario autenticado exitosamente
         
+        limitador_intentos.registrar_fallo(identificador, ip)
         return None  # Retornar None si falla cualquier verificación
     
     @staticmethod
@@ -144,11 +168,48 @@ class ServicioAutenticacion:
         # Guardar el usuario en la base de datos
         db.session.add(usuario)  # Agregar a la sesión de SQLAlchemy
         db.session.commit()  # Confirmar los cambios en la base de datos
+        cache_reportes.invalidar('usuarios')  # Los reportes por usuario quedan obsoletos
         
         # Nota: Respaldo CSV eliminado del sistema por limpieza de código
         # El sistema ya no guarda respaldos automáticos en CSV
         
         return usuario  # Retornar el usuario creado
+    
+    @staticmethod
+    def obtener_usuarios_paginados(cursor=None, limite=LIMITE_POR_DEFECTO):
+        """
+        Obtiene una página de usuarios del sistema ordenados por ID.
+        
+        Args:
+            cursor (str, opcional): Cursor de la página anterior (None para la primera)
+            limite (int): Número de usuarios por página
+            
+        Returns:
+            PaginaKeyset: Página de usuarios con el cursor de la siguiente
+        """
+        return paginar_keyset(Usuario.query, [Usuario.id], cursor, limite)
+    
+    @staticmethod
+    def obtener_resumen_usuarios():
+        """
+        Obtiene los totales de usuarios por rol y estado en una sola consulta agregada.
+        
+        Returns:
+            dict: Totales generales, activos y por rol (claves = nombre del rol)
+        """
+        filas = db.session.query(
+            Usuario.rol,
+            Usuario.activo,
+            func.count(Usuario.id)
+        ).group_by(Usuario.rol, Usuario.activo).all()
+        
+        resumen = {'total': 0, 'activos': 0, 'por_rol': {rol.name: 0 for rol in RolUsuario}}
+        for rol, activo, total in filas:
+            resumen['total'] += total
+            resumen['por_rol'][rol.name] += total
+            if activo:
+                resumen['activos'] += total
+        return resumen
 
 class ServicioPaciente:
     """
@@ -166,18 +227,112 @@ class ServicioPaciente:
     """
     
     @staticmethod
-    def obtener_pacientes():
+    def obtener_pacientes(perfil=None):
         """
         Obtiene todos los pacientes activos del sistema.
         
         Realiza un JOIN entre las tablas Paciente y Usuario para asegurar
         que solo se retornen pacientes cuyos usuarios estén activos en el sistema.
         
+        Args:
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+        
         Returns:
             list[Paciente]: Lista de todas las instancias de pacientes activos
         """
         # Realizar consulta con JOIN para filtrar solo usuarios activos
-        return Paciente.query.join(Usuario).filter(Usuario.activo == True).all()
+        query = Paciente.query.join(Usuario).filter(Usuario.activo == True)
+        return aplicar_perfil(query, perfil).all()
+    
+    @staticmethod
+    def obtener_pacientes_paginados(cursor=None, limite=LIMITE_POR_DEFECTO, perfil=None, profesional_id=None):
+        """
+        Obtiene una página de pacientes activos ordenados por ID.
+        
+        Args:
+            cursor (str, opcional): Cursor de la página anterior (None para la primera)
+            limite (int): Número de pacientes por página
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+            profesional_id (int, opcional): Solo pacientes con citas de este profesional
+            
+        Returns:
+            PaginaKeyset: Página de pacientes con el cursor de la siguiente
+        """
+        query = Paciente.query.join(Usuario).filter(Usuario.activo == True)
+        if profesional_id is not None:
+            query = query.filter(Paciente.id.in_(
+                db.select(Cita.paciente_id).where(Cita.profesional_id == profesional_id)
+            ))
+        return paginar_keyset(aplicar_perfil(query, perfil), [Paciente.id], cursor, limite)
+    
+    @staticmethod
+    def _texto_opcion(nombre, carrera, codigo_matricula):
+        """Texto de un paciente en el selector del formulario de citas."""
+        texto = f"{nombre} - {carrera}"
+        return f"{texto} ({codigo_matricula})" if codigo_matricula else texto
+    
+    @staticmethod
+    def buscar_para_seleccion(termino, limite=LIMITE_SELECCION):
+        """
+        Busca pacientes activos para el selector de citas (búsqueda al teclear).
+        
+        Es la primera página de buscar_pacientes (mismas reglas y orden por
+        relevancia) reducida al texto de cada opción, sin DNI ni procedencia.
+        
+        Args:
+            termino (str): Texto escrito por el usuario (mínimo 2 caracteres)
+            limite (int): Máximo de resultados
+            
+        Returns:
+            list[tuple]: (ID del paciente, texto de la opción), por relevancia
+        """
+        pagina = ServicioPaciente.buscar_pacientes(termino, limite=limite)
+        return [
+            (resultado.paciente.id, ServicioPaciente._texto_opcion(
+                resultado.paciente.usuario.nombre, resultado.paciente.carrera,
+                resultado.paciente.usuario.codigo_matricula,
+            ))
+            for resultado in pagina.items
+        ]
+    
+    @staticmethod
+    def buscar_pacientes(termino, cursor=None, limite=LIMITE_POR_DEFECTO):
+        """
+        Busca pacientes activos por nombre, código, DNI, carrera o procedencia.
+        
+        Acepta prefijos y errores de tipeo; los resultados se ordenan por
+        relevancia y se paginan por cursor (ver busqueda_pacientes).
+        
+        Args:
+            termino (str): Texto buscado
+            cursor (str, opcional): Cursor de la página anterior (None para la primera)
+            limite (int): Resultados por página
+            
+        Returns:
+            PaginaKeyset: Página de ResultadoBusqueda (paciente, puntaje)
+        """
+        from busqueda_pacientes import buscar_pacientes
+        return buscar_pacientes(termino, cursor, limite)
+    
+    @staticmethod
+    def opcion_paciente(paciente_id):
+        """
+        Opción del selector para un paciente ya elegido (validación del formulario).
+        
+        Args:
+            paciente_id (int): ID del paciente enviado en el formulario
+            
+        Returns:
+            list[tuple]: [(ID, texto)] si el paciente existe y está activo; si no, []
+        """
+        if not paciente_id:
+            return []
+        fila = db.session.execute(
+            db.select(Usuario.nombre, Paciente.carrera, Usuario.codigo_matricula)
+            .join(Usuario, Paciente.usuario_id == Usuario.id)
+            .where(Paciente.id == paciente_id, Usuario.activo == True)
+        ).first()
+        return [(paciente_id, ServicioPaciente._texto_opcion(*fila))] if fila else []
     
     @staticmethod
     def obtener_paciente_por_id(paciente_id):
@@ -228,6 +383,8 @@ class ServicioPaciente:
         # Guardar el paciente en la base de datos
         db.session.add(paciente)  # Agregar a la sesión de SQLAlchemy
         db.session.commit()  # Confirmar los cambios
+        cache_reportes.invalidar('pacientes')  # Los reportes por paciente quedan obsoletos
+        cache_sesiones.invalidar(usuario_id)  # La sesión del usuario ya tiene paciente_id
         
         return paciente  # Retornar el paciente creado
     
@@ -254,13 +411,24 @@ class ServicioPaciente:
             return None  # Retornar None si el paciente no existe
         
         # Actualizar dinámicamente todos los campos proporcionados
-        for campo, valor in datos_paciente.items():
-            # Verificar que el campo existe en el modelo antes de asignarlo
-            if hasattr(paciente, campo):
-                setattr(paciente, campo, valor)  # Asignar el nuevo valor
+        def asignar_campos():
+            for campo, valor in datos_paciente.items():
+                # Verificar que el campo existe en el modelo antes de asignarlo
+                if hasattr(paciente, campo):
+                    setattr(paciente, campo, valor)  # Asignar el nuevo valor
+        
+        if 'carrera' in datos_paciente and datos_paciente['carrera'] != paciente.carrera:
+            # La carrera forma parte de la clave del resumen diario:
+            # mover las citas del paciente a la nueva carrera
+            with recalcular_resumen(Cita.paciente_id == paciente.id):
+                asignar_campos()
+        else:
+            asignar_campos()
         
         # Confirmar los cambios en la base de datos
         db.session.commit()
+        cache_reportes.invalidar('pacientes')  # Los reportes por paciente quedan obsoletos
+        cache_sesiones.invalidar(paciente.usuario_id)  # Perfil actualizado
         
         return paciente  # Retornar el paciente actualizado
 
@@ -280,21 +448,54 @@ class ServicioCita:
     """
     
     @staticmethod
-    def obtener_citas():
+    def obtener_citas(perfil=None):
         """
         Obtiene todas las citas del sistema ordenadas cronológicamente.
         
         Las citas se ordenan por fecha descendente (más recientes primero) y luego
         por hora descendente para mostrar las citas más actuales al inicio.
         
+        Args:
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+        
         Returns:
             list[Cita]: Lista de todas las citas ordenadas cronológicamente
         """
         # Realizar consulta ordenada por fecha y hora descendente
-        return Cita.query.order_by(Cita.fecha.desc(), Cita.hora.desc()).all()
+        query = Cita.query.order_by(Cita.fecha.desc(), Cita.hora.desc())
+        return aplicar_perfil(query, perfil).all()
+    
+    @staticmethod
+    def obtener_citas_paginadas(cursor=None, limite=LIMITE_POR_DEFECTO, perfil=None, profesional_id=None, paciente_id=None):
+        """
+        Obtiene una página de citas ordenadas por fecha y hora descendente.
+        
+        El ID se usa como desempate para que el cursor sea único aunque
+        varias citas compartan fecha y hora.
+        
+        Args:
+            cursor (str, opcional): Cursor de la página anterior (None para la primera)
+            limite (int): Número de citas por página
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+            profesional_id (int, opcional): Solo citas de este profesional
+            paciente_id (int, opcional): Solo citas de este paciente
+            
+        Returns:
+            PaginaKeyset: Página de citas con el cursor de la siguiente
+        """
+        query = Cita.query
+        if profesional_id is not None:
+            query = query.filter(Cita.profesional_id == profesional_id)
+        if paciente_id is not None:
+            query = query.filter(Cita.paciente_id == paciente_id)
+        return paginar_keyset(
+            aplicar_perfil(query, perfil),
+            [Cita.fecha, Cita.hora, Cita.id],
+            cursor, limite, descendente=True
+        )
     
     @staticmethod
-    def obtener_citas_por_paciente(paciente_id):
+    def obtener_citas_por_paciente(paciente_id, perfil=None):
         """
         Obtiene todas las citas de un paciente específico.
         
@@ -303,15 +504,17 @@ class ServicioCita:
         
         Args:
             paciente_id (int): ID del paciente cuyas citas se desean consultar
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
             
         Returns:
             list[Cita]: Lista de citas del paciente ordenadas por fecha
         """
         # Filtrar por paciente específico y ordenar por fecha descendente
-        return Cita.query.filter_by(paciente_id=paciente_id).order_by(Cita.fecha.desc()).all()
+        query = Cita.query.filter_by(paciente_id=paciente_id).order_by(Cita.fecha.desc())
+        return aplicar_perfil(query, perfil).all()
     
     @staticmethod
-    def obtener_citas_por_profesional(profesional_id):
+    def obtener_citas_por_profesional(profesional_id, perfil=None):
         """
         Obtiene todas las citas asignadas a un profesional específico.
         
@@ -320,13 +523,104 @@ class ServicioCita:
         
         Args:
             profesional_id (int): ID del profesional cuyas citas se desean consultar
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
             
         Returns:
             list[Cita]: Lista de citas del profesional ordenadas por fecha
         """
         # Filtrar por profesional específico y ordenar por fecha descendente
-        return Cita.query.filter_by(profesional_id=profesional_id).order_by(Cita.fecha.desc()).all()
+        query = Cita.query.filter_by(profesional_id=profesional_id).order_by(Cita.fecha.desc())
+        return aplicar_perfil(query, perfil).all()
+    
+    @staticmethod
+    @cache_reportes.cachear(ttl=600, dependencias=('usuarios',))
+    def _profesionales_por_tipo():
+        """
+        Tipos de cita que atiende cada profesional activo, según su historial.
+        
+        Lee el resumen diario (no la tabla de citas). Los profesionales sin
+        historial se ofrecen para todos los tipos. Se refresca al cambiar los
+        usuarios o al vencer el TTL (un tipo nuevo tarda hasta 10 minutos).
+        
+        Returns:
+            dict: 'profesionales' ([ID, nombre] por nombre) y 'tipos'
+                (ID -> lista de nombres de TipoCita atendidos)
+        """
+        profesionales = db.session.execute(
+            db.select(Usuario.id, Usuario.nombre)
+            .where(Usuario.rol == RolUsuario.PROFESIONAL, Usuario.activo == True)
+            .order_by(Usuario.nombre, Usuario.id)
+        ).all()
+        tipos = defaultdict(list)
+        for profesional_id, tipo in db.session.execute(
+            db.select(ResumenDiarioCitas.profesional_id, ResumenDiarioCitas.tipo_cita).distinct()
+        ):
+            tipos[profesional_id].append(tipo.name)
+        return {'profesionales': [list(fila) for fila in profesionales], 'tipos': dict(tipos)}
+    
+    @staticmethod
+    def opciones_profesionales():
+        """
+        Opciones del selector de profesionales del formulario de citas.
+        
+        Salen del catálogo cacheado de _profesionales_por_tipo, que se
+        invalida al crear, modificar o desactivar usuarios.
+        
+        Returns:
+            list[tuple]: (ID, nombre) de los profesionales activos, por nombre
+        """
+        return [tuple(fila) for fila in ServicioCita._profesionales_por_tipo()['profesionales']]
     
+    @staticmethod
+    def buscar_disponibilidad(fecha_inicio, fecha_fin, profesional_id=None, tipo_cita=None):
+        """
+        Busca las franjas libres de los profesionales en un rango de fechas.
+        
+        Las franjas salen del mapa de bits diario de agenda_diaria (ver
+        agenda_profesionales.py), sin cargar las citas del rango.
+        
+        Args:
+            fecha_inicio (date): Primer día del rango
+            fecha_fin (date): Último día del rango (incluido)
+            profesional_id (int, opcional): Limitar a un profesional
+            tipo_cita (str, opcional): Solo profesionales que atienden ese tipo
+                (o sin historial todavía)
+            
+        Returns:
+            list[dict]: Por profesional: profesional_id, nombre y dias con sus
+                horas libres ('HH:MM')
+        """
+        catalogo = ServicioCita._profesionales_por_tipo()
+        profesionales = [tuple(fila) for fila in catalogo['profesionales']]
+        if profesional_id is not None:
+            profesionales = [p for p in profesionales if p[0] == profesional_id]
+        if tipo_cita is not None:
+            tipos = catalogo['tipos']
+            profesionales = [p for p in profesionales if p[0] not in tipos or tipo_cita in tipos[p[0]]]
+        return buscar_franjas_libres(profesionales, fecha_inicio, fecha_fin)
+
+    @staticmethod
+    def programar_citas_masivas(citas=None, archivo_csv=None):
+        """
+        Programa citas en bloque desde una lista o un CSV.
+
+        Los conflictos de horario se validan en memoria contra la agenda del
+        lote (leída y bloqueada de una vez) y las citas válidas se insertan
+        en una transacción por lote (ver programacion_masiva).
+
+        Args:
+            citas (list[dict], opcional): Citas a programar
+            archivo_csv (str | file, opcional): Ruta del CSV o flujo del archivo subido
+
+        Returns:
+            dict: exitoso, filas_leidas, citas_creadas, total_errores y
+                resultados por fila (cita_id o error)
+        """
+        from programacion_masiva import programar_citas, programar_desde_csv
+        if archivo_csv is not None:
+            return programar_desde_csv(archivo_csv)
+        return programar_citas(citas or [])
+
     @staticmethod
     def crear_cita(datos_cita):
         """
@@ -346,7 +640,21 @@ class ServicioCita:
                 
         Returns:
             Cita: Instancia de la cita recién creada
+            
+        Raises:
+            FranjaOcupada: Si el profesional ya tiene una cita en esa franja
+                (la transacción se revierte)
+            IntegrityError: Si la cita viola otra restricción (p. ej. un
+                paciente inexistente); la transacción se revierte
         """
+        # Reservar la franja en la agenda del profesional antes de insertar:
+        # un UPDATE condicional por clave primaria, sin recorrer las citas
+        try:
+            reservar_franja(datos_cita['profesional_id'], datos_cita['fecha'], datos_cita['hora'])
+        except FranjaOcupada:
+            db.session.rollback()
+            raise
+        
         # Crear nueva instancia de Cita con los datos proporcionados
         cita = Cita()
         cita.paciente_id = datos_cita['paciente_id']  # ID del paciente
@@ -358,7 +666,17 @@ class ServicioCita:
         
         # Guardar la cita en la base de datos
         db.session.add(cita)  # Agregar a la sesión
+        try:
+            db.session.flush()  # Obtener el ID antes de contabilizarla
+        except IntegrityError as e:
+            db.session.rollback()
+            if not es_franja_duplicada(e):
+                raise  # Clave foránea, NOT NULL, etc.: no es un horario ocupado
+            # Índice único de horarios: cita escrita sin pasar por la agenda
+            raise FranjaOcupada(cita.profesional_id, cita.fecha, cita.hora) from e
+        sumar_al_resumen(Cita.id == cita.id)  # Contabilizar en el resumen diario
         db.session.commit()  # Confirmar los cambios
+        cache_reportes.invalidar('citas')  # Los reportes de citas quedan obsoletos
         
         return cita  # Retornar la cita creada
     
@@ -376,6 +694,10 @@ class ServicioCita:
             
         Returns:
             Cita: Instancia de la cita actualizada o None si no existe
+            
+        Raises:
+            FranjaOcupada: Si se reactiva una cita cancelada cuya franja ya
+                fue ocupada por otra cita
         """
         # Buscar la cita por su ID
         cita = Cita.query.get(cita_id)
@@ -384,11 +706,25 @@ class ServicioCita:
         if not cita:
             return None  # Retornar None si no existe
         
-        # Actualizar el estado de la cita
-        cita.estado = nuevo_estado
+        # Cancelar libera la franja; reactivar una cancelada vuelve a reservarla
+        cancelada_antes = cita.estado == ESTADO_CANCELADA
+        cancelada_despues = nuevo_estado == ESTADO_CANCELADA
+        if cancelada_antes and not cancelada_despues:
+            try:
+                reservar_franja(cita.profesional_id, cita.fecha, cita.hora)
+            except FranjaOcupada:
+                db.session.rollback()
+                raise
+        
+        # Actualizar el estado de la cita, moviéndola en el resumen diario
+        with recalcular_resumen(Cita.id == cita_id):
+            cita.estado = nuevo_estado
+        if cancelada_despues and not cancelada_antes:
+            recalcular_dia(cita.profesional_id, cita.fecha)
         
         # Confirmar los cambios en la base de datos
         db.session.commit()
+        cache_reportes.invalidar('citas')  # Los reportes de citas quedan obsoletos
         
         return cita  # Retornar la cita actualizada
 
@@ -426,7 +762,15 @@ class ServicioConsulta:
                 
         Returns:
             Consulta: Instancia de la consulta recién creada
+            
+        Raises:
+            ValueError: Si la cita está cancelada (completarla la reactivaría
+                sin reservar su franja en la agenda)
         """
+        cita = Cita.query.get(cita_id)
+        if cita and cita.estado == ESTADO_CANCELADA:
+            raise ValueError('No se puede registrar una consulta en una cita cancelada')
+        
         # Crear nueva instancia de Consulta con los datos proporcionados
         consulta = Consulta()
         consulta.cita_id = cita_id  # ID de la cita asociada
@@ -435,35 +779,69 @@ class ServicioConsulta:
         consulta.observaciones = datos_consulta.get('observaciones')  # Observaciones opcionales
         consulta.nivel_riesgo = NivelRiesgo[datos_consulta['nivel_riesgo']]  # Convertir string a enum
         
-        # Agregar la consulta a la sesión de la base de datos
-        db.session.add(consulta)
-        
-        # Actualizar automáticamente el estado de la cita a COMPLETADA
-        cita = Cita.query.get(cita_id)
-        if cita:
-            cita.estado = 'COMPLETADA'  # Marcar cita como completada
+        # La cita cambia de nivel de riesgo y de estado en el resumen diario
+        with recalcular_resumen(Cita.id == cita_id):
+            # Agregar la consulta a la sesión de la base de datos
+            db.session.add(consulta)
+            
+            # Actualizar automáticamente el estado de la cita a COMPLETADA
+            if cita:
+                cita.estado = 'COMPLETADA'  # Marcar cita como completada
         
         # Confirmar todos los cambios en la base de datos
         db.session.commit()
+        cache_reportes.invalidar('citas', 'consultas')  # Los reportes de citas y consultas quedan obsoletos
         
         return consulta  # Retornar la consulta creada
     
     @staticmethod
-    def obtener_consultas():
+    def obtener_consultas(perfil=None):
         """
         Obtiene todas las consultas médicas del sistema.
         
         Las consultas se ordenan por fecha de consulta descendente para mostrar
         las consultas más recientes primero.
         
+        Args:
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+        
         Returns:
             list[Consulta]: Lista de todas las consultas ordenadas cronológicamente
         """
         # Realizar consulta ordenada por fecha de consulta descendente
-        return Consulta.query.order_by(Consulta.fecha_consulta.desc()).all()
+        query = Consulta.query.order_by(Consulta.fecha_consulta.desc())
+        return aplicar_perfil(query, perfil).all()
     
     @staticmethod
-    def obtener_consultas_por_paciente(paciente_id):
+    def obtener_consultas_paginadas(cursor=None, limite=LIMITE_POR_DEFECTO, profesional_id=None, paciente_id=None, perfil=None):
+        """
+        Obtiene una página de consultas ordenadas por fecha de consulta descendente.
+        
+        Args:
+            cursor (str, opcional): Cursor de la página anterior (None para la primera)
+            limite (int): Número de consultas por página
+            profesional_id (int, opcional): Solo consultas de citas de este profesional
+            paciente_id (int, opcional): Solo consultas de citas de este paciente
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+            
+        Returns:
+            PaginaKeyset: Página de consultas con el cursor de la siguiente
+        """
+        query = Consulta.query
+        if profesional_id is not None or paciente_id is not None:
+            query = query.join(Cita, Consulta.cita_id == Cita.id)
+            if profesional_id is not None:
+                query = query.filter(Cita.profesional_id == profesional_id)
+            if paciente_id is not None:
+                query = query.filter(Cita.paciente_id == paciente_id)
+        return paginar_keyset(
+            aplicar_perfil(query, perfil),
+            [Consulta.fecha_consulta, Consulta.id],
+            cursor, limite, descendente=True
+        )
+    
+    @staticmethod
+    def obtener_consultas_por_paciente(paciente_id, perfil=None):
         """
         Obtiene todas las consultas médicas de un paciente específico.
         
@@ -472,12 +850,30 @@ class ServicioConsulta:
         
         Args:
             paciente_id (int): ID del paciente cuyas consultas se desean obtener
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
             
         Returns:
             list[Consulta]: Lista de consultas del paciente ordenadas cronológicamente
         """
         # Realizar JOIN explícito con tabla Cita para filtrar por paciente y ordenar por fecha
-        return Consulta.query.join(Cita, Consulta.cita_id == Cita.id).filter(Cita.paciente_id == paciente_id).order_by(Consulta.fecha_consulta.desc()).all()
+        query = Consulta.query.join(Cita, Consulta.cita_id == Cita.id).filter(Cita.paciente_id == paciente_id).order_by(Consulta.fecha_consulta.desc())
+        return aplicar_perfil(query, perfil).all()
+    
+    @staticmethod
+    def obtener_consultas_por_profesional(profesional_id, perfil=None):
+        """
+        Obtiene todas las consultas registradas en citas de un profesional.
+        
+        Args:
+            profesional_id (int): ID del profesional cuyas consultas se desean obtener
+            perfil (str, opcional): Perfil de carga anticipada (ver perfiles_carga.py)
+            
+        Returns:
+            list[Consulta]: Lista de consultas del profesional ordenadas cronológicamente
+        """
+        # JOIN explícito con tabla Cita para filtrar por profesional
+        query = Consulta.query.join(Cita, Consulta.cita_id == Cita.id).filter(Cita.profesional_id == profesional_id).order_by(Consulta.fecha_consulta.desc())
+        return aplicar_perfil(query, perfil).all()
 
 class ServicioReporte:
     """
@@ -492,75 +888,92 @@ class ServicioReporte:
     - Tendencias mensuales de citas médicas
     - Evaluación de niveles de riesgo de pacientes
     - Resumen ejecutivo para dashboard
+    
+    Las estadísticas del dashboard (resumen, citas por tipo, consultas por
+    carrera, tendencia mensual y niveles de riesgo) se leen del resumen
+    mensual materializado (ResumenMensualCitas) en lugar de las tablas base.
+    
+    Los reportes marcados con @en_replica leen de la réplica si existe
+    DATABASE_URL_REPLICA, con respaldo al primario (ver replica_lectura).
     """
     
     @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('citas',))
+    @en_replica
     def obtener_estadisticas_citas():
         """
         Obtiene estadísticas de citas agrupadas por tipo de consulta.
         
-        Realiza una consulta agregada para contar el número total de citas
-        por cada tipo de consulta (MEDICINA, PSICOLOGIA, EMERGENCIA).
+        Suma en el resumen mensual el número total de citas por cada tipo de
+        consulta (MEDICINA, PSICOLOGIA, EMERGENCIA).
         
         Returns:
             dict: Diccionario con tipos de cita como claves y totales como valores
         """
-        # Realizar consulta agregada agrupando por tipo de cita
+        # Sumar los contadores del resumen agrupando por tipo de cita
         estadisticas = db.session.query(
-            Cita.tipo_cita,  # Campo por el cual agrupar
-            func.count(Cita.id).label('total')  # Contar registros y etiquetar como 'total'
-        ).group_by(Cita.tipo_cita).all()  # Agrupar por tipo de cita
+            ResumenMensualCitas.tipo_cita,  # Campo por el cual agrupar
+            func.sum(ResumenMensualCitas.total_citas).label('total')  # Sumar citas del resumen
+        ).group_by(ResumenMensualCitas.tipo_cita).having(
+            func.sum(ResumenMensualCitas.total_citas) > 0  # Omitir grupos vaciados
+        ).all()
         
         # Convertir resultado a diccionario para fácil acceso
         return {str(tipo): total for tipo, total in estadisticas}
     
     @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('pacientes', 'citas', 'consultas'))
+    @en_replica
     def obtener_estadisticas_consultas_por_carrera():
         """
         Obtiene estadísticas de consultas agrupadas por carrera universitaria.
         
-        Realiza JOINs entre las tablas Paciente, Cita y Consulta para obtener
-        el número total de consultas realizadas por estudiantes de cada carrera.
+        Suma en el resumen mensual el número total de consultas realizadas por
+        estudiantes de cada carrera (el resumen ya guarda la carrera del paciente).
         
         Returns:
             dict: Diccionario con carreras como claves y totales de consultas como valores
         """
-        # Realizar consulta con JOINs explícitos para relacionar pacientes con consultas
+        # Sumar las consultas del resumen agrupando por carrera
         estadisticas = db.session.query(
-            Paciente.carrera,  # Campo por el cual agrupar (carrera universitaria)
-            func.count(Consulta.id).label('total')  # Contar consultas
-        ).select_from(Paciente).join(Cita, Paciente.id == Cita.paciente_id).join(Consulta, Cita.id == Consulta.cita_id).group_by(Paciente.carrera).all()  # JOINs explícitos y agrupación
+            ResumenMensualCitas.carrera,  # Campo por el cual agrupar (carrera universitaria)
+            func.sum(ResumenMensualCitas.total_consultas).label('total')  # Sumar consultas
+        ).group_by(ResumenMensualCitas.carrera).having(
+            func.sum(ResumenMensualCitas.total_consultas) > 0  # Solo carreras con consultas
+        ).all()
         
         # Convertir resultado a diccionario para fácil acceso
         return {carrera: total for carrera, total in estadisticas}
     
     @staticmethod
+    @cache_reportes.cachear(ttl=600, dependencias=('citas',))
+    @en_replica
     def obtener_tendencia_mensual_citas():
         """
         Obtiene la tendencia mensual de citas de los últimos 12 meses.
         
         Calcula el número de citas programadas por mes para mostrar tendencias
-        temporales en la demanda de servicios médicos universitarios.
+        temporales en la demanda de servicios médicos universitarios. La
+        ventana empieza en el mes de hace 365 días, que se cuenta completo.
         
         Returns:
             dict: Diccionario con listas de meses y totales para gráficos
         """
-        # Calcular fecha límite para los últimos 12 meses
-        fecha_limite = datetime.now() - timedelta(days=365)
+        # Primer mes de la ventana de los últimos 12 meses
+        mes_limite = (datetime.now() - timedelta(days=365)).date().replace(day=1)
         
-        # Realizar consulta agregada por año y mes
+        # Realizar consulta agregada por mes sobre el resumen mensual
         estadisticas = db.session.query(
-            extract('year', Cita.fecha).label('año'),  # Extraer año de la fecha
-            extract('month', Cita.fecha).label('mes'),  # Extraer mes de la fecha
-            func.count(Cita.id).label('total')  # Contar citas por mes
+            ResumenMensualCitas.mes,  # Primer día del mes
+            func.sum(ResumenMensualCitas.total_citas).label('total')  # Sumar citas por mes
         ).filter(
-            Cita.fecha >= fecha_limite  # Filtrar solo últimos 12 meses
+            ResumenMensualCitas.mes >= mes_limite  # Filtrar solo últimos 12 meses
         ).group_by(
-            extract('year', Cita.fecha),  # Agrupar por año
-            extract('month', Cita.fecha)  # Agrupar por mes
+            ResumenMensualCitas.mes  # Agrupar por mes
+        ).having(
+            func.sum(ResumenMensualCitas.total_citas) > 0  # Omitir meses vaciados
         ).order_by(
-            extract('year', Cita.fecha),  # Ordenar por año ascendente
-            extract('month', Cita.fecha)  # Ordenar por mes ascendente
+            ResumenMensualCitas.mes  # Ordenar por mes ascendente
         ).all()
         
         # Listas para almacenar los datos formatados
@@ -568,34 +981,40 @@ class ServicioReporte:
         totales = []  # Lista de totales correspondientes
         
         # Procesar cada registro de estadísticas
-        for año, mes, total in estadisticas:
-            meses.append(f"{int(año)}-{int(mes):02d}")  # Formatear como YYYY-MM
+        for mes, total in estadisticas:
+            meses.append(mes.strftime('%Y-%m'))  # Formatear como YYYY-MM
             totales.append(total)  # Agregar total del mes
         
         # Retornar estructura de datos lista para gráficos
         return {'meses': meses, 'totales': totales}
     
     @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('consultas',))
+    @en_replica
     def obtener_niveles_riesgo():
         """
         Obtiene estadísticas de consultas agrupadas por nivel de riesgo.
         
-        Realiza una consulta agregada para contar el número de consultas
-        según su nivel de riesgo (BAJO, MEDIO, ALTO, CRITICO).
+        Suma en el resumen mensual el número de consultas según su nivel de
+        riesgo (BAJO, MEDIO, ALTO, CRITICO).
         
         Returns:
             dict: Diccionario con niveles de riesgo como claves y totales como valores
         """
-        # Realizar consulta agregada agrupando por nivel de riesgo
+        # Sumar las consultas del resumen agrupando por nivel de riesgo
         estadisticas = db.session.query(
-            Consulta.nivel_riesgo,  # Campo por el cual agrupar
-            func.count(Consulta.id).label('total')  # Contar consultas por nivel
-        ).group_by(Consulta.nivel_riesgo).all()  # Agrupar por nivel de riesgo
+            ResumenMensualCitas.nivel_riesgo,  # Campo por el cual agrupar
+            func.sum(ResumenMensualCitas.total_consultas).label('total')  # Sumar consultas por nivel
+        ).group_by(ResumenMensualCitas.nivel_riesgo).having(
+            func.sum(ResumenMensualCitas.total_consultas) > 0  # Excluye citas sin consulta
+        ).all()
         
         # Convertir resultado a diccionario para fácil acceso
         return {str(nivel): total for nivel, total in estadisticas}
     
     @staticmethod
+    @cache_reportes.cachear(ttl=60, dependencias=('pacientes', 'citas', 'consultas'))
+    @en_replica
     def obtener_resumen_dashboard():
         """
         Obtiene un resumen ejecutivo general para el dashboard administrativo.
@@ -607,23 +1026,29 @@ class ServicioReporte:
         Returns:
             dict: Diccionario con métricas clave para el dashboard
         """
-        # Contar totales generales de cada entidad principal
+        # Los pacientes sin citas no figuran en el resumen: contarlos en su tabla
         total_pacientes = Paciente.query.count()  # Total de pacientes registrados
-        total_citas = Cita.query.count()  # Total de citas programadas
-        total_consultas = Consulta.query.count()  # Total de consultas realizadas
         
         # Calcular métricas del mes actual
         hoy = datetime.now()  # Fecha y hora actuales
-        primer_dia_mes = hoy.replace(day=1)  # Primer día del mes actual
-        
-        # Contar citas programadas en el mes actual
-        citas_mes = Cita.query.filter(Cita.fecha >= primer_dia_mes).count()
-        
-        # Contar consultas con nivel de riesgo alto o crítico
-        # Estas requieren seguimiento prioritario
-        consultas_riesgo_alto = Consulta.query.filter(
-            Consulta.nivel_riesgo.in_([NivelRiesgo.ALTO, NivelRiesgo.CRITICO])
-        ).count()
+        primer_dia_mes = hoy.replace(day=1).date()  # Primer día del mes actual
+        
+        # Obtener el resto de totales en una sola pasada sobre el resumen mensual:
+        # citas y consultas totales, citas del mes actual y consultas con nivel
+        # de riesgo alto o crítico (estas requieren seguimiento prioritario)
+        total_citas, total_consultas, citas_mes, consultas_riesgo_alto = db.session.query(
+            func.coalesce(func.sum(ResumenMensualCitas.total_citas), 0),
+            func.coalesce(func.sum(ResumenMensualCitas.total_consultas), 0),
+            func.coalesce(func.sum(case(
+                (ResumenMensualCitas.mes >= primer_dia_mes, ResumenMensualCitas.total_citas),
+                else_=0
+            )), 0),
+            func.coalesce(func.sum(case(
+                (ResumenMensualCitas.nivel_riesgo.in_([NivelRiesgo.ALTO, NivelRiesgo.CRITICO]),
+                 ResumenMensualCitas.total_consultas),
+                else_=0
+            )), 0),
+        ).one()
         
         # Retornar diccionario con todas las métricas calculadas
         return {
@@ -635,6 +1060,8 @@ class ServicioReporte:
         }
     
     @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('usuarios', 'citas'))
+    @en_replica
     def obtener_estadisticas_profesionales():
         """
         Obtiene estadísticas de actividad de profesionales médicos.
@@ -657,6 +1084,8 @@ class ServicioReporte:
         return {profesional: total for profesional, total in estadisticas}
     
     @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('citas',))
+    @en_replica
     def obtener_estadisticas_citas_por_tipo():
         """
         Obtiene estadísticas detalladas de citas por tipo de consulta.
@@ -684,6 +1113,8 @@ class ServicioReporte:
         }
     
     @staticmethod
+    @cache_reportes.cachear(ttl=600, dependencias=('citas',))
+    @en_replica
     def obtener_horarios_populares():
         """
         Obtiene estadísticas de horarios más populares para citas.
@@ -708,47 +1139,84 @@ class ServicioReporte:
         return {f"{int(hora)}:00": total for hora, total in estadisticas}
     
     @staticmethod
-    def obtener_rendimiento_profesionales():
+    def _condiciones_citas(fecha_inicio=None, fecha_fin=None, tipo_cita=None):
+        """
+        Construye las condiciones de filtro opcionales sobre la tabla de citas.
+        
+        Args:
+            fecha_inicio (date, opcional): Fecha mínima de la cita (inclusive)
+            fecha_fin (date, opcional): Fecha máxima de la cita (inclusive)
+            tipo_cita (str | TipoCita, opcional): Tipo de cita a considerar
+            
+        Returns:
+            list: Lista de expresiones SQLAlchemy para combinar con and_()
+        """
+        condiciones = []
+        if fecha_inicio:
+            condiciones.append(Cita.fecha >= fecha_inicio)
+        if fecha_fin:
+            condiciones.append(Cita.fecha <= fecha_fin)
+        if tipo_cita:
+            # Aceptar tanto el enum como su nombre en texto
+            if not isinstance(tipo_cita, TipoCita):
+                tipo_cita = TipoCita[tipo_cita]
+            condiciones.append(Cita.tipo_cita == tipo_cita)
+        return condiciones
+    
+    @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('usuarios', 'citas', 'consultas'))
+    @en_replica
+    def obtener_rendimiento_profesionales(fecha_inicio=None, fecha_fin=None, tipo_cita=None):
         """
         Obtiene métricas de rendimiento de profesionales médicos.
         
         Calcula estadísticas de productividad y calidad de atención
-        para cada profesional médico del sistema.
+        para cada profesional médico del sistema en una sola consulta
+        agregada (LEFT JOIN usuarios -> citas -> consultas + GROUP BY),
+        por lo que el número de consultas no crece con el número de profesionales.
+        
+        Args:
+            fecha_inicio (date, opcional): Considerar solo citas desde esta fecha
+            fecha_fin (date, opcional): Considerar solo citas hasta esta fecha
+            tipo_cita (str, opcional): Considerar solo citas de este tipo
         
         Returns:
             dict: Diccionario con métricas de rendimiento por profesional
         """
-        # Obtener todos los profesionales
-        profesionales = Usuario.query.filter_by(rol=RolUsuario.PROFESIONAL).all()
+        # Peso numérico de cada nivel de riesgo (NULL si la cita no tiene consulta)
+        peso_riesgo = case(
+            (Consulta.id.is_(None), None),
+            (Consulta.nivel_riesgo == NivelRiesgo.BAJO, 1),
+            (Consulta.nivel_riesgo == NivelRiesgo.MEDIO, 2),
+            (Consulta.nivel_riesgo == NivelRiesgo.ALTO, 3),
+            (Consulta.nivel_riesgo == NivelRiesgo.CRITICO, 4),
+            else_=0
+        )
+        
+        # Los filtros van en la condición del JOIN para conservar a los
+        # profesionales sin citas en el rango (con métricas en cero)
+        condiciones_cita = ServicioReporte._condiciones_citas(fecha_inicio, fecha_fin, tipo_cita)
+        
+        filas = db.session.query(
+            Usuario.nombre,
+            func.count(func.distinct(Cita.id)).label('total_citas'),
+            func.count(Consulta.id).label('consultas_completadas'),
+            func.avg(peso_riesgo).label('promedio_riesgo')
+        ).select_from(Usuario).outerjoin(
+            Cita, and_(Cita.profesional_id == Usuario.id, *condiciones_cita)
+        ).outerjoin(
+            Consulta, Consulta.cita_id == Cita.id
+        ).filter(
+            Usuario.rol == RolUsuario.PROFESIONAL
+        ).group_by(Usuario.id, Usuario.nombre).order_by(Usuario.id).all()
         
         rendimiento = {}
         
-        for profesional in profesionales:
-            # Contar citas atendidas
-            total_citas = Cita.query.filter_by(profesional_id=profesional.id).count()
-            
-            # Contar consultas completadas
-            consultas_completadas = db.session.query(Consulta).join(Cita).filter(
-                Cita.profesional_id == profesional.id
-            ).count()
-            
+        for nombre, total_citas, consultas_completadas, promedio_riesgo in filas:
             # Calcular tasa de completitud
             tasa_completitud = (consultas_completadas / total_citas * 100) if total_citas > 0 else 0
             
-            # Calcular promedio de nivel de riesgo
-            promedio_riesgo = db.session.query(
-                func.avg(
-                    case(
-                        (Consulta.nivel_riesgo == NivelRiesgo.BAJO, 1),
-                        (Consulta.nivel_riesgo == NivelRiesgo.MEDIO, 2),
-                        (Consulta.nivel_riesgo == NivelRiesgo.ALTO, 3),
-                        (Consulta.nivel_riesgo == NivelRiesgo.CRITICO, 4),
-                        else_=0
-                    )
-                )
-            ).join(Cita).filter(Cita.profesional_id == profesional.id).scalar()
-            
-            rendimiento[profesional.nombre] = {
+            rendimiento[nombre] = {
                 'total_citas': total_citas,
                 'consultas_completadas': consultas_completadas,
                 'tasa_completitud': round(tasa_completitud, 2),
@@ -758,6 +1226,8 @@ class ServicioReporte:
         return rendimiento
     
     @staticmethod
+    @cache_reportes.cachear(ttl=60, dependencias=('usuarios', 'citas', 'consultas'))
+    @en_replica
     def obtener_alertas_sistema():
         """
         Obtiene alertas importantes del sistema para el dashboard.
@@ -768,13 +1238,35 @@ class ServicioReporte:
         Returns:
             list: Lista de alertas con información detallada
         """
-        alertas = []
-        
         # Consultas de alto riesgo sin seguimiento
         consultas_criticas = Consulta.query.filter(
             Consulta.nivel_riesgo == NivelRiesgo.CRITICO
         ).count()
         
+        # Citas pendientes para hoy
+        hoy = datetime.now().date()
+        citas_hoy = Cita.query.filter(Cita.fecha == hoy).count()
+        
+        # Usuarios inactivos
+        usuarios_inactivos = Usuario.query.filter_by(activo=False).count()
+        
+        return ServicioReporte._construir_alertas(consultas_criticas, citas_hoy, usuarios_inactivos)
+    
+    @staticmethod
+    def _construir_alertas(consultas_criticas, citas_hoy, usuarios_inactivos):
+        """
+        Construye la lista de alertas del dashboard a partir de sus contadores.
+        
+        Args:
+            consultas_criticas (int): Consultas con nivel de riesgo CRITICO
+            citas_hoy (int): Citas programadas para hoy
+            usuarios_inactivos (int): Usuarios desactivados
+            
+        Returns:
+            list: Alertas con tipo, mensaje y enlace (solo las de contador positivo)
+        """
+        alertas = []
+        
         if consultas_criticas > 0:
             alertas.append({
                 'tipo': 'critico',
@@ -782,10 +1274,6 @@ class ServicioReporte:
                 'enlace': '/reportes/estadisticas-detalladas'
             })
         
-        # Citas pendientes para hoy
-        hoy = datetime.now().date()
-        citas_hoy = Cita.query.filter(Cita.fecha == hoy).count()
-        
         if citas_hoy > 0:
             alertas.append({
                 'tipo': 'info',
@@ -793,9 +1281,6 @@ class ServicioReporte:
                 'enlace': '/citas/'
             })
         
-        # Usuarios inactivos
-        usuarios_inactivos = Usuario.query.filter_by(activo=False).count()
-        
         if usuarios_inactivos > 0:
             alertas.append({
                 'tipo': 'warning',
@@ -805,7 +1290,152 @@ class ServicioReporte:
         
         return alertas
     
+    # === WIDGETS DEL DASHBOARD EN LOTE ===
+    
+    # Widget -> escaneos compartidos que necesita ('resumen', 'citas', 'usuarios', 'rendimiento')
+    WIDGETS_DASHBOARD = {
+        'citas-por-tipo': ('resumen',),
+        'carreras': ('resumen',),
+        'tendencia': ('resumen',),
+        'riesgo': ('resumen',),
+        'horarios': ('citas',),
+        'alertas': ('resumen', 'citas', 'usuarios'),
+        'rendimiento': ('rendimiento',),
+    }
+    
+    @staticmethod
+    @cache_reportes.cachear(ttl=300, dependencias=('pacientes', 'citas', 'consultas'))
+    @en_replica
+    def _escanear_resumen():
+        """
+        Recorre el resumen mensual una sola vez y produce a la vez los
+        histogramas por tipo de cita, carrera, nivel de riesgo y mes.
+        
+        Agrupa por (tipo, carrera, nivel de riesgo, mes); el mes solo se
+        conserva dentro de la ventana de los últimos 12 meses (NULL fuera de
+        ella), así que el número de grupos no crece con el historial aunque
+        sí lo hacen las filas recorridas (unas pocas por mes).
+        
+        Returns:
+            dict: citas_por_tipo, carreras, riesgo y tendencia, con el mismo
+                formato que obtener_estadisticas_citas,
+                obtener_estadisticas_consultas_por_carrera,
+                obtener_niveles_riesgo y obtener_tendencia_mensual_citas
+        """
+        mes_limite = (datetime.now() - timedelta(days=365)).date().replace(day=1)
+        mes = case((ResumenMensualCitas.mes >= mes_limite, ResumenMensualCitas.mes), else_=None)
+        
+        filas = db.session.query(
+            ResumenMensualCitas.tipo_cita,
+            ResumenMensualCitas.carrera,
+            ResumenMensualCitas.nivel_riesgo,
+            mes,
+            func.sum(ResumenMensualCitas.total_citas),
+            func.sum(ResumenMensualCitas.total_consultas),
+        ).group_by(
+            ResumenMensualCitas.tipo_cita, ResumenMensualCitas.carrera, ResumenMensualCitas.nivel_riesgo, mes
+        ).all()
+        
+        # Plegar los grupos en los cuatro histogramas
+        por_tipo = defaultdict(int)
+        por_carrera = defaultdict(int)
+        por_riesgo = defaultdict(int)
+        por_mes = defaultdict(int)
+        for tipo, carrera, nivel, mes_grupo, citas, consultas in filas:
+            por_tipo[tipo] += citas or 0
+            por_carrera[carrera] += consultas or 0
+            por_riesgo[nivel] += consultas or 0
+            if mes_grupo is not None:
+                por_mes[mes_grupo] += citas or 0
+        
+        # Mismo formato y filtros (totales > 0) que los reportes individuales
+        meses = sorted(clave for clave, total in por_mes.items() if total > 0)
+        return {
+            'citas_por_tipo': {str(tipo): total for tipo, total in sorted(por_tipo.items(), key=lambda x: str(x[0])) if total > 0},
+            'carreras': {carrera: total for carrera, total in sorted(por_carrera.items(), key=lambda x: str(x[0])) if total > 0},
+            'riesgo': {str(nivel): total for nivel, total in sorted(por_riesgo.items(), key=lambda x: str(x[0])) if total > 0},
+            'tendencia': {
+                'meses': [mes_grupo.strftime('%Y-%m') for mes_grupo in meses],
+                'totales': [por_mes[clave] for clave in meses],
+            },
+        }
+    
+    @staticmethod
+    @cache_reportes.cachear(ttl=60, dependencias=('citas',))
+    @en_replica
+    def _escanear_citas():
+        """
+        Recorre las citas una sola vez: histograma por hora y citas de hoy.
+        
+        Returns:
+            dict: horarios (mismo formato que obtener_horarios_populares) y citas_hoy
+        """
+        hoy = datetime.now().date()
+        hora = func.extract('hour', Cita.hora)
+        filas = db.session.query(
+            hora,
+            func.count(Cita.id),
+            func.sum(case((Cita.fecha == hoy, 1), else_=0)),
+        ).group_by(hora).order_by(func.count(Cita.id).desc()).all()
+        
+        return {
+            'horarios': {f"{int(h)}:00": total for h, total, _ in filas},
+            'citas_hoy': sum(int(de_hoy or 0) for _, _, de_hoy in filas),
+        }
+    
     @staticmethod
+    def obtener_widgets_dashboard(widgets):
+        """
+        Calcula varios widgets del dashboard con escaneos compartidos.
+        
+        Cada escaneo se ejecuta (o se lee de la caché) una sola vez aunque
+        lo necesiten varios widgets: citas por tipo, carreras, tendencia,
+        riesgo y las consultas críticas de las alertas salen de una pasada
+        sobre el resumen diario; horarios y citas de hoy, de una pasada
+        sobre citas.
+        
+        Args:
+            widgets (list[str]): Claves de WIDGETS_DASHBOARD
+            
+        Returns:
+            dict: Widget -> resultado, con el mismo formato que su API individual
+            
+        Raises:
+            KeyError: Si algún widget no existe
+        """
+        escaneos = {}
+        for widget in widgets:
+            for escaneo in ServicioReporte.WIDGETS_DASHBOARD[widget]:
+                if escaneo in escaneos:
+                    continue
+                if escaneo == 'resumen':
+                    escaneos[escaneo] = ServicioReporte._escanear_resumen()
+                elif escaneo == 'citas':
+                    escaneos[escaneo] = ServicioReporte._escanear_citas()
+                elif escaneo == 'usuarios':
+                    escaneos[escaneo] = Usuario.query.filter_by(activo=False).count()
+                elif escaneo == 'rendimiento':
+                    escaneos[escaneo] = ServicioReporte.obtener_rendimiento_profesionales()
+        
+        resultado = {}
+        for widget in widgets:
+            if widget == 'horarios':
+                resultado[widget] = escaneos['citas']['horarios']
+            elif widget == 'alertas':
+                resultado[widget] = ServicioReporte._construir_alertas(
+                    escaneos['resumen']['riesgo'].get(str(NivelRiesgo.CRITICO), 0),
+                    escaneos['citas']['citas_hoy'],
+                    escaneos['usuarios'],
+                )
+            elif widget == 'rendimiento':
+                resultado[widget] = escaneos['rendimiento']
+            else:
+                resultado[widget] = escaneos['resumen'][widget.replace('-', '_')]
+        return resultado
+    
+    @staticmethod
+    @cache_reportes.cachear(ttl=600, dependencias=('pacientes', 'citas', 'consultas'))
+    @en_replica
     def obtener_datos_segmentacion():
         """
         Obtiene datos para análisis de segmentación de pacientes.
@@ -816,19 +1446,26 @@ class ServicioReporte:
         segmentacion = {}
         
         # Segmentación por edad
-        # Calcular edades y segmentar
+        # La edad se calcula como diferencia de años; expresada como rango de
+        # fechas de nacimiento, el filtro puede usar ix_pacientes_fecha_nacimiento
+        anio_actual = date.today().year
+
+        def nacidos_desde(edad):
+            # Primer día del año de nacimiento correspondiente a la edad dada
+            return date(anio_actual - edad, 1, 1)
+
         edad_18_22 = Paciente.query.filter(
-            (func.extract('year', func.current_date()) - func.extract('year', Paciente.fecha_nacimiento)) <= 22,
-            (func.extract('year', func.current_date()) - func.extract('year', Paciente.fecha_nacimiento)) >= 18
+            Paciente.fecha_nacimiento >= nacidos_desde(22),
+            Paciente.fecha_nacimiento < nacidos_desde(17)
         ).count()
         
         edad_23_27 = Paciente.query.filter(
-            (func.extract('year', func.current_date()) - func.extract('year', Paciente.fecha_nacimiento)) >= 23,
-            (func.extract('year', func.current_date()) - func.extract('year', Paciente.fecha_nacimiento)) <= 27
+            Paciente.fecha_nacimiento >= nacidos_desde(27),
+            Paciente.fecha_nacimiento < nacidos_desde(22)
         ).count()
         
         edad_28_mas = Paciente.query.filter(
-            (func.extract('year', func.current_date()) - func.extract('year', Paciente.fecha_nacimiento)) > 27
+            Paciente.fecha_nacimiento < nacidos_desde(27)
         ).count()
         
         segmentacion['por_edad'] = {
@@ -879,80 +1516,88 @@ class ServicioReporte:
         return segmentacion
     
     @staticmethod
+    @cache_reportes.cachear(ttl=900, dependencias=('usuarios', 'citas', 'consultas'))
+    @en_replica
     def obtener_datos_prediccion():
         """
         Obtiene datos para análisis predictivo de citas y consultas.
         
+        Las predicciones provienen del modelo Holt-Winters con estacionalidad
+        semanal de pronostico.py, ajustado sobre la serie diaria de citas.
+        
         Returns:
             dict: Datos para predicciones y tendencias
         """
         prediccion = {}
         
-        # Análisis de tendencia de citas (últimos 6 meses)
-        meses_anteriores = []
-        citas_por_mes = []
-        
-        for i in range(6):
-            fecha = datetime.now() - timedelta(days=30*i)
-            mes = fecha.strftime('%Y-%m')
-            
-            citas_mes = Cita.query.filter(
-                func.extract('year', Cita.fecha) == fecha.year,
-                func.extract('month', Cita.fecha) == fecha.month
-            ).count()
-            
-            meses_anteriores.append(mes)
-            citas_por_mes.append(citas_mes)
-        
-        # Invertir para orden cronológico
-        meses_anteriores.reverse()
-        citas_por_mes.reverse()
-        
-        # Calcular tendencia (predicción simple basada en promedio móvil)
-        if len(citas_por_mes) >= 3:
-            promedio_ultimos_3 = sum(citas_por_mes[-3:]) / 3
-            prediccion_proximo_mes = int(promedio_ultimos_3 * 1.1)  # 10% de crecimiento estimado
-        else:
-            prediccion_proximo_mes = sum(citas_por_mes) // len(citas_por_mes) if citas_por_mes else 0
-        
+        # Pronóstico diario hasta el último día del mes siguiente
+        hoy = date.today()
+        inicio_mes_siguiente = restar_meses(hoy, -1)
+        fin_mes_siguiente = restar_meses(hoy, -2) - timedelta(days=1)
+        # (al menos 30 días para comparar la demanda por tipo)
+        pronostico = pronosticar_demanda(horizonte=max(30, (fin_mes_siguiente - hoy).days), hasta=hoy)
+        inicio = (inicio_mes_siguiente - hoy).days - 1  # Índice del día 1 del mes siguiente
+        
+        def sumar(serie, campo, desde=0, hasta=None):
+            # Suma los valores diarios del modelo Holt-Winters en el intervalo
+            return int(round(sum(serie['holt_winters'][campo][desde:hasta])))
+        
+        # Análisis de tendencia de citas (últimos 6 meses calendario, incluido el actual)
+        # Una sola consulta agrupada por año y mes
+        serie = serie_mensual(Cita.fecha, meses=6)
+        meses_anteriores = [mes for mes, _ in serie]
+        citas_por_mes = [total for _, total in serie]
+        
+        # Predicción del mes siguiente: suma de los pronósticos diarios
+        # (las bandas diarias sumadas dan un intervalo conservador)
+        total = pronostico['total']
         prediccion['tendencia_citas'] = {
             'meses': meses_anteriores,
             'valores': citas_por_mes,
-            'prediccion_proximo': prediccion_proximo_mes
+            'prediccion_proximo': sumar(total, 'pronostico', inicio),
+            'prediccion_inferior': sumar(total, 'inferior', inicio),
+            'prediccion_superior': sumar(total, 'superior', inicio)
         }
         
         # Análisis de patrones de consulta por día de la semana
-        consultas_por_dia = {}
-        dias_semana = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-        
-        for i, dia in enumerate(dias_semana):
-            # SQLAlchemy: 1=Domingo, 2=Lunes, etc.
-            dia_numero = i + 2 if i < 6 else 1
-            
-            total_dia = Cita.query.filter(
-                func.extract('dow', Cita.fecha) == dia_numero
-            ).count()
-            
-            consultas_por_dia[dia] = total_dia
-        
-        prediccion['patrones_semanales'] = consultas_por_dia
-        
-        # Predicción de demanda por tipo de consulta
-        tipos_consulta = db.session.query(
-            Cita.tipo_cita,
-            func.count(Cita.id).label('total')
-        ).group_by(Cita.tipo_cita).all()
+        # Una sola consulta agrupada por día de la semana (de lunes a domingo)
+        prediccion['patrones_semanales'] = histograma_dia_semana(Cita.fecha)
         
+        # Demanda por tipo de consulta: últimos 30 días frente a los próximos 30
         prediccion['demanda_por_tipo'] = {
-            tipo.value: {
-                'actual': total,
-                'prediccion': int(total * 1.15)  # 15% de crecimiento estimado
+            tipo: {
+                'actual': serie['ultimos_30_dias'],
+                'prediccion': sumar(serie, 'pronostico', 0, 30),
+                'inferior': sumar(serie, 'inferior', 0, 30),
+                'superior': sumar(serie, 'superior', 0, 30)
             }
-            for tipo, total in tipos_consulta
+            for tipo, serie in pronostico['por_tipo'].items()
+            if serie['ultimos_30_dias'] or any(serie['holt_winters']['pronostico'])
         }
         
+        # Crecimiento estimado de la demanda total (próximos 30 días frente a los últimos 30)
+        actual = total['ultimos_30_dias']
+        proximos = sumar(total, 'pronostico', 0, 30)
+        prediccion['crecimiento_estimado'] = round((proximos / actual - 1) * 100, 1) if actual else 0.0
+        
         return prediccion
     
+    @staticmethod
+    @cache_reportes.cachear(ttl=900, dependencias=('usuarios', 'citas'))
+    @en_replica
+    def obtener_pronostico_demanda(horizonte=30):
+        """
+        Obtiene el pronóstico diario de citas con los tres modelos disponibles.
+        
+        Args:
+            horizonte (int): Días a pronosticar a partir de mañana
+            
+        Returns:
+            dict: Pronóstico total, por tipo de cita y por profesional con
+                bandas de confianza del 95% (ver pronostico.pronosticar_demanda)
+        """
+        return pronosticar_demanda(horizonte=horizonte)
+    
     @staticmethod
     def cargar_coordenadas_desde_csv():
         """
@@ -990,6 +1635,8 @@ class ServicioReporte:
         return coordenadas
     
     @staticmethod
+    @cache_reportes.cachear(ttl=900, dependencias=('pacientes',))
+    @en_replica
     def obtener_datos_geograficos():
         """
         Obtiene datos geográficos de procedencia de pacientes para visualización en mapa.
@@ -1040,92 +1687,41 @@ class ServicioReporte:
     @staticmethod
     def exportar_datos_procedencia_csv():
         """
-        Exporta datos de procedencia de pacientes a archivo CSV.
+        Genera el CSV de procedencia de pacientes en bloques, sin archivo intermedio.
+        
+        Las filas se leen con un cursor del lado del servidor y se agrupan
+        por procedencia en Python (ver exportacion_csv), por lo que funciona
+        igual en SQLite y en PostgreSQL.
         
         Returns:
-            str: Ruta del archivo CSV generado
+            iterator[str]: Fragmentos consecutivos del CSV
+                (Procedencia, Cantidad_Pacientes, Pacientes)
         """
-        import csv
-        from datetime import datetime
-        
-        # Obtener datos de procedencia
-        procedencias = db.session.query(
-            Paciente.procedencia,
-            func.count(Paciente.id).label('cantidad'),
-            func.string_agg(Usuario.nombre, ', ').label('pacientes')
-        ).join(Usuario).filter(
-            Paciente.procedencia.isnot(None),
-            Paciente.procedencia != ''
-        ).group_by(Paciente.procedencia).all()
-        
-        # Generar archivo CSV
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archivo = f'exportacion_procedencia_{timestamp}.csv'
-        
-        with open(archivo, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Procedencia', 'Cantidad_Pacientes', 'Pacientes'])
-            
-            for procedencia, cantidad, pacientes in procedencias:
-                writer.writerow([procedencia, cantidad, pacientes or ''])
-        
-        return archivo
+        from exportacion_csv import generar_csv
+        return generar_csv('procedencia')
     
     @staticmethod
     def importar_datos_procedencia_csv(archivo_csv):
         """
         Importa datos de procedencia desde archivo CSV.
         
+        Las filas se procesan por lotes: una consulta IN resuelve las claves
+        (codigo_matricula o nombre) de todo el lote y un UPDATE en bloque
+        aplica los cambios en una transacción por lote (ver importacion_csv).
+        
         Args:
-            archivo_csv (str): Ruta del archivo CSV a importar
+            archivo_csv (str | file): Ruta del archivo CSV o flujo del archivo subido
             
         Returns:
-            dict: Resultado de la importación
+            dict: Resultado de la importación (exitoso, filas_leidas,
+                registros_procesados, total_errores, errores por fila)
         """
-        import csv
-        
-        resultado = {
-            'exitoso': False,
-            'registros_procesados': 0,
-            'errores': []
-        }
-        
-        try:
-            with open(archivo_csv, 'r', encoding='utf-8') as archivo:
-                reader = csv.DictReader(archivo)
-                
-                for fila in reader:
-                    try:
-                        # Buscar paciente por nombre o código
-                        if 'codigo_matricula' in fila:
-                            usuario = Usuario.query.filter_by(
-                                codigo_matricula=fila['codigo_matricula']
-                            ).first()
-                        elif 'nombre' in fila:
-                            usuario = Usuario.query.filter_by(
-                                nombre=fila['nombre']
-                            ).first()
-                        else:
-                            continue
-                        
-                        if usuario and usuario.paciente and 'procedencia' in fila:
-                            ServicioPaciente.actualizar_paciente(
-                                usuario.paciente.id,
-                                {'procedencia': fila['procedencia']}
-                            )
-                            resultado['registros_procesados'] += 1
-                            
-                    except Exception as e:
-                        resultado['errores'].append(f"Error en fila {reader.line_num}: {str(e)}")
-                
-                resultado['exitoso'] = True
-                
-        except Exception as e:
-            resultado['errores'].append(f"Error al leer archivo: {str(e)}")
-        
-        return resultado
+        from importacion_csv import importar_procedencias
+        return importar_procedencias(archivo_csv)
     
     @staticmethod
+    @cache_reportes.cachear(ttl=60, dependencias=('usuarios', 'pacientes', 'citas', 'consultas'))
+    @en_replica
     def obtener_configuracion_sistema():
         """
         Obtiene configuración del sistema para el panel administrativo.
@@ -8,9 +8,12 @@ los principios SOLID con comentarios explicativos de cada principio aplicado.
 
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
+from sqlalchemy import or_, case
 from app import db
 from modelos import Usuario, RolUsuario
+from sesion_usuarios import cache_sesiones
+from autenticacion_concurrente import pool_verificacion, limitador_intentos, LimitadorIntentos
 from interfaces import (
     IRepositorioUsuario, IHasheadorPassword, IValidadorUsuario, 
     INotificadorEventos, IServicioAutenticacion, IServicioAutorizacion,
@@ -49,12 +52,29 @@ class RepositorioUsuarioSQLAlchemy(IRepositorioUsuario):
         """
         return Usuario.query.filter_by(codigo_matricula=codigo_matricula).first()
     
+    def obtener_por_identificador(self, identificador: str) -> Optional[Usuario]:
+        """
+        SRP: Solo resuelve el identificador de login, sin validaciones.
+        
+        Una sola consulta OR sobre los índices únicos de dni y codigo_matricula
+        (MULTI-INDEX OR en SQLite, BitmapOr en PostgreSQL), también cuando el
+        identificador no existe. Solo los identificadores numéricos se buscan
+        como DNI y, si ambos coinciden, tiene prioridad el DNI.
+        """
+        condiciones = [Usuario.codigo_matricula == identificador]
+        if identificador.isdigit():
+            condiciones.append(Usuario.dni == identificador)
+        return Usuario.query.filter(or_(*condiciones)).order_by(
+            case((Usuario.dni == identificador, 0), else_=1)
+        ).first()
+    
     def guardar(self, usuario: Usuario) -> Usuario:
         """
         SRP: Solo se ocupa de persistir el usuario, sin lógica de negocio.
         """
         db.session.add(usuario)
         db.session.commit()
+        cache_sesiones.invalidar(usuario.id)  # Descartar la instantánea de sesión anterior
         return usuario
     
     def listar_todos(self) -> List[Usuario]:
@@ -81,8 +101,11 @@ class HasheadorPasswordWerkzeug(IHasheadorPassword):
     def verificar_password(self, password: str, hash_password: str) -> bool:
         """
         SRP: Solo verifica contraseñas, sin lógica de autenticación.
+        
+        La verificación se ejecuta en el pool de procesos acotado para no
+        ocupar el hilo de la solicitud con el cálculo del hash.
         """
-        return check_password_hash(hash_password, password)
+        return pool_verificacion.verificar(hash_password, password)
 
 
 class ValidadorUsuario(IValidadorUsuario):
@@ -165,41 +188,50 @@ class ServicioAutenticacionSOLID(IServicioAutenticacion):
         repositorio_usuario: IRepositorioUsuario,
         hasheador_password: IHasheadorPassword,
         validador_usuario: IValidadorUsuario,
-        notificador_eventos: INotificadorEventos
+        notificador_eventos: INotificadorEventos,
+        limitador_intentos: Optional[LimitadorIntentos] = None
     ):
         """
         DIP: Inyección de dependencias - todas las dependencias son abstracciones.
         
         Esto permite testing fácil y flexibilidad en las implementaciones.
+        El limitador de intentos es opcional (None = sin límite).
         """
         self._repositorio_usuario = repositorio_usuario
         self._hasheador_password = hasheador_password
         self._validador_usuario = validador_usuario
         self._notificador_eventos = notificador_eventos
+        self._limitador_intentos = limitador_intentos
     
-    def autenticar(self, identificador: str, password: str) -> Optional[Usuario]:
+    def autenticar(self, identificador: str, password: str, ip: Optional[str] = None) -> Optional[Usuario]:
         """
         SRP: Solo se ocupa de autenticar usuarios.
         DIP: Usa abstracciones para todas las operaciones.
+        
+        Raises:
+            LoginBloqueado: Si el limitador rechaza el intento antes de verificar el hash
         """
         # Validar credenciales usando el validador inyectado
         if not self._validador_usuario.validar_credenciales(identificador, password):
             self._notificador_eventos.notificar_login_fallido(identificador)
             return None
         
-        # Buscar usuario usando el repositorio inyectado
-        usuario = None
-        if identificador.isdigit():
-            usuario = self._repositorio_usuario.obtener_por_dni(identificador)
+        # Rechazar antes de calcular el hash si hay demasiados fallos
+        if self._limitador_intentos:
+            self._limitador_intentos.comprobar(identificador, ip)
         
-        if not usuario:
-            usuario = self._repositorio_usuario.obtener_por_matricula(identificador)
+        # Buscar usuario por DNI o matrícula en una sola consulta
+        usuario = self._repositorio_usuario.obtener_por_identificador(identificador)
         
         # Verificar contraseña usando el hasheador inyectado
         if usuario and usuario.activo and self._hasheador_password.verificar_password(password, usuario.password_hash):
+            if self._limitador_intentos:
+                self._limitador_intentos.registrar_exito(identificador)
             self._notificador_eventos.notificar_login_exitoso(usuario)
             return usuario
         
+        if self._limitador_intentos:
+            self._limitador_intentos.registrar_fallo(identificador, ip)
         self._notificador_eventos.notificar_login_fallido(identificador)
         return None
     
@@ -367,7 +399,7 @@ class FactoriaServiciosProduccion:
         notificador = NotificadorEventosLog()
         
         return ServicioAutenticacionSOLID(
-            repositorio, hasheador, validador, notificador
+            repositorio, hasheador, validador, notificador, limitador_intentos
         )
     
     @staticmethod
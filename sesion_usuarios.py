@@ -0,0 +1,189 @@
+# ============================================================================
+# CACHÉ DE USUARIOS DE SESIÓN (FLASK-LOGIN)
+# ============================================================================
+"""
+Instantáneas de usuario para el user_loader de Flask-Login.
+
+Flask-Login llama al user_loader en cada solicitud autenticada. En lugar de
+cargar la entidad Usuario (y luego current_user.paciente de forma perezosa),
+el loader devuelve un UsuarioSesion: una instantánea compacta con id,
+nombre, rol, activo y paciente_id, guardada con un TTL corto. Una vista
+normal no emite ninguna consulta de identidad mientras la instantánea siga
+vigente.
+
+Invalidación: los servicios que modifican esos campos llaman a
+cache_sesiones.invalidar(usuario_id) después del commit (activar o
+desactivar usuario, completar o actualizar el perfil de paciente, guardar
+un usuario desde servicios_solid).
+
+Backends: se reutilizan los de cache_reportes. Con CACHE_REPORTES_URL las
+instantáneas se comparten en Redis y la invalidación alcanza a todos los
+workers; con el LRU en memoria cada worker invalida solo su copia y las de
+los demás caducan con el TTL.
+
+Configuración (app.config):
+    SESION_USUARIOS_TTL (int): Segundos de vigencia de una instantánea
+        (por defecto 60; 0 desactiva la caché)
+    CACHE_REPORTES_URL (str): URL de Redis compartida con la caché de reportes
+"""
+
+import pickle
+from flask_login import UserMixin
+from sqlalchemy import select
+from app import db  # Instancia de la base de datos
+from modelos import Usuario, Paciente, RolUsuario  # Modelos de datos
+from cache_reportes import BackendMemoriaLRU, BackendRedis  # Almacenamiento con TTL
+from replica_lectura import lecturas_en_primario  # La sesión no se lee de la réplica
+
+# Vigencia por defecto de una instantánea
+TTL_POR_DEFECTO = 60
+
+# Usuarios distintos retenidos en el LRU en memoria
+MAX_USUARIOS_POR_DEFECTO = 4096
+
+
+class UsuarioSesion(UserMixin):
+    """
+    Instantánea de solo lectura del usuario autenticado (current_user).
+
+    Expone los atributos y métodos que usan las vistas y plantillas
+    (id, nombre, rol, es_administrador(), es_profesional(), es_paciente()).
+    Para modificar el usuario se debe cargar la entidad Usuario.
+
+    Atributos:
+        id (int): ID del usuario
+        nombre (str): Nombre completo
+        rol (RolUsuario): Rol del usuario
+        activo (bool): Si la cuenta está activa
+        paciente_id (int): ID del perfil de paciente (None si no tiene)
+    """
+
+    def __init__(self, id, nombre, rol, activo, paciente_id):
+        self.id = id
+        self.nombre = nombre
+        self.rol = rol
+        self.activo = activo
+        self.paciente_id = paciente_id
+        self._paciente = None
+
+    @property
+    def is_active(self):
+        """Flask-Login: las cuentas desactivadas no están activas."""
+        return bool(self.activo)
+
+    @property
+    def paciente(self):
+        """Perfil de paciente, cargado solo si la vista lo usa (None si no tiene)."""
+        if self.paciente_id is None:
+            return None
+        if self._paciente is None:
+            self._paciente = db.session.get(Paciente, self.paciente_id)
+        return self._paciente
+
+    def es_administrador(self):
+        """Verifica si el usuario tiene rol de administrador."""
+        return self.rol == RolUsuario.ADMINISTRADOR
+
+    def es_profesional(self):
+        """Verifica si el usuario tiene rol de profesional médico."""
+        return self.rol == RolUsuario.PROFESIONAL
+
+    def es_paciente(self):
+        """Verifica si el usuario tiene rol de paciente/estudiante."""
+        return self.rol == RolUsuario.PACIENTE
+
+    def __repr__(self):
+        return f'<UsuarioSesion {self.id} {self.nombre}>'
+
+
+class CacheSesionUsuarios:
+    """
+    Caché de instantáneas UsuarioSesion indexada por ID de usuario.
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: BackendMemoriaLRU o BackendRedis (por defecto LRU en memoria)
+        """
+        self.backend = backend or BackendMemoriaLRU(MAX_USUARIOS_POR_DEFECTO)
+        self.ttl = TTL_POR_DEFECTO
+
+    def configurar(self, app):
+        """
+        Configura el backend y el TTL a partir de app.config.
+
+        Args:
+            app (Flask): Aplicación con SESION_USUARIOS_TTL y CACHE_REPORTES_URL
+        """
+        self.ttl = app.config.get('SESION_USUARIOS_TTL', TTL_POR_DEFECTO)
+        url = app.config.get('CACHE_REPORTES_URL')
+        if url:
+            self.backend = BackendRedis(url, prefijo='osiris:sesion:')
+        else:
+            self.backend = BackendMemoriaLRU(MAX_USUARIOS_POR_DEFECTO)
+
+    @staticmethod
+    def _leer_instantanea(usuario_id):
+        """
+        Lee los campos de la instantánea con una sola consulta, siempre en el
+        primario: una réplica atrasada podría guardar en caché un estado
+        anterior a la última invalidación.
+
+        Returns:
+            dict: Argumentos de UsuarioSesion, o None si el usuario no existe
+        """
+        with lecturas_en_primario():
+            fila = db.session.execute(
+                select(
+                    Usuario.id, Usuario.nombre, Usuario.rol, Usuario.activo,
+                    Paciente.id.label('paciente_id'),
+                ).outerjoin(
+                    Paciente, Paciente.usuario_id == Usuario.id
+                ).where(Usuario.id == usuario_id).limit(1)
+            ).first()
+        return fila._asdict() if fila else None
+
+    def cargar(self, usuario_id):
+        """
+        Retorna la instantánea del usuario, desde la caché si sigue vigente.
+
+        Args:
+            usuario_id (int): ID del usuario guardado en la sesión
+
+        Returns:
+            UsuarioSesion: Instantánea del usuario, o None si no existe
+        """
+        clave = str(usuario_id)
+        if self.ttl > 0:
+            valor = self.backend.obtener(clave)
+            if valor is not None:
+                return UsuarioSesion(**pickle.loads(valor))
+
+        datos = self._leer_instantanea(usuario_id)
+        if datos is None:
+            return None
+        if self.ttl > 0:
+            self.backend.guardar(clave, pickle.dumps(datos), self.ttl)
+        return UsuarioSesion(**datos)
+
+    def invalidar(self, *usuario_ids):
+        """
+        Descarta las instantáneas de los usuarios indicados.
+
+        Debe llamarse después del commit que modifica al usuario o a su perfil.
+
+        Args:
+            *usuario_ids (int): IDs de usuario
+        """
+        for usuario_id in usuario_ids:
+            if usuario_id is not None:
+                self.backend.eliminar(str(usuario_id))
+
+    def limpiar(self):
+        """Descarta todas las instantáneas."""
+        self.backend.limpiar()
+
+
+# Instancia única usada por el user_loader y los servicios de escritura
+cache_sesiones = CacheSesionUsuarios()
@@ -0,0 +1,181 @@
+// ============================================================================
+// GRÁFICOS DE REPORTES ARMADOS EN EL NAVEGADOR
+// ============================================================================
+// El servidor envía solo las series de cada gráfico (/reportes/api/graficos);
+// aquí se arman las trazas, el diseño y el tema de Plotly. Los diseños
+// replican los de graficos.py (figuras completas de /reportes/graficos/<id>.json).
+//
+// Uso (requiere plotly.js):
+//     OsirisGraficos.cargar({'segmentacion-edad': 'chart-edad', ...});
+
+(function () {
+    'use strict';
+
+    // Tema equivalente a template='plotly_white'
+    const TEMA = {
+        paper_bgcolor: '#ffffff',
+        plot_bgcolor: '#ffffff',
+        font: {color: '#2a3f5f'},
+        xaxis: {gridcolor: '#ebf0f8', linecolor: '#ebf0f8', zerolinecolor: '#ebf0f8', automargin: true},
+        yaxis: {gridcolor: '#ebf0f8', linecolor: '#ebf0f8', zerolinecolor: '#ebf0f8', automargin: true},
+        colorway: ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A', '#19d3f3', '#FF6692', '#B6E880']
+    };
+
+    const CONFIG = {responsive: true, displayModeBar: false, displaylogo: false};
+
+    const COLORES_TIPO_CITA = ['#28a745', '#17a2b8', '#dc3545'];
+
+    // --- Constructores de trazas a partir de las series ---
+
+    function barras(colores, mostrarTexto) {
+        return function (series) {
+            const serie = series[0];
+            const traza = {type: 'bar', x: serie.etiquetas, y: serie.valores, marker: {color: colores}};
+            if (mostrarTexto) {
+                traza.text = serie.valores;
+                traza.textposition = 'auto';
+            }
+            return [traza];
+        };
+    }
+
+    function torta(hueco, colores, textinfo) {
+        return function (series) {
+            const serie = series[0];
+            const traza = {type: 'pie', labels: serie.etiquetas, values: serie.valores, hole: hueco};
+            if (colores) {
+                traza.marker = {colors: colores};
+            }
+            if (textinfo) {
+                traza.textinfo = textinfo;
+                traza.textposition = 'outside';
+            }
+            return [traza];
+        };
+    }
+
+    function lineaMensual(tamanoMarcador, nombre) {
+        return function (series) {
+            const serie = series[0];
+            return [{
+                type: 'scatter', mode: 'lines+markers', x: serie.etiquetas, y: serie.valores, name: nombre,
+                line: {color: '#007bff', width: 3}, marker: {size: tamanoMarcador}
+            }];
+        };
+    }
+
+    // Barras de error asimétricas a partir de los límites superior/inferior
+    function errorY(serie) {
+        return {
+            type: 'data', symmetric: false,
+            array: serie.superior.map((s, i) => s - serie.valores[i]),
+            arrayminus: serie.inferior.map((inf, i) => serie.valores[i] - inf)
+        };
+    }
+
+    function tendenciaConPrediccion(series) {
+        const [historico, prediccion] = series;
+        return [
+            {type: 'scatter', mode: 'lines+markers', name: historico.nombre, x: historico.etiquetas,
+             y: historico.valores, line: {color: '#007bff', width: 3}, marker: {size: 8}},
+            {type: 'scatter', mode: 'markers', name: prediccion.nombre, x: prediccion.etiquetas,
+             y: prediccion.valores, marker: {size: 12, color: '#dc3545', symbol: 'star'},
+             error_y: errorY(prediccion)}
+        ];
+    }
+
+    function demandaPorTipo(series) {
+        const [actual, prediccion] = series;
+        return [
+            {type: 'bar', name: actual.nombre, x: actual.etiquetas, y: actual.valores, marker: {color: '#17a2b8'}},
+            {type: 'bar', name: prediccion.nombre, x: prediccion.etiquetas, y: prediccion.valores,
+             marker: {color: '#28a745'}, error_y: errorY(prediccion)}
+        ];
+    }
+
+    // ID del gráfico -> [trazas(series), diseño]
+    const DISENOS = {
+        'citas-por-tipo': [barras(COLORES_TIPO_CITA, true),
+            {title: 'Distribución de Citas por Tipo de Consulta', xaxis: {title: 'Tipo de Consulta'},
+             yaxis: {title: 'Número de Citas'}, height: 400}],
+        'consultas-por-carrera': [torta(0.3, null, 'label+percent'),
+            {title: 'Consultas Médicas por Carrera Universitaria', height: 500}],
+        'tendencia-mensual': [lineaMensual(8, 'Citas por Mes'),
+            {title: 'Tendencia Mensual de Citas Médicas', xaxis: {title: 'Mes'},
+             yaxis: {title: 'Número de Citas'}, height: 400}],
+        'dashboard-citas-tipo': [barras(COLORES_TIPO_CITA, true),
+            {title: 'Citas por Tipo de Consulta', xaxis: {title: 'Tipo'}, yaxis: {title: 'Cantidad'}, height: 300}],
+        'dashboard-consultas-carrera': [torta(0.3),
+            {title: 'Consultas por Carrera', height: 300}],
+        'dashboard-tendencia-mensual': [lineaMensual(6),
+            {title: 'Tendencia Mensual', xaxis: {title: 'Mes'}, yaxis: {title: 'Citas'}, height: 300}],
+        'segmentacion-edad': [torta(0.4, ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A']),
+            {title: 'Segmentación por Edad', height: 400}],
+        'segmentacion-tipo-consulta': [barras(['#28a745', '#17a2b8', '#dc3545', '#ffc107']),
+            {title: 'Segmentación por Tipo de Consulta', xaxis: {title: 'Tipo de Consulta'},
+             yaxis: {title: 'Número de Pacientes'}, height: 400}],
+        'segmentacion-riesgo': [torta(0.3, ['#28a745', '#ffc107', '#fd7e14', '#dc3545']),
+            {title: 'Segmentación por Nivel de Riesgo', height: 400}],
+        'segmentacion-actividad': [barras(['#28a745', '#6c757d']),
+            {title: 'Segmentación por Actividad', xaxis: {title: 'Tipo de Actividad'},
+             yaxis: {title: 'Número de Pacientes'}, height: 400}],
+        'prediccion-tendencia': [tendenciaConPrediccion,
+            {title: 'Tendencia de Citas con Predicción', xaxis: {title: 'Mes'},
+             yaxis: {title: 'Número de Citas'}, height: 400}],
+        'prediccion-patrones-semanales': [
+            barras(['#4ECDC4', '#45B7D1', '#FFA07A', '#FF6B6B', '#98D8C8', '#F7DC6F', '#BB8FCE']),
+            {title: 'Patrones de Consulta por Día de la Semana', xaxis: {title: 'Día de la Semana'},
+             yaxis: {title: 'Número de Consultas'}, height: 400}],
+        'prediccion-demanda-tipo': [demandaPorTipo,
+            {title: 'Demanda por Tipo de Consulta: Actual vs Predicción', xaxis: {title: 'Tipo de Consulta'},
+             yaxis: {title: 'Número de Consultas'}, height: 400, barmode: 'group'}]
+    };
+
+    // Combina el tema con el diseño del gráfico (los ejes se fusionan un nivel)
+    function aplicarTema(diseno) {
+        const resultado = Object.assign({}, TEMA, diseno);
+        ['xaxis', 'yaxis'].forEach(function (eje) {
+            resultado[eje] = Object.assign({}, TEMA[eje], diseno[eje] || {});
+        });
+        return resultado;
+    }
+
+    function dibujar(graficoId, contenedor, grafico) {
+        const definicion = DISENOS[graficoId];
+        if (!definicion || !grafico) {
+            return;
+        }
+        const [trazas, diseno] = definicion;
+        Plotly.newPlot(contenedor, trazas(grafico.series), aplicarTema(diseno), CONFIG);
+    }
+
+    /**
+     * Pide las series de todos los gráficos en una sola solicitud y los dibuja.
+     *
+     * @param {Object} contenedores - ID del gráfico -> ID del elemento contenedor
+     * @returns {Promise}
+     */
+    function cargar(contenedores) {
+        const ids = Object.keys(contenedores);
+        if (!ids.length) {
+            return Promise.resolve();
+        }
+        return fetch('/reportes/api/graficos?ids=' + encodeURIComponent(ids.join(',')), {credentials: 'same-origin'})
+            .then(function (respuesta) {
+                if (!respuesta.ok) {
+                    throw new Error('Error ' + respuesta.status + ' al cargar los gráficos');
+                }
+                return respuesta.json();
+            })
+            .then(function (datos) {
+                ids.forEach(function (graficoId) {
+                    dibujar(graficoId, contenedores[graficoId], datos.graficos[graficoId]);
+                });
+            })
+            .catch(function (error) {
+                console.error(error);
+            });
+    }
+
+    window.OsirisGraficos = {cargar: cargar, DISENOS: DISENOS};
+})();
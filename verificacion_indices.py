@@ -0,0 +1,148 @@
+# ============================================================================
+# VERIFICACIÓN DE USO DE ÍNDICES (EXPLAIN)
+# ============================================================================
+"""
+Verifica con EXPLAIN que las consultas de ServicioReporte, ServicioCita y
+la búsqueda de pacientes usan índices en lugar de recorrer tablas completas.
+
+Cada función de servicio se ejecuta capturando sus sentencias SELECT; luego
+se obtiene el plan de cada una (EXPLAIN QUERY PLAN en SQLite, EXPLAIN en
+PostgreSQL) y se marca como fallo todo recorrido secuencial de una tabla.
+
+Uso:
+    flask --app main verificar-indices
+"""
+
+import re
+from app import db  # Instancia de la base de datos
+from monitor_consultas import ContadorConsultas  # Captura de sentencias SQL
+from cache_reportes import cache_reportes  # Se desactiva para ejecutar las consultas reales
+
+# Tablas de resumen materializado: los reportes las recorren completas por
+# diseño (el tamaño de cada una se discute en resumen_diario.py)
+TABLAS_RESUMEN = {'resumen_diario_citas', 'resumen_mensual_citas'}
+
+
+def _funciones_a_verificar():
+    """
+    Lista de (nombre, función sin argumentos) cuyas consultas se verifican.
+
+    Las funciones que leen o escriben archivos CSV y las listas completas sin
+    paginar (obtener_citas) quedan fuera: recorren la tabla por diseño.
+    """
+    from datetime import date, timedelta
+    from servicios import ServicioReporte, ServicioCita, ServicioPaciente
+    from modelos import Cita
+
+    cita = Cita.query.first()
+    paciente_id = cita.paciente_id if cita else 0
+    profesional_id = cita.profesional_id if cita else 0
+
+    return [
+        ('ServicioReporte.obtener_estadisticas_citas', ServicioReporte.obtener_estadisticas_citas),
+        ('ServicioReporte.obtener_estadisticas_consultas_por_carrera', ServicioReporte.obtener_estadisticas_consultas_por_carrera),
+        ('ServicioReporte.obtener_tendencia_mensual_citas', ServicioReporte.obtener_tendencia_mensual_citas),
+        ('ServicioReporte.obtener_niveles_riesgo', ServicioReporte.obtener_niveles_riesgo),
+        ('ServicioReporte.obtener_resumen_dashboard', ServicioReporte.obtener_resumen_dashboard),
+        ('ServicioReporte.obtener_estadisticas_profesionales', ServicioReporte.obtener_estadisticas_profesionales),
+        ('ServicioReporte.obtener_estadisticas_citas_por_tipo', ServicioReporte.obtener_estadisticas_citas_por_tipo),
+        ('ServicioReporte.obtener_horarios_populares', ServicioReporte.obtener_horarios_populares),
+        ('ServicioReporte.obtener_rendimiento_profesionales', ServicioReporte.obtener_rendimiento_profesionales),
+        ('ServicioReporte.obtener_alertas_sistema', ServicioReporte.obtener_alertas_sistema),
+        ('ServicioReporte.obtener_datos_segmentacion', ServicioReporte.obtener_datos_segmentacion),
+        ('ServicioReporte.obtener_datos_prediccion', ServicioReporte.obtener_datos_prediccion),
+        ('ServicioReporte.obtener_datos_geograficos', ServicioReporte.obtener_datos_geograficos),
+        ('ServicioReporte.obtener_configuracion_sistema', ServicioReporte.obtener_configuracion_sistema),
+        ('ServicioCita.obtener_citas_paginadas', ServicioCita.obtener_citas_paginadas),
+        ('ServicioCita.obtener_citas_por_paciente', lambda: ServicioCita.obtener_citas_por_paciente(paciente_id)),
+        ('ServicioCita.obtener_citas_por_profesional', lambda: ServicioCita.obtener_citas_por_profesional(profesional_id)),
+        ('ServicioCita.obtener_citas_paginadas (paciente)', lambda: ServicioCita.obtener_citas_paginadas(paciente_id=paciente_id)),
+        ('ServicioCita.obtener_citas_paginadas (profesional)', lambda: ServicioCita.obtener_citas_paginadas(profesional_id=profesional_id)),
+        ('ServicioPaciente.obtener_pacientes_paginados (profesional)', lambda: ServicioPaciente.obtener_pacientes_paginados(profesional_id=profesional_id)),
+        ('ServicioCita.buscar_disponibilidad', lambda: ServicioCita.buscar_disponibilidad(
+            date.today(), date.today() + timedelta(days=30), profesional_id=profesional_id)),
+    ]
+
+
+def _obtener_plan(conexion, sentencia, parametros):
+    """Ejecuta EXPLAIN sobre una sentencia y retorna las líneas del plan."""
+    if conexion.dialect.name == 'sqlite':
+        filas = conexion.exec_driver_sql('EXPLAIN QUERY PLAN ' + sentencia, parametros)
+        return [fila[-1] for fila in filas]
+    filas = conexion.exec_driver_sql('EXPLAIN ' + sentencia, parametros)
+    return [fila[0] for fila in filas]
+
+
+def _recorridos_completos(plan, dialecto):
+    """Retorna las líneas del plan que recorren una tabla del esquema sin índice."""
+    tablas = set(db.metadata.tables) - TABLAS_RESUMEN
+    if dialecto == 'sqlite':
+        # "SCAN tabla" sin índice; "SCAN tabla USING [COVERING] INDEX" sí lo usa.
+        # Los recorridos de subconsultas (SCAN anon_1) no son tablas del esquema.
+        patron = re.compile(r'^SCAN (\w+)')
+        return [linea for linea in plan
+                if 'INDEX' not in linea and (m := patron.match(linea)) and m.group(1) in tablas]
+    patron = re.compile(r'Seq Scan on (\w+)')
+    return [linea for linea in plan if (m := patron.search(linea)) and m.group(1) in tablas]
+
+
+def verificar_uso_indices():
+    """
+    Ejecuta cada función de servicio y analiza el plan de sus consultas.
+
+    Returns:
+        list[dict]: Un resultado por sentencia con las claves funcion,
+            sentencia, plan y recorridos_completos (vacío si usa índices)
+    """
+    resultados = []
+    dialecto = db.engine.dialect.name
+    habilitada, cache_reportes.habilitada = cache_reportes.habilitada, False
+
+    try:
+        capturas = []
+        for nombre, funcion in _funciones_a_verificar():
+            db.session.expire_all()
+            with ContadorConsultas() as contador:
+                funcion()
+            capturas.append((nombre, contador))
+    finally:
+        cache_reportes.habilitada = habilitada
+
+    for nombre, contador in capturas:
+        with db.engine.connect() as conexion:
+            for sentencia, parametros in zip(contador.sentencias, contador.parametros):
+                if not sentencia.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = _obtener_plan(conexion, sentencia, parametros)
+                resultados.append({
+                    'funcion': nombre,
+                    'sentencia': sentencia,
+                    'plan': plan,
+                    'recorridos_completos': _recorridos_completos(plan, dialecto),
+                })
+
+    return resultados
+
+
+def registrar_comandos(app):
+    """Registra el comando `flask verificar-indices` en la aplicación."""
+    import click
+
+    @app.cli.command('verificar-indices')
+    @click.option('--detalle', is_flag=True, help='Mostrar el plan de todas las sentencias.')
+    def comando_verificar_indices(detalle):
+        """Verifica con EXPLAIN que las consultas de reportes, citas y búsqueda de pacientes usan índices."""
+        resultados = verificar_uso_indices()
+        fallos = [r for r in resultados if r['recorridos_completos']]
+
+        for resultado in resultados:
+            if resultado['recorridos_completos'] or detalle:
+                estado = 'SIN ÍNDICE' if resultado['recorridos_completos'] else 'OK'
+                click.echo(f"[{estado}] {resultado['funcion']}")
+                click.echo('    ' + ' '.join(resultado['sentencia'].split())[:200])
+                for linea in resultado['plan']:
+                    click.echo(f'      {linea}')
+
+        click.echo(f'{len(resultados) - len(fallos)}/{len(resultados)} sentencias usan índices.')
+        if fallos:
+            raise SystemExit(1)